@@ -5,35 +5,39 @@ Importa nuovi dati da file Excel e aggiorna i CSV
 
 Utilizzo:
     python aggiorna_dati.py CDC_CE_1.xlsx
+    python aggiorna_dati.py CDC_CE_1.xlsx --anteprima  # Mostra il changeset senza scrivere
+    python aggiorna_dati.py CDC_CE_1.xlsx --elimina    # Rimuove le strutture assenti dal file
     python aggiorna_dati.py --tutti  # Importa tutti i file nella cartella
 """
 
 import pandas as pd
-import shutil
-from datetime import datetime
 from pathlib import Path
 import sys
 import argparse
 
-def backup_files():
-    """Crea backup dei file CSV esistenti"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_dir = Path(f"backup_{timestamp}")
-    backup_dir.mkdir(exist_ok=True)
+from archivio_snapshot import crea_snapshot
+from motore_upsert import riepilogo_changeset, upsert_csv
+from schema_dati import ErroreValidazione, stampa_errori, verifica
 
+def backup_files():
+    """
+    Crea uno snapshot dei file CSV esistenti nell'archivio deduplicato (.snapshot/):
+    i file non modificati dall'ultimo snapshot non vengono copiati di nuovo.
+    """
     files_to_backup = [
         'strutture_sanitarie.csv',
         'dotazioni_strutture_telemedicina.csv',
         'dotazioni_telemedicina_catalogo.csv'
     ]
 
-    print(f"📦 Creazione backup in {backup_dir}/")
+    id_snapshot = crea_snapshot(files_to_backup, descrizione='aggiorna_dati')
+
+    print(f"📦 Snapshot backup: {id_snapshot}")
     for file in files_to_backup:
         if Path(file).exists():
-            shutil.copy2(file, backup_dir / file)
             print(f"  ✅ {file}")
 
-    return backup_dir
+    return id_snapshot
 
 def importa_excel(file_path):
     """Importa dati da file Excel"""
@@ -53,61 +57,45 @@ def importa_excel(file_path):
         print(f"  ❌ Errore: {e}")
         return None
 
-def valida_dati(df, tipo='strutture'):
-    """Valida i dati importati"""
-    print(f"\n🔍 Validazione dati {tipo}...")
-
-    errori = []
-    warnings = []
-
-    if tipo == 'strutture':
-        # Colonne richieste per strutture
-        colonne_richieste = ['Nome_Struttura', 'Tipologia', 'PNRR']
-        for col in colonne_richieste:
-            if col not in df.columns:
-                errori.append(f"Colonna mancante: {col}")
-
-        # Verifica valori PNRR
-        if 'PNRR' in df.columns:
-            valori_invalidi = df[~df['PNRR'].isin(['SI', 'NO'])]['PNRR'].unique()
-            if len(valori_invalidi) > 0:
-                warnings.append(f"Valori PNRR non standard: {valori_invalidi}")
-
-    elif tipo == 'dotazioni':
-        # Colonne richieste per dotazioni
-        colonne_richieste = ['Codice_Struttura', 'Codice_Dotazione', 'Quantita_Richiesta']
-        for col in colonne_richieste:
-            if col not in df.columns:
-                errori.append(f"Colonna mancante: {col}")
-
-    # Report validazione
-    if errori:
-        print(f"  ❌ {len(errori)} errori:")
-        for err in errori:
-            print(f"    - {err}")
-        return False
-
-    if warnings:
-        print(f"  ⚠️  {len(warnings)} warning:")
-        for warn in warnings:
-            print(f"    - {warn}")
-
-    print(f"  ✅ Validazione OK")
-    return True
-
-def aggiorna_strutture(df_nuovo):
-    """Aggiorna file strutture_sanitarie.csv"""
+def aggiorna_strutture(df_nuovo, elimina=False, anteprima=False):
+    """
+    Aggiorna file strutture_sanitarie.csv con upsert per Codice.
+    Le modifiche manuali restano: colonne non presenti nel file importato e celle
+    vuote nell'import non toccano i dati esistenti. Le strutture assenti
+    dall'import vengono rimosse solo con elimina=True.
+    """
     print(f"\n🔄 Aggiornamento strutture...")
 
-    # Carica CSV esistente
-    df_esistente = pd.read_csv('strutture_sanitarie.csv')
+    try:
+        changeset, file_changeset = upsert_csv(
+            'strutture_sanitarie.csv', df_nuovo, chiave='Codice',
+            elimina=elimina, anteprima=anteprima,
+            controllo=lambda df: verifica(df, 'strutture')
+        )
+    except ErroreValidazione as e:
+        print("  ❌ Il risultato dell'aggiornamento non rispetta lo schema: nessun file modificato")
+        stampa_errori(e.errori)
+        return False
+    except ValueError as e:
+        print(f"  ❌ Errore: {e}")
+        return False
 
-    # Merge o sostituisci
-    # TODO: Implementa logica di merge basata su Codice
+    conteggi = riepilogo_changeset(changeset)
+    print(f"  ➕ Nuove strutture:     {conteggi['inserite']}")
+    print(f"  ✏️  Strutture modificate: {conteggi['aggiornate']} ({conteggi['celle_aggiornate']} celle)")
+    print(f"  ➖ Strutture rimosse:   {conteggi['eliminate']}")
+
+    if changeset.empty:
+        print("  ✅ Nessuna modifica: dati già aggiornati")
+    elif anteprima:
+        for _, row in changeset[changeset['Operazione'] == 'UPDATE'].head(20).iterrows():
+            print(f"    - {row['Chiave']} {row['Colonna']}: '{row['Valore_Precedente']}' → '{row['Valore_Nuovo']}'")
+        print("  👀 Anteprima: nessun file modificato")
+    else:
+        print("  ✅ strutture_sanitarie.csv aggiornato")
+        print(f"  📝 Changeset: {file_changeset}")
 
-    # Per ora sovrascrivi (implementa merge più sofisticato se necessario)
-    df_nuovo.to_csv('strutture_sanitarie.csv', index=False)
-    print(f"  ✅ Aggiornate {len(df_nuovo)} strutture")
+    return True
 
 def rigenera_dati():
     """Rigenera dati integrati"""
@@ -130,6 +118,8 @@ def main():
     parser.add_argument('--tutti', action='store_true', help='Importa tutti i file *.xlsx nella cartella')
     parser.add_argument('--no-backup', action='store_true', help='Salta backup')
     parser.add_argument('--no-regen', action='store_true', help='Salta rigenerazione dati')
+    parser.add_argument('--elimina', action='store_true', help='Rimuovi le strutture assenti dal file importato')
+    parser.add_argument('--anteprima', action='store_true', help='Mostra le modifiche senza applicarle')
 
     args = parser.parse_args()
 
@@ -137,9 +127,9 @@ def main():
     print("AGGIORNAMENTO DATI DASHBOARD TELEMEDICINA")
     print("=" * 80)
 
-    # Backup
-    if not args.no_backup:
-        backup_dir = backup_files()
+    # Backup (non in anteprima: l'anteprima non scrive nulla)
+    if not args.no_backup and not args.anteprima:
+        id_snapshot = backup_files()
 
     # Importa file
     if args.tutti:
@@ -152,21 +142,32 @@ def main():
                 pass
     elif args.file:
         df = importa_excel(args.file)
-        if df is not None and valida_dati(df, tipo='strutture'):
-            # aggiorna_strutture(df)
-            print("\n⚠️  Aggiornamento manuale richiesto - verifica i dati prima")
+        # Lo schema si verifica sul file risultante dall'upsert (controllo=verifica):
+        # l'import può contenere solo Codice e le colonne da cambiare, con celle vuote
+        if df is None:
+            print("\n❌ Import non riuscito: nessun file modificato")
+            return
+        if not aggiorna_strutture(df, elimina=args.elimina, anteprima=args.anteprima):
+            return
     else:
         parser.print_help()
         return
 
-    # Rigenera dati
-    if not args.no_regen:
+    if args.anteprima:
+        return
+
+    # Rigenera dati (non dopo un upsert: integra_anagrafiche_v3.py ricostruisce
+    # strutture_sanitarie.csv dal censimento e cancellerebbe le modifiche appena applicate)
+    if args.file:
+        print("\nℹ️  Rigenerazione saltata: integra_anagrafiche_v3.py riscriverebbe strutture_sanitarie.csv")
+        print("\n✅ Aggiornamento completato!")
+    elif not args.no_regen:
         if rigenera_dati():
             print("\n✅ Aggiornamento completato!")
         else:
             print("\n❌ Errore durante rigenerazione")
             if not args.no_backup:
-                print(f"💡 Puoi ripristinare il backup da: {backup_dir}/")
+                print(f"💡 Puoi ripristinare il backup con: python archivio_snapshot.py ripristina {id_snapshot}")
 
     print("\n" + "=" * 80)
     print("Per applicare le modifiche alla dashboard:")
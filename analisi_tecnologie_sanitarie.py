@@ -4,13 +4,39 @@ Script per l'analisi e visualizzazione delle tecnologie sanitarie PNRR
 USL Toscana Nord Ovest - Case di Comunità e Ospedali di Comunità
 
 Utilizzo:
-    python3 analisi_tecnologie_sanitarie.py
+    python3 analisi_tecnologie_sanitarie.py                      # menu interattivo
+    python3 analisi_tecnologie_sanitarie.py --batch              # tutte le viste in JSON, CSV ed Excel
+    python3 analisi_tecnologie_sanitarie.py --batch --formati csv --cartella /percorso/output
+
+Ogni vista è calcolata con un solo groupby sul dettaglio CdC/OdC; il riepilogo per
+struttura (riepilogo_strutture.csv) è calcolato dal dettaglio, non letto da file.
 """
 
+import argparse
+import json
 import pandas as pd
 import sys
+from datetime import datetime
 from pathlib import Path
 
+FILE_DETTAGLIO_CDC = 'tecnologie_cdc_dettaglio.csv'
+FILE_DETTAGLIO_ODC = 'tecnologie_odc_dettaglio.csv'
+
+# Viste calcolate e foglio Excel corrispondente
+VISTE = {
+    'riepilogo_generale': 'Riepilogo Generale',
+    'tecnologie': 'Riepilogo Tecnologie',
+    'strutture': 'Riepilogo Strutture',
+    'top_strutture': 'Top Strutture',
+    'dettaglio_cdc': 'CdC Dettaglio',
+    'dettaglio_odc': 'OdC Dettaglio',
+}
+
+# Il riepilogo strutture mantiene il nome di file atteso dagli script precedenti
+FILE_CSV_VISTE = {'strutture': 'riepilogo_strutture.csv'}
+
+FORMATI = ['json', 'csv', 'excel']
+
 # Configurazione output
 pd.set_option('display.max_rows', None)
 pd.set_option('display.max_columns', None)
@@ -25,42 +51,97 @@ def stampa_sezione(titolo, carattere="=", larghezza=100):
     print(carattere * larghezza + "\n")
 
 
-def carica_dati():
-    """Carica i file CSV"""
-    try:
-        df_cdc = pd.read_csv('tecnologie_cdc_dettaglio.csv')
-        df_odc = pd.read_csv('tecnologie_odc_dettaglio.csv')
-        df_riepilogo = pd.read_csv('riepilogo_strutture.csv')
+def calcola_riepilogo_strutture(df_cdc, df_odc):
+    """
+    Riepilogo per struttura (un solo groupby sul dettaglio CdC + OdC): numero voci,
+    quantità e importo totale, in ordine di importo decrescente
+    """
+    df_all = pd.concat([df_cdc, df_odc], ignore_index=True)
+    return df_all.groupby(['Tipologia', 'Struttura'], as_index=False).agg(
+        Voci=('Tecnologia', 'size'),
+        Quantita=('Quantita', 'sum'),
+        Importo_Totale_EUR=('Importo_Totale_EUR', 'sum')
+    ).round({'Importo_Totale_EUR': 2}).sort_values('Importo_Totale_EUR', ascending=False, ignore_index=True)
 
-        # Converti colonne numeriche
-        df_cdc['Importo_Totale_EUR'] = pd.to_numeric(df_cdc['Importo_Totale_EUR'])
-        df_odc['Importo_Totale_EUR'] = pd.to_numeric(df_odc['Importo_Totale_EUR'])
-        df_riepilogo['Importo_Totale_EUR'] = pd.to_numeric(df_riepilogo['Importo_Totale_EUR'])
 
-        return df_cdc, df_odc, df_riepilogo
+def carica_dati():
+    """Carica i file CSV di dettaglio e ne calcola il riepilogo per struttura"""
+    try:
+        df_cdc = pd.read_csv(FILE_DETTAGLIO_CDC)
+        df_odc = pd.read_csv(FILE_DETTAGLIO_ODC)
     except FileNotFoundError as e:
         print(f"❌ Errore: File non trovato - {e}")
         print("Assicurati di essere nella directory corretta con i file CSV.")
         sys.exit(1)
 
+    # Converti colonne numeriche
+    df_cdc['Importo_Totale_EUR'] = pd.to_numeric(df_cdc['Importo_Totale_EUR'])
+    df_odc['Importo_Totale_EUR'] = pd.to_numeric(df_odc['Importo_Totale_EUR'])
+
+    # Il riepilogo non è un file di ingresso: deriva sempre dal dettaglio
+    df_riepilogo = calcola_riepilogo_strutture(df_cdc, df_odc)
+
+    return df_cdc, df_odc, df_riepilogo
+
+
+def vista_riepilogo_generale(df_cdc, df_odc):
+    """Quantità e importo per tipologia con riga di totale (un solo groupby)"""
+    riepilogo = pd.concat([df_cdc, df_odc], ignore_index=True).groupby('Tipologia', as_index=False).agg(
+        Quantita=('Quantita', 'sum'),
+        Importo_Totale_EUR=('Importo_Totale_EUR', 'sum')
+    )
+    totale = pd.DataFrame([{
+        'Tipologia': 'TOTALE',
+        'Quantita': riepilogo['Quantita'].sum(),
+        'Importo_Totale_EUR': riepilogo['Importo_Totale_EUR'].sum()
+    }])
+    return pd.concat([riepilogo, totale], ignore_index=True).round({'Importo_Totale_EUR': 2})
+
+
+def vista_tecnologie(df_cdc, df_odc):
+    """Riepilogo per tecnologia in ordine di importo decrescente (un solo groupby)"""
+    return pd.concat([df_cdc, df_odc], ignore_index=True).groupby('Tecnologia', as_index=False).agg({
+        'Quantita': 'sum',
+        'Costo_Unitario_EUR': 'first',
+        'Importo_Totale_EUR': 'sum'
+    }).round(2).sort_values('Importo_Totale_EUR', ascending=False, ignore_index=True)
+
+
+def vista_dettaglio(df):
+    """Dettaglio ordinato per struttura con il totale della struttura su ogni riga (un solo groupby)"""
+    dettaglio = df.sort_values('Struttura', kind='stable', ignore_index=True)
+    dettaglio['Totale_Struttura_EUR'] = dettaglio.groupby('Struttura')['Importo_Totale_EUR'].transform('sum').round(2)
+    return dettaglio
+
+
+def calcola_viste(df_cdc, df_odc, df_riepilogo, n_top=10):
+    """Tutte le viste dell'analisi come DataFrame, nell'ordine di VISTE"""
+    return {
+        'riepilogo_generale': vista_riepilogo_generale(df_cdc, df_odc),
+        'tecnologie': vista_tecnologie(df_cdc, df_odc),
+        'strutture': df_riepilogo,
+        'top_strutture': df_riepilogo.head(n_top),
+        'dettaglio_cdc': vista_dettaglio(df_cdc),
+        'dettaglio_odc': vista_dettaglio(df_odc),
+    }
+
 
 def visualizza_riepilogo_generale(df_cdc, df_odc, df_riepilogo):
     """Visualizza il riepilogo generale"""
     stampa_sezione("RIEPILOGO GENERALE TECNOLOGIE SANITARIE PNRR")
 
-    totale_cdc = df_cdc['Importo_Totale_EUR'].sum()
-    totale_odc = df_odc['Importo_Totale_EUR'].sum()
-    totale_generale = totale_cdc + totale_odc
-
-    quantita_cdc = df_cdc['Quantita'].sum()
-    quantita_odc = df_odc['Quantita'].sum()
-    quantita_totale = quantita_cdc + quantita_odc
+    riepilogo = vista_riepilogo_generale(df_cdc, df_odc).set_index('Tipologia')
+    etichette = {'CdC': 'Case di Comunità (CdC)', 'OdC': 'Ospedali di Comunità (OdC)'}
 
     print(f"{'Tipologia':<30} {'Quantità':>12} {'Importo Totale':>20}")
     print("-" * 65)
-    print(f"{'Case di Comunità (CdC)':<30} {quantita_cdc:>12,} {f'€{totale_cdc:,.2f}':>20}")
-    print(f"{'Ospedali di Comunità (OdC)':<30} {quantita_odc:>12,} {f'€{totale_odc:,.2f}':>20}")
+    for tipologia, etichetta in etichette.items():
+        quantita = int(riepilogo['Quantita'].get(tipologia, 0))
+        importo = riepilogo['Importo_Totale_EUR'].get(tipologia, 0.0)
+        print(f"{etichetta:<30} {quantita:>12,} {f'€{importo:,.2f}':>20}")
     print("-" * 65)
+    quantita_totale = int(riepilogo.loc['TOTALE', 'Quantita'])
+    totale_generale = riepilogo.loc['TOTALE', 'Importo_Totale_EUR']
     print(f"{'TOTALE GENERALE':<30} {quantita_totale:>12,} {f'€{totale_generale:,.2f}':>20}")
     print()
 
@@ -69,27 +150,16 @@ def visualizza_tecnologie_per_categoria(df_cdc, df_odc):
     """Visualizza riepilogo per tecnologia"""
     stampa_sezione("RIEPILOGO PER TECNOLOGIA")
 
-    # Combina CdC e OdC
-    df_all = pd.concat([df_cdc, df_odc])
-
-    # Aggrega per tecnologia
-    riepilogo_tech = df_all.groupby('Tecnologia').agg({
-        'Quantita': 'sum',
-        'Costo_Unitario_EUR': 'first',
-        'Importo_Totale_EUR': 'sum'
-    }).round(2)
-
-    # Ordina per importo decrescente
-    riepilogo_tech = riepilogo_tech.sort_values('Importo_Totale_EUR', ascending=False)
+    riepilogo_tech = vista_tecnologie(df_cdc, df_odc)
 
     print(f"{'Tecnologia':<55} {'Qty':>6} {'Costo Unit.':>15} {'Totale':>20}")
     print("-" * 100)
 
-    for idx, row in riepilogo_tech.iterrows():
-        tecnologia = idx[:50] + "..." if len(idx) > 50 else idx
-        costo_unit = f"€{row['Costo_Unitario_EUR']:,.2f}"
-        importo_tot = f"€{row['Importo_Totale_EUR']:,.2f}"
-        print(f"{tecnologia:<55} {int(row['Quantita']):>6} {costo_unit:>15} {importo_tot:>20}")
+    for row in riepilogo_tech.itertuples(index=False):
+        tecnologia = row.Tecnologia[:50] + "..." if len(row.Tecnologia) > 50 else row.Tecnologia
+        costo_unit = f"€{row.Costo_Unitario_EUR:,.2f}"
+        importo_tot = f"€{row.Importo_Totale_EUR:,.2f}"
+        print(f"{tecnologia:<55} {int(row.Quantita):>6} {costo_unit:>15} {importo_tot:>20}")
 
     print("-" * 100)
     totale_finale = f"€{riepilogo_tech['Importo_Totale_EUR'].sum():,.2f}"
@@ -106,70 +176,46 @@ def visualizza_top_strutture(df_riepilogo, n=10):
     print(f"{'Pos':>4} {'Tipo':>6} {'Struttura':<50} {'Importo Totale':>20}")
     print("-" * 85)
 
-    for i, (_, row) in enumerate(top_strutture.iterrows(), 1):
-        importo = f"€{row['Importo_Totale_EUR']:,.2f}"
-        print(f"{i:>4} {row['Tipologia']:>6} {row['Struttura']:<50} {importo:>20}")
+    for i, row in enumerate(top_strutture.itertuples(index=False), 1):
+        importo = f"€{row.Importo_Totale_EUR:,.2f}"
+        print(f"{i:>4} {row.Tipologia:>6} {row.Struttura:<50} {importo:>20}")
 
     print()
 
 
-def visualizza_dettaglio_cdc(df_cdc):
-    """Visualizza dettaglio completo CdC"""
-    stampa_sezione("DETTAGLIO CASE DI COMUNITÀ (CdC)", "-")
-
-    for struttura in sorted(df_cdc['Struttura'].unique()):
-        df_strutt = df_cdc[df_cdc['Struttura'] == struttura]
+def _stampa_dettaglio(df, icona):
+    """Dettaglio per struttura: un solo passaggio sui gruppi, senza rifiltrare il DataFrame"""
+    for struttura, df_strutt in df.groupby('Struttura', sort=True):
         totale = df_strutt['Importo_Totale_EUR'].sum()
 
-        print(f"\n📍 {struttura} - Totale: €{totale:,.2f}")
+        print(f"\n{icona} {struttura} - Totale: €{totale:,.2f}")
         print("-" * 80)
 
-        for _, row in df_strutt.iterrows():
-            print(f"  • {row['Tecnologia'][:60]:<60}")
-            print(f"    Quantità: {int(row['Quantita']):>3} × €{row['Costo_Unitario_EUR']:>10,.2f} = €{row['Importo_Totale_EUR']:>12,.2f}")
-            if row['Locale']:
-                print(f"    Locale: {row['Locale']}")
+        for row in df_strutt.itertuples(index=False):
+            print(f"  • {row.Tecnologia[:60]:<60}")
+            print(f"    Quantità: {int(row.Quantita):>3} × €{row.Costo_Unitario_EUR:>10,.2f} = €{row.Importo_Totale_EUR:>12,.2f}")
+            if pd.notna(row.Locale) and row.Locale:
+                print(f"    Locale: {row.Locale}")
+
+
+def visualizza_dettaglio_cdc(df_cdc):
+    """Visualizza dettaglio completo CdC"""
+    stampa_sezione("DETTAGLIO CASE DI COMUNITÀ (CdC)", "-")
+    _stampa_dettaglio(df_cdc, "📍")
 
 
 def visualizza_dettaglio_odc(df_odc):
     """Visualizza dettaglio completo OdC"""
     stampa_sezione("DETTAGLIO OSPEDALI DI COMUNITÀ (OdC)", "-")
-
-    for struttura in sorted(df_odc['Struttura'].unique()):
-        df_strutt = df_odc[df_odc['Struttura'] == struttura]
-        totale = df_strutt['Importo_Totale_EUR'].sum()
-
-        print(f"\n🏥 {struttura} - Totale: €{totale:,.2f}")
-        print("-" * 80)
-
-        for _, row in df_strutt.iterrows():
-            print(f"  • {row['Tecnologia'][:60]:<60}")
-            print(f"    Quantità: {int(row['Quantita']):>3} × €{row['Costo_Unitario_EUR']:>10,.2f} = €{row['Importo_Totale_EUR']:>12,.2f}")
-            if row['Locale']:
-                print(f"    Locale: {row['Locale']}")
+    _stampa_dettaglio(df_odc, "🏥")
 
 
-def esporta_report_excel(df_cdc, df_odc, df_riepilogo):
-    """Esporta un report completo in Excel"""
+def scrivi_viste_excel(viste, output_file):
+    """Scrive le viste in un workbook (un foglio per vista); False se la scrittura non riesce"""
     try:
-        output_file = 'report_tecnologie_sanitarie.xlsx'
-
         with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            # Combina dati
-            df_all = pd.concat([df_cdc, df_odc])
-
-            # Riepilogo per tecnologia
-            riepilogo_tech = df_all.groupby('Tecnologia').agg({
-                'Quantita': 'sum',
-                'Costo_Unitario_EUR': 'first',
-                'Importo_Totale_EUR': 'sum'
-            }).round(2).sort_values('Importo_Totale_EUR', ascending=False)
-
-            # Scrivi fogli
-            df_cdc.to_excel(writer, sheet_name='CdC Dettaglio', index=False)
-            df_odc.to_excel(writer, sheet_name='OdC Dettaglio', index=False)
-            df_riepilogo.to_excel(writer, sheet_name='Riepilogo Strutture', index=False)
-            riepilogo_tech.to_excel(writer, sheet_name='Riepilogo Tecnologie')
+            for nome, foglio in VISTE.items():
+                viste[nome].to_excel(writer, sheet_name=foglio, index=False)
 
         print(f"\n✅ Report Excel esportato: {output_file}")
         return True
@@ -178,6 +224,45 @@ def esporta_report_excel(df_cdc, df_odc, df_riepilogo):
         return False
 
 
+def esporta_report_excel(df_cdc, df_odc, df_riepilogo, output_file='report_tecnologie_sanitarie.xlsx'):
+    """Esporta un report completo in Excel"""
+    return scrivi_viste_excel(calcola_viste(df_cdc, df_odc, df_riepilogo), output_file)
+
+
+def esporta_viste(viste, cartella, formati=FORMATI):
+    """
+    Scrive le viste nella cartella: <vista>.csv (riepilogo_strutture.csv per il riepilogo
+    strutture), analisi_tecnologie.json con tutte le viste, report_tecnologie_sanitarie.xlsx.
+    Restituisce i percorsi scritti.
+    """
+    cartella = Path(cartella)
+    cartella.mkdir(parents=True, exist_ok=True)
+    scritti = []
+
+    if 'csv' in formati:
+        for nome, df in viste.items():
+            percorso = cartella / FILE_CSV_VISTE.get(nome, f"{nome}.csv")
+            df.to_csv(percorso, index=False)
+            scritti.append(percorso)
+
+    if 'json' in formati:
+        percorso = cartella / 'analisi_tecnologie.json'
+        contenuto = {
+            'generato': datetime.now().isoformat(timespec='seconds'),
+            'viste': {nome: json.loads(df.to_json(orient='records', force_ascii=False)) for nome, df in viste.items()}
+        }
+        with open(percorso, 'w', encoding='utf-8') as f:
+            json.dump(contenuto, f, ensure_ascii=False, indent=2)
+        scritti.append(percorso)
+
+    if 'excel' in formati:
+        percorso = cartella / 'report_tecnologie_sanitarie.xlsx'
+        if scrivi_viste_excel(viste, percorso):
+            scritti.append(percorso)
+
+    return scritti
+
+
 def menu_interattivo(df_cdc, df_odc, df_riepilogo):
     """Menu interattivo per scegliere la visualizzazione"""
     while True:
@@ -224,6 +309,15 @@ def menu_interattivo(df_cdc, df_odc, df_riepilogo):
 
 def main():
     """Funzione principale"""
+    parser = argparse.ArgumentParser(description='Analisi tecnologie sanitarie PNRR (menu interattivo o batch)')
+    parser.add_argument('--batch', action='store_true',
+                        help='nessuna domanda: calcola tutte le viste e le esporta (adatto a cron)')
+    parser.add_argument('--cartella', default='analisi_tecnologie', help='cartella di output in modalità batch')
+    parser.add_argument('--formati', nargs='+', choices=FORMATI, default=FORMATI, help='formati da esportare')
+    parser.add_argument('--top', type=int, default=10, help='numero di strutture nella vista top_strutture')
+    parser.add_argument('--stampa', action='store_true', help='in modalità batch stampa anche tutte le viste')
+    args = parser.parse_args()
+
     print("🏥 " + "="*98)
     print("   ANALISI TECNOLOGIE SANITARIE PNRR - USL Toscana Nord Ovest".center(100))
     print("="*100)
@@ -233,8 +327,25 @@ def main():
     df_cdc, df_odc, df_riepilogo = carica_dati()
     print("✅ Dati caricati con successo!")
 
-    # Avvia menu interattivo
-    menu_interattivo(df_cdc, df_odc, df_riepilogo)
+    if not args.batch:
+        # Avvia menu interattivo
+        menu_interattivo(df_cdc, df_odc, df_riepilogo)
+        return
+
+    viste = calcola_viste(df_cdc, df_odc, df_riepilogo, n_top=args.top)
+    if args.stampa:
+        visualizza_riepilogo_generale(df_cdc, df_odc, df_riepilogo)
+        visualizza_tecnologie_per_categoria(df_cdc, df_odc)
+        visualizza_top_strutture(df_riepilogo, args.top)
+        visualizza_dettaglio_cdc(df_cdc)
+        visualizza_dettaglio_odc(df_odc)
+
+    scritti = esporta_viste(viste, args.cartella, args.formati)
+    totale = viste['riepilogo_generale'].set_index('Tipologia').loc['TOTALE', 'Importo_Totale_EUR']
+    print(f"\n📊 {len(df_riepilogo)} strutture, {len(viste['tecnologie'])} tecnologie, totale €{totale:,.2f}")
+    print(f"💾 {len(scritti)} file in {args.cartella}/")
+    for percorso in scritti:
+        print(f"  - {percorso.name}")
 
 
 if __name__ == "__main__":
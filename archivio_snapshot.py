@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Archivio snapshot dei file dati (CSV) con deduplicazione per contenuto.
+
+Ogni file è salvato una sola volta come blob compresso identificato dallo
+SHA-256 del contenuto (.snapshot/objects/ab/cdef...); uno snapshot è un piccolo
+manifest JSON (.snapshot/snapshots/<id>.json) che elenca nome file → hash.
+Un file non modificato tra due snapshot non occupa altro spazio e, grazie alla
+cache di stat (dimensione + mtime), non viene nemmeno riletto.
+
+Utilizzo:
+    python archivio_snapshot.py crea -m "prima dell'import CDC"     # tutti i CSV
+    python archivio_snapshot.py crea strutture_sanitarie.csv
+    python archivio_snapshot.py lista
+    python archivio_snapshot.py diff 20260119_101500_ab12cd34             # snapshot vs file attuali
+    python archivio_snapshot.py diff ID_A ID_B --file strutture_sanitarie.csv
+    python archivio_snapshot.py ripristina ID [file ...]
+
+Utilizzo come modulo:
+    from archivio_snapshot import crea_snapshot
+    id_snapshot = crea_snapshot(['strutture_sanitarie.csv'], descrizione='aggiorna_dati')
+"""
+
+import argparse
+import difflib
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+ARCHIVIO = Path('.snapshot')
+FILE_CACHE_STAT = 'cache_stat.json'
+
+
+def _cartelle(archivio):
+    archivio = Path(archivio)
+    return archivio / 'objects', archivio / 'snapshots'
+
+
+def _scrivi_atomico(percorso, dati):
+    """Scrive bytes su file temporaneo nella stessa cartella e lo sostituisce atomicamente"""
+    percorso = Path(percorso)
+    percorso.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporaneo = tempfile.mkstemp(dir=percorso.parent, prefix=f'.{percorso.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dati)
+        os.replace(temporaneo, percorso)
+    except BaseException:
+        Path(temporaneo).unlink(missing_ok=True)
+        raise
+
+
+def _percorso_blob(archivio, sha):
+    cartella_oggetti, _ = _cartelle(archivio)
+    return cartella_oggetti / sha[:2] / sha[2:]
+
+
+def _leggi_cache_stat(archivio):
+    percorso = Path(archivio) / FILE_CACHE_STAT
+    if not percorso.exists():
+        return {}
+    try:
+        return json.loads(percorso.read_text(encoding='utf-8'))
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def _hash_file(percorso, cache):
+    """SHA-256 del file; se dimensione e mtime non sono cambiati usa la cache senza rileggerlo"""
+    stat = percorso.stat()
+    chiave = str(percorso.resolve())
+    voce = cache.get(chiave)
+    if voce and voce['dimensione'] == stat.st_size and voce['mtime_ns'] == stat.st_mtime_ns:
+        return voce['sha256'], None
+
+    dati = percorso.read_bytes()
+    sha = hashlib.sha256(dati).hexdigest()
+    cache[chiave] = {'dimensione': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha}
+    return sha, dati
+
+
+def leggi_manifest(id_snapshot, archivio=ARCHIVIO):
+    """Legge il manifest di uno snapshot (accetta anche un prefisso univoco dell'id)"""
+    _, cartella_snapshot = _cartelle(archivio)
+    candidati = sorted(cartella_snapshot.glob(f'{id_snapshot}*.json'))
+    if not candidati:
+        raise ValueError(f"Snapshot non trovato: {id_snapshot}")
+    if len(candidati) > 1 and candidati[0].stem != id_snapshot:
+        raise ValueError(f"Id ambiguo: {id_snapshot} ({len(candidati)} snapshot)")
+    return json.loads(candidati[0].read_text(encoding='utf-8'))
+
+
+def leggi_blob(sha, archivio=ARCHIVIO):
+    """Contenuto originale (decompresso) di un blob"""
+    return gzip.decompress(_percorso_blob(archivio, sha).read_bytes())
+
+
+def crea_snapshot(file, descrizione='', archivio=ARCHIVIO):
+    """
+    Registra lo stato attuale dei file indicati. Salva solo i blob non ancora presenti.
+    Restituisce l'id dello snapshot.
+    """
+    archivio = Path(archivio)
+    _, cartella_snapshot = _cartelle(archivio)
+    cache = _leggi_cache_stat(archivio)
+
+    voci = {}
+    for nome in file:
+        percorso = Path(nome)
+        if not percorso.exists():
+            continue
+        sha, dati = _hash_file(percorso, cache)
+        blob = _percorso_blob(archivio, sha)
+        if not blob.exists():
+            if dati is None:
+                dati = percorso.read_bytes()
+            _scrivi_atomico(blob, gzip.compress(dati, mtime=0))
+        voci[str(nome)] = {'sha256': sha, 'dimensione': percorso.stat().st_size}
+
+    adesso = datetime.now()
+    manifest = {
+        'creato': adesso.isoformat(timespec='microseconds'),
+        'descrizione': descrizione,
+        'file': voci
+    }
+    contenuto = json.dumps(manifest, sort_keys=True).encode('utf-8')
+    manifest['id'] = f"{adesso.strftime('%Y%m%d_%H%M%S')}_{hashlib.sha256(contenuto).hexdigest()[:8]}"
+
+    _scrivi_atomico(cartella_snapshot / f"{manifest['id']}.json",
+                    json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+    _scrivi_atomico(archivio / FILE_CACHE_STAT, json.dumps(cache).encode('utf-8'))
+    return manifest['id']
+
+
+def elenca_snapshot(archivio=ARCHIVIO):
+    """
+    Manifest di tutti gli snapshot, dal più vecchio al più recente secondo l'istante di
+    creazione ('creato', al microsecondo): l'id ha solo i secondi e poi un hash.
+    """
+    _, cartella_snapshot = _cartelle(archivio)
+    if not cartella_snapshot.exists():
+        return []
+    manifest = [json.loads(p.read_text(encoding='utf-8')) for p in cartella_snapshot.glob('*.json')]
+    return sorted(manifest, key=lambda m: datetime.fromisoformat(m['creato']))
+
+
+def ripristina_snapshot(id_snapshot, file=None, archivio=ARCHIVIO):
+    """
+    Riporta i file allo stato dello snapshot (tutti o solo quelli indicati).
+    Prima del ripristino lo stato attuale viene a sua volta salvato in uno snapshot.
+    Restituisce (file ripristinati, id snapshot di sicurezza).
+    """
+    manifest = leggi_manifest(id_snapshot, archivio)
+    nomi = list(manifest['file']) if not file else [str(f) for f in file]
+
+    mancanti = [n for n in nomi if n not in manifest['file']]
+    if mancanti:
+        raise ValueError(f"File non presenti nello snapshot {manifest['id']}: {', '.join(mancanti)}")
+
+    id_sicurezza = crea_snapshot(nomi, descrizione=f"prima del ripristino di {manifest['id']}", archivio=archivio)
+    for nome in nomi:
+        _scrivi_atomico(Path(nome), leggi_blob(manifest['file'][nome]['sha256'], archivio))
+    return nomi, id_sicurezza
+
+
+def _stato_attuale(nomi, archivio):
+    """Voci manifest per i file attuali (usa la cache di stat)"""
+    cache = _leggi_cache_stat(archivio)
+    voci = {}
+    for nome in nomi:
+        percorso = Path(nome)
+        if percorso.exists():
+            sha, _ = _hash_file(percorso, cache)
+            voci[nome] = {'sha256': sha, 'dimensione': percorso.stat().st_size}
+    return voci
+
+
+def diff_snapshot(id_da, id_a=None, archivio=ARCHIVIO):
+    """
+    Confronta due snapshot (o uno snapshot con i file attuali se id_a è None).
+    Restituisce una lista di (file, stato) con stato AGGIUNTO/RIMOSSO/MODIFICATO.
+    """
+    da = leggi_manifest(id_da, archivio)['file']
+    if id_a is None:
+        a = _stato_attuale(list(da), archivio)
+    else:
+        a = leggi_manifest(id_a, archivio)['file']
+
+    differenze = []
+    for nome in sorted(set(da) | set(a)):
+        if nome not in a:
+            differenze.append((nome, 'RIMOSSO'))
+        elif nome not in da:
+            differenze.append((nome, 'AGGIUNTO'))
+        elif da[nome]['sha256'] != a[nome]['sha256']:
+            differenze.append((nome, 'MODIFICATO'))
+    return differenze
+
+
+def diff_file(nome, id_da, id_a=None, archivio=ARCHIVIO):
+    """Diff unificato delle righe di un file tra due snapshot (o snapshot vs file attuale)"""
+    manifest_da = leggi_manifest(id_da, archivio)
+    prima = leggi_blob(manifest_da['file'][nome]['sha256'], archivio) if nome in manifest_da['file'] else b''
+    if id_a is None:
+        dopo = Path(nome).read_bytes() if Path(nome).exists() else b''
+        etichetta_a = 'attuale'
+    else:
+        manifest_a = leggi_manifest(id_a, archivio)
+        dopo = leggi_blob(manifest_a['file'][nome]['sha256'], archivio) if nome in manifest_a['file'] else b''
+        etichetta_a = manifest_a['id']
+
+    return difflib.unified_diff(
+        prima.decode('utf-8', errors='replace').splitlines(),
+        dopo.decode('utf-8', errors='replace').splitlines(),
+        fromfile=f"{nome} ({manifest_da['id']})",
+        tofile=f"{nome} ({etichetta_a})",
+        lineterm=''
+    )
+
+
+def dimensione_archivio(archivio=ARCHIVIO):
+    """Spazio occupato dai blob compressi (bytes)"""
+    cartella_oggetti, _ = _cartelle(archivio)
+    if not cartella_oggetti.exists():
+        return 0
+    return sum(p.stat().st_size for p in cartella_oggetti.rglob('*') if p.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archivio snapshot deduplicato dei file dati')
+    sotto = parser.add_subparsers(dest='comando', required=True)
+
+    p_crea = sotto.add_parser('crea', help='Crea uno snapshot (default: tutti i CSV della cartella)')
+    p_crea.add_argument('file', nargs='*', help='File da includere')
+    p_crea.add_argument('-m', '--descrizione', default='', help='Descrizione dello snapshot')
+
+    sotto.add_parser('lista', help='Elenca gli snapshot')
+
+    p_ripr = sotto.add_parser('ripristina', help='Ripristina i file da uno snapshot')
+    p_ripr.add_argument('id', help='Id (o prefisso) dello snapshot')
+    p_ripr.add_argument('file', nargs='*', help='Solo questi file (default: tutti)')
+
+    p_diff = sotto.add_parser('diff', help='Confronta due snapshot o uno snapshot con i file attuali')
+    p_diff.add_argument('id_da', help='Snapshot di partenza')
+    p_diff.add_argument('id_a', nargs='?', help='Snapshot di arrivo (default: file attuali)')
+    p_diff.add_argument('--file', help='Mostra il diff riga per riga di questo file')
+
+    args = parser.parse_args()
+
+    try:
+        if args.comando == 'crea':
+            file = args.file or sorted(str(p) for p in Path('.').glob('*.csv'))
+            id_snapshot = crea_snapshot(file, descrizione=args.descrizione)
+            print(f"📦 Snapshot creato: {id_snapshot} ({len(file)} file)")
+            print(f"💾 Archivio: {dimensione_archivio() / 1024:,.1f} KB")
+
+        elif args.comando == 'lista':
+            snapshot = elenca_snapshot()
+            if not snapshot:
+                print("Nessuno snapshot presente")
+            for manifest in snapshot:
+                dimensione = sum(v['dimensione'] for v in manifest['file'].values())
+                print(f"  • {manifest['id']}  {manifest['creato'][:19]}  {len(manifest['file']):3d} file "
+                      f"{dimensione / 1024:9,.1f} KB  {manifest['descrizione']}")
+            print(f"\n💾 Archivio: {dimensione_archivio() / 1024:,.1f} KB")
+
+        elif args.comando == 'ripristina':
+            nomi, id_sicurezza = ripristina_snapshot(args.id, args.file)
+            print(f"♻️  Ripristinati {len(nomi)} file da {args.id}")
+            for nome in nomi:
+                print(f"  ✅ {nome}")
+            print(f"💡 Stato precedente salvato in: {id_sicurezza}")
+
+        elif args.comando == 'diff':
+            if args.file:
+                for riga in diff_file(args.file, args.id_da, args.id_a):
+                    print(riga)
+            else:
+                differenze = diff_snapshot(args.id_da, args.id_a)
+                if not differenze:
+                    print("✅ Nessuna differenza")
+                for nome, stato in differenze:
+                    print(f"  {stato:10} {nome}")
+
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
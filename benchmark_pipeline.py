@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Benchmark di tutte le fasi della pipeline e delle pagine della dashboard.
+
+Per ogni scala (default 1x, 10x, 100x, 1000x le strutture reali) i dati sono
+generati con genera_dati_sintetici.py in .benchmark/dati_x<scala>/ (riusati se
+seme, scala e profilo non cambiano) e ogni fase gira in un processo separato
+con la cartella dei dati come cartella di lavoro:
+
+    integra_censimenti      integra_anagrafiche_v3: censimenti CDC e ODC
+    integra_attrezzature    integra_anagrafiche_v3: tecnologie_*_dettaglio.csv
+    importa_arredi          importa_arredi_pnrr: fogli Stima arredi OdC e CdC
+    calcola_fabbisogno      motore_fabbisogno.calcola_fabbisogno
+    crea_report_direzione   report Excel (genera_report_direzione.py)
+    genera_html_report      report HTML con tutte le sezioni rigenerate
+    dashboard               avvio headless (AppTest) e una riga pagina_<nome> per ogni vista
+
+Il tempo misurato (mediana di --ripetizioni esecuzioni) esclude l'avvio del
+processo e la lettura degli ingressi; la memoria è il picco RSS del processo
+(Picco_MB) e quanto il picco è cresciuto durante la fase (Incremento_MB). Righe è la tabella principale elaborata
+(configurazioni prodotte o lette, voci estratte). Una fase che supera --timeout
+viene interrotta e registrata come 'timeout'.
+
+Ogni esecuzione si aggiunge a benchmark_risultati.csv; con --salva-baseline i
+risultati diventano il riferimento (benchmark_baseline.json), altrimenti vengono
+confrontati con esso: un tempo o un picco di memoria oltre la tolleranza è una
+regressione e il comando termina con codice 1 (da usare prima del deploy).
+
+Utilizzo:
+    python benchmark_pipeline.py --salva-baseline          # sul server, prima della modifica
+    python benchmark_pipeline.py                            # dopo: confronto con la baseline
+    python benchmark_pipeline.py --scale 1 10 --fasi calcola_fabbisogno dashboard
+    python benchmark_pipeline.py --scale 1000 --timeout 1800 --tolleranza 0.5
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: picco di memoria non disponibile
+    resource = None
+
+import pandas as pd
+
+from genera_dati_sintetici import FILE_MANIFEST, SEME_PREDEFINITO, file_profilo, genera_dati_sintetici
+from genera_report_html import CARTELLA_TEMPLATE
+from integrita_referenziale import versione_dati
+from motore_fabbisogno import FILE_CATALOGO, FILE_DOTAZIONI, FILE_STRUTTURE
+from storico_censimenti import CARTELLA_STORICO, MODELLO_PROSPETTI, acquisisci_prospetto, data_prospetto
+
+CARTELLA_BENCHMARK = Path('.benchmark')
+FILE_RISULTATI = 'benchmark_risultati.csv'
+FILE_BASELINE = 'benchmark_baseline.json'
+DASHBOARD = Path(__file__).resolve().parent / 'dashboard_telemedicina.py'
+
+SCALE = [1, 10, 100, 1000]
+TIMEOUT_SECONDI = 600
+
+# Ripetizioni per fase (tempo = mediana); una fase più lenta di così non si ripete
+RIPETIZIONI = 3
+MASSIMO_SECONDI_RIPETIZIONE = 10
+
+# Regressione: oltre +25% rispetto alla baseline e almeno 100 ms / 20 MB in più
+TOLLERANZA = 0.25
+MINIMO_SECONDI = 0.1
+MINIMO_MB = 20
+
+COLONNE_RISULTATI = [
+    'Data', 'Commit', 'Scala', 'Fase', 'Esito', 'Righe', 'Ripetizioni', 'Secondi', 'Secondi_Primo', 'Righe_Al_Secondo', 'Picco_MB',
+    'Incremento_MB', 'Baseline_Secondi', 'Baseline_Picco_MB', 'Regressione', 'Messaggio'
+]
+
+
+def picco_memoria_mb():
+    """Picco RSS del processo corrente in MB (None se non disponibile)"""
+    if resource is None:
+        return None
+    picco = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return picco / 1024 ** 2 if sys.platform == 'darwin' else picco / 1024
+
+
+def _n_configurazioni():
+    return sum(1 for _ in open(FILE_DOTAZIONI, encoding='utf-8')) - 1
+
+
+# Fasi: preparano gli ingressi (non misurati) e restituiscono la funzione da misurare,
+# che restituisce il numero di righe elaborate
+
+def _fase_integra_censimenti():
+    import integra_anagrafiche_v3 as integra
+
+    def esegui():
+        _, dotazioni_cdc = integra.carica_cdc_dispositivi()
+        _, dotazioni_odc = integra.carica_odc_dispositivi()
+        return len(dotazioni_cdc) + len(dotazioni_odc)
+    return esegui
+
+
+def _fase_integra_attrezzature():
+    import integra_anagrafiche_v3 as integra
+    df_strutture = pd.read_csv(FILE_STRUTTURE)
+    return lambda: len(integra.carica_attrezzature_sanitarie(df_strutture))
+
+
+def _fase_importa_arredi():
+    import importa_arredi_pnrr as arredi
+
+    def esegui():
+        return sum(len(df) for df in [arredi.estrai_tecnologie_odc(), arredi.estrai_tecnologie_cdc()] if df is not None)
+    return esegui
+
+
+def _fase_calcola_fabbisogno():
+    from motore_fabbisogno import calcola_fabbisogno
+    df_dotazioni, df_catalogo = pd.read_csv(FILE_DOTAZIONI), pd.read_csv(FILE_CATALOGO)
+    return lambda: len(calcola_fabbisogno(df_dotazioni, df_catalogo))
+
+
+def _fase_crea_report_direzione():
+    from genera_report_direzione import crea_report_direzione
+    from motore_fabbisogno import materializza_fabbisogno
+    materializza_fabbisogno()
+
+    def esegui():
+        os.remove(crea_report_direzione())
+        return _n_configurazioni()
+    return esegui
+
+
+def _fase_genera_html_report():
+    from genera_report_html import bundle_plotly, genera_html_report
+    from motore_fabbisogno import materializza_fabbisogno
+    materializza_fabbisogno()
+    bundle_plotly()
+
+    def esegui():
+        os.remove(genera_html_report(rigenera=True))
+        return _n_configurazioni()
+    return esegui
+
+
+FASI = {
+    'integra_censimenti': _fase_integra_censimenti,
+    'integra_attrezzature': _fase_integra_attrezzature,
+    'importa_arredi': _fase_importa_arredi,
+    'calcola_fabbisogno': _fase_calcola_fabbisogno,
+    'crea_report_direzione': _fase_crea_report_direzione,
+    'genera_html_report': _fase_genera_html_report,
+}
+FASE_DASHBOARD = 'dashboard'
+TUTTE_LE_FASI = list(FASI) + [FASE_DASHBOARD]
+
+
+def _misura(fase, esegui, ripetizioni=RIPETIZIONI):
+    """
+    Esegue e misura una fase fino a 'ripetizioni' volte (tempo mediano; Secondi_Primo è la
+    prima esecuzione, con le cache interne ancora vuote); l'output degli script è soppresso.
+    """
+    picco_prima = picco_memoria_mb()
+    tempi = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        while len(tempi) < max(ripetizioni, 1) and sum(tempi) < MASSIMO_SECONDI_RIPETIZIONE:
+            inizio = time.perf_counter()
+            righe = esegui()
+            tempi.append(time.perf_counter() - inizio)
+    picco = picco_memoria_mb()
+    return {
+        'Fase': fase, 'Esito': 'ok', 'Righe': int(righe), 'Ripetizioni': len(tempi),
+        'Secondi': round(float(pd.Series(tempi).median()), 4), 'Secondi_Primo': round(tempi[0], 4),
+        'Picco_MB': None if picco is None else round(picco, 1),
+        'Incremento_MB': None if picco is None else round(picco - picco_prima, 1)
+    }
+
+
+def _misura_dashboard(scrivi, timeout, ripetizioni=RIPETIZIONI):
+    """Avvio della dashboard (dati in cache) e poi ogni vista della navigazione, headless"""
+    from streamlit.testing.v1 import AppTest
+
+    from motore_fabbisogno import materializza_fabbisogno
+    from nomi_file import nome_file
+    logging.disable(logging.CRITICAL)
+    materializza_fabbisogno()
+
+    app = AppTest.from_file(str(DASHBOARD), default_timeout=timeout)
+
+    def esegui():
+        app.run()
+        return _n_configurazioni()
+
+    scrivi(_misura(f'{FASE_DASHBOARD}_avvio', esegui, ripetizioni=1))
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    for vista in app.sidebar.radio[0].options:
+        app.sidebar.radio[0].set_value(vista)
+        risultato = _misura(f'pagina_{nome_file(vista)}', esegui, ripetizioni)
+        if app.exception:
+            risultato.update(Esito='errore', Messaggio=app.exception[0].message.splitlines()[0][:200])
+        scrivi(risultato)
+
+
+def esegui_fase(fase, cartella, uscita, timeout=TIMEOUT_SECONDI, ripetizioni=RIPETIZIONI):
+    """Processo di lavoro: esegue una fase nella cartella dei dati e scrive i risultati (JSON per riga)"""
+    os.chdir(cartella)
+    with open(uscita, 'a', encoding='utf-8') as f:
+        def scrivi(risultato):
+            f.write(json.dumps(risultato) + '\n')
+            f.flush()
+
+        if fase == FASE_DASHBOARD:
+            _misura_dashboard(scrivi, timeout, ripetizioni)
+        else:
+            scrivi(_misura(fase, FASI[fase](), ripetizioni))
+
+
+def prepara_dati(scala, seme=SEME_PREDEFINITO):
+    """
+    Cartella dei dati sintetici per una scala (rigenerata solo se seme, scala o dati
+    reali del profilo sono cambiati) con i prospetti già acquisiti nello storico e i
+    template del report HTML aggiornati.
+    """
+    cartella = CARTELLA_BENCHMARK / f"dati_x{scala:g}"
+    manifest = cartella / FILE_MANIFEST
+    esistente = json.loads(manifest.read_text(encoding='utf-8')) if manifest.exists() else {}
+    if (esistente.get('Seme'), esistente.get('Scala'), esistente.get('Versione_Profilo')) != \
+            (seme, scala, versione_dati(*file_profilo())):
+        shutil.rmtree(cartella, ignore_errors=True)  # anche storico e cache dei dati precedenti
+        genera_dati_sintetici(cartella, scala, seme, verbose=False)
+        prospetti = sorted(cartella.glob(MODELLO_PROSPETTI), key=lambda p: (data_prospetto(p), p.name))
+        for percorso in prospetti:
+            acquisisci_prospetto(percorso, cartella / CARTELLA_STORICO)
+    shutil.copytree(CARTELLA_TEMPLATE, cartella / CARTELLA_TEMPLATE, dirs_exist_ok=True)
+    return cartella
+
+
+def commit_corrente():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def lancia_fase(fase, cartella, timeout=TIMEOUT_SECONDI, ripetizioni=RIPETIZIONI):
+    """Esegue una fase in un processo separato; restituisce i risultati (anche parziali se interrotta)"""
+    uscita = (cartella / f".risultati_{fase}.jsonl").resolve()
+    uscita.unlink(missing_ok=True)
+    comando = [sys.executable, str(Path(__file__).resolve()), '--esegui', fase, '--dati', str(cartella.resolve()),
+               '--uscita', str(uscita), '--timeout', str(timeout), '--ripetizioni', str(ripetizioni)]
+    try:
+        processo = subprocess.run(comando, capture_output=True, text=True, timeout=timeout)
+        esito, messaggio = ('ok', '') if processo.returncode == 0 else \
+            ('errore', (processo.stderr.strip().splitlines() or [''])[-1][:200])
+    except subprocess.TimeoutExpired:
+        esito, messaggio = 'timeout', f"interrotta dopo {timeout} s"
+
+    risultati = [json.loads(r) for r in uscita.read_text(encoding='utf-8').splitlines()] if uscita.exists() else []
+    uscita.unlink(missing_ok=True)
+    if esito != 'ok':
+        risultati.append({'Fase': fase, 'Esito': esito, 'Secondi': timeout if esito == 'timeout' else None,
+                          'Messaggio': messaggio})
+    return risultati
+
+
+def carica_baseline(percorso=FILE_BASELINE):
+    if not Path(percorso).exists():
+        return {}
+    return json.loads(Path(percorso).read_text(encoding='utf-8'))
+
+
+def salva_baseline(risultati, percorso=FILE_BASELINE):
+    """Aggiorna la baseline con i risultati riusciti (le altre scale e fasi restano)"""
+    baseline = carica_baseline(percorso)
+    for r in risultati:
+        if r['Esito'] == 'ok':
+            baseline.setdefault(f"{r['Scala']:g}", {})[r['Fase']] = {
+                'Secondi': r['Secondi'], 'Picco_MB': r['Picco_MB'], 'Righe': r['Righe'],
+                'Commit': r['Commit'], 'Data': r['Data']
+            }
+    with open(percorso, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+
+
+def confronta_baseline(risultato, baseline, tolleranza=TOLLERANZA):
+    """Aggiunge al risultato i valori di baseline e l'eventuale regressione (testo)"""
+    riferimento = baseline.get(f"{risultato['Scala']:g}", {}).get(risultato['Fase'])
+    if not riferimento:
+        return risultato
+    risultato['Baseline_Secondi'] = riferimento['Secondi']
+    risultato['Baseline_Picco_MB'] = riferimento['Picco_MB']
+    regressioni = []
+    if risultato['Esito'] != 'ok':
+        regressioni.append(risultato['Esito'])
+    else:
+        secondi, base = risultato['Secondi'], riferimento['Secondi']
+        if secondi > base * (1 + tolleranza) and secondi - base > MINIMO_SECONDI:
+            regressioni.append(f"tempo x{secondi / base:.2f}" if base else "tempo")
+        picco, base_mb = risultato.get('Picco_MB'), riferimento.get('Picco_MB')
+        if picco is not None and base_mb and picco > base_mb * (1 + tolleranza) and picco - base_mb > MINIMO_MB:
+            regressioni.append(f"memoria x{picco / base_mb:.2f}")
+    risultato['Regressione'] = ', '.join(regressioni)
+    return risultato
+
+
+def scrivi_risultati(risultati, percorso=FILE_RISULTATI):
+    """Aggiunge i risultati allo storico CSV"""
+    nuovo = not Path(percorso).exists()
+    with open(percorso, 'a', encoding='utf-8', newline='') as f:
+        scrittore = csv.DictWriter(f, fieldnames=COLONNE_RISULTATI, extrasaction='ignore')
+        if nuovo:
+            scrittore.writeheader()
+        scrittore.writerows(risultati)
+
+
+def esegui_benchmark(scale=SCALE, fasi=TUTTE_LE_FASI, seme=SEME_PREDEFINITO, timeout=TIMEOUT_SECONDI,
+                     tolleranza=TOLLERANZA, ripetizioni=RIPETIZIONI, verbose=True):
+    """Esegue le fasi a ogni scala; restituisce i risultati confrontati con la baseline"""
+    log = print if verbose else (lambda *a, **k: None)
+    baseline = carica_baseline()
+    intestazione = {'Data': datetime.now().isoformat(timespec='seconds'), 'Commit': commit_corrente()}
+    risultati = []
+    for scala in scale:
+        inizio = time.perf_counter()
+        cartella = prepara_dati(scala, seme)
+        log(f"\n📏 Scala {scala:g}x ({cartella}/, dati pronti in {time.perf_counter() - inizio:.1f} s)")
+        for fase in fasi:
+            for r in lancia_fase(fase, cartella, timeout, ripetizioni):
+                r = {**intestazione, 'Scala': scala, 'Righe': None, 'Picco_MB': None, 'Incremento_MB': None, **r}
+                if r['Esito'] == 'ok' and r['Secondi']:
+                    r['Righe_Al_Secondo'] = round(r['Righe'] / r['Secondi'])
+                risultati.append(confronta_baseline(r, baseline, tolleranza))
+                log(_riga_console(risultati[-1]))
+    return risultati
+
+
+def _riga_console(r):
+    if r['Esito'] != 'ok':
+        icona = '⏱️ ' if r['Esito'] == 'timeout' else '❌'
+        return f"  {icona} {r['Fase']:38} {r['Esito']}: {r.get('Messaggio', '')}"
+    testo = (f"  {'⚠️ ' if r.get('Regressione') else '✅'} {r['Fase']:38} {r['Secondi']:9.3f} s  "
+             f"{r.get('Righe_Al_Secondo') or 0:>12,} righe/s")
+    if r['Picco_MB'] is not None:
+        testo += f"  picco {r['Picco_MB']:8.1f} MB"
+    if r.get('Baseline_Secondi') is not None:
+        testo += f"  (baseline {r['Baseline_Secondi']:.3f} s)"
+    if r.get('Regressione'):
+        testo += f"  REGRESSIONE: {r['Regressione']}"
+    return testo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark delle fasi della pipeline e delle pagine della dashboard')
+    parser.add_argument('--scale', nargs='+', type=float, default=SCALE, help='scale dei dati (default: 1 10 100 1000)')
+    parser.add_argument('--fasi', nargs='+', choices=TUTTE_LE_FASI, default=TUTTE_LE_FASI, help='fasi da misurare')
+    parser.add_argument('--seme', type=int, default=SEME_PREDEFINITO, help='seme dei dati sintetici')
+    parser.add_argument('--timeout', type=int, default=TIMEOUT_SECONDI, help='secondi massimi per processo di fase')
+    parser.add_argument('--ripetizioni', type=int, default=RIPETIZIONI, help='ripetizioni per fase (mediana)')
+    parser.add_argument('--tolleranza', type=float, default=TOLLERANZA, help='peggioramento ammesso (0.25 = +25%%)')
+    parser.add_argument('--salva-baseline', action='store_true', help='usa questi risultati come baseline')
+    parser.add_argument('--esegui', choices=TUTTE_LE_FASI, help=argparse.SUPPRESS)
+    parser.add_argument('--dati', help=argparse.SUPPRESS)
+    parser.add_argument('--uscita', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.esegui:
+        esegui_fase(args.esegui, args.dati, args.uscita, args.timeout, args.ripetizioni)
+        return
+    args.scale = [int(s) if float(s).is_integer() else s for s in args.scale]
+
+    print(f"⏱️  Benchmark pipeline: scale {', '.join(f'{s:g}x' for s in args.scale)}, "
+          f"{len(args.fasi)} fasi, timeout {args.timeout} s")
+    risultati = esegui_benchmark(args.scale, args.fasi, args.seme, args.timeout, args.tolleranza, args.ripetizioni)
+    scrivi_risultati(risultati)
+    print(f"\n💾 Risultati aggiunti a {FILE_RISULTATI}")
+
+    if args.salva_baseline:
+        salva_baseline(risultati)
+        print(f"📌 Baseline aggiornata: {FILE_BASELINE}")
+        return
+    if not carica_baseline():
+        print("ℹ️  Nessuna baseline: eseguire con --salva-baseline per crearla")
+        return
+
+    problemi = [r for r in risultati if r.get('Regressione') or r['Esito'] != 'ok']
+    if problemi:
+        print(f"\n⚠️  {len(problemi)} regressioni o fasi non completate rispetto alla baseline:")
+        for r in problemi:
+            print(f"  - {r['Scala']:g}x {r['Fase']}: {r.get('Regressione') or r['Esito']}")
+        sys.exit(1)
+    print("\n✅ Nessuna regressione rispetto alla baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Test di carico della dashboard con più utenti contemporanei.
+
+Avvia dashboard_telemedicina.py su un server Streamlit locale (come
+dashboard-telemedicina.service, ma su 127.0.0.1) e lo fa usare da N sessioni
+simulate, ciascuna con la propria connessione websocket come un browser: apre
+la dashboard e poi, con una pausa di riflessione casuale tra un'azione e
+l'altra, cambia pagina, cambia il filtro PNRR, sceglie una struttura nel
+dettaglio dotazioni o passa agli importi IVA inclusa.
+
+Per ogni numero di sessioni (default 1, 5, 10, 20, ciascuno per --durata
+secondi) riporta la latenza dei rerun (dall'invio dell'azione alla fine dello
+script sul server) come p50/p95/p99, in totale e per tipo di azione, i rerun
+al secondo, la CPU e la memoria RSS del processo server (lette da /proc, solo
+Linux) e la CPU usata dal generatore di carico stesso, che sulla stessa
+macchina compete con il server. Prima del primo livello una sessione visita
+tutte le pagine una volta, così le cache della dashboard sono già calde come
+in servizio. Le sessioni di un livello restano sullo stesso server dei livelli
+precedenti.
+
+I dati sono quelli della cartella corrente; con --scala si usano i dati
+sintetici di benchmark_pipeline.py (.benchmark/dati_x<scala>/). Con --indirizzo
+si prova un server già avviato (in quel caso CPU e memoria solo con --pid).
+
+Ogni esecuzione si aggiunge a carico_dashboard_risultati.csv; il comando
+termina con codice 1 se ci sono errori o, con --soglia-p95, se un livello
+supera la soglia.
+
+Utilizzo:
+    python carico_dashboard.py                               # dati reali, 1/5/10/20 sessioni
+    python carico_dashboard.py --sessioni 10 30 --durata 120 --scala 10
+    python carico_dashboard.py --indirizzo http://localhost:8501 --pid 1234 --sessioni 5
+    python carico_dashboard.py --soglia-p95 2000            # prima del deploy
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from benchmark_pipeline import DASHBOARD, commit_corrente, prepara_dati
+from genera_dati_sintetici import SEME_PREDEFINITO
+
+FILE_RISULTATI = 'carico_dashboard_risultati.csv'
+
+SESSIONI = [1, 5, 10, 20]
+DURATA_SECONDI = 60
+PAUSA_SECONDI = (1.0, 5.0)   # riflessione dell'utente tra due azioni
+TIMEOUT_RERUN = 120
+PORTA = 8599
+ATTESA_AVVIO_SECONDI = 60
+INTERVALLO_CAMPIONI = 0.5
+
+# Widget della dashboard (etichette) usati dalle sessioni simulate
+ETICHETTA_PAGINA = 'Seleziona una vista'
+ETICHETTA_PNRR = 'Interventi da visualizzare'
+ETICHETTA_IMPORTI = '💶 Importi IVA inclusa'
+ETICHETTA_STRUTTURA = 'Seleziona Struttura'
+PAGINA_DETTAGLIO = 'Dettaglio Dotazioni Struttura'
+
+# Azioni dell'utente e loro frequenza
+AZIONI = {
+    'pagina': 0.5,
+    'filtro_pnrr': 0.2,
+    'struttura': 0.2,
+    'importi_lordi': 0.1,
+}
+AZIONE_APERTURA = 'apertura'
+TUTTE = 'tutte'
+
+COLONNE_RISULTATI = [
+    'Data', 'Commit', 'Dati', 'Sessioni', 'Azione', 'Rerun', 'Errori', 'P50_ms', 'P95_ms', 'P99_ms', 'Max_ms',
+    'Rerun_Al_Secondo', 'CPU_Server_Medio_Pct', 'CPU_Server_Max_Pct', 'RSS_Server_Max_MB', 'RSS_Server_Fine_MB',
+    'CPU_Generatore_Pct'
+]
+
+
+# ---------------------------------------------------------------------------
+# Server e risorse
+# ---------------------------------------------------------------------------
+
+def avvia_server(cartella, porta=PORTA, attesa=ATTESA_AVVIO_SECONDI):
+    """
+    Avvia la dashboard su 127.0.0.1:porta con la cartella dei dati come cartella di
+    lavoro e attende che risponda. Restituisce (processo, file di log del server).
+    """
+    log = tempfile.NamedTemporaryFile('w+', prefix='carico_dashboard_', suffix='.log', delete=False)
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', str(DASHBOARD), '--server.headless', 'true',
+         '--server.address', '127.0.0.1', '--server.port', str(porta), '--server.fileWatcherType', 'none',
+         '--browser.gatherUsageStats', 'false'],
+        cwd=cartella, stdout=log, stderr=subprocess.STDOUT,
+    )
+    scadenza = time.monotonic() + attesa
+    while time.monotonic() < scadenza:
+        if processo.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{porta}/_stcore/health", timeout=2) as risposta:
+                if risposta.status == 200:
+                    return processo, log.name
+        except OSError:
+            time.sleep(0.5)
+    ferma_server(processo)
+    log.seek(0)
+    raise RuntimeError(f"server non avviato sulla porta {porta}:\n{log.read()[-2000:]}")
+
+
+def ferma_server(processo):
+    if processo.poll() is None:
+        processo.terminate()
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+
+
+def campiona_processo(pid):
+    """(secondi di CPU user+system, RSS in MB) del processo da /proc; None se /proc non c'è"""
+    try:
+        stat = Path(f'/proc/{pid}/stat').read_text().rsplit(')', 1)[1].split()
+        statm = Path(f'/proc/{pid}/statm').read_text().split()
+    except OSError:
+        return None
+    cpu = (int(stat[11]) + int(stat[12])) / os.sysconf('SC_CLK_TCK')  # utime e stime
+    return cpu, int(statm[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+
+
+async def monitora(pid, fermo, intervallo=INTERVALLO_CAMPIONI):
+    """Campioni (istante, CPU, RSS) del processo finché fermo non è impostato"""
+    campioni = []
+    while True:
+        campione = campiona_processo(pid)
+        if campione:
+            campioni.append((time.monotonic(), *campione))
+        if fermo.is_set():
+            return campioni
+        try:
+            await asyncio.wait_for(fermo.wait(), intervallo)
+        except asyncio.TimeoutError:
+            pass
+
+
+def risorse_server(campioni):
+    """CPU media e massima (% di un core) e RSS massimo e finale dai campioni di monitora()"""
+    if len(campioni) < 2:
+        return {}
+    percentuali = [100 * (c2 - c1) / (t2 - t1) for (t1, c1, _), (t2, c2, _) in zip(campioni, campioni[1:]) if t2 > t1]
+    (t_inizio, cpu_inizio, _), (t_fine, cpu_fine, rss_fine) = campioni[0], campioni[-1]
+    return {
+        'CPU_Server_Medio_Pct': round(100 * (cpu_fine - cpu_inizio) / (t_fine - t_inizio), 1),
+        'CPU_Server_Max_Pct': round(max(percentuali), 1),
+        'RSS_Server_Max_MB': round(max(c[2] for c in campioni), 1),
+        'RSS_Server_Fine_MB': round(rss_fine, 1),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Sessioni simulate
+# ---------------------------------------------------------------------------
+
+def indirizzo_websocket(indirizzo):
+    """'http://host:porta' → 'ws://host:porta/_stcore/stream'"""
+    indirizzo = indirizzo.rstrip('/')
+    if indirizzo.startswith('http'):
+        indirizzo = 'ws' + indirizzo[len('http'):]
+    return f"{indirizzo}/_stcore/stream"
+
+
+async def _attendi_fine_script(ws):
+    widget, errori = {}, []
+    while True:
+        messaggio = ForwardMsg()
+        messaggio.ParseFromString(await ws.recv())
+        tipo = messaggio.WhichOneof('type')
+        if tipo == 'delta' and messaggio.delta.WhichOneof('type') == 'new_element':
+            elemento = messaggio.delta.new_element
+            tipo_elemento = elemento.WhichOneof('type')
+            if tipo_elemento == 'exception':
+                errori.append(elemento.exception.message)
+            elif tipo_elemento in ('radio', 'selectbox', 'checkbox'):
+                w = getattr(elemento, tipo_elemento)
+                widget[w.label] = (w.id, list(getattr(w, 'options', [])))
+        elif tipo == 'script_finished':
+            if messaggio.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                errori.append('errore di compilazione dello script')
+            return widget, errori
+
+
+async def rerun(ws, stati, timeout=TIMEOUT_RERUN):
+    """
+    Invia lo stato dei widget come il browser e attende la fine dello script.
+    Restituisce (secondi, widget della pagina {etichetta: (id, opzioni)}, errori).
+    """
+    messaggio = BackMsg()
+    messaggio.rerun_script.query_string = ''
+    for id_widget, valore in stati.items():
+        stato = messaggio.rerun_script.widget_states.widgets.add()
+        stato.id = id_widget
+        if isinstance(valore, bool):
+            stato.bool_value = valore
+        else:
+            stato.string_value = valore
+    inizio = time.perf_counter()
+    await ws.send(messaggio.SerializeToString())
+    widget, errori = await asyncio.wait_for(_attendi_fine_script(ws), timeout)
+    return time.perf_counter() - inizio, widget, errori
+
+
+def scegli_azione(rng, widget, stati):
+    """Sceglie la prossima azione e aggiorna stati; restituisce il nome dell'azione"""
+    azione = rng.choice(list(AZIONI), p=list(AZIONI.values()))
+    if azione == 'importi_lordi':
+        id_widget, _ = widget[ETICHETTA_IMPORTI]
+        stati[id_widget] = not stati.get(id_widget, False)
+        return azione
+
+    etichetta = {'pagina': ETICHETTA_PAGINA, 'filtro_pnrr': ETICHETTA_PNRR, 'struttura': ETICHETTA_STRUTTURA}[azione]
+    if etichetta not in widget:  # struttura: prima si apre il dettaglio dotazioni
+        azione, etichetta = 'pagina', ETICHETTA_PAGINA
+        stati[widget[etichetta][0]] = PAGINA_DETTAGLIO
+        return azione
+    id_widget, opzioni = widget[etichetta]
+    altre = [o for o in opzioni if o != stati.get(id_widget, opzioni[0])] or opzioni
+    stati[id_widget] = altre[rng.integers(len(altre))]
+    return azione
+
+
+async def sessione_utente(url, indice, fine, pausa=PAUSA_SECONDI, seme=SEME_PREDEFINITO, timeout=TIMEOUT_RERUN):
+    """
+    Una sessione simulata fino all'istante fine (time.monotonic()); restituisce le
+    misure dei rerun come dict (Sessione, Azione, Secondi, Errore).
+    """
+    rng = np.random.default_rng([seme, indice])
+    await asyncio.sleep(rng.uniform(0, pausa[1]))  # gli utenti non arrivano tutti insieme
+    misure, stati, azione = [], {}, AZIONE_APERTURA
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=timeout) as ws:
+            while True:
+                secondi, widget, errori = await rerun(ws, stati, timeout)
+                misure.append({'Sessione': indice, 'Azione': azione, 'Secondi': secondi, 'Errore': '; '.join(errori)})
+                if ETICHETTA_PAGINA not in widget or time.monotonic() >= fine:
+                    break
+                # Come il browser: solo lo stato dei widget presenti nell'ultima esecuzione
+                presenti = {id_widget for id_widget, _ in widget.values()}
+                stati = {k: v for k, v in stati.items() if k in presenti}
+                await asyncio.sleep(rng.uniform(*pausa))
+                azione = scegli_azione(rng, widget, stati)
+    except asyncio.TimeoutError:
+        misure.append({'Sessione': indice, 'Azione': azione, 'Secondi': None, 'Errore': f'timeout ({timeout} s)'})
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        misure.append({'Sessione': indice, 'Azione': azione, 'Secondi': None, 'Errore': f'connessione: {e}'})
+    return misure
+
+
+async def riscalda(url, timeout=TIMEOUT_RERUN):
+    """Una sessione che visita tutte le pagine una volta (cache della dashboard calde); restituisce i secondi"""
+    inizio = time.perf_counter()
+    async with websockets.connect(url, max_size=None, open_timeout=timeout) as ws:
+        _, widget, _ = await rerun(ws, {}, timeout)
+        id_pagina, pagine = widget[ETICHETTA_PAGINA]
+        for pagina in pagine:
+            await rerun(ws, {id_pagina: pagina}, timeout)
+    return time.perf_counter() - inizio
+
+
+async def esegui_livello(url, sessioni, durata=DURATA_SECONDI, pausa=PAUSA_SECONDI, seme=SEME_PREDEFINITO,
+                         timeout=TIMEOUT_RERUN, pid=None):
+    """Sessioni contemporanee per durata secondi; restituisce (misure, risorse del server, CPU % del generatore)"""
+    fermo = asyncio.Event()
+    monitor = asyncio.create_task(monitora(pid, fermo)) if pid else None
+    inizio, cpu_inizio = time.monotonic(), time.process_time()
+    fine = inizio + durata
+    esiti = await asyncio.gather(*(sessione_utente(url, i, fine, pausa, seme, timeout) for i in range(sessioni)))
+    cpu_generatore = 100 * (time.process_time() - cpu_inizio) / (time.monotonic() - inizio)
+    fermo.set()
+    campioni = await monitor if monitor else []
+    misure = [m for misure_sessione in esiti for m in misure_sessione]
+    return misure, risorse_server(campioni), round(cpu_generatore, 1)
+
+
+# ---------------------------------------------------------------------------
+# Riepilogo
+# ---------------------------------------------------------------------------
+
+def riepiloga(sessioni, misure, risorse, cpu_generatore, durata):
+    """Righe dei risultati del livello: una per tutte le azioni e una per tipo di azione"""
+    df = pd.DataFrame(misure, columns=['Sessione', 'Azione', 'Secondi', 'Errore'])
+    df['Errore'] = df['Errore'].fillna('')
+    righe = []
+    for azione, gruppo in [(TUTTE, df)] + list(df.groupby('Azione', sort=True)):
+        riuscite = gruppo.loc[gruppo['Errore'] == '', 'Secondi'].astype(float) * 1000
+        riga = {'Sessioni': sessioni, 'Azione': azione, 'Rerun': len(gruppo), 'Errori': int((gruppo['Errore'] != '').sum())}
+        if len(riuscite):
+            p50, p95, p99 = np.percentile(riuscite, [50, 95, 99])
+            riga.update(P50_ms=round(p50), P95_ms=round(p95), P99_ms=round(p99), Max_ms=round(riuscite.max()))
+        if azione == TUTTE:
+            riga.update(risorse, Rerun_Al_Secondo=round(len(gruppo) / durata, 2), CPU_Generatore_Pct=cpu_generatore)
+        righe.append(riga)
+    return righe
+
+
+def scrivi_risultati(righe, percorso=FILE_RISULTATI):
+    """Aggiunge i risultati allo storico CSV"""
+    nuovo = not Path(percorso).exists()
+    with open(percorso, 'a', encoding='utf-8', newline='') as f:
+        scrittore = csv.DictWriter(f, fieldnames=COLONNE_RISULTATI, extrasaction='ignore')
+        if nuovo:
+            scrittore.writeheader()
+        scrittore.writerows(righe)
+
+
+def _latenze(r):
+    if r.get('P50_ms') is None:
+        return 'nessun rerun riuscito'
+    return f"p50 {r['P50_ms']:>6,} ms  p95 {r['P95_ms']:>6,} ms  p99 {r['P99_ms']:>6,} ms"
+
+
+def _stampa_livello(righe):
+    totale, per_azione = righe[0], righe[1:]
+    testo = (f"\n👥 {totale['Sessioni']} sessioni: {totale['Rerun']} rerun ({totale['Rerun_Al_Secondo']}/s), "
+             f"{_latenze(totale)}")
+    if totale['Errori']:
+        testo += f"  ❌ {totale['Errori']} errori"
+    print(testo)
+    if totale.get('CPU_Server_Medio_Pct') is not None:
+        print(f"  🖥️  server: CPU {totale['CPU_Server_Medio_Pct']:.0f}% (max {totale['CPU_Server_Max_Pct']:.0f}%), "
+              f"RSS {totale['RSS_Server_Max_MB']:.0f} MB (fine {totale['RSS_Server_Fine_MB']:.0f} MB); "
+              f"generatore di carico CPU {totale['CPU_Generatore_Pct']:.0f}%")
+    for r in per_azione:
+        print(f"  - {r['Azione']:14} {r['Rerun']:5} rerun  {_latenze(r)}" + (f"  ❌ {r['Errori']}" if r['Errori'] else ''))
+
+
+def _primi_errori(misure, quanti=3):
+    return list(dict.fromkeys(m['Errore'] for m in misure if m['Errore']))[:quanti]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Test di carico della dashboard con sessioni simulate')
+    parser.add_argument('--sessioni', nargs='+', type=int, default=SESSIONI, help='sessioni contemporanee (default: 1 5 10 20)')
+    parser.add_argument('--durata', type=float, default=DURATA_SECONDI, help='secondi per livello di sessioni')
+    parser.add_argument('--pausa', nargs=2, type=float, default=PAUSA_SECONDI, metavar=('MIN', 'MAX'),
+                        help='secondi di riflessione tra due azioni (default: 1 5)')
+    parser.add_argument('--scala', type=float, help='usa i dati sintetici a questa scala invece dei dati correnti')
+    parser.add_argument('--seme', type=int, default=SEME_PREDEFINITO, help='seme delle sessioni e dei dati sintetici')
+    parser.add_argument('--porta', type=int, default=PORTA, help='porta del server locale')
+    parser.add_argument('--indirizzo', help='server già avviato (es. http://localhost:8501) invece di uno locale')
+    parser.add_argument('--pid', type=int, help='processo del server indicato con --indirizzo, per CPU e memoria')
+    parser.add_argument('--timeout', type=int, default=TIMEOUT_RERUN, help='secondi massimi per rerun')
+    parser.add_argument('--soglia-p95', type=int, help='p95 massimo ammesso in ms (codice 1 se superato)')
+    args = parser.parse_args()
+
+    processo = None
+    if args.indirizzo:
+        dati, url, pid = args.indirizzo, indirizzo_websocket(args.indirizzo), args.pid
+    else:
+        cartella = Path('.')
+        if args.scala is not None:
+            args.scala = int(args.scala) if args.scala.is_integer() else args.scala
+            cartella = prepara_dati(args.scala, args.seme)
+        dati = f"{args.scala:g}x" if args.scala is not None else 'correnti'
+        print(f"🚀 Avvio della dashboard su 127.0.0.1:{args.porta} (dati {dati})...")
+        processo, log_server = avvia_server(cartella, args.porta)
+        url, pid = indirizzo_websocket(f"http://127.0.0.1:{args.porta}"), processo.pid
+        print(f"  📄 Log del server: {log_server}")
+
+    if pid and campiona_processo(pid) is None:
+        print("  ⚠️  /proc non disponibile: CPU e memoria del server non misurate")
+    try:
+        print(f"🔥 Riscaldamento (tutte le pagine una volta): {asyncio.run(riscalda(url, args.timeout)):.1f} s")
+        print(f"⏱️  Livelli: {', '.join(map(str, args.sessioni))} sessioni, {args.durata:g} s ciascuno, "
+              f"pausa {args.pausa[0]:g}-{args.pausa[1]:g} s")
+        risultati, errori = [], []
+        for sessioni in args.sessioni:
+            misure, risorse, cpu_generatore = asyncio.run(
+                esegui_livello(url, sessioni, args.durata, tuple(args.pausa), args.seme, args.timeout, pid)
+            )
+            righe = riepiloga(sessioni, misure, risorse, cpu_generatore, args.durata)
+            _stampa_livello(righe)
+            errori += _primi_errori(misure)
+            risultati += righe
+    finally:
+        if processo:
+            ferma_server(processo)
+
+    intestazione = {'Data': datetime.now().isoformat(timespec='seconds'), 'Commit': commit_corrente(), 'Dati': dati}
+    scrivi_risultati([{**intestazione, **r} for r in risultati])
+    print(f"\n💾 Risultati aggiunti a {FILE_RISULTATI}")
+
+    totali = [r for r in risultati if r['Azione'] == TUTTE]
+    problemi = [f"{r['Sessioni']} sessioni: {r['Errori']} errori" for r in totali if r['Errori']]
+    if args.soglia_p95:
+        problemi += [f"{r['Sessioni']} sessioni: p95 {r['P95_ms']:,} ms oltre la soglia di {args.soglia_p95:,} ms"
+                     for r in totali if (r.get('P95_ms') or 0) > args.soglia_p95]
+    if problemi:
+        print(f"\n⚠️  {len(problemi)} problemi:")
+        for problema in problemi + [f"errore: {e}" for e in dict.fromkeys(errori)]:
+            print(f"  - {problema}")
+        sys.exit(1)
+    print("\n✅ Nessun errore" + (f", p95 entro {args.soglia_p95:,} ms" if args.soglia_p95 else ''))
+
+
+if __name__ == "__main__":
+    main()
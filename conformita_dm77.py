@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Matrice di conformità DM 77/2022 per struttura.
+
+Ogni Dispositivo di dotazioni_minime_standard.csv è associato ai codici del
+catalogo che lo soddisfano (MAPPATURA_STANDARD). Le configurazioni vengono
+aggregate per (struttura, dispositivo richiesto) in un solo passaggio
+vettoriale e confrontate con la quantità minima:
+
+    Conforme    quantità presente ≥ minima
+    Finanziato  non ancora presente, ma coperto da configurazioni FINANZIATO
+    Mancante    né presente né finanziato (eventualmente DA_ACQUISTARE)
+
+Le strutture sono confrontate con gli standard della propria tipologia
+(TIPOLOGIA_STANDARD) più quelli COMUNE. I risultati sono tenuti in cache per
+versione dei dati.
+
+Utilizzo come modulo:
+    from conformita_dm77 import calcola_conformita, matrice_conformita, riepilogo_conformita
+
+    df_conformita = calcola_conformita(df_strutture, df_dotazioni, df_dotazioni_minime, versione=versione)
+    matrice = matrice_conformita(df_conformita)              # struttura × dispositivo (bool)
+    per_zona = riepilogo_conformita(df_conformita, 'Zona')
+
+Da riga di comando:
+    python conformita_dm77.py
+    python conformita_dm77.py --csv conformita_dm77.csv
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from integrita_referenziale import FILE_DOTAZIONI, FILE_STRUTTURE, per_versione, versione_dati
+
+FILE_DOTAZIONI_MINIME = 'dotazioni_minime_standard.csv'
+
+# Tipologia struttura → tipologia degli standard (oltre a COMUNE)
+TIPOLOGIA_STANDARD = {
+    'CdC': 'CDC',
+    'OdC': 'ODC',
+    'Cure Intermedie': 'ODC'
+}
+
+# (Tipologia standard, Dispositivo) → codici catalogo che lo soddisfano
+MAPPATURA_STANDARD = {
+    ('CDC', 'ECG'): ['DIAG001'],
+    ('CDC', 'Holter cardiaco'): ['DIAG002'],
+    ('CDC', 'Spirometro'): ['DIAG003'],
+    ('CDC', 'Ecografo portatile'): ['DIAG004'],
+    ('CDC', 'Monitor multiparametrico'): ['DIAG005'],
+    ('ODC', 'Apparecchio radiologico'): ['DIAG007'],
+    ('ODC', 'Ecografo'): ['DIAG013'],
+    ('ODC', 'Carrello emergenza'): ['DIAG010'],
+    ('ODC', 'Defibrillatore'): ['DIAG006', 'ATTR004'],
+    ('ODC', 'Spirometro'): ['DIAG012'],
+    ('ODC', 'Emogasanalizzatore'): ['DIAG008'],
+    ('ODC', 'POC'): ['DIAG009'],
+    ('ODC', 'ECG portatile'): ['DIAG011'],
+    ('ODC', 'Telemedicina (STANZA)'): ['DIAG014'],
+    ('COMUNE', 'Lettino visita elettrico'): ['ATTR001'],
+    ('COMUNE', 'Lettino ginecologico'): ['ATTR002'],
+    ('COMUNE', 'Letto degenza elettrico'): ['ATTR003'],
+    ('COMUNE', 'DAE con aspiratore'): ['ATTR004', 'DIAG006'],
+    ('COMUNE', 'Lampada visita'): ['ATTR005'],
+    ('COMUNE', 'Frigofarmaco'): ['ATTR006'],
+    ('COMUNE', 'Lavapadelle'): ['ATTR007'],
+    ('COMUNE', 'Vuotatorio'): ['ATTR008'],
+    ('COMUNE', 'Sollevatore'): ['ATTR009'],
+    ('COMUNE', 'Riunito oculistico completo'): ['ATTR010']
+}
+
+STATI_CONFORMITA = ['Conforme', 'Finanziato', 'Mancante']
+
+COLONNE_CONFORMITA = [
+    'Codice_Struttura', 'Nome_Struttura', 'Tipologia', 'Zona', 'PNRR',
+    'Tipologia_Standard', 'Dispositivo', 'Quantita_Minima',
+    'Quantita_Presente', 'Quantita_Finanziata', 'Quantita_Da_Acquistare', 'Stato_Conformita'
+]
+
+# Tabella di conformità dell'ultima versione dei dati
+_RISULTATI = {}
+
+
+def mappatura_codici():
+    """MAPPATURA_STANDARD come tabella (Tipologia_Standard, Dispositivo, Codice_Dotazione)"""
+    return pd.DataFrame(
+        [(tip, disp, codice) for (tip, disp), codici in MAPPATURA_STANDARD.items() for codice in codici],
+        columns=['Tipologia_Standard', 'Dispositivo', 'Codice_Dotazione']
+    )
+
+
+def _calcola(df_strutture, df_dotazioni, df_dotazioni_minime):
+    # Strutture con la tipologia di standard applicabile (la propria + COMUNE)
+    strutture = df_strutture.assign(Tipologia_Standard=df_strutture['Tipologia'].map(TIPOLOGIA_STANDARD))
+    strutture = strutture[strutture['Tipologia_Standard'].notna()]
+    strutture = pd.concat([strutture, strutture.assign(Tipologia_Standard='COMUNE')], ignore_index=True)
+
+    requisiti = df_dotazioni_minime.rename(columns={'Tipologia': 'Tipologia_Standard'})[
+        ['Tipologia_Standard', 'Dispositivo', 'Quantita_Minima']
+    ]
+    attesi = strutture.merge(requisiti, on='Tipologia_Standard').rename(columns={'Codice': 'Codice_Struttura'})
+
+    # Configurazioni → requisito soddisfatto (tramite tipologia della struttura e codice catalogo)
+    richiesta = pd.to_numeric(df_dotazioni['Quantita_Richiesta'], errors='coerce').fillna(0)
+    presente = pd.to_numeric(df_dotazioni['Quantita_Presente'], errors='coerce').fillna(0)
+    stato = df_dotazioni['Stato_Finanziamento']
+    configurazioni = pd.DataFrame({
+        'Codice_Struttura': df_dotazioni['Codice_Struttura'],
+        'Codice_Dotazione': df_dotazioni['Codice_Dotazione'],
+        'Quantita_Presente': presente,
+        'Quantita_Finanziata': richiesta.where(stato == 'FINANZIATO', 0),
+        'Quantita_Da_Acquistare': (richiesta - presente).clip(lower=0).where(stato == 'DA_ACQUISTARE', 0)
+    })
+    tipologie = strutture[['Codice', 'Tipologia_Standard']].rename(columns={'Codice': 'Codice_Struttura'})
+    configurazioni = configurazioni.merge(tipologie, on='Codice_Struttura').merge(
+        mappatura_codici(), on=['Tipologia_Standard', 'Codice_Dotazione']
+    )
+    quantita = ['Quantita_Presente', 'Quantita_Finanziata', 'Quantita_Da_Acquistare']
+    per_requisito = configurazioni.groupby(
+        ['Codice_Struttura', 'Tipologia_Standard', 'Dispositivo'], as_index=False
+    )[quantita].sum()
+
+    df = attesi.merge(per_requisito, on=['Codice_Struttura', 'Tipologia_Standard', 'Dispositivo'], how='left')
+    df[quantita] = df[quantita].fillna(0).astype('int64')
+
+    minima = df['Quantita_Minima']
+    df['Stato_Conformita'] = np.select(
+        [df['Quantita_Presente'] >= minima, df['Quantita_Presente'] + df['Quantita_Finanziata'] >= minima],
+        ['Conforme', 'Finanziato'],
+        default='Mancante'
+    )
+    colonne = [c for c in COLONNE_CONFORMITA if c in df.columns]
+    return df[colonne].sort_values(['Codice_Struttura', 'Tipologia_Standard', 'Dispositivo'], ignore_index=True)
+
+
+def calcola_conformita(df_strutture, df_dotazioni, df_dotazioni_minime, versione=None):
+    """
+    Tabella di conformità, una riga per (struttura, dispositivo richiesto) (COLONNE_CONFORMITA).
+    Con versione indicata il risultato è riutilizzato finché la versione dei dati non cambia.
+    """
+    if versione is None:
+        return _calcola(df_strutture, df_dotazioni, df_dotazioni_minime)
+    return per_versione(_RISULTATI, versione, lambda: _calcola(df_strutture, df_dotazioni, df_dotazioni_minime))
+
+
+def matrice_conformita(df_conformita, stato='Conforme'):
+    """Matrice booleana struttura × dispositivo (True se nello stato indicato; NaN se non richiesto)"""
+    return df_conformita.assign(Valore=df_conformita['Stato_Conformita'] == stato).pivot_table(
+        index='Codice_Struttura', columns='Dispositivo', values='Valore', aggfunc='any'
+    )
+
+
+def riepilogo_conformita(df_conformita, per='Codice_Struttura'):
+    """Conteggio requisiti per stato e % di conformità, per struttura (default) o per Zona"""
+    chiavi = [per] if per != 'Codice_Struttura' else ['Codice_Struttura', 'Nome_Struttura', 'Tipologia', 'Zona']
+    riepilogo = pd.crosstab(
+        [df_conformita[c] for c in chiavi], df_conformita['Stato_Conformita']
+    ).reindex(columns=STATI_CONFORMITA, fill_value=0)
+    riepilogo['Requisiti'] = riepilogo[STATI_CONFORMITA].sum(axis=1)
+    riepilogo['Conformita_%'] = (riepilogo['Conforme'] / riepilogo['Requisiti'] * 100).round(1)
+    riepilogo.columns.name = None
+    return riepilogo.reset_index().sort_values('Conformita_%', ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Conformità delle strutture alle dotazioni minime DM 77/2022')
+    parser.add_argument('--csv', help='salva la tabella di conformità completa nel file CSV indicato')
+    args = parser.parse_args()
+
+    versione = versione_dati(FILE_STRUTTURE, FILE_DOTAZIONI, FILE_DOTAZIONI_MINIME)
+    print(f"⭐ Conformità DM 77/2022 (versione dati {versione})")
+    df_strutture = pd.read_csv(FILE_STRUTTURE)
+    df_dotazioni = pd.read_csv(FILE_DOTAZIONI)
+    df_dotazioni_minime = pd.read_csv(FILE_DOTAZIONI_MINIME)
+
+    inizio = time.perf_counter()
+    df_conformita = calcola_conformita(df_strutture, df_dotazioni, df_dotazioni_minime)
+    durata = time.perf_counter() - inizio
+
+    print(f"  📊 {df_conformita['Codice_Struttura'].nunique()} strutture, "
+          f"{len(df_conformita)} requisiti verificati ({durata * 1000:.1f} ms)")
+    conteggi = df_conformita['Stato_Conformita'].value_counts().reindex(STATI_CONFORMITA, fill_value=0)
+    print(f"  ✅ Conformi: {conteggi['Conforme']}  💶 Finanziati: {conteggi['Finanziato']}  "
+          f"❌ Mancanti: {conteggi['Mancante']}")
+
+    print("\n📍 Conformità per zona:")
+    for _, row in riepilogo_conformita(df_conformita, 'Zona').iterrows():
+        print(f"  - {row['Zona']}: {row['Conformita_%']}% "
+              f"({row['Conforme']}/{row['Requisiti']}, {row['Mancante']} mancanti)")
+
+    if args.csv:
+        df_conformita.to_csv(args.csv, index=False)
+        print(f"\n💾 Tabella conformità: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
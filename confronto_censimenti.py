@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Confronto tra due prospetti di censimento CDC/ODC (es. al 19-01-26 e al 20-01-26).
+
+I due prospetti, letti in forma lunga con storico_censimenti.leggi_prospetto,
+sono allineati con un hash join: ogni riga riceve un hash a 64 bit di
+(Chiave_Struttura, Dispositivo) e un hash della sola struttura, e i due lati
+sono uniti su questi interi in un solo passaggio (tempo lineare nel numero di
+righe, nessun confronto riga per riga). Il risultato è un changeset compatto:
+
+    Stato               transizione di stato di un dispositivo (es. DA_ACQUISTARE → FINANZIATO)
+    Struttura nuova     struttura presente solo nel secondo prospetto
+    Struttura rimossa   struttura presente solo nel primo prospetto
+    Indirizzo           indirizzo della struttura cambiato
+    PNRR                flag PNRR della struttura cambiato
+
+con l'impatto sul valore da finanziare (righe DA_ACQUISTARE ai prezzi di
+catalogo correnti): positivo se il fabbisogno cresce, negativo se cala.
+
+Utilizzo:
+    python confronto_censimenti.py                          # ultimi due prospetti per tipo nella cartella
+    python confronto_censimenti.py "ODC_..._al 19-01-26.CSV" "ODC_..._al 20-01-26.CSV" --lordo --csv modifiche.csv
+
+Utilizzo come modulo:
+    from confronto_censimenti import confronta_prospetti
+
+    changeset = confronta_prospetti(leggi_prospetto(prima), leggi_prospetto(dopo), prezzi_catalogo(df_catalogo))
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from motore_fabbisogno import ETICHETTA_IMPORTI, FILE_CATALOGO, formatta_euro
+from storico_censimenti import MODELLO_PROSPETTI, data_prospetto, leggi_prospetto, prezzi_catalogo
+
+TIPI_VARIAZIONE = ['Stato', 'Struttura nuova', 'Struttura rimossa', 'Indirizzo', 'PNRR']
+
+# Stato di un dispositivo assente da uno dei due prospetti (colonna aggiunta o tolta)
+STATO_ASSENTE = 'ASSENTE'
+
+COLONNE_CHANGESET = [
+    'Tipo_Variazione', 'Tipo', 'Zona', 'Nome_Struttura', 'Dispositivo', 'Codice_Dotazione',
+    'Prima', 'Dopo', 'Impatto_Cent'
+]
+
+
+def _hash_chiavi(df, colonne):
+    """Hash uint64 delle colonne indicate (stessa funzione sui due lati del join)"""
+    return pd.util.hash_pandas_object(df[colonne], index=False).to_numpy()
+
+
+def _valore_da_acquistare(prospetto, prezzi_cent):
+    """Valore in centesimi delle sole righe DA_ACQUISTARE (0 altrimenti)"""
+    prezzo = prospetto['Codice_Dotazione'].map(prezzi_cent).fillna(0).to_numpy('int64')
+    return np.where(prospetto['Stato'].to_numpy() == 'DA_ACQUISTARE', prezzo, 0)
+
+
+def _prepara(prospetto, prezzi_cent):
+    return prospetto.assign(
+        Hash_Riga=_hash_chiavi(prospetto, ['Chiave_Struttura', 'Dispositivo']),
+        Hash_Struttura=_hash_chiavi(prospetto, ['Chiave_Struttura']),
+        Valore_Cent=_valore_da_acquistare(prospetto, prezzi_cent)
+    )
+
+
+def confronta_prospetti(prima, dopo, prezzi_cent):
+    """
+    Changeset tra due prospetti in forma lunga (COLONNE_CHANGESET), una riga per
+    struttura nuova/rimossa o per attributo/dispositivo cambiato.
+    prezzi_cent: prezzo unitario per codice catalogo (storico_censimenti.prezzi_catalogo).
+    """
+    prima, dopo = _prepara(prima, prezzi_cent), _prepara(dopo, prezzi_cent)
+
+    # Livello struttura: hash join sulle strutture dei due prospetti
+    attributi = ['Hash_Struttura', 'Tipo', 'Zona', 'Nome_Struttura', 'Indirizzo', 'PNRR']
+    strutture = prima.groupby(attributi, sort=False, as_index=False)['Valore_Cent'].sum().merge(
+        dopo.groupby(attributi, sort=False, as_index=False)['Valore_Cent'].sum(),
+        on='Hash_Struttura', how='outer', suffixes=('_Prima', '_Dopo'), indicator=True
+    )
+    for colonna in ['Tipo', 'Zona', 'Nome_Struttura']:
+        strutture[colonna] = strutture[f'{colonna}_Dopo'].fillna(strutture[f'{colonna}_Prima'])
+    valore_prima = strutture['Valore_Cent_Prima'].fillna(0).astype('int64')
+    valore_dopo = strutture['Valore_Cent_Dopo'].fillna(0).astype('int64')
+
+    parti = []
+    nuove = strutture['_merge'] == 'right_only'
+    rimosse = strutture['_merge'] == 'left_only'
+    parti.append(strutture[nuove].assign(
+        Tipo_Variazione='Struttura nuova', Prima='', Dopo=strutture.loc[nuove, 'Indirizzo_Dopo'],
+        Impatto_Cent=valore_dopo[nuove]
+    ))
+    parti.append(strutture[rimosse].assign(
+        Tipo_Variazione='Struttura rimossa', Prima=strutture.loc[rimosse, 'Indirizzo_Prima'], Dopo='',
+        Impatto_Cent=-valore_prima[rimosse]
+    ))
+    entrambe = strutture[strutture['_merge'] == 'both']
+    for attributo in ['Indirizzo', 'PNRR']:
+        cambiate = entrambe[entrambe[f'{attributo}_Prima'] != entrambe[f'{attributo}_Dopo']]
+        parti.append(cambiate.assign(
+            Tipo_Variazione=attributo, Prima=cambiate[f'{attributo}_Prima'], Dopo=cambiate[f'{attributo}_Dopo'],
+            Impatto_Cent=0
+        ))
+
+    # Livello dispositivo: hash join delle righe delle strutture presenti in entrambi i prospetti
+    comuni = entrambe['Hash_Struttura'].to_numpy()
+    colonne = ['Hash_Riga', 'Tipo', 'Zona', 'Nome_Struttura', 'Dispositivo', 'Codice_Dotazione', 'Stato', 'Valore_Cent']
+    righe = prima.loc[prima['Hash_Struttura'].isin(comuni), colonne].merge(
+        dopo.loc[dopo['Hash_Struttura'].isin(comuni), colonne],
+        on='Hash_Riga', how='outer', suffixes=('_Prima', '_Dopo')
+    )
+    righe['Prima'] = righe['Stato_Prima'].fillna(STATO_ASSENTE)
+    righe['Dopo'] = righe['Stato_Dopo'].fillna(STATO_ASSENTE)
+    righe = righe[righe['Prima'] != righe['Dopo']]
+    for colonna in ['Tipo', 'Zona', 'Nome_Struttura', 'Dispositivo', 'Codice_Dotazione']:
+        righe[colonna] = righe[f'{colonna}_Dopo'].fillna(righe[f'{colonna}_Prima'])
+    impatto = righe['Valore_Cent_Dopo'].fillna(0).astype('int64') - righe['Valore_Cent_Prima'].fillna(0).astype('int64')
+    parti.append(righe.assign(Tipo_Variazione='Stato', Impatto_Cent=impatto))
+
+    changeset = pd.concat([p.reindex(columns=COLONNE_CHANGESET) for p in parti], ignore_index=True)
+    changeset[['Dispositivo', 'Codice_Dotazione', 'Prima', 'Dopo']] = (
+        changeset[['Dispositivo', 'Codice_Dotazione', 'Prima', 'Dopo']].fillna('')
+    )
+    changeset['Impatto_Cent'] = changeset['Impatto_Cent'].astype('int64')
+    changeset['Tipo_Variazione'] = pd.Categorical(changeset['Tipo_Variazione'], categories=TIPI_VARIAZIONE)
+    return changeset.sort_values(
+        ['Tipo_Variazione', 'Tipo', 'Zona', 'Nome_Struttura', 'Dispositivo'], ignore_index=True
+    ).astype({'Tipo_Variazione': str})
+
+
+def riepilogo_transizioni(changeset):
+    """Transizioni di stato Prima → Dopo con numero di dispositivi e impatto complessivo"""
+    stati = changeset[changeset['Tipo_Variazione'] == 'Stato']
+    return stati.groupby(['Prima', 'Dopo'], as_index=False).agg(
+        Dispositivi=('Dispositivo', 'size'),
+        Impatto_Cent=('Impatto_Cent', 'sum')
+    ).sort_values('Dispositivi', ascending=False, ignore_index=True)
+
+
+def coppie_recenti(cartella='.'):
+    """Per ogni tipo (CDC/ODC) i due prospetti più recenti nella cartella: {tipo: (prima, dopo)}"""
+    prospetti = {}
+    for percorso in Path(cartella).glob(MODELLO_PROSPETTI):
+        tipo = percorso.name.split('_', 1)[0].upper()
+        prospetti.setdefault(tipo, []).append(percorso)
+    coppie = {}
+    for tipo, percorsi in sorted(prospetti.items()):
+        percorsi = sorted(percorsi, key=data_prospetto)
+        if len(percorsi) >= 2:
+            coppie[tipo] = (percorsi[-2], percorsi[-1])
+    return coppie
+
+
+def stampa_changeset(changeset, massimo=20):
+    """Changeset su console, raggruppato per tipo di variazione"""
+    if changeset.empty:
+        print("  ✅ Nessuna differenza")
+        return
+    for tipo_variazione, righe in changeset.groupby('Tipo_Variazione', sort=False):
+        print(f"\n  🔀 {tipo_variazione}: {len(righe)} "
+              f"(impatto {formatta_euro(righe['Impatto_Cent'].sum(), prefisso='€ ')})")
+        for _, row in righe.head(massimo).iterrows():
+            dispositivo = f" / {row['Dispositivo']}" if row['Dispositivo'] else ''
+            impatto = f"  [{formatta_euro(row['Impatto_Cent'], prefisso='€ ')}]" if row['Impatto_Cent'] else ''
+            print(f"    - {row['Zona']} | {row['Nome_Struttura']}{dispositivo}: "
+                  f"{row['Prima'] or '—'} → {row['Dopo'] or '—'}{impatto}")
+        if len(righe) > massimo:
+            print(f"    ... e altre {len(righe) - massimo}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Confronto tra due prospetti di censimento CDC/ODC')
+    parser.add_argument('file', nargs='*', metavar='PROSPETTO',
+                        help='prospetto di partenza e di arrivo (default: ultimi due per tipo nella cartella)')
+    parser.add_argument('--lordo', action='store_true', help='importi IVA inclusa')
+    parser.add_argument('--csv', help='salva il changeset nel file CSV indicato')
+    args = parser.parse_args()
+
+    if args.file and len(args.file) != 2:
+        print("❌ Indicare due prospetti: PRIMA DOPO")
+        sys.exit(1)
+    coppie = {'': tuple(args.file)} if args.file else coppie_recenti()
+    if not coppie:
+        print(f"❌ Servono almeno due prospetti dello stesso tipo ({MODELLO_PROSPETTI})")
+        sys.exit(1)
+
+    prezzi = prezzi_catalogo(pd.read_csv(FILE_CATALOGO), lordo=args.lordo)
+    changeset_tutti = []
+    for prima, dopo in coppie.values():
+        inizio = time.perf_counter()
+        df_prima, df_dopo = leggi_prospetto(prima), leggi_prospetto(dopo)
+        changeset = confronta_prospetti(df_prima, df_dopo, prezzi)
+        durata = (time.perf_counter() - inizio) * 1000
+
+        print(f"\n🔍 {Path(prima).name}\n   → {Path(dopo).name}")
+        print(f"  📊 {len(df_prima)} → {len(df_dopo)} righe, {len(changeset)} variazioni "
+              f"(importi {ETICHETTA_IMPORTI[args.lordo]}, {durata:.1f} ms)")
+        stampa_changeset(changeset)
+        if not changeset.empty:
+            print(f"\n  💶 Variazione valore DA_ACQUISTARE: "
+                  f"{formatta_euro(changeset['Impatto_Cent'].sum(), prefisso='€ ')}")
+        changeset_tutti.append(changeset.assign(Prospetto_Prima=Path(prima).name, Prospetto_Dopo=Path(dopo).name))
+
+    if args.csv:
+        pd.concat(changeset_tutti, ignore_index=True).to_csv(args.csv, index=False)
+        print(f"\n💾 Changeset: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ import pandas as pd
 import difflib
 from datetime import datetime
 
+from archivio_snapshot import crea_snapshot
+
 def normalizza_nome(nome):
     """Normalizza nome per confronto"""
     if pd.isna(nome):
@@ -64,11 +66,10 @@ def main():
 
     print(f"   ✅ {len(df_attuale_cdc)} CDC nell'anagrafica")
 
-    # Backup
+    # Backup (snapshot deduplicato in .snapshot/)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = f'strutture_sanitarie.csv.backup_{timestamp}'
-    df_attuale.to_csv(backup_file, index=False)
-    print(f"   💾 Backup creato: {backup_file}")
+    id_snapshot = crea_snapshot(['strutture_sanitarie.csv'], descrizione='correggi_pnrr_da_master')
+    print(f"   💾 Snapshot backup: {id_snapshot}")
 
     # Processa correzioni
     print("\n🔄 Analisi correzioni...")
@@ -173,6 +174,7 @@ def main():
     print("1. Verifica il file: strutture_sanitarie_CORRETTE.csv")
     print("2. Se OK, applicalo:")
     print("   cp strutture_sanitarie_CORRETTE.csv strutture_sanitarie.csv")
+    print(f"   (per tornare indietro: python archivio_snapshot.py ripristina {id_snapshot})")
     print("3. Rigenera dati:")
     print("   python integra_anagrafiche_v3.py")
     print("4. Commit:")
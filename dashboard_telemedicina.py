@@ -7,14 +7,50 @@ Visualizza dotazioni tecnologiche per telemedicina con fabbisogno complessivo
 
 Utilizzo:
     streamlit run dashboard_telemedicina.py
+
+Profilo dei tempi di ogni rerun nella sidebar: aprire la dashboard con ?profilo=1
+(?profilo=cprofile salva anche le statistiche cProfile, vedi profilo_dashboard.py).
 """
 
+import time
+
 import pandas as pd
-import streamlit as st
+import streamlit
 import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
 
+from motore_fabbisogno import (
+    ETICHETTA_IMPORTI, arricchisci_strutture, centesimi_a_euro, colonne_euro, euro_a_centesimi, formatta_euro,
+    materializza_fabbisogno, seleziona_importi
+)
+from conformita_dm77 import FILE_DOTAZIONI_MINIME, STATI_CONFORMITA, calcola_conformita, riepilogo_conformita
+from integrita_referenziale import (
+    FILE_CATALOGO, FILE_DOTAZIONI, FILE_STRUTTURE, indice_per_versione, trova_orfani, versione_dati
+)
+from confronto_censimenti import TIPI_VARIAZIONE, confronta_prospetti, riepilogo_transizioni
+from lotti_gara import costruisci_lotti
+from priorita_acquisti import CLASSI_PRIORITA, candidati_acquisto, ottimizza_budget
+from profilo_dashboard import (
+    PARAMETRO_QUERY, StreamlitCronometrato, avvia_profilo, cronometra, modalita_profilo, tabella_profilo,
+    termina_profilo
+)
+from regole_qualita import esegui_regole
+from schema_dati import valida_tutti
+from simulatore_prezzi import (
+    applica_scenario, base_simulazione, carica_scenari, confronta_scenari, kpi_scenario, salva_scenario
+)
+from storico_censimenti import (
+    MODELLO_PROSPETTI, STATI_CENSIMENTO, andamento, carica_storico, data_prospetto, leggi_prospetto, prezzi_catalogo
+)
+
+
+# st.plotly_chart e st.dataframe misurati quando il profilo del rerun è attivo (?profilo=1)
+st = StreamlitCronometrato(streamlit)
+
+# Stato conformità DM 77/2022 → icona nella matrice struttura × dispositivo
+ICONE_CONFORMITA = {'Conforme': '✅', 'Finanziato': '💶', 'Mancante': '❌'}
+
 
 # Configurazione pagina
 st.set_page_config(
@@ -29,56 +65,41 @@ st.set_page_config(
 def carica_dati():
     """Carica tutti i dati necessari (cache: 10 minuti)"""
     try:
-        # Carica strutture
-        df_strutture = pd.read_csv('strutture_sanitarie.csv')
-
-        # Carica catalogo dotazioni
-        df_catalogo = pd.read_csv('dotazioni_telemedicina_catalogo.csv')
-
-        # Carica dotazioni per struttura
-        df_dotazioni = pd.read_csv('dotazioni_strutture_telemedicina.csv')
+        # Strutture, catalogo, dotazioni e fabbisogno (netto, IVA e lordo) dai risultati
+        # materializzati per versione dei CSV: filtri e selettore IVA lavorano sulle
+        # righe/colonne già pronte
+        with cronometra('carica_fabbisogno') as fase:
+            risultati, da_cache = materializza_fabbisogno()
+            if not da_cache:
+                fase['Fase'] = 'calcola_fabbisogno (CSV cambiati)'
+        df_strutture, df_catalogo, df_dotazioni, df_fabbisogno = (
+            risultati['strutture'], risultati['catalogo'], risultati['dotazioni'], risultati['fabbisogno']
+        )
 
         # Carica dotazioni minime standard
         df_dotazioni_minime = pd.read_csv('dotazioni_minime_standard.csv')
 
-        return df_strutture, df_catalogo, df_dotazioni, df_dotazioni_minime
+        # Controllo schema di tutti i file (tabella errori riga/colonna)
+        with cronometra('valida_tutti'):
+            df_errori_schema = valida_tutti({
+                'strutture': df_strutture,
+                'catalogo': df_catalogo,
+                'dotazioni': df_dotazioni,
+                'dotazioni_minime': df_dotazioni_minime
+            })
+
+        # Chiavi esterne delle configurazioni: indice costruito una volta per versione dati
+        with cronometra('trova_orfani'):
+            versione = versione_dati(FILE_STRUTTURE, FILE_CATALOGO, FILE_DOTAZIONI, FILE_DOTAZIONI_MINIME)
+            df_orfani = trova_orfani(df_dotazioni, indice_per_versione(versione, df_strutture, df_catalogo))
+
+        return (df_strutture, df_catalogo, df_dotazioni, df_dotazioni_minime, df_fabbisogno,
+                df_errori_schema, versione, df_orfani)
     except FileNotFoundError as e:
         st.error(f"❌ Errore: File non trovato - {e}")
         st.stop()
 
 
-def calcola_fabbisogno(df_dotazioni, df_catalogo):
-    """Calcola il fabbisogno complessivo per dotazione con distinzione stati finanziamento"""
-
-    # Merge con catalogo per ottenere descrizione e costo
-    df_merge = df_dotazioni.merge(
-        df_catalogo,
-        left_on='Codice_Dotazione',
-        right_on='Codice',
-        how='left'
-    )
-
-    # Calcola quantità da acquistare
-    df_merge['Quantita_Da_Acquistare'] = df_merge['Quantita_Richiesta'] - df_merge['Quantita_Presente']
-    df_merge['Quantita_Da_Acquistare'] = df_merge['Quantita_Da_Acquistare'].clip(lower=0)
-
-    # Calcola costo per struttura (solo ciò che serve acquistare)
-    df_merge['Costo_Totale'] = df_merge['Quantita_Da_Acquistare'] * df_merge['Costo_Unitario_EUR']
-
-    # Calcola costi separati per stato finanziamento
-    df_merge['Costo_Da_Finanziare'] = df_merge.apply(
-        lambda row: row['Costo_Totale'] if row.get('Stato_Finanziamento') == 'DA_ACQUISTARE' else 0, axis=1
-    )
-    df_merge['Costo_Gia_Finanziato'] = df_merge.apply(
-        lambda row: row['Quantita_Richiesta'] * row['Costo_Unitario_EUR'] if row.get('Stato_Finanziamento') == 'FINANZIATO' else 0, axis=1
-    )
-    df_merge['Costo_Presente'] = df_merge.apply(
-        lambda row: row['Quantita_Presente'] * row['Costo_Unitario_EUR'] if row.get('Stato_Finanziamento') == 'PRESENTE' else 0, axis=1
-    )
-
-    return df_merge
-
-
 def pagina_riepilogo_generale(df_strutture, df_catalogo, df_dotazioni, df_fabbisogno):
     """Pagina riepilogo generale"""
     st.header("📊 Riepilogo Generale")
@@ -99,8 +120,8 @@ def pagina_riepilogo_generale(df_strutture, df_catalogo, df_dotazioni, df_fabbis
         st.metric("Ospedali di Comunità", n_odc)
 
     with col4:
-        fabbisogno_totale = df_fabbisogno['Costo_Totale'].sum()
-        st.metric("Fabbisogno Totale", f"€{fabbisogno_totale:,.2f}")
+        fabbisogno_totale = df_fabbisogno['Costo_Totale_Cent'].sum()
+        st.metric("Fabbisogno Totale", formatta_euro(fabbisogno_totale))
 
     # KPI PNRR vs non-PNRR - seconda riga
     col1, col2, col3, col4 = st.columns(4)
@@ -117,39 +138,39 @@ def pagina_riepilogo_generale(df_strutture, df_catalogo, df_dotazioni, df_fabbis
         # Merge per ottenere PNRR dalle strutture
         df_fabb_strutt = df_fabbisogno.merge(df_strutture[['Codice', 'PNRR']],
                                               left_on='Codice_Struttura', right_on='Codice', how='left')
-        fabb_pnrr = df_fabb_strutt[df_fabb_strutt['PNRR'] == 'SI']['Costo_Totale'].sum()
-        st.metric("💰 Fabbisogno PNRR", f"€{fabb_pnrr:,.2f}")
+        fabb_pnrr = df_fabb_strutt[df_fabb_strutt['PNRR'] == 'SI']['Costo_Totale_Cent'].sum()
+        st.metric("💰 Fabbisogno PNRR", formatta_euro(fabb_pnrr))
 
     with col4:
-        fabb_non_pnrr = df_fabb_strutt[df_fabb_strutt['PNRR'] == 'NO']['Costo_Totale'].sum()
-        st.metric("💰 Fabbisogno non-PNRR", f"€{fabb_non_pnrr:,.2f}")
+        fabb_non_pnrr = df_fabb_strutt[df_fabb_strutt['PNRR'] == 'NO']['Costo_Totale_Cent'].sum()
+        st.metric("💰 Fabbisogno non-PNRR", formatta_euro(fabb_non_pnrr))
 
     # KPI per stato finanziamento - terza riga
     st.markdown("### 💸 Analisi Finanziamento")
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        costo_da_finanziare = df_fabbisogno['Costo_Da_Finanziare'].sum()
+        costo_da_finanziare = df_fabbisogno['Costo_Da_Finanziare_Cent'].sum()
         st.metric(
             "🔴 DA FINANZIARE",
-            f"€{costo_da_finanziare:,.2f}",
+            formatta_euro(costo_da_finanziare),
             delta="Richiede nuovo finanziamento",
             delta_color="inverse"
         )
 
     with col2:
-        costo_gia_finanziato = df_fabbisogno['Costo_Gia_Finanziato'].sum()
+        costo_gia_finanziato = df_fabbisogno['Costo_Gia_Finanziato_Cent'].sum()
         st.metric(
             "🟢 GIÀ FINANZIATO",
-            f"€{costo_gia_finanziato:,.2f}",
+            formatta_euro(costo_gia_finanziato),
             delta="Budget già allocato"
         )
 
     with col3:
-        costo_presente = df_fabbisogno['Costo_Presente'].sum()
+        costo_presente = df_fabbisogno['Costo_Presente_Cent'].sum()
         st.metric(
             "🔵 GIÀ PRESENTE",
-            f"€{costo_presente:,.2f}",
+            formatta_euro(costo_presente),
             delta="Valore esistente"
         )
 
@@ -170,11 +191,11 @@ def pagina_riepilogo_generale(df_strutture, df_catalogo, df_dotazioni, df_fabbis
     costo_da_finanz_pnrr = df_fabb_strutt_pnrr[
         (df_fabb_strutt_pnrr['PNRR'] == 'SI') &
         (df_fabb_strutt_pnrr['Stato_Finanziamento'] == 'DA_ACQUISTARE')
-    ]['Costo_Da_Finanziare'].sum()
+    ]['Costo_Da_Finanziare_Cent'].sum()
 
     if costo_da_finanz_pnrr > 0:
         st.warning(
-            f"⚠️ **PRIORITÀ ALTA**: €{costo_da_finanz_pnrr:,.2f} da finanziare per interventi **PNRR** "
+            f"⚠️ **PRIORITÀ ALTA**: {formatta_euro(costo_da_finanz_pnrr)} da finanziare per interventi **PNRR** "
             f"(scadenza: **marzo 2026**)"
         )
 
@@ -183,10 +204,10 @@ def pagina_riepilogo_generale(df_strutture, df_catalogo, df_dotazioni, df_fabbis
     # Fabbisogno per categoria
     st.subheader("💰 Fabbisogno per Categoria")
 
-    fabbisogno_cat = df_fabbisogno.groupby('Categoria').agg({
+    fabbisogno_cat = colonne_euro(df_fabbisogno.groupby('Categoria').agg({
         'Quantita_Da_Acquistare': 'sum',
-        'Costo_Totale': 'sum'
-    }).reset_index()
+        'Costo_Totale_Cent': 'sum'
+    }).reset_index())
 
     col1, col2 = st.columns(2)
 
@@ -205,7 +226,7 @@ def pagina_riepilogo_generale(df_strutture, df_catalogo, df_dotazioni, df_fabbis
     with col2:
         # Tabella riepilogo
         st.dataframe(
-            fabbisogno_cat.style.format({
+            fabbisogno_cat[['Categoria', 'Quantita_Da_Acquistare', 'Costo_Totale']].style.format({
                 'Quantita_Da_Acquistare': '{:.0f}',
                 'Costo_Totale': '€{:,.2f}'
             }),
@@ -218,10 +239,10 @@ def pagina_riepilogo_generale(df_strutture, df_catalogo, df_dotazioni, df_fabbis
     # Top 10 dotazioni per costo
     st.subheader("🔝 Top 10 Dotazioni per Fabbisogno")
 
-    top_dotazioni = df_fabbisogno.groupby(['Descrizione', 'Costo_Unitario_EUR']).agg({
+    top_dotazioni = colonne_euro(df_fabbisogno.groupby(['Descrizione', 'Costo_Unitario_Cent']).agg({
         'Quantita_Da_Acquistare': 'sum',
-        'Costo_Totale': 'sum'
-    }).reset_index().sort_values('Costo_Totale', ascending=False).head(10)
+        'Costo_Totale_Cent': 'sum'
+    }).reset_index().sort_values('Costo_Totale_Cent', ascending=False).head(10))
 
     fig_bar = px.bar(
         top_dotazioni,
@@ -298,8 +319,9 @@ def pagina_strutture(df_strutture, df_fabbisogno):
         df_filtrato = df_filtrato[df_filtrato['PNRR'].isin(pnrr_filtro)]
 
     # Calcola fabbisogno per struttura
-    fabbisogno_struttura = df_fabbisogno.groupby('Codice_Struttura')['Costo_Totale'].sum().reset_index()
-    fabbisogno_struttura.columns = ['Codice', 'Fabbisogno_EUR']
+    fabbisogno_struttura = df_fabbisogno.groupby('Codice_Struttura')['Costo_Totale_Cent'].sum().reset_index()
+    fabbisogno_struttura.columns = ['Codice', 'Fabbisogno_Cent']
+    fabbisogno_struttura['Fabbisogno_EUR'] = centesimi_a_euro(fabbisogno_struttura['Fabbisogno_Cent'])
 
     # Merge con strutture
     df_display = df_filtrato.merge(fabbisogno_struttura, on='Codice', how='left')
@@ -361,20 +383,25 @@ def pagina_dotazioni_struttura(df_strutture, df_catalogo, df_fabbisogno):
     st.divider()
 
     # Filtra dotazioni per struttura
-    df_strutt = df_fabbisogno[df_fabbisogno['Codice_Struttura'] == struttura_selezionata].copy()
+    df_strutt = colonne_euro(
+        df_fabbisogno[df_fabbisogno['Codice_Struttura'] == struttura_selezionata],
+        ['Costo_Totale_Cent']
+    )
+    # Costo unitario nella vista netto/lordo selezionata
+    df_strutt['Costo_Unitario_EUR'] = centesimi_a_euro(df_strutt['Costo_Unitario_Cent'])
 
     if len(df_strutt) == 0:
         st.warning("⚠️ Nessuna dotazione configurata per questa struttura")
         return
 
     # Calcola totali
-    fabbisogno_totale = df_strutt['Costo_Totale'].sum()
+    fabbisogno_totale = df_strutt['Costo_Totale_Cent'].sum()
     dotazioni_da_acquistare = (df_strutt['Quantita_Da_Acquistare'] > 0).sum()
     dotazioni_complete = (df_strutt['Quantita_Da_Acquistare'] == 0).sum()
 
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Fabbisogno Totale", f"€{fabbisogno_totale:,.2f}")
+        st.metric("Fabbisogno Totale", formatta_euro(fabbisogno_totale))
     with col2:
         st.metric("Dotazioni da Acquistare", dotazioni_da_acquistare)
     with col3:
@@ -396,7 +423,7 @@ def pagina_dotazioni_struttura(df_strutture, df_catalogo, df_fabbisogno):
             hide_index=True,
             use_container_width=True
         )
-        st.metric("Subtotale Dispositivi Diagnostici", f"€{df_diag['Costo_Totale'].sum():,.2f}")
+        st.metric("Subtotale Dispositivi Diagnostici", formatta_euro(df_diag['Costo_Totale_Cent'].sum()))
     else:
         st.info("Nessun dispositivo diagnostico configurato")
 
@@ -415,7 +442,7 @@ def pagina_dotazioni_struttura(df_strutture, df_catalogo, df_fabbisogno):
             hide_index=True,
             use_container_width=True
         )
-        st.metric("Subtotale Attrezzature Sanitarie", f"€{df_attr['Costo_Totale'].sum():,.2f}")
+        st.metric("Subtotale Attrezzature Sanitarie", formatta_euro(df_attr['Costo_Totale_Cent'].sum()))
     else:
         st.info("Nessuna attrezzatura sanitaria configurata")
 
@@ -427,10 +454,11 @@ def pagina_fabbisogno_complessivo(df_fabbisogno, df_strutture):
     # Fabbisogno per dotazione
     st.subheader("Riepilogo per Dotazione")
 
-    fabbisogno_dot = df_fabbisogno.groupby(['Categoria', 'Descrizione', 'Costo_Unitario_EUR']).agg({
+    fabbisogno_dot = colonne_euro(df_fabbisogno.groupby(['Categoria', 'Descrizione', 'Costo_Unitario_Cent']).agg({
         'Quantita_Da_Acquistare': 'sum',
-        'Costo_Totale': 'sum'
-    }).reset_index().sort_values(['Categoria', 'Costo_Totale'], ascending=[True, False])
+        'Costo_Totale_Cent': 'sum'
+    }).reset_index().sort_values(['Categoria', 'Costo_Totale_Cent'], ascending=[True, False]))
+    fabbisogno_dot = fabbisogno_dot.rename(columns={'Costo_Unitario': 'Costo_Unitario_EUR'})
 
     # Visualizza per categoria
     for categoria in fabbisogno_dot['Categoria'].unique():
@@ -447,22 +475,23 @@ def pagina_fabbisogno_complessivo(df_fabbisogno, df_strutture):
                 use_container_width=True
             )
 
-            st.metric(f"Totale {categoria}", f"€{df_cat['Costo_Totale'].sum():,.2f}")
+            st.metric(f"Totale {categoria}", formatta_euro(df_cat['Costo_Totale_Cent'].sum()))
 
     st.divider()
 
     # Fabbisogno per struttura
     st.subheader("Fabbisogno per Struttura")
 
-    fabbisogno_strutt = df_fabbisogno.groupby('Codice_Struttura')['Costo_Totale'].sum().reset_index()
-    fabbisogno_strutt.columns = ['Codice', 'Fabbisogno_EUR']
+    fabbisogno_strutt = df_fabbisogno.groupby('Codice_Struttura')['Costo_Totale_Cent'].sum().reset_index()
+    fabbisogno_strutt.columns = ['Codice', 'Fabbisogno_Cent']
+    fabbisogno_strutt['Fabbisogno_EUR'] = centesimi_a_euro(fabbisogno_strutt['Fabbisogno_Cent'])
 
     # Merge con info strutture
     df_merge = fabbisogno_strutt.merge(
         df_strutture[['Codice', 'Tipologia', 'Nome_Struttura', 'Comune', 'Provincia']],
         on='Codice',
         how='left'
-    ).sort_values('Fabbisogno_EUR', ascending=False)
+    ).sort_values('Fabbisogno_Cent', ascending=False)
 
     # Top 10 strutture
     st.subheader("Top 10 Strutture per Fabbisogno")
@@ -494,116 +523,570 @@ def pagina_fabbisogno_complessivo(df_fabbisogno, df_strutture):
     )
 
     # Totale generale
-    totale_generale = df_merge['Fabbisogno_EUR'].sum()
-    st.success(f"### 💰 FABBISOGNO TOTALE COMPLESSIVO: €{totale_generale:,.2f}")
+    totale_generale = df_merge['Fabbisogno_Cent'].sum()
+    st.success(f"### 💰 FABBISOGNO TOTALE COMPLESSIVO: {formatta_euro(totale_generale)}")
+
+    st.divider()
+
+    # Lotti di gara: stesso dispositivo su più strutture, per zona e finestra di consegna
+    st.subheader("📦 Lotti di Gara")
+    col1, col2 = st.columns(2)
+    with col1:
+        quantita_minima = st.number_input("Quantità minima per lotto di zona", min_value=1, value=3, step=1)
+    with col2:
+        valore_minimo = st.number_input("Valore minimo per lotto di zona (€)", min_value=0, value=20000, step=5000)
+
+    lotti, _ = costruisci_lotti(
+        arricchisci_strutture(df_fabbisogno, df_strutture), quantita_minima, int(euro_a_centesimi([valore_minimo])[0])
+    )
+    st.caption(f"{lotti['Codice_Dotazione'].nunique()} gare, {len(lotti)} lotti "
+               f"({int(lotti['Accorpato'].sum())} accorpati a livello regionale sotto soglia)")
+    st.dataframe(
+        colonne_euro(lotti, ['Valore_Cent'])[[
+            'Lotto', 'Descrizione', 'Finestra_Consegna', 'Zona_Lotto', 'Strutture', 'Quantita', 'Valore'
+        ]].style.format({'Valore': '€{:,.2f}'}),
+        hide_index=True,
+        use_container_width=True,
+        height=400
+    )
+    st.caption("💡 File Excel per gara (lotti e consegne per struttura): python lotti_gara.py")
+
+
+def _mostra_conformita(df_conformita, etichetta):
+    """Analisi conformità di un gruppo di standard: KPI, riepilogo per struttura e matrice struttura × dispositivo"""
+    if df_conformita.empty:
+        st.info(f"Nessuna struttura {etichetta} nel filtro selezionato")
+        return
+
+    riepilogo = riepilogo_conformita(df_conformita)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric(f"Strutture {etichetta}", len(riepilogo))
+    with col2:
+        st.metric("Strutture pienamente conformi", int((riepilogo['Conforme'] == riepilogo['Requisiti']).sum()))
+    with col3:
+        percentuale = (df_conformita['Stato_Conformita'] == 'Conforme').mean() * 100
+        st.metric("Requisiti soddisfatti", f"{percentuale:.1f}%")
+
+    st.dataframe(
+        riepilogo,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'Conformita_%': st.column_config.ProgressColumn('Conformità', format='%.1f%%', min_value=0, max_value=100)
+        }
+    )
+
+    # Matrice struttura × dispositivo
+    with st.expander("🧩 Matrice struttura × dispositivo", expanded=False):
+        matrice = df_conformita.pivot_table(
+            index='Nome_Struttura', columns='Dispositivo', values='Stato_Conformita', aggfunc='first'
+        ).replace(ICONE_CONFORMITA)
+        st.caption("✅ conforme · 💶 finanziato non ancora presente · ❌ mancante")
+        st.dataframe(matrice, use_container_width=True)
 
 
-def pagina_standard_conformita(df_strutture, df_catalogo, df_dotazioni, df_dotazioni_minime):
+def pagina_standard_conformita(df_strutture, df_dotazioni_minime, df_conformita):
     """Pagina Standard e Conformità - Verifica dotazioni minime"""
     st.header("⭐ Standard e Conformità DM 77/2022")
 
-    st.info("📋 Questa pagina mostra le **dotazioni minime obbligatorie** per CDC e ODC secondo le linee guida nazionali")
+    st.info("📋 Questa pagina confronta le dotazioni delle strutture con le **dotazioni minime obbligatorie** "
+            "per CDC e ODC secondo le linee guida nazionali")
+
+    # Conformità delle sole strutture filtrate (tabella calcolata una volta per versione dati)
+    df_conformita = df_conformita[df_conformita['Codice_Struttura'].isin(df_strutture['Codice'])]
+
+    # KPI complessivi
+    conteggi = df_conformita['Stato_Conformita'].value_counts()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("✅ Requisiti conformi", int(conteggi.get('Conforme', 0)))
+    with col2:
+        st.metric("💶 Finanziati non presenti", int(conteggi.get('Finanziato', 0)))
+    with col3:
+        st.metric("❌ Requisiti mancanti", int(conteggi.get('Mancante', 0)))
 
     # Tabs per CDC e ODC
-    tab_cdc, tab_odc, tab_comuni = st.tabs(["🏥 CDC - Case di Comunità", "🏥 ODC - Ospedali di Comunità", "🔧 Dotazioni Comuni"])
+    tab_cdc, tab_odc, tab_comuni, tab_zone = st.tabs([
+        "🏥 CDC - Case di Comunità", "🏥 ODC - Ospedali di Comunità", "🔧 Dotazioni Comuni", "📍 Per Zona"
+    ])
+
+    for tab, tipologia, titolo in [
+        (tab_cdc, 'CDC', "Dotazioni Minime per Case di Comunità (CDC)"),
+        (tab_odc, 'ODC', "Dotazioni Minime per Ospedali di Comunità (ODC)"),
+        (tab_comuni, 'COMUNE', "Dotazioni Comuni a CDC e ODC")
+    ]:
+        with tab:
+            st.subheader(titolo)
+
+            # Mostra tabella dotazioni minime
+            dotazioni_standard = df_dotazioni_minime[df_dotazioni_minime['Tipologia'] == tipologia]
+            st.markdown("### 📌 Dotazioni Obbligatorie")
+            st.dataframe(
+                dotazioni_standard[['Dispositivo', 'Quantita_Minima', 'Note']],
+                hide_index=True,
+                use_container_width=True
+            )
+
+            # Analisi conformità
+            st.markdown("### ✅ Analisi Conformità")
+            _mostra_conformita(df_conformita[df_conformita['Tipologia_Standard'] == tipologia], tipologia)
+
+    with tab_zone:
+        st.subheader("Conformità per Zona")
+        if df_conformita.empty:
+            st.info("Nessuna struttura nel filtro selezionato")
+        else:
+            riepilogo_zone = riepilogo_conformita(df_conformita, 'Zona')
+            fig_zone = px.bar(
+                riepilogo_zone,
+                x='Zona',
+                y=STATI_CONFORMITA,
+                title='Requisiti DM 77/2022 per Zona',
+                labels={'value': 'Requisiti', 'variable': 'Stato'},
+                color_discrete_map={'Conforme': '#2ca02c', 'Finanziato': '#ff7f0e', 'Mancante': '#d62728'}
+            )
+            st.plotly_chart(fig_zone, use_container_width=True)
+            st.dataframe(riepilogo_zone, hide_index=True, use_container_width=True)
+
+            # Cosa manca, per zona
+            mancanti = df_conformita[df_conformita['Stato_Conformita'] != 'Conforme']
+            st.markdown("### ❌ Dispositivi mancanti o non ancora presenti")
+            st.dataframe(
+                mancanti.groupby(['Zona', 'Dispositivo', 'Stato_Conformita']).size()
+                .reset_index(name='Strutture'),
+                hide_index=True,
+                use_container_width=True
+            )
+
+    # Sezione normativa
+    st.divider()
+    st.markdown("### 📜 Riferimenti Normativi")
+    st.markdown("""
+    Le dotazioni minime sono definite dal **DM 77/2022** - Decreto Ministeriale 23 maggio 2022, n. 77:
+    - **Regolamento recante la definizione di modelli e standard per lo sviluppo dell'assistenza territoriale**
+    - Pubblicato in G.U. Serie Generale n. 144 del 22-06-2022
+    - Allegati tecnici con specifiche dotazioni per CDC e ODC
+
+    🔗 [Maggiori informazioni sul sito del Ministero della Salute](https://www.salute.gov.it/)
+    """)
+
+
+def pagina_priorita_acquisti(df_fabbisogno, df_strutture, df_conformita, lordo):
+    """Pagina priorità di acquisto con budget limitato (PNRR, poi gap DM 77, poi altro)"""
+    st.header("🎯 Priorità Acquisti")
+    st.markdown("Selezione delle configurazioni **DA_ACQUISTARE** da finanziare entro il budget: "
+                "prima **PNRR** (scadenza marzo 2026), poi **gap DM 77**, poi il resto")
+
+    candidati = candidati_acquisto(arricchisci_strutture(df_fabbisogno, df_strutture), df_conformita)
+    if candidati.empty:
+        st.info("Nessuna configurazione da finanziare nel filtro selezionato")
+        return
+    totale = int(candidati['Costo_Cent'].sum())
+
+    col1, col2 = st.columns(2)
+    with col1:
+        budget_euro = st.number_input(
+            f"💶 Budget disponibile (€, {ETICHETTA_IMPORTI[lordo]})",
+            min_value=0,
+            value=int(centesimi_a_euro(totale) // 2 // 1000 * 1000),
+            step=10000
+        )
+    with col2:
+        quota_zona = st.slider(
+            "📍 Tetto per zona (% del budget)",
+            min_value=5, max_value=100, value=100, step=5,
+            help="100% = nessun tetto per zona"
+        )
+
+    piano, riepilogo = ottimizza_budget(
+        candidati, int(euro_a_centesimi([budget_euro])[0]), quota_zona=None if quota_zona == 100 else quota_zona
+    )
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Configurazioni finanziate", f"{riepilogo['Finanziati']} / {riepilogo['Candidati']}")
+    with col2:
+        st.metric("Spesa", formatta_euro(riepilogo['Spesa_Cent']))
+    with col3:
+        st.metric("Residuo", formatta_euro(riepilogo['Residuo_Cent']))
+    with col4:
+        st.metric("Prossimo intervento", formatta_euro(riepilogo['Prossimo_Costo_Cent']),
+                  help="Costo del candidato non finanziato più economico")
+
+    st.dataframe(
+        colonne_euro(riepilogo['Per_Classe'])[['Priorita', 'Candidati', 'Finanziati', 'Costo', 'Spesa']].style.format({
+            'Costo': '€{:,.2f}', 'Spesa': '€{:,.2f}'
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+
+    # Costo marginale: budget cumulato lungo la graduatoria
+    piano_euro = colonne_euro(piano)
+    fig_curva = px.line(
+        piano_euro,
+        x='Rango',
+        y='Budget_Cumulato',
+        color='Priorita',
+        category_orders={'Priorita': list(CLASSI_PRIORITA.values())},
+        title='Budget necessario lungo la graduatoria',
+        labels={'Rango': 'Posizione in graduatoria', 'Budget_Cumulato': 'Budget cumulato (€)'},
+        hover_data=['Nome_Struttura', 'Descrizione', 'Costo']
+    )
+    fig_curva.add_hline(y=budget_euro, line_dash='dash', annotation_text='Budget')
+    st.plotly_chart(fig_curva, use_container_width=True)
+
+    colonne = ['Rango', 'Priorita', 'Nome_Struttura', 'Zona', 'Descrizione', 'Quantita_Da_Acquistare', 'Costo']
+    formati = {'Costo': '€{:,.2f}', 'Budget_Aggiuntivo': '€{:,.2f}'}
+
+    st.subheader("✅ Interventi finanziati")
+    st.dataframe(
+        piano_euro.loc[piano_euro['Finanziato'], colonne].style.format(formati),
+        hide_index=True,
+        use_container_width=True,
+        height=350
+    )
+
+    st.subheader("⏳ Interventi non finanziati")
+    st.dataframe(
+        piano_euro.loc[~piano_euro['Finanziato'], colonne + ['Motivo_Esclusione', 'Budget_Aggiuntivo']]
+        .style.format(formati),
+        hide_index=True,
+        use_container_width=True,
+        height=350
+    )
+    st.caption("💡 Budget_Aggiuntivo: budget in più necessario per arrivare a quella posizione della graduatoria")
+
+
+@st.cache_data(ttl=600, show_spinner="Caricamento storico censimenti...")
+def carica_storico_censimenti():
+    """Archivio dei prospetti di censimento: solo variazioni, nessun prospetto riletto (cache: 10 minuti)"""
+    return carica_storico()
+
+
+@st.cache_data(ttl=600, show_spinner="Lettura prospetto...")
+def carica_prospetto(percorso, mtime_ns):
+    """Prospetto di censimento in forma lunga (cache per file e data di modifica)"""
+    return leggi_prospetto(percorso)
 
-    with tab_cdc:
-        st.subheader("Dotazioni Minime per Case di Comunità (CDC)")
 
-        # Filtra dotazioni minime CDC
-        dotazioni_cdc = df_dotazioni_minime[df_dotazioni_minime['Tipologia'] == 'CDC']
+def pagina_simulatore_prezzi(df_fabbisogno_tutto, df_strutture_tutte, df_strutture, df_catalogo, versione, lordo):
+    """Pagina simulatore what-if dei prezzi di catalogo (KPI aggiornati per differenza)"""
+    st.header("🧮 Simulatore Prezzi")
+    st.markdown(f"Modifica prezzi o sconti di catalogo e osserva l'effetto sui KPI (importi {ETICHETTA_IMPORTI[lordo]})")
 
-        # Mostra tabella dotazioni minime
-        st.markdown("### 📌 Dotazioni Obbligatorie")
+    # Base precalcolata una volta per versione dati; il filtro PNRR seleziona i gruppi
+    base = base_simulazione(df_fabbisogno_tutto, df_strutture_tutte, versione=versione)
+    base = base[base['PNRR'].isin(df_strutture['PNRR'].unique())].reset_index(drop=True)
+
+    # Prezzi e sconti dello scenario
+    st.subheader("✏️ Scenario")
+    df_prezzi = df_catalogo[['Codice', 'Descrizione', 'Costo_Unitario_EUR']].assign(
+        Nuovo_Prezzo_EUR=None, Sconto_Percentuale=None
+    )
+    df_prezzi['Nuovo_Prezzo_EUR'] = df_prezzi['Nuovo_Prezzo_EUR'].astype('float64')
+    df_prezzi['Sconto_Percentuale'] = df_prezzi['Sconto_Percentuale'].astype('float64')
+    df_modificato = st.data_editor(
+        df_prezzi,
+        hide_index=True,
+        use_container_width=True,
+        disabled=['Codice', 'Descrizione', 'Costo_Unitario_EUR'],
+        column_config={
+            'Costo_Unitario_EUR': st.column_config.NumberColumn('Prezzo catalogo (€)', format='€%.2f'),
+            'Nuovo_Prezzo_EUR': st.column_config.NumberColumn('Nuovo prezzo (€)', min_value=0.0, format='€%.2f'),
+            'Sconto_Percentuale': st.column_config.NumberColumn('Sconto %', min_value=0.0, max_value=100.0)
+        },
+        key='simulatore_prezzi'
+    )
+    prezzi = df_modificato.dropna(subset=['Nuovo_Prezzo_EUR']).set_index('Codice')['Nuovo_Prezzo_EUR']
+    sconti = df_modificato.dropna(subset=['Sconto_Percentuale']).set_index('Codice')['Sconto_Percentuale']
+    scenario = {'prezzi': prezzi.to_dict(), 'sconti': sconti.to_dict()}
+
+    inizio = time.perf_counter()
+    risultato = applica_scenario(base, scenario, lordo=lordo)
+    kpi = kpi_scenario(risultato)
+    durata = (time.perf_counter() - inizio) * 1000
+
+    # KPI con differenza rispetto al catalogo
+    st.subheader("📊 Effetto sui KPI")
+    etichette = {
+        'Totale': 'Fabbisogno Totale', 'Da_Finanziare': 'Da Finanziare',
+        'Gia_Finanziato': 'Già Finanziato', 'Presente': 'Valore Presente'
+    }
+    colonne = st.columns(len(etichette))
+    for colonna, (voce, etichetta) in zip(colonne, etichette.items()):
+        with colonna:
+            delta = int(kpi[f'Delta_{voce}_Cent'])
+            st.metric(
+                etichetta,
+                formatta_euro(kpi[f'Costo_{voce}_Cent']),
+                delta=formatta_euro(delta) if delta else None,
+                delta_color='inverse'
+            )
+    st.caption(f"⚡ Ricalcolo in {durata:.1f} ms su {len(base)} gruppi codice/PNRR/zona/tipologia")
+
+    if prezzi.empty and sconti.empty:
+        st.info("💡 Inserisci un nuovo prezzo o uno sconto % per uno o più codici")
+    else:
+        per_zona = kpi_scenario(risultato, 'Zona')
+        per_zona = per_zona[per_zona['Delta_Totale_Cent'] != 0].sort_values('Delta_Totale_Cent')
+        st.markdown("### 📍 Differenza per Zona")
         st.dataframe(
-            dotazioni_cdc[['Dispositivo', 'Quantita_Minima', 'Note']],
+            colonne_euro(per_zona, ['Costo_Totale_Cent', 'Delta_Totale_Cent', 'Delta_Da_Finanziare_Cent'])[
+                ['Zona', 'Costo_Totale', 'Delta_Totale', 'Delta_Da_Finanziare']
+            ].style.format({
+                'Costo_Totale': '€{:,.2f}', 'Delta_Totale': '€{:,.2f}', 'Delta_Da_Finanziare': '€{:,.2f}'
+            }),
             hide_index=True,
             use_container_width=True
         )
 
-        # Analisi conformità
-        st.markdown("### ✅ Analisi Conformità")
+        # Salvataggio scenario
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            nome = st.text_input("Nome scenario", placeholder="es. Gara regionale ATTR003 -15%")
+        with col2:
+            st.write("")
+            if st.button("💾 Salva scenario", use_container_width=True, disabled=not nome):
+                percorso = salva_scenario({'nome': nome, **scenario})
+                st.success(f"✅ Scenario salvato in {percorso}")
+
+    # Confronto affiancato degli scenari salvati
+    scenari_salvati = carica_scenari()
+    if scenari_salvati:
+        st.divider()
+        st.subheader("⚖️ Confronto Scenari")
+        selezionati = st.multiselect("Scenari salvati", list(scenari_salvati), default=list(scenari_salvati)[:3])
+        confronto = confronta_scenari(base, [scenari_salvati[nome] for nome in selezionati], lordo=lordo)
+        st.dataframe(
+            confronto.rename(index=etichette).map(formatta_euro),
+            use_container_width=True
+        )
 
-        # Conta quante strutture CDC hanno ogni dotazione
-        strutture_cdc = df_strutture[df_strutture['Tipologia'] == 'CdC']
-        n_cdc = len(strutture_cdc)
 
-        st.metric("Totale Case di Comunità", n_cdc)
+def pagina_qualita_dati(df_strutture_tutte, df_dotazioni_tutte, df_strutture, versione):
+    """Pagina regole di qualità dati (risultati in cache per versione dei dati)"""
+    st.header("🧪 Qualità Dati")
+    st.markdown("Controlli di coerenza su strutture e configurazioni dotazioni")
 
-        # Info box
-        st.info(f"📊 Ogni CDC deve avere **{len(dotazioni_cdc)}** dotazioni diagnostiche minime obbligatorie")
+    # Regole eseguite sui dati completi una volta per versione; il filtro PNRR agisce sul dettaglio
+    df_riepilogo, df_dettaglio = esegui_regole(df_strutture_tutte, df_dotazioni_tutte, versione=versione)
+    df_dettaglio = df_dettaglio[df_dettaglio['Codice_Struttura'].isin(df_strutture['Codice'])]
+    violazioni = df_dettaglio['Regola'].value_counts()
+    df_riepilogo = df_riepilogo.assign(
+        Violazioni=df_riepilogo['Regola'].map(violazioni).fillna(0).astype(int)
+    )
 
-    with tab_odc:
-        st.subheader("Dotazioni Minime per Ospedali di Comunità (ODC)")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Regole", len(df_riepilogo))
+    with col2:
+        st.metric("Violazioni (errori)", int((df_dettaglio['Gravita'] == 'errore').sum()))
+    with col3:
+        st.metric("Violazioni (avvisi)", int((df_dettaglio['Gravita'] == 'avviso').sum()))
+
+    st.subheader("📋 Riepilogo Regole")
+    st.dataframe(df_riepilogo, hide_index=True, use_container_width=True)
+
+    if df_dettaglio.empty:
+        st.success("✅ Nessuna violazione delle regole di qualità")
+        return
+
+    st.subheader("🔍 Dettaglio Violazioni")
+    regole_violate = df_riepilogo.loc[df_riepilogo['Violazioni'] > 0, 'Regola'].tolist()
+    regola = st.selectbox(
+        "Regola",
+        regole_violate,
+        format_func=lambda r: f"{r} - {df_riepilogo.set_index('Regola').at[r, 'Descrizione']}"
+    )
+    st.dataframe(df_dettaglio[df_dettaglio['Regola'] == regola], hide_index=True, use_container_width=True)
+    st.caption("💡 Report completo da riga di comando: python regole_qualita.py --csv violazioni_qualita.csv")
+
+
+def _mostra_andamento(df_catalogo, lordo):
+    """Andamento nel tempo dall'archivio delle variazioni (nessun prospetto riletto)"""
+    df_variazioni, df_acquisizioni = carica_storico_censimenti()
+    if df_acquisizioni.empty:
+        st.info("💡 Archivio vuoto: acquisire i prospetti con python storico_censimenti.py acquisisci")
+        return
 
-        # Filtra dotazioni minime ODC
-        dotazioni_odc = df_dotazioni_minime[df_dotazioni_minime['Tipologia'] == 'ODC']
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Prospetti acquisiti", len(df_acquisizioni))
+    with col2:
+        st.metric("Date", df_acquisizioni['Data'].nunique())
+    with col3:
+        st.metric("Variazioni registrate", len(df_variazioni))
+    with col4:
+        st.metric("Ultimo prospetto", f"{df_acquisizioni['Data'].max():%d/%m/%Y}")
 
-        # Mostra tabella dotazioni minime
-        st.markdown("### 📌 Dotazioni Obbligatorie")
+    col1, col2 = st.columns(2)
+    with col1:
+        stato = st.selectbox("Stato", STATI_CENSIMENTO, index=STATI_CENSIMENTO.index('DA_ACQUISTARE'))
+    with col2:
+        per = st.radio("Raggruppa per", ['Zona', 'Tipo', 'PNRR', 'Dispositivo'], horizontal=True)
+
+    df_andamento = colonne_euro(andamento(
+        df_variazioni, prezzi_catalogo(df_catalogo, lordo=lordo), stato=stato, per=per,
+        date=df_acquisizioni['Data']
+    ))
+
+    fig_valore = px.line(
+        df_andamento,
+        x='Data',
+        y='Valore',
+        color=per,
+        markers=True,
+        title=f'Valore {stato} per {per}',
+        labels={'Valore': 'Valore (€)'}
+    )
+    st.plotly_chart(fig_valore, use_container_width=True)
+
+    totale = df_andamento.groupby('Data', as_index=False)[['Quantita', 'Valore']].sum()
+    fig_quantita = px.bar(
+        df_andamento,
+        x='Data',
+        y='Quantita',
+        color=per,
+        title=f'Dispositivi {stato} per {per}',
+        labels={'Quantita': 'Dispositivi'}
+    )
+    st.plotly_chart(fig_quantita, use_container_width=True)
+
+    # Tabella gruppo × data con la differenza rispetto al prospetto precedente
+    st.subheader("📋 Valore per data")
+    tabella = df_andamento.pivot_table(index=per, columns='Data', values='Valore', aggfunc='sum')
+    tabella.columns = [f"{data:%d/%m/%Y}" for data in tabella.columns]
+    if len(tabella.columns) > 1:
+        tabella['Differenza'] = tabella.iloc[:, -1] - tabella.iloc[:, -2]
+    st.dataframe(tabella.style.format('€{:,.2f}'), use_container_width=True)
+    st.caption(f"Totale all'ultima data: {int(totale['Quantita'].iloc[-1])} dispositivi, "
+               f"€{totale['Valore'].iloc[-1]:,.2f}")
+
+    with st.expander("🔍 Variazioni registrate per data", expanded=False):
+        data = st.selectbox(
+            "Data", sorted(df_variazioni['Data'].unique(), reverse=True), format_func=lambda d: f"{d:%d/%m/%Y}"
+        )
         st.dataframe(
-            dotazioni_odc[['Dispositivo', 'Quantita_Minima', 'Note']],
+            df_variazioni[df_variazioni['Data'] == data].drop(columns=['Chiave_Struttura']),
             hide_index=True,
             use_container_width=True
         )
 
-        # Analisi conformità
-        st.markdown("### ✅ Analisi Conformità")
-
-        # Conta quante strutture ODC ci sono
-        strutture_odc = df_strutture[df_strutture['Tipologia'] == 'OdC']
-        n_odc = len(strutture_odc)
+    with st.expander("🗂️ Prospetti acquisiti", expanded=False):
+        st.dataframe(df_acquisizioni.drop(columns=['Hash']), hide_index=True, use_container_width=True)
 
-        st.metric("Totale Ospedali di Comunità", n_odc)
 
-        # Info box
-        st.info(f"📊 Ogni ODC deve avere **{len(dotazioni_odc)}** dotazioni diagnostiche minime obbligatorie")
+def _mostra_confronto(df_catalogo, lordo):
+    """Changeset tra due prospetti dello stesso tipo (stati, strutture nuove/rimosse, indirizzi)"""
+    prospetti = {}
+    for percorso in sorted(Path('.').glob(MODELLO_PROSPETTI), key=data_prospetto):
+        prospetti.setdefault(percorso.name.split('_', 1)[0].upper(), []).append(percorso)
+    prospetti = {tipo: percorsi for tipo, percorsi in prospetti.items() if len(percorsi) >= 2}
+    if not prospetti:
+        st.info(f"💡 Servono almeno due prospetti dello stesso tipo nella cartella ({MODELLO_PROSPETTI})")
+        return
 
-    with tab_comuni:
-        st.subheader("Dotazioni Comuni a CDC e ODC")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        tipo = st.selectbox("Tipo prospetto", list(prospetti))
+    percorsi = prospetti[tipo]
+    with col2:
+        prima = st.selectbox("Prospetto di partenza", percorsi, index=len(percorsi) - 2,
+                             format_func=lambda p: f"{data_prospetto(p):%d/%m/%Y}", key=f"confronto_prima_{tipo}")
+    with col3:
+        dopo = st.selectbox("Prospetto di arrivo", percorsi, index=len(percorsi) - 1,
+                            format_func=lambda p: f"{data_prospetto(p):%d/%m/%Y}", key=f"confronto_dopo_{tipo}")
 
-        # Filtra dotazioni comuni
-        dotazioni_comuni = df_dotazioni_minime[df_dotazioni_minime['Tipologia'] == 'COMUNE']
+    changeset = confronta_prospetti(
+        carica_prospetto(str(prima), prima.stat().st_mtime_ns),
+        carica_prospetto(str(dopo), dopo.stat().st_mtime_ns),
+        prezzi_catalogo(df_catalogo, lordo=lordo)
+    )
+    if changeset.empty:
+        st.success("✅ Nessuna differenza tra i due prospetti")
+        return
 
-        # Mostra tabella dotazioni comuni
-        st.markdown("### 📌 Attrezzature Sanitarie Standard")
+    conteggi = changeset['Tipo_Variazione'].value_counts()
+    colonne = st.columns(len(TIPI_VARIAZIONE) + 1)
+    for colonna, tipo_variazione in zip(colonne, TIPI_VARIAZIONE):
+        with colonna:
+            st.metric(tipo_variazione, int(conteggi.get(tipo_variazione, 0)))
+    with colonne[-1]:
+        st.metric("Impatto DA_ACQUISTARE", formatta_euro(changeset['Impatto_Cent'].sum()),
+                  help="Variazione del valore da finanziare ai prezzi di catalogo correnti")
+
+    transizioni = riepilogo_transizioni(changeset)
+    if not transizioni.empty:
+        st.subheader("🔀 Transizioni di stato")
         st.dataframe(
-            dotazioni_comuni[['Dispositivo', 'Quantita_Minima', 'Note']],
+            colonne_euro(transizioni).drop(columns=['Impatto_Cent'])
+            .style.format({'Impatto': '€{:,.2f}'}),
             hide_index=True,
             use_container_width=True
         )
 
-        st.info(f"🔧 Sia CDC che ODC devono avere **{len(dotazioni_comuni)}** attrezzature sanitarie standard")
+    st.subheader("📋 Changeset")
+    tipi = st.multiselect("Tipi di variazione", list(conteggi.index), default=list(conteggi.index))
+    st.dataframe(
+        colonne_euro(changeset[changeset['Tipo_Variazione'].isin(tipi)]).drop(columns=['Impatto_Cent'])
+        .style.format({'Impatto': '€{:,.2f}'}),
+        hide_index=True,
+        use_container_width=True,
+        height=400
+    )
+    st.caption("💡 Da riga di comando: python confronto_censimenti.py PRIMA DOPO --csv modifiche.csv")
 
-    # Sezione normativa
-    st.divider()
-    st.markdown("### 📜 Riferimenti Normativi")
-    st.markdown("""
-    Le dotazioni minime sono definite dal **DM 77/2022** - Decreto Ministeriale 23 maggio 2022, n. 77:
-    - **Regolamento recante la definizione di modelli e standard per lo sviluppo dell'assistenza territoriale**
-    - Pubblicato in G.U. Serie Generale n. 144 del 22-06-2022
-    - Allegati tecnici con specifiche dotazioni per CDC e ODC
 
-    🔗 [Maggiori informazioni sul sito del Ministero della Salute](https://www.salute.gov.it/)
-    """)
+def pagina_storico_censimenti(df_catalogo, lordo):
+    """Pagina storico dei prospetti di censimento CDC/ODC: andamento e confronto tra date"""
+    st.header("📈 Storico Censimenti")
+    st.markdown(f"Evoluzione dei prospetti di censimento datati, valorizzata ai prezzi di catalogo "
+                f"correnti (importi {ETICHETTA_IMPORTI[lordo]})")
+
+    tab_andamento, tab_confronto = st.tabs(["📈 Andamento", "🔀 Confronto tra date"])
+    with tab_andamento:
+        _mostra_andamento(df_catalogo, lordo)
+    with tab_confronto:
+        _mostra_confronto(df_catalogo, lordo)
+
+
+def mostra_profilo(profilo):
+    """Tempi del rerun nella sidebar (profilo attivo con ?profilo=1 o DASHBOARD_PROFILO=1)"""
+    with st.sidebar.expander(f"⏱️ Profilo rerun: {profilo['Secondi'] * 1000:,.0f} ms", expanded=False):
+        st.caption("ms_propri: tempo della fase esclusi grafici, tabelle e fasi annidate "
+                   "(per una pagina: filtri, groupby e costruzione dei grafici)")
+        # Il modulo streamlit diretto: la tabella del profilo non entra nel profilo
+        streamlit.dataframe(tabella_profilo(profilo), hide_index=True, use_container_width=True)
+        if profilo.get('File_Cprofile'):
+            st.caption(f"cProfile: {profilo['File_Cprofile']}")
+        elif profilo['Modalita'] == 'cprofile':
+            st.caption("cProfile non disponibile: un altro profilatore è attivo nel processo")
 
 
 def main():
     """Funzione principale"""
 
+    # Profilo dei tempi del rerun (solo con ?profilo=1 o DASHBOARD_PROFILO=1)
+    profilo = avvia_profilo(modalita_profilo(st.query_params.get(PARAMETRO_QUERY)))
+
     # Titolo
     st.title("🏥 Dashboard Telemedicina")
     st.subheader("Dotazioni Tecnologiche - USL Toscana Nord Ovest")
 
     # Carica dati
-    with st.spinner("Caricamento dati in corso..."):
-        df_strutture_orig, df_catalogo, df_dotazioni_orig, df_dotazioni_minime = carica_dati()
+    with st.spinner("Caricamento dati in corso..."), cronometra('carica_dati'):
+        (df_strutture_orig, df_catalogo, df_dotazioni_orig, df_dotazioni_minime,
+         df_fabbisogno_orig, df_errori_schema, versione_dati_caricati, df_orfani) = carica_dati()
 
     # Sidebar navigazione
     st.sidebar.title("Navigazione")
     pagina = st.sidebar.radio(
         "Seleziona una vista",
-        ["Riepilogo Generale", "Elenco Strutture", "Dettaglio Dotazioni Struttura", "Fabbisogno Complessivo", "⭐ Standard e Conformità"]
+        ["Riepilogo Generale", "Elenco Strutture", "Dettaglio Dotazioni Struttura", "Fabbisogno Complessivo",
+         "⭐ Standard e Conformità", "🎯 Priorità Acquisti", "🧮 Simulatore Prezzi", "📈 Storico Censimenti",
+         "🧪 Qualità Dati"]
     )
 
     st.sidebar.divider()
@@ -617,23 +1100,39 @@ def main():
         help="Filtra per interventi PNRR (scadenza marzo 2026) o non-PNRR"
     )
 
+    # Selettore importi netti/lordi
+    importi_lordi = st.sidebar.toggle(
+        "💶 Importi IVA inclusa",
+        value=False,
+        help="Mostra KPI, grafici e tabelle con IVA inclusa (aliquota da catalogo)"
+    )
+
     # Applica filtro PNRR
-    if filtro_pnrr == "Solo PNRR":
-        df_strutture = df_strutture_orig[df_strutture_orig['PNRR'] == 'SI'].copy()
-        codici_strutture = df_strutture['Codice'].unique()
-        df_dotazioni = df_dotazioni_orig[df_dotazioni_orig['Codice_Struttura'].isin(codici_strutture)].copy()
-        st.sidebar.info("🎯 Visualizzando solo interventi **PNRR** (scadenza marzo 2026)")
-    elif filtro_pnrr == "Solo non-PNRR":
-        df_strutture = df_strutture_orig[df_strutture_orig['PNRR'] == 'NO'].copy()
-        codici_strutture = df_strutture['Codice'].unique()
-        df_dotazioni = df_dotazioni_orig[df_dotazioni_orig['Codice_Struttura'].isin(codici_strutture)].copy()
-        st.sidebar.info("📍 Visualizzando solo interventi **non-PNRR**")
-    else:
-        df_strutture = df_strutture_orig.copy()
-        df_dotazioni = df_dotazioni_orig.copy()
+    with cronometra('filtro PNRR'):
+        if filtro_pnrr == "Solo PNRR":
+            df_strutture = df_strutture_orig[df_strutture_orig['PNRR'] == 'SI'].copy()
+            codici_strutture = df_strutture['Codice'].unique()
+            df_dotazioni = df_dotazioni_orig[df_dotazioni_orig['Codice_Struttura'].isin(codici_strutture)].copy()
+            st.sidebar.info("🎯 Visualizzando solo interventi **PNRR** (scadenza marzo 2026)")
+        elif filtro_pnrr == "Solo non-PNRR":
+            df_strutture = df_strutture_orig[df_strutture_orig['PNRR'] == 'NO'].copy()
+            codici_strutture = df_strutture['Codice'].unique()
+            df_dotazioni = df_dotazioni_orig[df_dotazioni_orig['Codice_Struttura'].isin(codici_strutture)].copy()
+            st.sidebar.info("📍 Visualizzando solo interventi **non-PNRR**")
+        else:
+            df_strutture = df_strutture_orig.copy()
+            df_dotazioni = df_dotazioni_orig.copy()
 
-    # Calcola fabbisogno con dati filtrati
-    df_fabbisogno = calcola_fabbisogno(df_dotazioni, df_catalogo)
+    # Fabbisogno delle sole strutture filtrate, nella vista netto/lordo scelta
+    with cronometra('filtro fabbisogno e seleziona_importi'):
+        if filtro_pnrr == "TUTTI":
+            df_fabbisogno = df_fabbisogno_orig
+        else:
+            df_fabbisogno = df_fabbisogno_orig[
+                df_fabbisogno_orig['Codice_Struttura'].isin(df_strutture['Codice'])
+            ].reset_index(drop=True)
+        df_fabbisogno = seleziona_importi(df_fabbisogno, lordo=importi_lordi)
+    st.sidebar.caption(f"Importi {ETICHETTA_IMPORTI[importi_lordi]}")
 
     st.sidebar.divider()
 
@@ -652,6 +1151,27 @@ def main():
     st.sidebar.metric("Dotazioni Catalogo", len(df_catalogo))
     st.sidebar.metric("Configurazioni", len(df_dotazioni))
 
+    # Qualità dati: errori di schema sui file caricati
+    if df_errori_schema.empty:
+        st.sidebar.success("✅ Dati conformi allo schema")
+    else:
+        st.sidebar.warning(f"⚠️ {len(df_errori_schema)} errori di schema nei dati")
+        with st.sidebar.expander("Dettaglio errori", expanded=False):
+            st.dataframe(df_errori_schema, hide_index=True, use_container_width=True)
+
+    # Integrità referenziale: configurazioni senza struttura o codice catalogo (costo nullo)
+    if df_orfani.empty:
+        st.sidebar.success("🔗 Nessun riferimento orfano")
+    else:
+        st.sidebar.warning(f"🔗 {len(df_orfani)} riferimenti orfani (costo non calcolato)")
+        with st.sidebar.expander("Dettaglio orfani", expanded=False):
+            riepilogo_orfani = (
+                df_orfani.groupby(['Colonna', 'Valore', 'Riferimento']).size()
+                .reset_index(name='Righe')
+            )
+            st.dataframe(riepilogo_orfani, hide_index=True, use_container_width=True)
+    st.sidebar.caption(f"Versione dati: {versione_dati_caricati}")
+
     st.sidebar.divider()
 
     # Popup dotazioni minime
@@ -696,16 +1216,38 @@ def main():
         """)
 
     # Routing pagine
-    if pagina == "Riepilogo Generale":
-        pagina_riepilogo_generale(df_strutture, df_catalogo, df_dotazioni, df_fabbisogno)
-    elif pagina == "Elenco Strutture":
-        pagina_strutture(df_strutture, df_fabbisogno)
-    elif pagina == "Dettaglio Dotazioni Struttura":
-        pagina_dotazioni_struttura(df_strutture, df_catalogo, df_fabbisogno)
-    elif pagina == "Fabbisogno Complessivo":
-        pagina_fabbisogno_complessivo(df_fabbisogno, df_strutture)
-    elif pagina == "⭐ Standard e Conformità":
-        pagina_standard_conformita(df_strutture, df_catalogo, df_dotazioni, df_dotazioni_minime)
+    with cronometra(f"pagina: {pagina}"):
+        if pagina == "Riepilogo Generale":
+            pagina_riepilogo_generale(df_strutture, df_catalogo, df_dotazioni, df_fabbisogno)
+        elif pagina == "Elenco Strutture":
+            pagina_strutture(df_strutture, df_fabbisogno)
+        elif pagina == "Dettaglio Dotazioni Struttura":
+            pagina_dotazioni_struttura(df_strutture, df_catalogo, df_fabbisogno)
+        elif pagina == "Fabbisogno Complessivo":
+            pagina_fabbisogno_complessivo(df_fabbisogno, df_strutture)
+        elif pagina == "⭐ Standard e Conformità":
+            with cronometra('calcola_conformita'):
+                df_conformita = calcola_conformita(
+                    df_strutture_orig, df_dotazioni_orig, df_dotazioni_minime, versione=versione_dati_caricati
+                )
+            pagina_standard_conformita(df_strutture, df_dotazioni_minime, df_conformita)
+        elif pagina == "🎯 Priorità Acquisti":
+            with cronometra('calcola_conformita'):
+                df_conformita = calcola_conformita(
+                    df_strutture_orig, df_dotazioni_orig, df_dotazioni_minime, versione=versione_dati_caricati
+                )
+            pagina_priorita_acquisti(df_fabbisogno, df_strutture, df_conformita, importi_lordi)
+        elif pagina == "🧮 Simulatore Prezzi":
+            pagina_simulatore_prezzi(
+                df_fabbisogno_orig, df_strutture_orig, df_strutture, df_catalogo, versione_dati_caricati, importi_lordi
+            )
+        elif pagina == "📈 Storico Censimenti":
+            pagina_storico_censimenti(df_catalogo, importi_lordi)
+        elif pagina == "🧪 Qualità Dati":
+            pagina_qualita_dati(df_strutture_orig, df_dotazioni_orig, df_strutture, versione_dati_caricati)
+
+    if profilo:
+        mostra_profilo(termina_profilo(profilo, etichetta=pagina))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+Generatore di dati sintetici per prove di carico e di scala.
+
+Produce in una cartella separata gli stessi file che gli script leggono dalla
+cartella di lavoro, con N volte le strutture reali (--scala):
+
+    strutture_sanitarie.csv, dotazioni_strutture_telemedicina.csv   anagrafica e configurazioni
+    dotazioni_telemedicina_catalogo.csv, dotazioni_minime_standard.csv   copiati dai file reali
+    CDC_CE_1_claude.csv, ODC_CE_1_claude.csv         censimenti (layout 'Zona;Denominazione;...')
+    *_prospetto al DD-MM-YY.CSV                      prospetti datati per storico_censimenti.py
+    Stima arredi PNRR.xlsx - CdC.csv / - OdC.csv     fogli per importa_arredi_pnrr.py
+    tecnologie_cdc_dettaglio.csv, tecnologie_odc_dettaglio.csv
+
+Le distribuzioni (zone e comuni, quota PNRR, Hub/Spoke, posti letto, stati di
+ogni dispositivo, attrezzature e arredi con quantità e costi) sono stimate dai
+file reali; strutture e configurazioni sono coerenti con i censimenti: eseguendo
+integra_anagrafiche_v3.py nella cartella generata si ottengono le stesse
+configurazioni. I nomi delle strutture hanno un progressivo ('CdC Aulla-017') così
+che il riconoscimento per nome degli script trovi sempre la struttura giusta.
+
+Le strutture sono generate e scritte a blocchi (BLOCCO), ciascuno con un
+generatore casuale derivato da (seme, tipo, blocco): a parità di seme e scala i
+file sono identici byte per byte e la memoria non cresce con il numero di righe.
+In memoria restano solo le quantità di arredi e attrezzature delle strutture PNRR,
+necessarie ai fogli Stima arredi (una colonna per struttura).
+
+Nella cartella c'è anche dati_sintetici.json con seme, scala, versione dei dati
+reali usati come profilo e righe di ogni file.
+
+Utilizzo:
+    python genera_dati_sintetici.py                          # scala 1, seme 42
+    python genera_dati_sintetici.py --scala 100 --cartella dati_sintetici_x100
+    python genera_dati_sintetici.py --scala 1000 --seme 7 --prospetti 4
+"""
+
+import argparse
+import csv
+import json
+import re
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from integrita_referenziale import versione_dati
+from motore_fabbisogno import FILE_CATALOGO, FILE_DOTAZIONI, FILE_DOTAZIONI_MINIME, FILE_STRUTTURE, formatta_euro
+from normalizza_numeri import converti_quantita, converti_valuta
+
+SEME_PREDEFINITO = 42
+
+# Strutture generate e scritte per blocco
+BLOCCO = 5000
+
+FILE_MANIFEST = 'dati_sintetici.json'
+
+FILE_CENSIMENTO = {'CDC': 'CDC_CE_1_claude.csv', 'ODC': 'ODC_CE_1_claude.csv'}
+FILE_STIMA_ARREDI = {'CDC': 'Stima arredi PNRR.xlsx - CdC.csv', 'ODC': 'Stima arredi PNRR.xlsx - OdC.csv'}
+FILE_TECNOLOGIE = {'CDC': 'tecnologie_cdc_dettaglio.csv', 'ODC': 'tecnologie_odc_dettaglio.csv'}
+MODELLO_PROSPETTO = '{tipo}_censimento tecnologie_sanitarie_TELEMEDICINA_prospetto al {data}.CSV'
+
+DATA_PRIMO_PROSPETTO = datetime(2026, 1, 19)
+GIORNI_TRA_PROSPETTI = 7
+
+# Intestazioni dei censimenti (come nei file reali); colonna → codice catalogo
+INTESTAZIONE_CDC = [
+    'Zona', 'Denominazione', 'Tipologia', 'PNRR', 'indirizzo', 'ECG',
+    'ECG - INSERIRE SE PRESENTE IL NUMERO DI INVENTARIO ',
+    'Holter cardiaco - NB: FORNITI PNRR ALLE ZONE PER COT N. 14 STAZIONI SCARICO E N. 23 HOLTER',
+    'Spirometro - NB: FORNITI PNRR ALLE ZONE PER COT n. 34 SPIROMETRI con licenza di rete',
+    'SPIROMETRO - INSERIRE SE PRESENTE IL NUMERO DI INVENTARIO ',
+    'Ecografo portatile - NB: FORNITI PNRR ALLE ZONE PER COT n. 35 ECOGRAFI con DUE SONDE',
+    'ECOGRAFO - INSERIRE SE PRESENTE IL NUMERO DI INVENTARIO ',
+    'Monitor multiparametrico NB: FORNITI PNRR ALLE ZONE PER COT n. 34 MON '
+]
+INTESTAZIONE_ODC = [
+    'Zona', 'STRUTTURA', 'POSTI LETTO', 'SETTING', 'PNRR', 'DATA FINE LAVORI', 'apparecchio radiologico',
+    'ECOGRAFO', 'ECOGRAFO - INSERIRE SE PRESENTE IL NUMERO DI INVENTARIO ', 'carrello emergenza',
+    'defibrillatore', 'SPIROMETRO', 'SPIROMETRO - INSERIRE SE PRESENTE IL NUMERO DI INVENTARIO ',
+    'emogasanalizzatore', 'POC', 'ECG portatile', 'ECG - INSERIRE SE PRESENTE IL NUMERO DI INVENTARIO ',
+    'telemedicina (STANZA)'
+]
+INTESTAZIONI = {'CDC': INTESTAZIONE_CDC, 'ODC': INTESTAZIONE_ODC}
+
+COLONNE_DISPOSITIVI = {
+    'CDC': {5: 'DIAG001', 7: 'DIAG002', 8: 'DIAG003', 10: 'DIAG004', 12: 'DIAG005'},
+    'ODC': {6: 'DIAG007', 7: 'DIAG013', 9: 'DIAG010', 10: 'DIAG006', 11: 'DIAG012',
+            13: 'DIAG008', 14: 'DIAG009', 15: 'DIAG011', 17: 'DIAG014'}
+}
+# Colonna del dispositivo → colonna del numero di inventario
+COLONNE_INVENTARIO = {'CDC': {5: 6, 8: 9, 10: 11}, 'ODC': {7: 8, 11: 12, 15: 16}}
+
+# Righe prima dell'intestazione: ODC_CE_1_claude.csv ne salta esattamente 10
+_ISTRUZIONI = (
+    "PRESENTE se già individuato presso la struttura/zona\n"
+    "FINANZIATO se previsto dal RUP nel progetto PNRR oppure se già ordinato\n"
+    "DA ACQUISTARE se non presente e non ancora finanziato\n"
+    "NON RICHIESTO ove al momento non occorresse presso la specifica struttura"
+)
+_CASELLE_GIALLE = ("Nelle caselle in giallo, per ELETTROCARDIOGRAFI, SPIROMETRI ed ECOGRAFI ove indicato "
+                   "PRESENTE occorre inserire il relativo numero di inventario")
+PREAMBOLO = {
+    'CDC': [[''], [f"{_CASELLE_GIALLE}\n\n{_ISTRUZIONI}"]],
+    'ODC': [[f"Compilare riportando nelle caselle vuote una delle seguenti diciture:\n\n{_ISTRUZIONI}\n\n"
+             f"{_CASELLE_GIALLE}\n"], ['']]
+}
+
+# Stati (nomi di storico_censimenti) e testo della cella nel censimento
+STATI = ['PRESENTE', 'FINANZIATO', 'DA_ACQUISTARE', 'NON_RICHIESTO', 'NON_COMPILATO']
+TESTO_STATO = np.array(['PRESENTE', 'FINANZIATO', 'DA ACQUISTARE', 'NON RICHIESTO', ''], dtype=object)
+# Varianti di compilazione che gli script riconoscono comunque
+VARIANTI_STATO = {0: ['presente', '**PRESENTE', 'PRESENTE '], 2: ['Da acquistare', 'DA ACQUISTARE ']}
+QUOTA_VARIANTI = 0.03
+# Configurazione generata da integra_anagrafiche_v3 per stato: presente, richiesta, note
+CONFIGURAZIONE_STATO = {
+    0: (1, 1, 'Già presente'),
+    1: (0, 1, 'Già finanziato/ordinato'),
+    2: (0, 1, 'Da finanziare')
+}
+# Prospetti precedenti: probabilità che lo stato fosse quello "indietro" (PRESENTE ← FINANZIATO ← DA ACQUISTARE)
+REGRESSIONE_STATO = {0: (1, 0.10), 1: (2, 0.20)}
+
+# Attrezzature dei fogli Stima arredi riconosciute da integra_anagrafiche_v3 (nome → codice)
+CODICI_TECNOLOGIE = {
+    'CDC': {
+        'LETTINO VISITA ELETTRICO': 'ATTR001',
+        'Lettino visita di tipo ginecologico (FAVERO)': 'ATTR002',
+        'DAE+ ASPIRATORE PER CARRELLO EMERGENZA': 'ATTR004',
+        'LAMPADA VISITA SU STATIVO': 'ATTR005',
+        'FRIGORIFERO': 'ATTR006'
+    },
+    'ODC': {
+        'Letto elettrico degenza (LINET)': 'ATTR003',
+        'FRIGORIFERO': 'ATTR006',
+        'DAE+ ASPIRATORE PER CARRELLO EMERGENZA': 'ATTR004',
+        'Lavapadelle (ARJO)': 'ATTR007',
+        'Vuotatoio (ARJO)': 'ATTR008',
+        'Sollevatore (ARJO)': 'ATTR009'
+    }
+}
+
+ETICHETTA_TIPO = {'CDC': 'CdC', 'ODC': 'OdC'}
+TITOLO_STIMA_ARREDI = {'CDC': 'Stima arredi PNRR Case di Comunità', 'ODC': 'Stima arredi PNRR Ospedali di Comunità'}
+PREFISSO_ODC = {False: "OSPEDALE DI COMUNITA' DI ", True: 'CURE INTERMEDIE '}
+
+VIE = ['Via', 'Viale', 'Piazza', 'P.zza']
+NOMI_VIE = ['Roma', 'Garibaldi', 'Mazzini', 'XX Settembre', 'Matteotti', 'Dante', 'Marconi', 'della Repubblica',
+            'Gramsci', 'dei Mille', 'Cavour', 'Vittorio Veneto', 'San Francesco', 'Aurelia', 'del Popolo']
+PROVINCE = ['MS', 'LU', 'PI', 'LI']
+
+COLONNE_STRUTTURE = ['Tipologia', 'Codice', 'Nome_Struttura', 'Zona', 'Classificazione', 'Comune', 'Provincia',
+                     'Indirizzo', 'CAP', 'PNRR', 'Posti_Letto']
+COLONNE_DOTAZIONI = ['Codice_Struttura', 'Codice_Dotazione', 'Quantita_Presente', 'Quantita_Richiesta',
+                     'Stato_Finanziamento', 'Note']
+COLONNE_TECNOLOGIE = ['Tipologia', 'Tecnologia', 'Locale', 'Struttura', 'Quantita', 'Costo_Unitario_EUR',
+                      'Importo_Totale_EUR']
+
+
+def _campione(valori, predefinito):
+    valori = np.asarray([int(v) for v in valori if v > 0])
+    return valori if len(valori) else np.asarray([predefinito])
+
+
+def _comune(testo):
+    """Comune in forma pulita ('SAN ROMANO IN GARFAGNANA (LU)' → 'San Romano In Garfagnana')"""
+    return re.sub(r"[^\w' ]+", ' ', testo.split('(')[0]).strip().title()
+
+
+def _voci_stima_arredi(percorso):
+    """Arredi di un foglio Stima arredi reale: locale, voce, costo (cent), probabilità e quantità osservate"""
+    df = pd.read_csv(percorso, header=None)
+    inizio = next(i for i, v in df[1].items() if 'Tipologia Attrezzatura' in str(v))
+    arredi = df.iloc[7:inizio]
+    arredi = arredi[arredi[1].notna() & (arredi[1].astype(str).str.strip() != '')]
+    costi, _ = converti_valuta(arredi[2])
+    quantita = pd.concat([converti_quantita(arredi[c])[0] for c in range(3, df.shape[1], 2)], axis=1).fillna(0)
+    presenti = quantita.to_numpy() > 0
+    return {
+        'Locale': arredi[0].fillna('').astype(str).str.strip().tolist(),
+        'Voce': arredi[1].astype(str).str.strip().tolist(),
+        'Costo_Cent': (costi.fillna(0) * 100).round().astype(np.int64).to_numpy(),
+        'Probabilita': presenti.mean(axis=1) if presenti.size else np.zeros(len(arredi)),
+        'Quantita': _campione(quantita.to_numpy()[presenti], 1)
+    }
+
+
+def profilo_dati():
+    """
+    Distribuzioni stimate dai file reali della cartella corrente, per tipo di
+    censimento (CDC = CdC, ODC = OdC e Cure Intermedie).
+    """
+    strutture = pd.read_csv(FILE_STRUTTURE)
+    dotazioni = pd.read_csv(FILE_DOTAZIONI).merge(
+        strutture[['Codice', 'Tipologia', 'PNRR']], left_on='Codice_Struttura', right_on='Codice'
+    )
+    strutture['Tipo'] = np.where(strutture['Tipologia'] == 'CdC', 'CDC', 'ODC')
+    dotazioni['Tipo'] = np.where(dotazioni['Tipologia'] == 'CdC', 'CDC', 'ODC')
+
+    profilo = {}
+    for tipo, reali in strutture.groupby('Tipo'):
+        reali = reali.assign(Zona=reali['Zona'].fillna('N/D'))
+        zone = reali['Zona'].value_counts(normalize=True).sort_index()
+        comuni = {
+            zona: sorted(set(_comune(c) for c in gruppo['Comune'].dropna().astype(str) if _comune(c)) or {_comune(zona)})
+            for zona, gruppo in reali.groupby('Zona')
+        }
+        pnrr = reali['PNRR'] == 'SI'
+
+        # Stati dei dispositivi del censimento; le strutture senza riga restano non compilate
+        stati = {}
+        configurazioni = dotazioni[dotazioni['Tipo'] == tipo]
+        for codice in COLONNE_DISPOSITIVI[tipo].values():
+            conteggi = configurazioni.loc[configurazioni['Codice_Dotazione'] == codice, 'Stato_Finanziamento'].value_counts()
+            p = np.array([conteggi.get(s, 0) for s in STATI[:4]], dtype=float) / len(reali)
+            p = np.append(p, max(1 - p.sum(), 0.0))
+            stati[codice] = p / p.sum()
+
+        # Attrezzature delle strutture PNRR (da tecnologie_*_dettaglio.csv)
+        tecnologie = pd.read_csv(FILE_TECNOLOGIE[tipo])
+        tecnologie = tecnologie[tecnologie['Quantita'] > 0]
+        n_pnrr = max(int(pnrr.sum()), tecnologie['Struttura'].nunique(), 1)
+        voci = tecnologie.groupby(['Tecnologia', 'Locale'], dropna=False, sort=True)
+        attrezzature = [{
+            'Tecnologia': nome,
+            'Locale': '' if pd.isna(locale) else locale,
+            'Costo_Cent': int(round(gruppo['Costo_Unitario_EUR'].iloc[0] * 100)),
+            'Probabilita': min(gruppo['Struttura'].nunique() / n_pnrr, 1.0),
+            'Quantita': _campione(gruppo['Quantita'], 1)
+        } for (nome, locale), gruppo in voci]
+
+        profilo[tipo] = {
+            'Strutture': len(reali),
+            'Zone': zone.index.tolist(),
+            'Probabilita_Zone': zone.to_numpy(),
+            'Comuni': comuni,
+            'Quota_PNRR': float(pnrr.mean()),
+            'Quota_Hub': float((reali['Classificazione'] == 'Hub').mean()),
+            'Quota_Cure_Intermedie': float((reali['Tipologia'] == 'Cure Intermedie').mean()),
+            'Posti_Letto': _campione(pd.to_numeric(reali['Posti_Letto'], errors='coerce').dropna(), 20),
+            'Stati': stati,
+            'Attrezzature': attrezzature,
+            'Arredi': _voci_stima_arredi(FILE_STIMA_ARREDI[tipo])
+        }
+    return profilo
+
+
+def file_profilo():
+    """File reali da cui è stimato il profilo"""
+    return [FILE_STRUTTURE, FILE_DOTAZIONI, *FILE_TECNOLOGIE.values(), *FILE_STIMA_ARREDI.values()]
+
+
+def euro_italiano(centesimi, simbolo_prima=True):
+    """Importo come nei fogli Excel esportati: '€ 1.723,13' oppure '1.723,13€'"""
+    testo = formatta_euro(centesimi, prefisso='').replace(',', '#').replace('.', ',').replace('#', '.')
+    return f"€ {testo}" if simbolo_prima else f"{testo}€"
+
+
+def _euro_decimale(centesimi):
+    return f"{centesimi // 100}.{centesimi % 100:02d}"
+
+
+def _data_prospetto(indice):
+    return (DATA_PRIMO_PROSPETTO + timedelta(days=GIORNI_TRA_PROSPETTI * indice)).strftime('%d-%m-%y')
+
+
+def _scrittore(file):
+    return csv.writer(file, delimiter=';', lineterminator='\n')
+
+
+def _genera_blocco(profilo, tipo, inizio, fine, seme, n_prospetti, larghezza):
+    """
+    Strutture [inizio, fine) di un tipo: anagrafica, stati di ogni prospetto (l'ultimo è
+    il censimento corrente), inventari, attrezzature e arredi delle strutture PNRR.
+    """
+    rng = np.random.default_rng([seme, list(INTESTAZIONI).index(tipo), inizio // BLOCCO])
+    n = fine - inizio
+
+    zone = rng.choice(len(profilo['Zone']), size=n, p=profilo['Probabilita_Zone'])
+    scelta_comune = rng.random(n)
+    pnrr = rng.random(n) < profilo['Quota_PNRR']
+    hub = rng.random(n) < profilo['Quota_Hub']
+    cure_intermedie = (rng.random(n) < profilo['Quota_Cure_Intermedie']) & ~pnrr
+    posti_letto = rng.choice(profilo['Posti_Letto'], size=n)
+    setting = rng.integers(1, 3, size=n)
+    vie = rng.integers(len(VIE), size=n)
+    nomi_vie = rng.integers(len(NOMI_VIE), size=n)
+    civici = rng.integers(1, 120, size=n)
+    province = rng.integers(len(PROVINCE), size=n)
+
+    # Stato corrente per dispositivo, poi i prospetti precedenti a ritroso
+    codici = list(COLONNE_DISPOSITIVI[tipo].values())
+    correnti = np.column_stack([rng.choice(len(STATI), size=n, p=profilo['Stati'][c]) for c in codici])
+    stati = [correnti]
+    for _ in range(n_prospetti - 1):
+        precedenti = stati[0].copy()
+        for da, (a, probabilita) in REGRESSIONE_STATO.items():
+            precedenti[(stati[0] == da) & (rng.random(precedenti.shape) < probabilita)] = a
+        stati.insert(0, precedenti)
+    varianti = rng.random(correnti.shape) < QUOTA_VARIANTI
+    scelta_variante = rng.integers(0, 3, size=correnti.shape)
+    inventari = rng.integers(0, 1_000_000, size=correnti.shape)
+    con_inventario = rng.random(correnti.shape) < 0.5
+
+    attrezzature = profilo['Attrezzature']
+    quantita_attrezzature = np.column_stack([
+        np.where(rng.random(n) < a['Probabilita'], rng.choice(a['Quantita'], size=n), 0) for a in attrezzature
+    ]) if attrezzature else np.zeros((n, 0), dtype=np.int64)
+    arredi = profilo['Arredi']
+    quantita_arredi = np.where(
+        rng.random((n, len(arredi['Voce']))) < arredi['Probabilita'],
+        rng.choice(arredi['Quantita'], size=(n, len(arredi['Voce']))), 0
+    )
+    quantita_attrezzature[~pnrr] = 0
+    quantita_arredi[~pnrr] = 0
+
+    strutture = []
+    for i in range(n):
+        zona = profilo['Zone'][zone[i]]
+        comuni = profilo['Comuni'][zona]
+        comune = comuni[int(scelta_comune[i] * len(comuni))]
+        # Nome senza spazi con progressivo a larghezza fissa: univoco anche come sottostringa
+        nome = f"{comune.replace(' ', '-')}-{inizio + i + 1:0{larghezza}d}"
+        indirizzo = f"{VIE[vie[i]]} {NOMI_VIE[nomi_vie[i]]} {civici[i]}"
+        strutture.append({
+            'Progressivo': inizio + i + 1, 'Zona': zona, 'Nome': nome, 'Comune': comune, 'Indirizzo': indirizzo,
+            'Provincia': PROVINCE[province[i]], 'PNRR': bool(pnrr[i]), 'Hub': bool(hub[i]),
+            'Cure_Intermedie': bool(cure_intermedie[i]), 'Posti_Letto': int(posti_letto[i]),
+            'Setting': int(setting[i])
+        })
+
+    celle = [TESTO_STATO[s] for s in stati]
+    for testo, stato in zip(celle, stati):
+        for indice in zip(*np.nonzero(varianti)):
+            alternative = VARIANTI_STATO.get(stato[indice])
+            if alternative:
+                testo[indice] = alternative[scelta_variante[indice] % len(alternative)]
+    return strutture, correnti, celle, inventari, con_inventario, quantita_attrezzature, quantita_arredi
+
+
+def _riga_censimento(tipo, struttura, celle, inventari, con_inventario):
+    """Riga del censimento (CDC_CE_1 / ODC_CE_1 e prospetti) con gli stati dei dispositivi"""
+    riga = [''] * len(INTESTAZIONI[tipo])
+    riga[0] = struttura['Zona']
+    if tipo == 'CDC':
+        riga[1:5] = [struttura['Nome'], 'Hub' if struttura['Hub'] else 'Spoke',
+                     'PNRR' if struttura['PNRR'] else '', struttura['Indirizzo']]
+    else:
+        prefisso = PREFISSO_ODC[struttura['Cure_Intermedie']]
+        riga[1:6] = [
+            f"{prefisso}{struttura['Nome'].upper()}\n{struttura['Indirizzo']} ({struttura['Provincia']})",
+            str(struttura['Posti_Letto']), str(struttura['Setting']), 'X' if struttura['PNRR'] else 'NO',
+            '31/03/2026' if struttura['PNRR'] else ''
+        ]
+    colonne_inventario = COLONNE_INVENTARIO[tipo]
+    for j, colonna in enumerate(COLONNE_DISPOSITIVI[tipo]):
+        riga[colonna] = celle[j]
+        if colonna in colonne_inventario and con_inventario[j] and 'PRESENT' in celle[j].upper():
+            riga[colonne_inventario[colonna]] = f"S{inventari[j]:06d}"
+    return riga + [''] * 4
+
+
+def _nome_struttura(tipo, struttura):
+    """Nome in anagrafica, come lo ricava integra_anagrafiche_v3 dal censimento"""
+    if tipo == 'CDC':
+        return f"CdC {struttura['Nome']}"
+    return f"OdC {struttura['Nome'].upper()}"
+
+
+def _scrivi_stima_arredi(percorso, tipo, profilo, nomi, quantita_arredi, quantita_attrezzature):
+    """Foglio Stima arredi: una coppia di colonne (nr., Stima o q.e.) per ogni struttura PNRR"""
+    n = len(nomi)
+    vuota = [''] * (3 + 2 * n)
+    arredi, attrezzature = profilo['Arredi'], profilo['Attrezzature']
+    righe = 0
+    with open(percorso, 'w', encoding='utf-8', newline='') as f:
+        scrittore = csv.writer(f, lineterminator='\n')
+
+        def scrivi(riga):
+            nonlocal righe
+            scrittore.writerow(riga)
+            righe += 1
+
+        scrivi(['', TITOLO_STIMA_ARREDI[tipo]] + vuota[2:])
+        scrivi(vuota)
+        intestazione = vuota.copy()
+        intestazione[3::2] = nomi
+        scrivi(intestazione)
+        for etichetta in ['RUP', 'Cell.', 'Data consegna prevista']:
+            scrivi(['', etichetta] + vuota[2:])
+        scrivi(['', 'Arredo', 'Costo unitario (IVA compresa)'] + ['nr.', 'Stima'] * n)
+
+        for j, voce in enumerate(arredi['Voce']):
+            costo = int(arredi['Costo_Cent'][j])
+            quantita = quantita_arredi[:, j]
+            testi = {q: euro_italiano(costo * int(q)) for q in np.unique(quantita)}
+            riga = [arredi['Locale'][j], voce, euro_italiano(costo)] + [''] * (2 * n)
+            riga[3::2] = [str(q) if q else '' for q in quantita]
+            riga[4::2] = [testi[q] for q in quantita]
+            scrivi(riga)
+
+        scrivi(vuota)
+        scrivi(['', 'Tipologia Attrezzatura da acquistare '] + vuota[2:])
+        scrivi(['Locale di destinazione', 'Attrezzatura', 'Importo (IVA esclusa) €'] + ['nr.', 'q.e. (sì/no)'] * n)
+        for j, voce in enumerate(attrezzature):
+            riga = [voce['Locale'], voce['Tecnologia'], euro_italiano(voce['Costo_Cent'], simbolo_prima=False)]
+            riga += [''] * (2 * n)
+            riga[3::2] = [str(q) if q else '' for q in quantita_attrezzature[:, j]]
+            scrivi(riga)
+    return righe
+
+
+def genera_dati_sintetici(cartella, scala=1.0, seme=SEME_PREDEFINITO, prospetti=2, verbose=True):
+    """
+    Scrive nella cartella i file sintetici a N volte la scala reale; restituisce il
+    manifest (anche in dati_sintetici.json). La cartella non può essere quella corrente.
+    """
+    log = print if verbose else (lambda *a, **k: None)
+    inizio = time.perf_counter()
+    cartella = Path(cartella)
+    if cartella.resolve() == Path('.').resolve():
+        raise ValueError("La cartella dei dati sintetici non può essere quella dei dati reali")
+    cartella.mkdir(parents=True, exist_ok=True)
+    prospetti = max(int(prospetti), 1)
+
+    profilo = profilo_dati()
+    for nome in [FILE_CATALOGO, FILE_DOTAZIONI_MINIME]:
+        shutil.copyfile(nome, cartella / nome)
+    costi_catalogo = pd.read_csv(FILE_CATALOGO).set_index('Codice')['Costo_Unitario_EUR']
+
+    righe = {FILE_CATALOGO: len(costi_catalogo), FILE_DOTAZIONI_MINIME: len(pd.read_csv(FILE_DOTAZIONI_MINIME))}
+    numeri = {}
+    with open(cartella / FILE_STRUTTURE, 'w', encoding='utf-8', newline='') as f_strutture, \
+            open(cartella / FILE_DOTAZIONI, 'w', encoding='utf-8', newline='') as f_dotazioni:
+        strutture_csv = csv.writer(f_strutture, lineterminator='\n')
+        dotazioni_csv = csv.writer(f_dotazioni, lineterminator='\n')
+        strutture_csv.writerow(COLONNE_STRUTTURE)
+        dotazioni_csv.writerow(COLONNE_DOTAZIONI)
+        righe[FILE_STRUTTURE] = righe[FILE_DOTAZIONI] = 0
+
+        for tipo, profilo_tipo in profilo.items():
+            n = max(1, round(profilo_tipo['Strutture'] * scala))
+            larghezza = max(3, len(str(n)))
+            etichetta = ETICHETTA_TIPO[tipo]
+            codici = list(COLONNE_DISPOSITIVI[tipo].values())
+            codici_tecnologie = CODICI_TECNOLOGIE[tipo]
+            file_prospetti = [
+                MODELLO_PROSPETTO.format(tipo=tipo, data=_data_prospetto(k)) for k in range(prospetti)
+            ]
+            nomi_pnrr, arredi_pnrr, attrezzature_pnrr = [], [], []
+
+            percorsi = [FILE_CENSIMENTO[tipo]] + file_prospetti
+            file_censimenti = [open(cartella / p, 'w', encoding='latin-1', errors='replace', newline='')
+                               for p in percorsi]
+            try:
+                with open(cartella / FILE_TECNOLOGIE[tipo], 'w', encoding='utf-8', newline='') as f_tecnologie:
+                    tecnologie_csv = csv.writer(f_tecnologie, lineterminator='\n')
+                    tecnologie_csv.writerow(COLONNE_TECNOLOGIE)
+                    censimenti_csv = [_scrittore(f) for f in file_censimenti]
+                    for scrittore in censimenti_csv:
+                        scrittore.writerows(riga + [''] * (len(INTESTAZIONI[tipo]) - 1) for riga in PREAMBOLO[tipo])
+                        scrittore.writerow(INTESTAZIONI[tipo] + [''] * 4)
+                    righe[FILE_TECNOLOGIE[tipo]] = 0
+
+                    for blocco in range(0, n, BLOCCO):
+                        strutture, correnti, celle, inventari, con_inventario, q_attrezzature, q_arredi = \
+                            _genera_blocco(profilo_tipo, tipo, blocco, min(blocco + BLOCCO, n), seme, prospetti,
+                                           larghezza)
+                        for i, struttura in enumerate(strutture):
+                            codice = f"{tipo}{struttura['Progressivo']:03d}"
+                            nome = _nome_struttura(tipo, struttura)
+                            pnrr = 'SI' if struttura['PNRR'] else 'NO'
+                            if tipo == 'CDC':
+                                strutture_csv.writerow([
+                                    'CdC', codice, nome, struttura['Zona'], 'Hub' if struttura['Hub'] else 'Spoke',
+                                    struttura['Nome'], '', struttura['Indirizzo'], '', pnrr, ''
+                                ])
+                            else:
+                                strutture_csv.writerow([
+                                    'OdC', codice, nome, struttura['Zona'], '', struttura['Nome'].upper(), '', '',
+                                    '', pnrr, struttura['Posti_Letto']
+                                ])
+
+                            # Censimento corrente (primo file) e prospetti dal più vecchio al più recente
+                            censimenti_csv[0].writerow(
+                                _riga_censimento(tipo, struttura, celle[-1][i], inventari[i], con_inventario[i]))
+                            for k, scrittore in enumerate(censimenti_csv[1:]):
+                                scrittore.writerow(
+                                    _riga_censimento(tipo, struttura, celle[k][i], inventari[i], con_inventario[i]))
+
+                            for j, stato in enumerate(correnti[i]):
+                                if stato in CONFIGURAZIONE_STATO:
+                                    presente, richiesta, note = CONFIGURAZIONE_STATO[stato]
+                                    dotazioni_csv.writerow([codice, codici[j], presente, richiesta, STATI[stato], note])
+                                    righe[FILE_DOTAZIONI] += 1
+
+                            if struttura['PNRR']:
+                                struttura_tecnologie = f"{etichetta} {struttura['Nome']}"
+                                for j, voce in enumerate(profilo_tipo['Attrezzature']):
+                                    quantita = int(q_attrezzature[i, j])
+                                    if not quantita:
+                                        continue
+                                    tecnologie_csv.writerow([
+                                        etichetta, voce['Tecnologia'], voce['Locale'], struttura_tecnologie, quantita,
+                                        _euro_decimale(voce['Costo_Cent']), _euro_decimale(voce['Costo_Cent'] * quantita)
+                                    ])
+                                    righe[FILE_TECNOLOGIE[tipo]] += 1
+                                    if voce['Tecnologia'] in codici_tecnologie:
+                                        dotazioni_csv.writerow([
+                                            codice, codici_tecnologie[voce['Tecnologia']], 0, quantita,
+                                            'DA_ACQUISTARE', 'Da finanziare (da file PNRR)'
+                                        ])
+                                        righe[FILE_DOTAZIONI] += 1
+                                nomi_pnrr.append(struttura_tecnologie)
+                                arredi_pnrr.append(q_arredi[i])
+                                attrezzature_pnrr.append(q_attrezzature[i])
+                        righe[FILE_STRUTTURE] += len(strutture)
+                        log(f"  ⏳ {etichetta}: {min(blocco + BLOCCO, n):,}/{n:,} strutture")
+            finally:
+                for f in file_censimenti:
+                    f.close()
+            for p in percorsi:
+                righe[p] = n
+
+            colonne_arredi = len(profilo_tipo['Arredi']['Voce'])
+            colonne_attrezzature = len(profilo_tipo['Attrezzature'])
+            righe[FILE_STIMA_ARREDI[tipo]] = _scrivi_stima_arredi(
+                cartella / FILE_STIMA_ARREDI[tipo], tipo, profilo_tipo, nomi_pnrr,
+                np.array(arredi_pnrr, dtype=np.int64).reshape(-1, colonne_arredi),
+                np.array(attrezzature_pnrr, dtype=np.int64).reshape(-1, colonne_attrezzature)
+            )
+            numeri[tipo] = {'Strutture': n, 'PNRR': len(nomi_pnrr)}
+
+    # I costi del catalogo restano quelli reali: il fabbisogno si ricalcola dai file copiati
+    manifest = {
+        'Generato': datetime.now().isoformat(timespec='seconds'),
+        'Seme': seme,
+        'Scala': scala,
+        'Prospetti': prospetti,
+        'Versione_Profilo': versione_dati(*file_profilo()),
+        'Strutture': numeri,
+        'Righe': righe,
+        'Secondi': round(time.perf_counter() - inizio, 3)
+    }
+    with open(cartella / FILE_MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dati sintetici coerenti a N volte la scala reale')
+    parser.add_argument('--scala', type=float, default=1.0, help='moltiplicatore delle strutture reali (default: 1)')
+    parser.add_argument('--seme', type=int, default=SEME_PREDEFINITO, help=f'seme casuale (default: {SEME_PREDEFINITO})')
+    parser.add_argument('--prospetti', type=int, default=2, help='prospetti datati da generare per tipo (default: 2)')
+    parser.add_argument('--cartella', help='cartella di output (default: dati_sintetici_x<scala>)')
+    args = parser.parse_args()
+
+    cartella = args.cartella or f"dati_sintetici_x{args.scala:g}"
+    print(f"🧪 Dati sintetici scala {args.scala:g}x, seme {args.seme} → {cartella}/")
+    manifest = genera_dati_sintetici(cartella, args.scala, args.seme, args.prospetti)
+
+    for tipo, numeri in manifest['Strutture'].items():
+        print(f"  ✅ {ETICHETTA_TIPO[tipo]}: {numeri['Strutture']:,} strutture ({numeri['PNRR']:,} PNRR)")
+    print(f"  ✅ {manifest['Righe'][FILE_DOTAZIONI]:,} configurazioni")
+    print(f"  📄 {len(manifest['Righe'])} file, {sum(manifest['Righe'].values()):,} righe "
+          f"in {manifest['Secondi']:.1f} s (profilo dati reali {manifest['Versione_Profilo']})")
+    print(f"\n💾 Manifest: {Path(cartella) / FILE_MANIFEST}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,55 +5,95 @@ Report Excel con executive summary, analisi PNRR, e dettagli per struttura
 
 Utilizzo:
     python genera_report_direzione.py
+    python genera_report_direzione.py --lordo    # importi IVA inclusa
+    python genera_report_direzione.py --budget 500000 [--quota-zona 25]   # con piano acquisti
 
 Output:
     report_direzione_telemedicina_YYYYMMDD.xlsx
+
+Il workbook è scritto una sola volta in modalità sola scrittura (openpyxl
+write_only): stili dichiarati in testa, larghezze colonne calcolate dai
+DataFrame prima di scrivere le righe, nessuna riapertura del file.
 """
 
+import argparse
 import pandas as pd
 from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
 
-def crea_report_direzione():
-    """Genera report Excel completo per la direzione"""
-
-    # Carica dati
-    print("📊 Caricamento dati...")
-    df_strutture = pd.read_csv('strutture_sanitarie.csv')
-    df_catalogo = pd.read_csv('dotazioni_telemedicina_catalogo.csv')
-    df_dotazioni = pd.read_csv('dotazioni_strutture_telemedicina.csv')
-
-    # Merge per analisi
-    df_merge = df_dotazioni.merge(
-        df_catalogo,
-        left_on='Codice_Dotazione',
-        right_on='Codice',
-        how='left'
-    )
-
-    df_merge['Quantita_Da_Acquistare'] = df_merge['Quantita_Richiesta'] - df_merge['Quantita_Presente']
-    df_merge['Quantita_Da_Acquistare'] = df_merge['Quantita_Da_Acquistare'].clip(lower=0)
-    df_merge['Costo_Totale'] = df_merge['Quantita_Da_Acquistare'] * df_merge['Costo_Unitario_EUR']
-
-    # Merge con strutture
-    df_merge = df_merge.merge(
-        df_strutture[['Codice', 'Nome_Struttura', 'Tipologia', 'Zona', 'PNRR']],
-        left_on='Codice_Struttura',
-        right_on='Codice',
-        how='left',
-        suffixes=('', '_Strutt')
-    )
-
-    # Nome file output
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    filename = f"report_direzione_telemedicina_{timestamp}.xlsx"
-
-    print(f"📝 Generazione report: {filename}")
+from conformita_dm77 import FILE_DOTAZIONI_MINIME, calcola_conformita
+from motore_fabbisogno import (
+    ETICHETTA_IMPORTI, carica_fabbisogno, centesimi_a_euro, colonne_euro, euro_a_centesimi, formatta_euro,
+    seleziona_importi
+)
+from priorita_acquisti import candidati_acquisto, ottimizza_budget
+
+# Stili dichiarati una volta e applicati in scrittura (workbook in sola scrittura)
+STILE_INTESTAZIONE = {
+    'font': Font(bold=True, size=11, color="FFFFFF"),
+    'fill': PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+    'alignment': Alignment(horizontal="center")
+}
+STILE_INTESTAZIONE_SUMMARY = {**STILE_INTESTAZIONE, 'font': Font(bold=True, size=12, color="FFFFFF")}
+STILE_EVIDENZA = {
+    'font': Font(bold=True, size=11),
+    'fill': PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+}
+
+LARGHEZZA_MASSIMA = 50
+
+
+def larghezze_colonne(df, massimo=LARGHEZZA_MASSIMA):
+    """Larghezza di ogni colonna dai dati: testo più lungo (intestazione inclusa) + 2, al massimo `massimo`"""
+    larghezze = []
+    for colonna in df.columns:
+        valori = df[colonna]
+        lunghezza = valori.astype(str).str.len().where(valori.notna(), 0).max() if len(valori) else 0
+        larghezze.append(min(max(len(str(colonna)), int(lunghezza)) + 2, massimo))
+    return larghezze
+
+
+def _cella(ws, valore, stile):
+    cella = WriteOnlyCell(ws, value=valore)
+    for attributo, oggetto in stile.items():
+        setattr(cella, attributo, oggetto)
+    return cella
+
+
+def scrivi_foglio(wb, nome, df, larghezze=None, stile_intestazione=STILE_INTESTAZIONE, evidenzia=None):
+    """
+    Aggiunge al workbook in sola scrittura un foglio con intestazione formattata e
+    larghezze colonne impostate prima delle righe (calcolate dai dati se non indicate).
+    evidenzia: maschera booleana delle righe da mettere in evidenza (STILE_EVIDENZA).
+    """
+    ws = wb.create_sheet(nome)
+    for indice, larghezza in enumerate(larghezze or larghezze_colonne(df), start=1):
+        ws.column_dimensions[get_column_letter(indice)].width = larghezza
+
+    ws.append([_cella(ws, str(colonna), stile_intestazione) for colonna in df.columns])
+    valori = df.astype(object).where(df.notna(), None)
+    righe_evidenza = set() if evidenzia is None else set(pd.Series(evidenzia).to_numpy().nonzero()[0])
+    for posizione, riga in enumerate(valori.itertuples(index=False, name=None)):
+        if posizione in righe_evidenza:
+            riga = [_cella(ws, valore, STILE_EVIDENZA) for valore in riga]
+        ws.append(riga)
+    return ws
+
+
+def scrivi_report_excel(filename, df_strutture, df_merge, lordo=False, df_piano=None, ambito=None, verbose=True):
+    """
+    Scrive il workbook del report dalle strutture e dal fabbisogno già arricchito (vista
+    netto/lordo già selezionata): l'intero territorio o una sua parte (ambito: zona o
+    struttura, riportato nell'Executive Summary). df_piano: scheda Piano Acquisti già formattata.
+    Restituisce i totali da finanziare in centesimi.
+    """
+    log = print if verbose else (lambda *args: None)
 
     # 1. EXECUTIVE SUMMARY
-    print("  → Executive Summary")
+    log("  → Executive Summary")
     summary_data = {
         'Indicatore': [
             'Strutture Totali',
@@ -70,7 +110,9 @@ def crea_report_direzione():
             'Budget già finanziato',
             'Dotazioni già presenti (valore)',
             '',
-            'TOTALE INVESTIMENTO NECESSARIO'
+            'TOTALE INVESTIMENTO NECESSARIO',
+            '',
+            'Importi'
         ],
         'Valore': [],
         'Note': []
@@ -87,10 +129,10 @@ def crea_report_direzione():
     df_finanz = df_merge[df_merge['Stato_Finanziamento'] == 'FINANZIATO']
     df_presente = df_merge[df_merge['Stato_Finanziamento'] == 'PRESENTE']
 
-    costo_da_acq_pnrr = df_da_acq[df_da_acq['PNRR'] == 'SI']['Costo_Totale'].sum()
-    costo_da_acq_no = df_da_acq[df_da_acq['PNRR'] == 'NO']['Costo_Totale'].sum()
-    costo_finanz = (df_finanz['Quantita_Richiesta'] * df_finanz['Costo_Unitario_EUR']).sum()
-    costo_presente = (df_presente['Quantita_Presente'] * df_presente['Costo_Unitario_EUR']).sum()
+    costo_da_acq_pnrr = df_da_acq[df_da_acq['PNRR'] == 'SI']['Costo_Totale_Cent'].sum()
+    costo_da_acq_no = df_da_acq[df_da_acq['PNRR'] == 'NO']['Costo_Totale_Cent'].sum()
+    costo_finanz = df_finanz['Costo_Gia_Finanziato_Cent'].sum()
+    costo_presente = df_presente['Costo_Presente_Cent'].sum()
 
     summary_data['Valore'] = [
         n_strutture,
@@ -100,14 +142,16 @@ def crea_report_direzione():
         n_pnrr,
         n_non_pnrr,
         '',
-        f"€ {costo_da_acq_pnrr + costo_da_acq_no:,.2f}",
-        f"€ {costo_da_acq_pnrr:,.2f}",
-        f"€ {costo_da_acq_no:,.2f}",
+        formatta_euro(costo_da_acq_pnrr + costo_da_acq_no, prefisso='€ '),
+        formatta_euro(costo_da_acq_pnrr, prefisso='€ '),
+        formatta_euro(costo_da_acq_no, prefisso='€ '),
+        '',
+        formatta_euro(costo_finanz, prefisso='€ '),
+        formatta_euro(costo_presente, prefisso='€ '),
         '',
-        f"€ {costo_finanz:,.2f}",
-        f"€ {costo_presente:,.2f}",
+        formatta_euro(costo_da_acq_pnrr + costo_da_acq_no, prefisso='€ '),
         '',
-        f"€ {costo_da_acq_pnrr + costo_da_acq_no:,.2f}"
+        ETICHETTA_IMPORTI[lordo]
     ]
 
     summary_data['Note'] = [
@@ -125,44 +169,53 @@ def crea_report_direzione():
         'Budget già allocato',
         'Dotazioni operative',
         '',
-        'Per completamento rete'
+        'Per completamento rete',
+        '',
+        'Aliquote IVA da catalogo dotazioni' if lordo else ''
     ]
 
     df_summary = pd.DataFrame(summary_data)
+    if ambito:
+        df_summary.loc[len(df_summary)] = ['Ambito', ambito, '']
 
     # 2. ANALISI PNRR PRIORITARIA
-    print("  → Analisi PNRR Prioritaria")
+    log("  → Analisi PNRR Prioritaria")
     df_pnrr_detail = df_da_acq[df_da_acq['PNRR'] == 'SI'].groupby(
         ['Nome_Struttura', 'Zona', 'Tipologia']
     ).agg({
-        'Costo_Totale': 'sum'
-    }).reset_index().sort_values('Costo_Totale', ascending=False)
+        'Costo_Totale_Cent': 'sum'
+    }).reset_index().sort_values('Costo_Totale_Cent', ascending=False)
+    df_pnrr_detail['Costo_Totale_Cent'] = centesimi_a_euro(df_pnrr_detail['Costo_Totale_Cent'])
 
     df_pnrr_detail.columns = ['Struttura', 'Zona', 'Tipo', 'Fabbisogno (€)']
 
     # 3. FABBISOGNO PER DOTAZIONE
-    print("  → Fabbisogno per Dotazione")
-    df_fabb_dot = df_da_acq.groupby(['Categoria', 'Descrizione', 'Costo_Unitario_EUR']).agg({
+    log("  → Fabbisogno per Dotazione")
+    df_fabb_dot = df_da_acq.groupby(['Categoria', 'Descrizione', 'Costo_Unitario_Cent']).agg({
         'Quantita_Da_Acquistare': 'sum',
-        'Costo_Totale': 'sum'
-    }).reset_index().sort_values(['Categoria', 'Costo_Totale'], ascending=[True, False])
+        'Costo_Totale_Cent': 'sum'
+    }).reset_index().sort_values(['Categoria', 'Costo_Totale_Cent'], ascending=[True, False])
+    df_fabb_dot = colonne_euro(df_fabb_dot)[
+        ['Categoria', 'Descrizione', 'Costo_Unitario', 'Quantita_Da_Acquistare', 'Costo_Totale']
+    ]
 
     df_fabb_dot.columns = ['Categoria', 'Descrizione', 'Costo Unitario (€)', 'Quantità', 'Costo Totale (€)']
 
     # 4. DETTAGLIO PER STRUTTURA
-    print("  → Dettaglio per Struttura")
+    log("  → Dettaglio per Struttura")
     df_strutt_detail = df_merge.groupby(['Nome_Struttura', 'Zona', 'Tipologia', 'PNRR']).agg({
-        'Costo_Totale': 'sum'
-    }).reset_index().sort_values(['PNRR', 'Costo_Totale'], ascending=[False, False])
+        'Costo_Totale_Cent': 'sum'
+    }).reset_index().sort_values(['PNRR', 'Costo_Totale_Cent'], ascending=[False, False])
+    df_strutt_detail['Costo_Totale_Cent'] = centesimi_a_euro(df_strutt_detail['Costo_Totale_Cent'])
 
     df_strutt_detail.columns = ['Struttura', 'Zona', 'Tipo', 'PNRR', 'Fabbisogno (€)']
 
     # 5. CONFIGURAZIONI COMPLETE
-    print("  → Configurazioni Complete")
-    df_config = df_merge[[
+    log("  → Configurazioni Complete")
+    df_config = colonne_euro(df_merge, ['Costo_Unitario_Cent', 'Costo_Totale_Cent'])[[
         'Nome_Struttura', 'Zona', 'PNRR', 'Categoria', 'Descrizione',
         'Stato_Finanziamento', 'Quantita_Presente', 'Quantita_Richiesta',
-        'Quantita_Da_Acquistare', 'Costo_Unitario_EUR', 'Costo_Totale'
+        'Quantita_Da_Acquistare', 'Costo_Unitario', 'Costo_Totale'
     ]].sort_values(['Nome_Struttura', 'Categoria', 'Descrizione'])
 
     df_config.columns = [
@@ -171,82 +224,92 @@ def crea_report_direzione():
         'Qty Da Acquistare', 'Costo Unitario (€)', 'Costo Totale (€)'
     ]
 
-    # Scrivi Excel
-    print("  → Scrittura file Excel")
-    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-        df_summary.to_excel(writer, sheet_name='Executive Summary', index=False)
-        df_pnrr_detail.to_excel(writer, sheet_name='PNRR Priorità', index=False)
-        df_fabb_dot.to_excel(writer, sheet_name='Fabbisogno per Dotazione', index=False)
-        df_strutt_detail.to_excel(writer, sheet_name='Fabbisogno per Struttura', index=False)
-        df_config.to_excel(writer, sheet_name='Configurazioni Complete', index=False)
-
-    # Formattazione
-    print("  → Formattazione celle")
-    wb = load_workbook(filename)
-
-    # Formatta Executive Summary
-    ws = wb['Executive Summary']
-    ws.column_dimensions['A'].width = 40
-    ws.column_dimensions['B'].width = 25
-    ws.column_dimensions['C'].width = 30
-
-    # Header
-    for cell in ws[1]:
-        cell.font = Font(bold=True, size=12)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, size=12, color="FFFFFF")
-        cell.alignment = Alignment(horizontal="center")
-
-    # Evidenzia totale
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        if 'FABBISOGNO DA FINANZIARE' in str(row[0].value) or 'TOTALE INVESTIMENTO' in str(row[0].value):
-            for cell in row:
-                cell.font = Font(bold=True, size=11)
-                cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-
-    # Formatta altre schede
-    for sheet_name in ['PNRR Priorità', 'Fabbisogno per Dotazione', 'Fabbisogno per Struttura']:
-        ws = wb[sheet_name]
-
-        # Header
-        for cell in ws[1]:
-            cell.font = Font(bold=True, size=11)
-            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            cell.font = Font(bold=True, size=11, color="FFFFFF")
-            cell.alignment = Alignment(horizontal="center")
-
-        # Auto-width
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
+    # Scrivi Excel in un solo passaggio (sola scrittura: righe inviate su disco man mano)
+    log("  → Scrittura file Excel")
+    wb = Workbook(write_only=True)
+    evidenza = df_summary['Indicatore'].str.contains('FABBISOGNO DA FINANZIARE|TOTALE INVESTIMENTO')
+    scrivi_foglio(wb, 'Executive Summary', df_summary, larghezze=[40, 25, 30],
+                  stile_intestazione=STILE_INTESTAZIONE_SUMMARY, evidenzia=evidenza)
+    scrivi_foglio(wb, 'PNRR Priorità', df_pnrr_detail)
+    scrivi_foglio(wb, 'Fabbisogno per Dotazione', df_fabb_dot)
+    scrivi_foglio(wb, 'Fabbisogno per Struttura', df_strutt_detail)
+    scrivi_foglio(wb, 'Configurazioni Complete', df_config)
+    if df_piano is not None:
+        scrivi_foglio(wb, 'Piano Acquisti', df_piano)
     wb.save(filename)
 
+    return {'Da_Finanziare_PNRR_Cent': costo_da_acq_pnrr, 'Da_Finanziare_No_Cent': costo_da_acq_no}
+
+
+def crea_report_direzione(lordo=False, budget=None, quota_zona=None):
+    """
+    Genera report Excel completo per la direzione (lordo=True: importi IVA inclusa).
+    Con budget (euro) aggiunge la scheda Piano Acquisti: graduatoria PNRR → gap DM 77 → altro,
+    interventi finanziati e budget aggiuntivo per i non finanziati (quota_zona: tetto % per zona).
+    """
+
+    # Carica dati e calcola fabbisogno (importi in centesimi)
+    print("📊 Caricamento dati...")
+    df_strutture, df_catalogo, df_dotazioni, df_merge = carica_fabbisogno()
+    df_merge = seleziona_importi(df_merge, lordo=lordo)
+    print(f"💶 Importi {ETICHETTA_IMPORTI[lordo]}")
+
+    # Nome file output
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    suffisso = '_lordo' if lordo else ''
+    filename = f"report_direzione_telemedicina_{timestamp}{suffisso}.xlsx"
+
+    print(f"📝 Generazione report: {filename}")
+
+    # 6. PIANO ACQUISTI (solo con budget)
+    df_piano = None
+    if budget is not None:
+        print("  → Piano Acquisti")
+        df_conformita = calcola_conformita(df_strutture, df_dotazioni, pd.read_csv(FILE_DOTAZIONI_MINIME))
+        df_piano, riepilogo_piano = ottimizza_budget(
+            candidati_acquisto(df_merge, df_conformita), int(euro_a_centesimi([budget])[0]), quota_zona=quota_zona
+        )
+        df_piano = colonne_euro(df_piano)[[
+            'Rango', 'Priorita', 'Nome_Struttura', 'Zona', 'PNRR', 'Descrizione', 'Quantita_Da_Acquistare',
+            'Costo', 'Finanziato', 'Motivo_Esclusione', 'Budget_Cumulato', 'Budget_Aggiuntivo'
+        ]]
+        df_piano['Finanziato'] = df_piano['Finanziato'].map({True: 'SI', False: 'NO'})
+        df_piano.columns = [
+            'Rango', 'Priorità', 'Struttura', 'Zona', 'PNRR', 'Dotazione', 'Qty',
+            'Costo (€)', 'Finanziato', 'Motivo Esclusione', 'Budget Cumulato (€)', 'Budget Aggiuntivo (€)'
+        ]
+
+    totali = scrivi_report_excel(filename, df_strutture, df_merge, lordo=lordo, df_piano=df_piano)
+    costo_da_acq_pnrr, costo_da_acq_no = totali['Da_Finanziare_PNRR_Cent'], totali['Da_Finanziare_No_Cent']
+
     print(f"\n✅ Report generato: {filename}")
     print(f"\n📊 RIEPILOGO:")
-    print(f"  • Fabbisogno PNRR (priorità):  € {costo_da_acq_pnrr:,.2f}")
-    print(f"  • Fabbisogno non-PNRR:         € {costo_da_acq_no:,.2f}")
-    print(f"  • TOTALE DA FINANZIARE:        € {costo_da_acq_pnrr + costo_da_acq_no:,.2f}")
+    print(f"  • Fabbisogno PNRR (priorità):  {formatta_euro(costo_da_acq_pnrr, prefisso='€ ')}")
+    print(f"  • Fabbisogno non-PNRR:         {formatta_euro(costo_da_acq_no, prefisso='€ ')}")
+    print(f"  • TOTALE DA FINANZIARE:        {formatta_euro(costo_da_acq_pnrr + costo_da_acq_no, prefisso='€ ')}")
+    if df_piano is not None:
+        print(f"\n🎯 PIANO ACQUISTI (budget {formatta_euro(riepilogo_piano['Budget_Cent'], prefisso='€ ')}):")
+        print(f"  • Interventi finanziati:       {riepilogo_piano['Finanziati']}/{riepilogo_piano['Candidati']}")
+        print(f"  • Spesa:                       {formatta_euro(riepilogo_piano['Spesa_Cent'], prefisso='€ ')}")
+        print(f"  • Prossimo intervento:         {formatta_euro(riepilogo_piano['Prossimo_Costo_Cent'], prefisso='€ ')}")
     print(f"\n  ⚠️  SCADENZA PNRR: MARZO 2026")
 
     return filename
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Genera il report Excel per la direzione')
+    parser.add_argument('--lordo', action='store_true', help='Importi IVA inclusa (default: IVA esclusa)')
+    parser.add_argument('--budget', type=float, help='Budget disponibile (€): aggiunge la scheda Piano Acquisti')
+    parser.add_argument('--quota-zona', type=float, help='Tetto per zona nel piano acquisti (%% del budget)')
+    args = parser.parse_args()
+
     print("=" * 80)
     print("GENERAZIONE REPORT DIREZIONE - TELEMEDICINA USL TOSCANA NORD OVEST")
     print("=" * 80)
     print()
 
-    filename = crea_report_direzione()
+    filename = crea_report_direzione(lordo=args.lordo, budget=args.budget, quota_zona=args.quota_zona)
 
     print("\n" + "=" * 80)
     print("Il report è pronto per la presentazione in direzione!")
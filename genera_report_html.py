@@ -5,539 +5,374 @@ Report user-friendly con grafici, navigazione e design professionale
 
 Utilizzo:
     python genera_report_html.py
+    python genera_report_html.py --lordo    # importi IVA inclusa
+    python genera_report_html.py --rigenera # tutte le sezioni, ignorando la cache
 
 Output:
     report_direzione_telemedicina_YYYYMMDD.html
+
+Il report è autocontenuto e si apre anche senza internet: plotly.js è inserito una sola
+volta nel <head> (copia locale in .cache_report/), i grafici contengono solo i dati.
+Layout e testi sono in template_report/ (pagina + una sezione per file).
+
+Ogni sezione ha un'impronta calcolata sulle sole colonne da cui dipende (più template e
+versione): se non è cambiata il frammento HTML già renderizzato è ripreso da
+.cache_report/sezioni/ e solo le sezioni con dati cambiati sono ricostruite.
 """
 
+import argparse
+import hashlib
+import os
+import tempfile
 import pandas as pd
 from datetime import datetime
+from html import escape
+from pathlib import Path
+from string import Template
+import plotly
 import plotly.express as px
 import plotly.graph_objects as go
-
-def genera_html_report():
-    """Genera report HTML completo"""
-
-    print("=" * 80)
-    print("GENERAZIONE REPORT HTML - TELEMEDICINA USL TOSCANA NORD OVEST")
-    print("=" * 80)
-    print()
-
-    # Carica dati
-    print("📊 Caricamento dati...")
-    df_strutture = pd.read_csv('strutture_sanitarie.csv')
-    df_catalogo = pd.read_csv('dotazioni_telemedicina_catalogo.csv')
-    df_dotazioni = pd.read_csv('dotazioni_strutture_telemedicina.csv')
-
-    # Merge
-    df_merge = df_dotazioni.merge(
-        df_catalogo,
-        left_on='Codice_Dotazione',
-        right_on='Codice',
-        how='left'
+from plotly.offline import get_plotlyjs
+
+from motore_fabbisogno import (
+    ETICHETTA_IMPORTI, carica_fabbisogno, centesimi_a_euro, colonne_euro, formatta_euro, seleziona_importi
+)
+
+CARTELLA_TEMPLATE = Path('template_report')
+CARTELLA_CACHE = Path('.cache_report')
+CARTELLA_SEZIONI = CARTELLA_CACHE / 'sezioni'
+
+# Sezioni del report nell'ordine di pagina (un file template_report/<nome>.html ciascuna)
+SEZIONI_REPORT = ['executive', 'finanziamento', 'dotazioni', 'priorita_pnrr', 'strutture']
+
+# Da incrementare quando cambia il codice che produce una sezione: invalida i frammenti salvati
+VERSIONE_SEZIONI = 1
+
+# Frammenti tenuti in cache per sezione (uno per ogni ambito/versione dei dati usati di recente)
+MASSIMO_FRAMMENTI = 200
+
+# Intestazione del report dell'intera ASL (i report per zona/struttura la estendono)
+AMBITO_ASL = 'USL Toscana Nord Ovest'
+
+SEGNAPOSTO_PLOTLYJS = '<!-- PLOTLYJS -->'
+SEGNAPOSTO_SEZIONI = '<!-- SEZIONI -->'
+
+# Letti una volta per processo e condivisi da tutti i grafici e i report generati
+_TEMPLATE = {}
+_BUNDLE_PLOTLY = {}
+
+
+def bundle_plotly():
+    """
+    plotly.js minificato da inserire inline nel report (niente CDN: le postazioni di reparto
+    sono senza internet). La copia della versione installata è salvata in .cache_report/
+    la prima volta e poi letta dal disco una sola volta per processo.
+    """
+    versione = plotly.__version__
+    if versione not in _BUNDLE_PLOTLY:
+        percorso = CARTELLA_CACHE / f"plotly-{versione}.min.js"
+        if not percorso.exists():
+            CARTELLA_CACHE.mkdir(exist_ok=True)
+            # Temporaneo univoco: esecuzioni contemporanee non si troncano a vicenda
+            fd, temporaneo = tempfile.mkstemp(dir=CARTELLA_CACHE, prefix=f'.{percorso.name}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(get_plotlyjs())
+                os.replace(temporaneo, percorso)
+            except BaseException:
+                Path(temporaneo).unlink(missing_ok=True)
+                raise
+        _BUNDLE_PLOTLY[versione] = percorso.read_text(encoding='utf-8')
+    return _BUNDLE_PLOTLY[versione]
+
+
+def carica_template(nome):
+    """Template di template_report/<nome>.html (segnaposto $nome), compilato una volta per processo"""
+    if nome not in _TEMPLATE:
+        _TEMPLATE[nome] = Template((CARTELLA_TEMPLATE / f"{nome}.html").read_text(encoding='utf-8'))
+    return _TEMPLATE[nome]
+
+
+def renderizza(nome, valori):
+    """Frammento HTML di una sezione con i valori già formattati"""
+    return carica_template(nome).substitute(valori)
+
+
+def grafico_html(fig, div_id):
+    """Solo <div> e script del grafico: plotly.js è nel <head> della pagina"""
+    return fig.to_html(full_html=False, include_plotlyjs=False, div_id=div_id)
+
+
+def percentuale(parte, totale):
+    """Percentuale con un decimale come nel resto del report ('0.0%' se il totale è nullo)"""
+    return f"{parte / totale * 100:.1f}%" if totale else "0.0%"
+
+
+def scrivi_report(percorso, valori, sezioni):
+    """
+    Scrive la pagina a blocchi: intestazione, bundle plotly.js, sezioni già renderizzate e
+    piè di pagina vanno su file uno dopo l'altro, senza comporre l'HTML completo in memoria.
+    """
+    pagina = carica_template('pagina').substitute(valori)
+    testa, resto = pagina.split(SEGNAPOSTO_PLOTLYJS)
+    corpo, coda = resto.split(SEGNAPOSTO_SEZIONI)
+    with open(percorso, 'w', encoding='utf-8') as f:
+        f.write(testa)
+        f.write('<script type="text/javascript">')
+        f.write(bundle_plotly())
+        f.write('</script>')
+        f.write(corpo)
+        for sezione in sezioni:
+            f.write(sezione)
+        f.write(coda)
+
+
+def impronta_sezione(nome, *ingressi):
+    """
+    Impronta di una sezione: template, versione delle sezioni e di plotly e dati da cui
+    dipende (DataFrame con hash per riga, altri valori con repr). Cambia solo se cambia
+    qualcosa che finisce nel frammento renderizzato.
+    """
+    sha = hashlib.sha256()
+    sha.update(f"{nome}|{VERSIONE_SEZIONI}|{plotly.__version__}|".encode('utf-8'))
+    sha.update(carica_template(nome).template.encode('utf-8'))
+    for ingresso in ingressi:
+        if isinstance(ingresso, pd.DataFrame):
+            sha.update('|'.join(map(str, ingresso.columns)).encode('utf-8'))
+            sha.update(pd.util.hash_pandas_object(ingresso, index=False).to_numpy().tobytes())
+        else:
+            sha.update(repr(ingresso).encode('utf-8'))
+    return sha.hexdigest()[:16]
+
+
+def frammento_sezione(nome, ingressi, calcola_valori, rigenera=False):
+    """
+    Frammento HTML di una sezione: letto da .cache_report/sezioni/ se gli ingressi non sono
+    cambiati, altrimenti renderizzato (calcola_valori è chiamata solo in questo caso) e salvato.
+    Per ogni sezione restano i MASSIMO_FRAMMENTI usati più di recente.
+    Restituisce (frammento, rigenerato).
+    """
+    percorso = CARTELLA_SEZIONI / f"{nome}_{impronta_sezione(nome, *ingressi)}.html"
+    if not rigenera and percorso.exists():
+        os.utime(percorso)
+        return percorso.read_text(encoding='utf-8'), False
+
+    frammento = renderizza(nome, calcola_valori())
+    try:
+        CARTELLA_SEZIONI.mkdir(parents=True, exist_ok=True)
+        temporaneo = percorso.with_suffix(f'.{os.getpid()}.tmp')
+        temporaneo.write_text(frammento, encoding='utf-8')
+        temporaneo.replace(percorso)
+        salvati = sorted(CARTELLA_SEZIONI.glob(f"{nome}_*.html"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for vecchio in salvati[MASSIMO_FRAMMENTI:]:
+            vecchio.unlink(missing_ok=True)
+    except OSError:
+        pass  # cache non scrivibile (o file rimosso da un altro processo): il frammento è comunque valido
+    return frammento, True
+
+
+def righe_html(righe):
+    """Righe <tr> di una tabella dalle celle già formattate (testo con escape HTML)"""
+    return '\n'.join(
+        '                        <tr>' + ''.join(f'<td>{escape(str(cella))}</td>' for cella in riga) + '</tr>'
+        for riga in righe
     )
 
-    df_merge['Quantita_Da_Acquistare'] = df_merge['Quantita_Richiesta'] - df_merge['Quantita_Presente']
-    df_merge['Quantita_Da_Acquistare'] = df_merge['Quantita_Da_Acquistare'].clip(lower=0)
-    df_merge['Costo_Totale'] = df_merge['Quantita_Da_Acquistare'] * df_merge['Costo_Unitario_EUR']
-
-    df_merge = df_merge.merge(
-        df_strutture[['Codice', 'Nome_Struttura', 'Tipologia', 'Zona', 'PNRR']],
-        left_on='Codice_Struttura',
-        right_on='Codice',
-        how='left',
-        suffixes=('', '_Strutt')
-    )
 
+def scrivi_report_html(filename, df_strutture, df_merge, lordo=False, ambito=AMBITO_ASL, rigenera=False):
+    """
+    Scrive il report dalle strutture e dal fabbisogno già arricchito (vista netto/lordo già
+    selezionata): l'intero territorio o una sua parte (ambito: es. 'USL Toscana Nord Ovest - Zona Versilia').
+    Ogni sezione dipende solo dalle colonne indicate nei suoi ingressi ed è renderizzata solo se
+    questi sono cambiati dall'ultima generazione (rigenera=True: tutte le sezioni).
+    Restituisce i totali da finanziare in centesimi e le sezioni rigenerate.
+    """
     # Calcoli
     n_strutture = len(df_strutture)
     n_cdc = len(df_strutture[df_strutture['Tipologia'] == 'CdC'])
     n_odc = len(df_strutture[df_strutture['Tipologia'] == 'OdC'])
     n_pnrr = len(df_strutture[df_strutture['PNRR'] == 'SI'])
-    n_non_pnrr = len(df_strutture[df_strutture['PNRR'] == 'NO'])
 
     df_da_acq = df_merge[df_merge['Stato_Finanziamento'] == 'DA_ACQUISTARE']
     df_finanz = df_merge[df_merge['Stato_Finanziamento'] == 'FINANZIATO']
     df_presente = df_merge[df_merge['Stato_Finanziamento'] == 'PRESENTE']
 
-    costo_da_acq_pnrr = df_da_acq[df_da_acq['PNRR'] == 'SI']['Costo_Totale'].sum()
-    costo_da_acq_no = df_da_acq[df_da_acq['PNRR'] == 'NO']['Costo_Totale'].sum()
-    costo_finanz = (df_finanz['Quantita_Richiesta'] * df_finanz['Costo_Unitario_EUR']).sum()
-    costo_presente = (df_presente['Quantita_Presente'] * df_presente['Costo_Unitario_EUR']).sum()
-
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    filename = f"report_direzione_telemedicina_{timestamp}.html"
-
-    print(f"📝 Generazione grafici...")
-
-    # GRAFICO 1: Torta finanziamento
-    fig_pie = go.Figure(data=[go.Pie(
-        labels=['DA FINANZIARE<br>(PNRR)', 'DA FINANZIARE<br>(non-PNRR)', 'GIÀ FINANZIATO', 'GIÀ PRESENTE'],
-        values=[costo_da_acq_pnrr, costo_da_acq_no, costo_finanz, costo_presente],
-        hole=0.4,
-        marker=dict(colors=['#d62728', '#ff7f0e', '#2ca02c', '#1f77b4']),
-        textinfo='label+percent+value',
-        texttemplate='%{label}<br>€%{value:,.0f}<br>(%{percent})',
-        hovertemplate='%{label}<br>€%{value:,.0f}<br>%{percent}<extra></extra>'
-    )])
-    fig_pie.update_layout(
-        title="Distribuzione Finanziamento",
-        height=400,
-        showlegend=True,
-        legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5)
-    )
+    costo_da_acq_pnrr = df_da_acq[df_da_acq['PNRR'] == 'SI']['Costo_Totale_Cent'].sum()
+    costo_da_acq_no = df_da_acq[df_da_acq['PNRR'] == 'NO']['Costo_Totale_Cent'].sum()
+    costo_finanz = df_finanz['Costo_Gia_Finanziato_Cent'].sum()
+    costo_presente = df_presente['Costo_Presente_Cent'].sum()
+    totale = costo_da_acq_pnrr + costo_da_acq_no + costo_finanz + costo_presente
+
+    # Dati da cui dipende ciascuna sezione (le impronte sono calcolate su queste colonne)
+    finanziamento = df_merge[[
+        'Stato_Finanziamento', 'PNRR', 'Costo_Totale_Cent', 'Costo_Gia_Finanziato_Cent', 'Costo_Presente_Cent'
+    ]]
+    dotazioni = df_da_acq[['Descrizione', 'Costo_Unitario_Cent', 'Quantita_Da_Acquistare', 'Costo_Totale_Cent']]
+    pnrr = df_da_acq.loc[df_da_acq['PNRR'] == 'SI', ['Nome_Struttura', 'Zona', 'Tipologia', 'Costo_Totale_Cent']]
+    strutture = df_merge[[
+        'Nome_Struttura', 'Zona', 'Tipologia', 'PNRR',
+        'Costo_Totale_Cent', 'Costo_Da_Finanziare_Cent', 'Costo_Gia_Finanziato_Cent', 'Costo_Presente_Cent'
+    ]]
+
+    def valori_executive():
+        return {
+            'n_strutture': n_strutture, 'n_cdc': n_cdc, 'n_odc': n_odc, 'n_pnrr': n_pnrr,
+            'perc_strutture_pnrr': percentuale(n_pnrr, n_strutture),
+            'kpi_da_finanziare': formatta_euro(costo_da_acq_pnrr + costo_da_acq_no, 0),
+            'kpi_da_finanziare_pnrr': formatta_euro(costo_da_acq_pnrr, 0),
+            'kpi_da_finanziare_no': formatta_euro(costo_da_acq_no, 0),
+            'kpi_finanziato': formatta_euro(costo_finanz, 0),
+            'kpi_presente': formatta_euro(costo_presente, 0),
+        }
+
+    def valori_finanziamento():
+        # GRAFICO 1: Torta finanziamento
+        fig_pie = go.Figure(data=[go.Pie(
+            labels=['DA FINANZIARE<br>(PNRR)', 'DA FINANZIARE<br>(non-PNRR)', 'GIÀ FINANZIATO', 'GIÀ PRESENTE'],
+            values=centesimi_a_euro([costo_da_acq_pnrr, costo_da_acq_no, costo_finanz, costo_presente]),
+            hole=0.4,
+            marker=dict(colors=['#d62728', '#ff7f0e', '#2ca02c', '#1f77b4']),
+            textinfo='label+percent+value',
+            texttemplate='%{label}<br>€%{value:,.0f}<br>(%{percent})',
+            hovertemplate='%{label}<br>€%{value:,.0f}<br>%{percent}<extra></extra>'
+        )])
+        fig_pie.update_layout(
+            title="Distribuzione Finanziamento",
+            height=400,
+            showlegend=True,
+            legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5)
+        )
+        return {
+            'da_finanziare': formatta_euro(costo_da_acq_pnrr + costo_da_acq_no),
+            'da_finanziare_pnrr': formatta_euro(costo_da_acq_pnrr),
+            'da_finanziare_no': formatta_euro(costo_da_acq_no),
+            'finanziato': formatta_euro(costo_finanz),
+            'presente': formatta_euro(costo_presente),
+            'quota_pnrr': percentuale(costo_da_acq_pnrr, costo_da_acq_pnrr + costo_da_acq_no),
+            'perc_da_finanziare': percentuale(costo_da_acq_pnrr + costo_da_acq_no, totale),
+            'perc_da_finanziare_pnrr': percentuale(costo_da_acq_pnrr, totale),
+            'perc_da_finanziare_no': percentuale(costo_da_acq_no, totale),
+            'perc_finanziato': percentuale(costo_finanz, totale),
+            'perc_presente': percentuale(costo_presente, totale),
+            'grafico_torta': grafico_html(fig_pie, 'pie'),
+        }
+
+    def valori_dotazioni():
+        # GRAFICO 2: Bar chart fabbisogno per dotazione
+        top_dotazioni = dotazioni.groupby(['Descrizione', 'Costo_Unitario_Cent']).agg({
+            'Quantita_Da_Acquistare': 'sum',
+            'Costo_Totale_Cent': 'sum'
+        }).reset_index().sort_values('Costo_Totale_Cent', ascending=False).head(10)
+        top_dotazioni = colonne_euro(top_dotazioni)
+
+        # Pre-formatto i valori con punto come separatore
+        top_dotazioni['Testo_Costo'] = top_dotazioni['Costo_Totale_Cent'].apply(lambda x: formatta_euro(x, 0).replace(',', '.'))
+
+        fig_bar = px.bar(
+            top_dotazioni,
+            x='Costo_Totale',
+            y='Descrizione',
+            orientation='h',
+            title='Top 10 Dotazioni per Costo Totale',
+            labels={'Costo_Totale': 'Costo Totale (€)', 'Descrizione': 'Dotazione'},
+            text='Testo_Costo'
+        )
+        fig_bar.update_traces(textposition='outside')
+        fig_bar.update_layout(yaxis={'categoryorder': 'total ascending'}, height=500)
+        return {'grafico_barre': grafico_html(fig_bar, 'bar')}
+
+    def valori_priorita_pnrr():
+        per_struttura = pnrr.groupby(['Nome_Struttura', 'Zona', 'Tipologia'], dropna=False)['Costo_Totale_Cent'].sum()
+        per_struttura = per_struttura[per_struttura > 0].sort_values(ascending=False).reset_index()
+        return {
+            'n_strutture_pnrr': len(per_struttura),
+            'da_finanziare_pnrr': formatta_euro(costo_da_acq_pnrr),
+            'righe': righe_html(
+                (r.Nome_Struttura, r.Zona, r.Tipologia, formatta_euro(r.Costo_Totale_Cent),
+                 percentuale(r.Costo_Totale_Cent, costo_da_acq_pnrr))
+                for r in per_struttura.fillna('').itertuples()
+            ),
+        }
+
+    def valori_strutture():
+        per_struttura = strutture.groupby(['Nome_Struttura', 'Zona', 'Tipologia', 'PNRR'], dropna=False).sum()
+        per_struttura = per_struttura.reset_index().sort_values(
+            ['PNRR', 'Costo_Totale_Cent'], ascending=[False, False]
+        )
+        return {
+            'righe': righe_html(
+                (r.Nome_Struttura, r.Zona, r.Tipologia, r.PNRR, formatta_euro(r.Costo_Totale_Cent),
+                 formatta_euro(r.Costo_Da_Finanziare_Cent), formatta_euro(r.Costo_Gia_Finanziato_Cent),
+                 formatta_euro(r.Costo_Presente_Cent))
+                for r in per_struttura.fillna('').itertuples()
+            ),
+        }
+
+    sezioni = {
+        'executive': ([df_strutture[['Tipologia', 'PNRR']], finanziamento], valori_executive),
+        'finanziamento': ([finanziamento], valori_finanziamento),
+        'dotazioni': ([dotazioni], valori_dotazioni),
+        'priorita_pnrr': ([pnrr, costo_da_acq_pnrr], valori_priorita_pnrr),
+        'strutture': ([strutture], valori_strutture),
+    }
+
+    # Genera HTML: sezioni dalla cache o dal template, grafici senza plotly.js (il bundle è inline una volta sola)
+    frammenti, rigenerate = [], []
+    for nome in SEZIONI_REPORT:
+        ingressi, calcola_valori = sezioni[nome]
+        frammento, rigenerato = frammento_sezione(nome, ingressi, calcola_valori, rigenera=rigenera)
+        frammenti.append(frammento)
+        if rigenerato:
+            rigenerate.append(nome)
+
+    valori_pagina = {
+        'generato': datetime.now().strftime("%d/%m/%Y alle %H:%M"),
+        'ambito': ambito,
+        'importi': ETICHETTA_IMPORTI[lordo],
+        'da_finanziare_pnrr': formatta_euro(costo_da_acq_pnrr),
+    }
+    scrivi_report(filename, valori_pagina, frammenti)
+
+    return {
+        'Da_Finanziare_PNRR_Cent': costo_da_acq_pnrr,
+        'Da_Finanziare_No_Cent': costo_da_acq_no,
+        'Sezioni_Rigenerate': rigenerate,
+    }
+
+
+def genera_html_report(lordo=False, rigenera=False):
+    """
+    Genera report HTML completo (lordo=True: importi IVA inclusa). Le sezioni i cui dati non
+    sono cambiati dall'ultima generazione sono riprese dalla cache (rigenera=True: tutte).
+    """
 
-    # GRAFICO 2: Bar chart fabbisogno per dotazione
-    top_dotazioni = df_da_acq.groupby(['Descrizione', 'Costo_Unitario_EUR']).agg({
-        'Quantita_Da_Acquistare': 'sum',
-        'Costo_Totale': 'sum'
-    }).reset_index().sort_values('Costo_Totale', ascending=False).head(10)
-
-    # Pre-formatto i valori con punto come separatore
-    top_dotazioni['Testo_Costo'] = top_dotazioni['Costo_Totale'].apply(lambda x: f'€{x:,.0f}'.replace(',', '.'))
-
-    fig_bar = px.bar(
-        top_dotazioni,
-        x='Costo_Totale',
-        y='Descrizione',
-        orientation='h',
-        title='Top 10 Dotazioni per Costo Totale',
-        labels={'Costo_Totale': 'Costo Totale (€)', 'Descrizione': 'Dotazione'},
-        text='Testo_Costo'
-    )
-    fig_bar.update_traces(textposition='outside')
-    fig_bar.update_layout(yaxis={'categoryorder': 'total ascending'}, height=500)
+    print("=" * 80)
+    print("GENERAZIONE REPORT HTML - TELEMEDICINA USL TOSCANA NORD OVEST")
+    print("=" * 80)
+    print()
 
-    # Genera HTML
-    print(f"📝 Generazione HTML: {filename}")
+    # Carica dati e calcola fabbisogno (importi in centesimi)
+    print("📊 Caricamento dati...")
+    df_strutture, df_catalogo, df_dotazioni, df_merge = carica_fabbisogno()
+    df_merge = seleziona_importi(df_merge, lordo=lordo)
+    print(f"💶 Importi {ETICHETTA_IMPORTI[lordo]}")
 
-    html_content = f"""
-<!DOCTYPE html>
-<html lang="it">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Report Direzione - Telemedicina USL Toscana Nord Ovest</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            padding: 20px;
-            color: #333;
-        }}
-
-        .container {{
-            max-width: 1400px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 20px;
-            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-            overflow: hidden;
-        }}
-
-        .header {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 40px;
-            text-align: center;
-        }}
-
-        .header h1 {{
-            font-size: 2.5em;
-            margin-bottom: 10px;
-            text-shadow: 2px 2px 4px rgba(0,0,0,0.2);
-        }}
-
-        .header p {{
-            font-size: 1.2em;
-            opacity: 0.95;
-        }}
-
-        .alert-banner {{
-            background: linear-gradient(90deg, #d62728 0%, #ff6b6b 100%);
-            color: white;
-            padding: 20px;
-            text-align: center;
-            font-size: 1.3em;
-            font-weight: bold;
-            border-bottom: 4px solid #a00;
-        }}
-
-        .alert-banner .deadline {{
-            font-size: 1.5em;
-            animation: pulse 2s infinite;
-        }}
-
-        @keyframes pulse {{
-            0%, 100% {{ opacity: 1; }}
-            50% {{ opacity: 0.7; }}
-        }}
-
-        .nav {{
-            background: #f8f9fa;
-            padding: 15px;
-            display: flex;
-            justify-content: center;
-            flex-wrap: wrap;
-            gap: 10px;
-            border-bottom: 2px solid #dee2e6;
-            position: sticky;
-            top: 0;
-            z-index: 1000;
-        }}
-
-        .nav a {{
-            text-decoration: none;
-            color: #495057;
-            padding: 10px 20px;
-            border-radius: 25px;
-            background: white;
-            border: 2px solid #dee2e6;
-            transition: all 0.3s;
-            font-weight: 500;
-        }}
-
-        .nav a:hover {{
-            background: #667eea;
-            color: white;
-            border-color: #667eea;
-            transform: translateY(-2px);
-            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-        }}
-
-        .content {{
-            padding: 40px;
-        }}
-
-        .section {{
-            margin-bottom: 50px;
-            scroll-margin-top: 70px;
-        }}
-
-        .section h2 {{
-            font-size: 2em;
-            color: #667eea;
-            margin-bottom: 20px;
-            padding-bottom: 10px;
-            border-bottom: 3px solid #667eea;
-        }}
-
-        .kpi-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 20px;
-            margin: 30px 0;
-        }}
-
-        .kpi-card {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 30px;
-            border-radius: 15px;
-            box-shadow: 0 10px 25px rgba(0,0,0,0.1);
-            transition: transform 0.3s;
-        }}
-
-        .kpi-card:hover {{
-            transform: translateY(-5px);
-            box-shadow: 0 15px 35px rgba(0,0,0,0.2);
-        }}
-
-        .kpi-card.red {{
-            background: linear-gradient(135deg, #d62728 0%, #ff6b6b 100%);
-        }}
-
-        .kpi-card.green {{
-            background: linear-gradient(135deg, #2ca02c 0%, #4caf50 100%);
-        }}
-
-        .kpi-card.blue {{
-            background: linear-gradient(135deg, #1f77b4 0%, #42a5f5 100%);
-        }}
-
-        .kpi-label {{
-            font-size: 0.9em;
-            opacity: 0.9;
-            margin-bottom: 10px;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }}
-
-        .kpi-value {{
-            font-size: 2.5em;
-            font-weight: bold;
-            margin-bottom: 5px;
-        }}
-
-        .kpi-note {{
-            font-size: 0.85em;
-            opacity: 0.85;
-        }}
-
-        .chart-container {{
-            background: white;
-            padding: 20px;
-            border-radius: 15px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.08);
-            margin: 20px 0;
-        }}
-
-        .info-box {{
-            background: #e3f2fd;
-            border-left: 4px solid #2196f3;
-            padding: 20px;
-            margin: 20px 0;
-            border-radius: 5px;
-        }}
-
-        .info-box.warning {{
-            background: #fff3e0;
-            border-left-color: #ff9800;
-        }}
-
-        .info-box.success {{
-            background: #e8f5e9;
-            border-left-color: #4caf50;
-        }}
-
-        .info-box h3 {{
-            margin-bottom: 10px;
-            color: #1976d2;
-        }}
-
-        .info-box.warning h3 {{
-            color: #f57c00;
-        }}
-
-        .info-box.success h3 {{
-            color: #388e3c;
-        }}
-
-        table {{
-            width: 100%;
-            border-collapse: collapse;
-            margin: 20px 0;
-            background: white;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            border-radius: 10px;
-            overflow: hidden;
-        }}
-
-        th {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 15px;
-            text-align: left;
-            font-weight: 600;
-        }}
-
-        td {{
-            padding: 12px 15px;
-            border-bottom: 1px solid #f0f0f0;
-        }}
-
-        tr:hover {{
-            background: #f8f9fa;
-        }}
-
-        .footer {{
-            background: #f8f9fa;
-            padding: 30px;
-            text-align: center;
-            color: #6c757d;
-            border-top: 2px solid #dee2e6;
-        }}
-
-        @media print {{
-            body {{
-                background: white;
-            }}
-            .nav {{
-                display: none;
-            }}
-            .container {{
-                box-shadow: none;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <!-- Header -->
-        <div class="header">
-            <h1>🏥 Report Direzione Telemedicina</h1>
-            <p>USL Toscana Nord Ovest - Dotazioni Tecnologiche CDC/ODC</p>
-            <p style="font-size: 0.9em; opacity: 0.8; margin-top: 10px;">Generato il {datetime.now().strftime("%d/%m/%Y alle %H:%M")}</p>
-        </div>
-
-        <!-- Alert Banner -->
-        <div class="alert-banner">
-            ⚠️ ATTENZIONE: Scadenza PNRR <span class="deadline">MARZO 2026</span> - €{costo_da_acq_pnrr:,.2f} da rendicontare
-        </div>
-
-        <!-- Navigation -->
-        <div class="nav">
-            <a href="#executive">Executive Summary</a>
-            <a href="#finanziamento">Analisi Finanziamento</a>
-            <a href="#dotazioni">Dotazioni</a>
-        </div>
-
-        <!-- Content -->
-        <div class="content">
-            <!-- Executive Summary -->
-            <div id="executive" class="section">
-                <h2>📊 Executive Summary</h2>
-
-                <div class="kpi-grid">
-                    <div class="kpi-card">
-                        <div class="kpi-label">Strutture Totali</div>
-                        <div class="kpi-value">{n_strutture}</div>
-                        <div class="kpi-note">{n_cdc} CDC + {n_odc} ODC</div>
-                    </div>
-
-                    <div class="kpi-card red">
-                        <div class="kpi-label">Fabbisogno Totale</div>
-                        <div class="kpi-value">€{costo_da_acq_pnrr + costo_da_acq_no:,.0f}</div>
-                        <div class="kpi-note">Nuovo finanziamento richiesto</div>
-                    </div>
-
-                    <div class="kpi-card red">
-                        <div class="kpi-label">🎯 PNRR (Priorità)</div>
-                        <div class="kpi-value">€{costo_da_acq_pnrr:,.0f}</div>
-                        <div class="kpi-note">Scadenza: Marzo 2026</div>
-                    </div>
-
-                    <div class="kpi-card">
-                        <div class="kpi-label">Non-PNRR</div>
-                        <div class="kpi-value">€{costo_da_acq_no:,.0f}</div>
-                        <div class="kpi-note">Programmabile nel tempo</div>
-                    </div>
-
-                    <div class="kpi-card green">
-                        <div class="kpi-label">Già Finanziato</div>
-                        <div class="kpi-value">€{costo_finanz:,.0f}</div>
-                        <div class="kpi-note">Budget allocato</div>
-                    </div>
-
-                    <div class="kpi-card blue">
-                        <div class="kpi-label">Già Presente</div>
-                        <div class="kpi-value">€{costo_presente:,.0f}</div>
-                        <div class="kpi-note">Valore esistente</div>
-                    </div>
-
-                    <div class="kpi-card">
-                        <div class="kpi-label">Strutture PNRR</div>
-                        <div class="kpi-value">{n_pnrr}</div>
-                        <div class="kpi-note">{n_pnrr/n_strutture*100:.1f}% del totale</div>
-                    </div>
-                </div>
-            </div>
-
-            <!-- Analisi Finanziamento -->
-            <div id="finanziamento" class="section">
-                <h2>💸 Analisi Finanziamento</h2>
-
-                <div class="info-box warning">
-                    <h3>📌 Punti Chiave</h3>
-                    <ul style="margin-left: 20px; line-height: 1.8;">
-                        <li><strong>€{costo_da_acq_pnrr + costo_da_acq_no:,.2f}</strong> di investimento necessario per completare la rete</li>
-                        <li>Il <strong>{costo_da_acq_pnrr/(costo_da_acq_pnrr + costo_da_acq_no)*100:.1f}%</strong> sono fondi PNRR con scadenza obbligatoria</li>
-                        <li>La rete ha già <strong>€{costo_presente:,.2f}</strong> di dotazioni operative</li>
-                    </ul>
-                </div>
-
-                <div class="chart-container">
-                    {fig_pie.to_html(include_plotlyjs=False, div_id="pie")}
-                </div>
-
-                <table>
-                    <thead>
-                        <tr>
-                            <th>Categoria</th>
-                            <th>Importo</th>
-                            <th>Percentuale</th>
-                            <th>Note</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        <tr style="background: #ffebee;">
-                            <td><strong>🔴 DA FINANZIARE</strong></td>
-                            <td><strong>€{costo_da_acq_pnrr + costo_da_acq_no:,.2f}</strong></td>
-                            <td><strong>{(costo_da_acq_pnrr + costo_da_acq_no)/(costo_da_acq_pnrr + costo_da_acq_no + costo_finanz + costo_presente)*100:.1f}%</strong></td>
-                            <td>Richiede approvazione immediata</td>
-                        </tr>
-                        <tr>
-                            <td>  └─ PNRR (priorità)</td>
-                            <td>€{costo_da_acq_pnrr:,.2f}</td>
-                            <td>{costo_da_acq_pnrr/(costo_da_acq_pnrr + costo_da_acq_no + costo_finanz + costo_presente)*100:.1f}%</td>
-                            <td>⚠️ Scadenza: Marzo 2026</td>
-                        </tr>
-                        <tr>
-                            <td>  └─ Non-PNRR</td>
-                            <td>€{costo_da_acq_no:,.2f}</td>
-                            <td>{costo_da_acq_no/(costo_da_acq_pnrr + costo_da_acq_no + costo_finanz + costo_presente)*100:.1f}%</td>
-                            <td>Programmabile nel tempo</td>
-                        </tr>
-                        <tr style="background: #e8f5e9;">
-                            <td><strong>🟢 GIÀ FINANZIATO</strong></td>
-                            <td><strong>€{costo_finanz:,.2f}</strong></td>
-                            <td><strong>{costo_finanz/(costo_da_acq_pnrr + costo_da_acq_no + costo_finanz + costo_presente)*100:.1f}%</strong></td>
-                            <td>Budget già allocato</td>
-                        </tr>
-                        <tr style="background: #e3f2fd;">
-                            <td><strong>🔵 GIÀ PRESENTE</strong></td>
-                            <td><strong>€{costo_presente:,.2f}</strong></td>
-                            <td><strong>{costo_presente/(costo_da_acq_pnrr + costo_da_acq_no + costo_finanz + costo_presente)*100:.1f}%</strong></td>
-                            <td>Dotazioni operative</td>
-                        </tr>
-                    </tbody>
-                </table>
-            </div>
-
-            <!-- Dotazioni -->
-            <div id="dotazioni" class="section">
-                <h2>🔬 Fabbisogno per Dotazione</h2>
-
-                <div class="info-box">
-                    <h3>📋 Conformità Normativa</h3>
-                    <p>Le dotazioni rispettano le <strong>linee guida DM 77/2022</strong> per le dotazioni minime standard di CDC e ODC.</p>
-                </div>
-
-                <div class="chart-container">
-                    {fig_bar.to_html(include_plotlyjs=False, div_id="bar")}
-                </div>
-            </div>
-        </div>
-
-        <!-- Footer -->
-        <div class="footer">
-            <p><strong>USL Toscana Nord Ovest</strong> - Report Direzione Telemedicina</p>
-            <p>Generato il {datetime.now().strftime("%d/%m/%Y alle %H:%M")}</p>
-            <p style="margin-top: 10px; font-size: 0.9em;">
-                Per informazioni e supporto: <strong>UOC Tecnologie</strong>
-            </p>
-        </div>
-    </div>
-</body>
-</html>
-"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    suffisso = '_lordo' if lordo else ''
+    filename = f"report_direzione_telemedicina_{timestamp}{suffisso}.html"
 
-    # Scrivi file
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    print(f"📝 Generazione HTML: {filename}")
+    totali = scrivi_report_html(filename, df_strutture, df_merge, lordo=lordo, rigenera=rigenera)
+    costo_da_acq_pnrr, costo_da_acq_no = totali['Da_Finanziare_PNRR_Cent'], totali['Da_Finanziare_No_Cent']
+    rigenerate = totali['Sezioni_Rigenerate']
+    print(f"♻️  Sezioni rigenerate: {len(rigenerate)}/{len(SEZIONI_REPORT)} "
+          f"({', '.join(rigenerate) if rigenerate else 'nessuna, tutte dalla cache'})")
 
     print(f"\n✅ Report HTML generato: {filename}")
     print(f"\n📊 RIEPILOGO:")
-    print(f"  • Fabbisogno PNRR (priorità):  € {costo_da_acq_pnrr:,.2f}")
-    print(f"  • Fabbisogno non-PNRR:         € {costo_da_acq_no:,.2f}")
-    print(f"  • TOTALE DA FINANZIARE:        € {costo_da_acq_pnrr + costo_da_acq_no:,.2f}")
+    print(f"  • Fabbisogno PNRR (priorità):  {formatta_euro(costo_da_acq_pnrr, prefisso='€ ')}")
+    print(f"  • Fabbisogno non-PNRR:         {formatta_euro(costo_da_acq_no, prefisso='€ ')}")
+    print(f"  • TOTALE DA FINANZIARE:        {formatta_euro(costo_da_acq_pnrr + costo_da_acq_no, prefisso='€ ')}")
     print(f"\n  ⚠️  SCADENZA PNRR: MARZO 2026")
     print(f"\n📱 Per aprire il report:")
     print(f"  • Doppio click su {filename}")
@@ -547,12 +382,17 @@ def genera_html_report():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Genera il report HTML interattivo per la direzione')
+    parser.add_argument('--lordo', action='store_true', help='Importi IVA inclusa (default: IVA esclusa)')
+    parser.add_argument('--rigenera', action='store_true', help='Rigenera tutte le sezioni ignorando la cache')
+    args = parser.parse_args()
+
     print("=" * 80)
     print("GENERAZIONE REPORT HTML INTERATTIVO")
     print("=" * 80)
     print()
 
-    filename = genera_html_report()
+    filename = genera_html_report(lordo=args.lordo, rigenera=args.rigenera)
 
     print("\n" + "=" * 80)
     print("Il report HTML è pronto! User-friendly e pronto per la direzione!")
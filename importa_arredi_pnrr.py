@@ -5,10 +5,66 @@ Estrae solo anagrafiche strutture e sezione "Tipologia Attrezzatura da acquistar
 """
 
 import pandas as pd
-import numpy as np
 
-def estrai_tecnologie_odc():
-    """Estrae tecnologie da file ODC"""
+from motore_fabbisogno import euro_a_centesimi, formatta_euro, importo_per_quantita
+from normalizza_numeri import COLONNE_SCARTI, converti_quantita, converti_valuta, stampa_scarti
+
+COLONNE_TECNOLOGIE = ['Struttura', 'Tipologia', 'Locale', 'Attrezzatura', 'Costo_Unitario', 'Quantita', 'Totale']
+OUTPUT_SCARTI = 'scarti_importazione_arredi.csv'
+
+
+def estrai_voci_tecnologie(df, inizio_tecnologie, strutture, indici_colonne, tipologia, scarti_trovati=None):
+    """
+    Estrae le voci della sezione tecnologie convertendo costi e quantità per colonne intere.
+    Le celle non interpretabili non vengono azzerate ma aggiunte con le coordinate (riga/colonna
+    del CSV sorgente) alla lista scarti_trovati, se indicata.
+    """
+    sezione = df.iloc[inizio_tecnologie:]
+    sezione = sezione[sezione[1].notna() & (sezione[1].astype(str).str.strip() != '')]
+
+    costi, scarti_costi = converti_valuta(sezione[2], colonna=2)
+    scarti = [scarti_costi]
+
+    locali = sezione[0].fillna('').astype(str).str.strip()
+    attrezzature = sezione[1].astype(str).str.strip()
+
+    voci = []
+    for ordine, (struttura, col_idx) in enumerate(zip(strutture, indici_colonne)):
+        if col_idx >= df.shape[1]:
+            continue
+        quantita, scarti_qta = converti_quantita(sezione[col_idx], colonna=col_idx)
+        scarti.append(scarti_qta)
+
+        presenti = quantita.fillna(0) > 0  # Solo se c'è una quantità
+        voci.append(pd.DataFrame({
+            'Struttura': struttura,
+            'Tipologia': tipologia,
+            'Locale': locali[presenti],
+            'Attrezzatura': attrezzature[presenti],
+            'Costo_Unitario': costi[presenti],
+            'Quantita': quantita[presenti].astype(int),
+            '_ordine': ordine
+        }))
+
+    scarti = [s.assign(Tipologia=tipologia) for s in scarti if not s.empty]
+    if scarti:
+        if scarti_trovati is not None:
+            scarti_trovati.extend(scarti)
+        stampa_scarti(pd.concat(scarti, ignore_index=True), contesto=f'file {tipologia}')
+
+    if not voci:
+        return pd.DataFrame(columns=COLONNE_TECNOLOGIE)
+
+    # Stesso ordine dell'estrazione riga per riga: riga del foglio, poi struttura
+    df_voci = pd.concat(voci)
+    df_voci['_riga'] = df_voci.index
+    df_voci = df_voci.sort_values(['_riga', '_ordine'], kind='stable')
+    df_voci['Totale'] = importo_per_quantita(df_voci['Costo_Unitario'], df_voci['Quantita'])
+    return df_voci[COLONNE_TECNOLOGIE].reset_index(drop=True)
+
+
+def estrai_tecnologie_odc(scarti=None):
+    """Estrae tecnologie da file ODC (celle non numeriche aggiunte alla lista scarti, se indicata)"""
     print("📥 Importazione ODC...")
 
     df = pd.read_csv('Stima arredi PNRR.xlsx - OdC.csv', header=None)
@@ -40,51 +96,14 @@ def estrai_tecnologie_odc():
 
     print(f"  📍 Sezione tecnologie inizia a riga {inizio_tecnologie}")
 
-    # Estrai dati tecnologie
-    tecnologie_data = []
-    for idx in range(inizio_tecnologie, len(df)):
-        row = df.iloc[idx]
+    # Estrai dati tecnologie (conversione vettoriale di costi e quantità)
+    df_tecnologie = estrai_voci_tecnologie(df, inizio_tecnologie, strutture, indici_colonne, 'OdC', scarti)
 
-        # Salta righe vuote
-        if pd.isna(row[1]) or str(row[1]).strip() == '':
-            continue
+    print(f"  ✅ Estratte {len(df_tecnologie)} voci tecnologie ODC")
+    return df_tecnologie
 
-        locale = str(row[0]).strip() if not pd.isna(row[0]) else ''
-        attrezzatura = str(row[1]).strip()
-        costo_str = str(row[2]).strip()
-
-        # Estrai costo (rimuovi €, virgole, converti)
-        try:
-            costo = float(costo_str.replace('€', '').replace('.', '').replace(',', '.').strip())
-        except:
-            costo = 0.0
-
-        # Per ogni struttura, estrai quantità
-        for i, struttura in enumerate(strutture):
-            col_idx = indici_colonne[i]
-            if col_idx < len(row):
-                qta_str = str(row[col_idx]).strip()
-                try:
-                    qta = int(qta_str) if qta_str and qta_str != 'nan' else 0
-                except:
-                    qta = 0
-
-                if qta > 0:  # Solo se c'è una quantità
-                    tecnologie_data.append({
-                        'Struttura': struttura,
-                        'Tipologia': 'OdC',
-                        'Locale': locale,
-                        'Attrezzatura': attrezzatura,
-                        'Costo_Unitario': costo,
-                        'Quantita': qta,
-                        'Totale': costo * qta
-                    })
-
-    print(f"  ✅ Estratte {len(tecnologie_data)} voci tecnologie ODC")
-    return pd.DataFrame(tecnologie_data)
-
-def estrai_tecnologie_cdc():
-    """Estrae tecnologie da file CDC"""
+def estrai_tecnologie_cdc(scarti=None):
+    """Estrae tecnologie da file CDC (celle non numeriche aggiunte alla lista scarti, se indicata)"""
     print("\n📥 Importazione CDC...")
 
     df = pd.read_csv('Stima arredi PNRR.xlsx - CdC.csv', header=None)
@@ -119,56 +138,24 @@ def estrai_tecnologie_cdc():
     print(f"  📍 Sezione tecnologie inizia a riga {inizio_tecnologie}")
 
     # Estrai dati (stesso metodo di ODC)
-    tecnologie_data = []
-    for idx in range(inizio_tecnologie, len(df)):
-        row = df.iloc[idx]
+    df_tecnologie = estrai_voci_tecnologie(df, inizio_tecnologie, strutture, indici_colonne, 'CdC', scarti)
 
-        if pd.isna(row[1]) or str(row[1]).strip() == '':
-            continue
-
-        locale = str(row[0]).strip() if not pd.isna(row[0]) else ''
-        attrezzatura = str(row[1]).strip()
-        costo_str = str(row[2]).strip()
-
-        try:
-            costo = float(costo_str.replace('€', '').replace('.', '').replace(',', '.').strip())
-        except:
-            costo = 0.0
-
-        for i, struttura in enumerate(strutture):
-            if i < len(indici_colonne):
-                col_idx = indici_colonne[i]
-                if col_idx < len(row):
-                    qta_str = str(row[col_idx]).strip()
-                    try:
-                        qta = int(qta_str) if qta_str and qta_str != 'nan' else 0
-                    except:
-                        qta = 0
-
-                    if qta > 0:
-                        tecnologie_data.append({
-                            'Struttura': struttura,
-                            'Tipologia': 'CdC',
-                            'Locale': locale,
-                            'Attrezzatura': attrezzatura,
-                            'Costo_Unitario': costo,
-                            'Quantita': qta,
-                            'Totale': costo * qta
-                        })
-
-    print(f"  ✅ Estratte {len(tecnologie_data)} voci tecnologie CDC")
-    return pd.DataFrame(tecnologie_data)
+    print(f"  ✅ Estratte {len(df_tecnologie)} voci tecnologie CDC")
+    return df_tecnologie
 
 def main():
     print("="*70)
     print("IMPORTAZIONE TECNOLOGIE DA STIMA ARREDI PNRR")
     print("="*70)
 
+    # Celle non numeriche trovate durante l'estrazione
+    scarti = []
+
     # Estrai ODC
-    df_odc = estrai_tecnologie_odc()
+    df_odc = estrai_tecnologie_odc(scarti)
 
     # Estrai CDC
-    df_cdc = estrai_tecnologie_cdc()
+    df_cdc = estrai_tecnologie_cdc(scarti)
 
     # Combina
     if df_odc is not None and df_cdc is not None:
@@ -191,18 +178,23 @@ def main():
     print(f"📊 Totale voci: {len(df_tecnologie)}")
     print(f"🏥 Strutture: {df_tecnologie['Struttura'].nunique()}")
     print(f"🔧 Attrezzature: {df_tecnologie['Attrezzatura'].nunique()}")
-    print(f"💰 Totale costi: €{df_tecnologie['Totale'].sum():,.2f}")
+    print(f"💰 Totale costi: {formatta_euro(euro_a_centesimi(df_tecnologie['Totale']).sum())}")
     print(f"\n💾 File salvato: {output_file}")
 
+    if scarti:
+        df_scarti = pd.concat(scarti, ignore_index=True)[['Tipologia'] + COLONNE_SCARTI]
+        df_scarti.to_csv(OUTPUT_SCARTI, index=False)
+        print(f"⚠️  {len(df_scarti)} celle non numeriche da verificare: {OUTPUT_SCARTI}")
+
     # Mostra riepilogo per attrezzatura
     print("\n📦 Riepilogo per attrezzatura:")
-    riepilogo = df_tecnologie.groupby('Attrezzatura').agg({
+    riepilogo = df_tecnologie.assign(Totale_Cent=euro_a_centesimi(df_tecnologie['Totale'])).groupby('Attrezzatura').agg({
         'Quantita': 'sum',
-        'Totale': 'sum'
-    }).sort_values('Totale', ascending=False)
+        'Totale_Cent': 'sum'
+    }).sort_values('Totale_Cent', ascending=False)
 
     for idx, row in riepilogo.iterrows():
-        print(f"  • {idx:40} | Qta: {row['Quantita']:3.0f} | €{row['Totale']:,.2f}")
+        print(f"  • {idx:40} | Qta: {row['Quantita']:3.0f} | {formatta_euro(row['Totale_Cent'])}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Script per importare le tecnologie direttamente dai workbook "Stima arredi PNRR*.xlsx"
+Legge tutte le revisioni disponibili in un solo passaggio, senza export CSV manuali:
+ogni coppia (revisione, foglio CdC/OdC) viene estratta in un worker separato
+aprendo il workbook in modalità streaming (openpyxl read-only).
+
+Utilizzo:
+    python importa_stima_arredi_xlsx.py
+    python importa_stima_arredi_xlsx.py "Stima arredi PNRR (2).xlsx" "Stima arredi PNRR (3).xlsx"
+
+Output:
+    tecnologie_arredi_revisioni.csv   (tabella lunga, una riga per revisione/struttura/attrezzatura)
+    diff_revisioni_arredi.csv         (variazioni quantità/costi tra revisioni consecutive)
+    scarti_revisioni_arredi.csv       (celle non numeriche con coordinate, se presenti)
+"""
+
+import argparse
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+from motore_fabbisogno import centesimi_a_euro, euro_a_centesimi, formatta_euro, importo_per_quantita
+from normalizza_numeri import COLONNE_SCARTI, converti_quantita, converti_valuta, stampa_scarti
+
+FOGLI = ['CdC', 'OdC']
+PATTERN_REVISIONE = re.compile(r'^Stima arredi PNRR(?: \((\d+)\))?\.xlsx$')
+
+OUTPUT_REVISIONI = 'tecnologie_arredi_revisioni.csv'
+OUTPUT_DIFF = 'diff_revisioni_arredi.csv'
+OUTPUT_SCARTI = 'scarti_revisioni_arredi.csv'
+
+CHIAVI_DIFF = ['Tipologia', 'Struttura', 'Attrezzatura']
+COLONNE_DIFF = ['Revisione_Da', 'Revisione_A'] + CHIAVI_DIFF + [
+    'Variazione', 'Quantita_Da', 'Quantita_A', 'Delta_Quantita',
+    'Costo_Unitario_Da', 'Costo_Unitario_A', 'Totale_Da', 'Totale_A', 'Delta_Totale'
+]
+
+
+def trova_revisioni(cartella='.'):
+    """Restituisce [(revisione, percorso)] per i workbook Stima arredi, ordinati per revisione"""
+    revisioni = []
+    for percorso in Path(cartella).glob('Stima arredi PNRR*.xlsx'):
+        match = PATTERN_REVISIONE.match(percorso.name)
+        if match:
+            # Il file senza suffisso è la prima revisione
+            revisioni.append((int(match.group(1) or 1), str(percorso)))
+    return sorted(revisioni)
+
+
+def revisione_da_nome(percorso):
+    """Ricava il numero di revisione dal nome file (1 se senza suffisso)"""
+    match = PATTERN_REVISIONE.match(Path(percorso).name)
+    return int(match.group(1) or 1) if match else 1
+
+
+def _e_nome_struttura(valore, foglio):
+    """Riconosce le intestazioni di colonna con il nome struttura (es. 'CdC Carrara')"""
+    if not isinstance(valore, str):
+        return False
+    nome = valore.strip()
+    return nome.lower().startswith(foglio.lower() + ' ') and len(nome) < 50
+
+
+def estrai_foglio(percorso, foglio, revisione):
+    """
+    Estrae la sezione "Tipologia Attrezzatura da acquistare" di un foglio.
+    Le righe vengono lette una alla volta (read-only): la memoria non dipende dalla dimensione del foglio.
+    Restituisce (voci, scarti) con le coordinate Excel delle celle non numeriche.
+    """
+    wb = load_workbook(percorso, read_only=True, data_only=True)
+    try:
+        if foglio not in wb.sheetnames:
+            return pd.DataFrame(), pd.DataFrame(columns=COLONNE_SCARTI)
+        ws = wb[foglio]
+
+        strutture = []       # [(nome, indice colonna "nr.")]
+        in_sezione = False
+        salta_header = False
+        voci = []            # una riga per attrezzatura (costo grezzo)
+        quantita = []        # una riga per cella quantità non vuota
+
+        for idx, row in enumerate(ws.iter_rows(values_only=True)):
+            # Intestazioni strutture nelle prime righe
+            if not strutture and idx < 10:
+                strutture = [(str(val).strip(), col) for col, val in enumerate(row)
+                             if _e_nome_struttura(val, foglio)]
+                continue
+
+            descrizione = row[1] if len(row) > 1 else None
+
+            if not in_sezione:
+                if descrizione and 'Tipologia Attrezzatura' in str(descrizione):
+                    in_sezione = True
+                    salta_header = True
+                continue
+
+            # La riga dopo il titolo è l'header (Locale, Attrezzatura, Importo, nr., ...)
+            if salta_header:
+                salta_header = False
+                continue
+
+            if descrizione is None or str(descrizione).strip() == '':
+                continue
+
+            riga_excel = idx + 1
+            voci.append({
+                'Riga': riga_excel,
+                'Locale': str(row[0]).strip() if row[0] is not None else '',
+                'Attrezzatura': str(descrizione).strip(),
+                'Costo_Grezzo': row[2] if len(row) > 2 else None
+            })
+
+            # La colonna "nr." di ogni struttura è quella del nome struttura
+            for nome, col in strutture:
+                if col < len(row) and row[col] is not None:
+                    quantita.append({
+                        'Riga': riga_excel,
+                        'Colonna': get_column_letter(col + 1),
+                        'Struttura': nome,
+                        'Quantita_Grezza': row[col]
+                    })
+    finally:
+        wb.close()
+
+    if not voci or not quantita:
+        return pd.DataFrame(), pd.DataFrame(columns=COLONNE_SCARTI)
+
+    # Conversione vettoriale di costi e quantità, con coordinate Excel per gli scarti
+    df_voci = pd.DataFrame(voci).set_index('Riga')
+    df_voci['Costo_Unitario'], scarti_costi = converti_valuta(df_voci['Costo_Grezzo'], colonna='C')
+
+    df_qta = pd.DataFrame(quantita)
+    df_qta['Quantita'], scarti_qta = converti_quantita(df_qta['Quantita_Grezza'])
+    if not scarti_qta.empty:
+        # Riporta l'indice posizionale alle coordinate Excel della cella
+        posizioni = scarti_qta['Riga'].to_numpy()
+        scarti_qta['Colonna'] = df_qta.loc[posizioni, 'Colonna'].to_numpy()
+        scarti_qta['Riga'] = df_qta.loc[posizioni, 'Riga'].to_numpy()
+
+    df_qta = df_qta[df_qta['Quantita'].fillna(0) > 0]
+    df = df_qta.merge(df_voci[['Locale', 'Attrezzatura', 'Costo_Unitario']], left_on='Riga', right_index=True)
+
+    df = pd.DataFrame({
+        'Revisione': revisione,
+        'File': Path(percorso).name,
+        'Struttura': df['Struttura'],
+        'Tipologia': foglio,
+        'Locale': df['Locale'],
+        'Attrezzatura': df['Attrezzatura'],
+        'Costo_Unitario': df['Costo_Unitario'],
+        'Quantita': df['Quantita'].astype(int),
+        'Totale': importo_per_quantita(df['Costo_Unitario'], df['Quantita'].astype(int))
+    }).reset_index(drop=True)
+
+    scarti = pd.concat([s for s in [scarti_costi, scarti_qta] if not s.empty] or
+                       [pd.DataFrame(columns=COLONNE_SCARTI)], ignore_index=True)
+    scarti.insert(0, 'Foglio', foglio)
+    scarti.insert(0, 'Revisione', revisione)
+    return df, scarti
+
+
+def importa_revisioni(revisioni, max_workers=None):
+    """
+    Estrae in parallelo tutti i fogli CdC/OdC di tutte le revisioni.
+    Restituisce (tabella lunga, scarti).
+    """
+    compiti = [(percorso, foglio, revisione) for revisione, percorso in revisioni for foglio in FOGLI]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(estrai_foglio, *compito) for compito in compiti]
+        risultati = []
+        tutti_scarti = []
+        for (percorso, foglio, revisione), future in zip(compiti, futures):
+            df, scarti = future.result()
+            print(f"  ✅ Rev. {revisione} - {foglio}: {len(df)} voci ({Path(percorso).name})")
+            stampa_scarti(scarti, contesto=f'rev. {revisione} foglio {foglio}')
+            risultati.append(df)
+            tutti_scarti.append(scarti)
+
+    risultati = [df for df in risultati if not df.empty]
+    tutti_scarti = [s for s in tutti_scarti if not s.empty]
+    df_scarti = pd.concat(tutti_scarti, ignore_index=True) if tutti_scarti else pd.DataFrame()
+    if not risultati:
+        return pd.DataFrame(), df_scarti
+    return pd.concat(risultati, ignore_index=True), df_scarti
+
+
+def calcola_diff_revisioni(df):
+    """Confronta revisioni consecutive per (Tipologia, Struttura, Attrezzatura): quantità e costi"""
+    if df.empty:
+        return pd.DataFrame(columns=COLONNE_DIFF)
+
+    # Somme in centesimi interi: i delta non accumulano errori di arrotondamento
+    aggregato = df.assign(Totale_Cent=euro_a_centesimi(df['Totale'])).groupby(
+        ['Revisione'] + CHIAVI_DIFF, as_index=False
+    ).agg(
+        Quantita=('Quantita', 'sum'),
+        Costo_Unitario=('Costo_Unitario', 'first'),
+        Totale=('Totale_Cent', 'sum')
+    )
+
+    revisioni = sorted(aggregato['Revisione'].unique())
+    diff = []
+    for rev_da, rev_a in zip(revisioni, revisioni[1:]):
+        prima = aggregato[aggregato['Revisione'] == rev_da].drop(columns='Revisione')
+        dopo = aggregato[aggregato['Revisione'] == rev_a].drop(columns='Revisione')
+
+        confronto = prima.merge(dopo, on=CHIAVI_DIFF, how='outer', suffixes=('_Da', '_A'), indicator=True)
+        for col in ['Quantita_Da', 'Quantita_A', 'Totale_Da', 'Totale_A']:
+            confronto[col] = confronto[col].fillna(0)
+
+        confronto['Delta_Quantita'] = confronto['Quantita_A'] - confronto['Quantita_Da']
+        confronto['Delta_Totale'] = confronto['Totale_A'] - confronto['Totale_Da']
+        for col in ['Totale_Da', 'Totale_A', 'Delta_Totale']:
+            confronto[col] = centesimi_a_euro(confronto[col])
+        confronto['Variazione'] = confronto['_merge'].map({
+            'left_only': 'RIMOSSA', 'right_only': 'NUOVA', 'both': 'MODIFICATA'
+        }).astype(str)
+
+        costo_da, costo_a = confronto['Costo_Unitario_Da'], confronto['Costo_Unitario_A']
+        costo_cambiato = (costo_da != costo_a) & ~(costo_da.isna() & costo_a.isna())
+        cambiate = (
+            (confronto['_merge'] != 'both') |
+            (confronto['Delta_Quantita'] != 0) |
+            costo_cambiato
+        )
+        confronto = confronto[cambiate].drop(columns='_merge')
+        confronto.insert(0, 'Revisione_Da', rev_da)
+        confronto.insert(1, 'Revisione_A', rev_a)
+        diff.append(confronto)
+
+    if not diff:
+        return pd.DataFrame(columns=COLONNE_DIFF)
+
+    return pd.concat(diff, ignore_index=True)[COLONNE_DIFF]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importa tecnologie da tutte le revisioni Stima arredi PNRR (.xlsx)')
+    parser.add_argument('file', nargs='*', help='Workbook da importare (default: tutti i "Stima arredi PNRR*.xlsx")')
+    parser.add_argument('--workers', type=int, default=None, help='Numero di processi paralleli')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("IMPORTAZIONE TECNOLOGIE DA WORKBOOK STIMA ARREDI PNRR")
+    print("=" * 70)
+
+    if args.file:
+        revisioni = sorted((revisione_da_nome(f), f) for f in args.file)
+    else:
+        revisioni = trova_revisioni()
+
+    if not revisioni:
+        print("\n❌ Nessun workbook 'Stima arredi PNRR*.xlsx' trovato")
+        return
+
+    print(f"\n📂 Revisioni trovate: {len(revisioni)}")
+    for revisione, percorso in revisioni:
+        print(f"  • Rev. {revisione}: {percorso}")
+
+    print("\n📥 Estrazione fogli CdC/OdC in parallelo...")
+    df_revisioni, df_scarti = importa_revisioni(revisioni, max_workers=args.workers)
+
+    if df_revisioni.empty:
+        print("\n❌ Nessun dato estratto!")
+        return
+
+    df_revisioni.to_csv(OUTPUT_REVISIONI, index=False)
+
+    df_diff = calcola_diff_revisioni(df_revisioni)
+    df_diff.to_csv(OUTPUT_DIFF, index=False)
+
+    print("\n" + "=" * 70)
+    print("✅ IMPORTAZIONE COMPLETATA")
+    print("=" * 70)
+
+    riepilogo = df_revisioni.assign(Totale_Cent=euro_a_centesimi(df_revisioni['Totale'])).groupby('Revisione').agg(
+        Voci=('Attrezzatura', 'size'),
+        Strutture=('Struttura', 'nunique'),
+        Totale_Cent=('Totale_Cent', 'sum')
+    )
+    for revisione, row in riepilogo.iterrows():
+        print(f"  • Rev. {revisione}: {row['Voci']:4.0f} voci | {row['Strutture']:3.0f} strutture | "
+              f"{formatta_euro(row['Totale_Cent'])}")
+
+    print(f"\n🔀 Variazioni tra revisioni: {len(df_diff)}")
+    if not df_diff.empty:
+        for (rev_da, rev_a), gruppo in df_diff.groupby(['Revisione_Da', 'Revisione_A']):
+            print(f"  • Rev. {rev_da} → {rev_a}: {len(gruppo)} variazioni, "
+                  f"Δ quantità {gruppo['Delta_Quantita'].sum():+.0f}, Δ costo €{gruppo['Delta_Totale'].sum():+,.2f}")
+
+    print(f"\n💾 File salvati: {OUTPUT_REVISIONI}, {OUTPUT_DIFF}")
+
+    if not df_scarti.empty:
+        df_scarti.to_csv(OUTPUT_SCARTI, index=False)
+        print(f"⚠️  {len(df_scarti)} celle non numeriche da verificare: {OUTPUT_SCARTI}")
+
+
+if __name__ == "__main__":
+    main()
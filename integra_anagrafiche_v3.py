@@ -9,6 +9,9 @@ Script integrazione v3 - Distinzione corretta dispositivi CDC/ODC
 import pandas as pd
 import csv
 
+from integrita_referenziale import FILE_CATALOGO, costruisci_indice, separa_orfani, stampa_orfani, trova_orfani
+from motore_fabbisogno import CARTELLA_CACHE, materializza_fabbisogno, versione_fabbisogno
+
 def carica_cdc_dispositivi():
     """Carica dispositivi diagnostici CDC (DIAG001-DIAG005) da CDC_CE_1_claude.csv"""
     strutture = []
@@ -621,6 +624,17 @@ def main():
     dotazioni_totali = dotazioni_cdc + dotazioni_odc + dotazioni_attr
     df_dotazioni = pd.DataFrame(dotazioni_totali)
 
+    # Integrità referenziale: solo configurazioni con struttura e codice catalogo esistenti
+    print("🔗 Verifica integrità referenziale...")
+    indice = costruisci_indice(df_strutture, pd.read_csv(FILE_CATALOGO))
+    orfani = trova_orfani(df_dotazioni, indice)
+    stampa_orfani(orfani)
+    df_dotazioni, df_orfane = separa_orfani(df_dotazioni, orfani)
+    if not df_orfane.empty:
+        df_orfane.to_csv('orfani_dotazioni_strutture_telemedicina.csv', index=False)
+        print(f"  ⚠️  {len(df_orfane)} configurazioni escluse → orfani_dotazioni_strutture_telemedicina.csv")
+    print()
+
     # Salva file
     print("💾 Salvataggio file integrati...")
     df_strutture.to_csv('strutture_sanitarie.csv', index=False)
@@ -628,6 +642,10 @@ def main():
 
     df_dotazioni.to_csv('dotazioni_strutture_telemedicina.csv', index=False)
     print(f"  ✅ dotazioni_strutture_telemedicina.csv ({len(df_dotazioni)} configurazioni)")
+
+    # Fabbisogno precalcolato: dashboard e report successivi lo rileggono senza ricalcolare
+    materializza_fabbisogno()
+    print(f"  ✅ {CARTELLA_CACHE}/ fabbisogno {versione_fabbisogno()}")
     print()
 
     # Riepilogo
@@ -6,6 +6,10 @@ NON modifica l'anagrafica strutture, solo aggiunge/aggiorna dotazioni
 
 import pandas as pd
 
+from archivio_snapshot import crea_snapshot
+from integrita_referenziale import (indice_per_versione, separa_orfani, stampa_orfani,
+                                    trova_orfani, versione_dati)
+
 # Mappatura nomi strutture Stima Arredi → Nomi registro
 MAPPATURA_STRUTTURE = {
     'OdC Campo Marte': 'OdC CAMPO DI MARTE Lucca',
@@ -184,10 +188,23 @@ def main():
     # Integra
     df_dotazioni_aggiornate = integra_dotazioni(df_tech, df_strutture, df_catalogo, df_dotazioni)
 
-    # Salva backup
+    # Integrità referenziale: le configurazioni senza struttura o codice catalogo
+    # non entrano nel file integrato (avrebbero costo nullo nel fabbisogno)
+    print("\n🔗 Verifica integrità referenziale...")
+    versione = versione_dati('strutture_sanitarie.csv', 'dotazioni_telemedicina_catalogo.csv')
+    indice = indice_per_versione(versione, df_strutture, df_catalogo)
+    orfani = trova_orfani(df_dotazioni_aggiornate, indice)
+    stampa_orfani(orfani)
+    df_dotazioni_aggiornate, df_orfane = separa_orfani(df_dotazioni_aggiornate, orfani)
+    if not df_orfane.empty:
+        df_orfane.to_csv('orfani_dotazioni_INTEGRATO.csv', index=False)
+        print(f"  ⚠️  {len(df_orfane)} configurazioni escluse → orfani_dotazioni_INTEGRATO.csv")
+        print("     Correggi MAPPATURA_ATTREZZATURE / MAPPATURA_STRUTTURE o aggiungi i codici al catalogo")
+
+    # Salva backup (snapshot deduplicato in .snapshot/)
     print("\n💾 Backup file originale...")
-    df_dotazioni.to_csv('dotazioni_strutture_telemedicina.csv.bak', index=False)
-    print("  ✅ dotazioni_strutture_telemedicina.csv.bak")
+    id_snapshot = crea_snapshot(['dotazioni_strutture_telemedicina.csv'], descrizione='integra_tecnologie_arredi')
+    print(f"  ✅ Snapshot {id_snapshot}")
 
     # Salva aggiornato
     print("\n💾 Salvataggio dotazioni aggiornate...")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Integrità referenziale tra configurazioni, strutture e catalogo.
+
+Chiavi esterne di dotazioni_strutture_telemedicina.csv:
+    Codice_Struttura → strutture_sanitarie.csv (Codice)
+    Codice_Dotazione → dotazioni_telemedicina_catalogo.csv (Codice)
+
+L'indice delle chiavi valide (pd.Index, lookup hash) viene costruito una sola
+volta per versione dei dati: la versione è l'hash del contenuto dei file, quindi
+finché i CSV non cambiano l'indice è riutilizzato. La ricerca degli orfani è
+un singolo isin per chiave, O(n) sulle configurazioni.
+
+Una configurazione orfana non ha costo nel fabbisogno (merge senza
+corrispondenza): gli script di integrazione la escludono dal file prodotto e
+la salvano a parte per la correzione della mappatura.
+
+Utilizzo:
+    python integrita_referenziale.py                  # verifica i CSV della dashboard
+    python integrita_referenziale.py dotazioni_strutture_telemedicina_INTEGRATO.csv
+"""
+
+import hashlib
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+FILE_STRUTTURE = 'strutture_sanitarie.csv'
+FILE_CATALOGO = 'dotazioni_telemedicina_catalogo.csv'
+FILE_DOTAZIONI = 'dotazioni_strutture_telemedicina.csv'
+
+# Colonna della configurazione → (dataset di riferimento, colonna chiave)
+CHIAVI_ESTERNE = {
+    'Codice_Struttura': ('strutture', 'Codice'),
+    'Codice_Dotazione': ('catalogo', 'Codice')
+}
+
+COLONNE_ORFANI = ['Riga', 'Colonna', 'Valore', 'Riferimento']
+
+# Indice dell'ultima versione dei dati di riferimento (vedi per_versione)
+_INDICI = {}
+
+
+def versione_dati(*percorsi):
+    """Hash breve del contenuto dei file indicati: cambia solo se cambia almeno un file"""
+    sha = hashlib.sha256()
+    for percorso in percorsi:
+        percorso = Path(percorso)
+        sha.update(percorso.name.encode('utf-8'))
+        sha.update(percorso.read_bytes() if percorso.exists() else b'')
+    return sha.hexdigest()[:12]
+
+
+def per_versione(cache, versione, calcola):
+    """
+    Valore della versione dati indicata da una cache dict, calcolato con calcola() se
+    manca. La cache tiene solo l'ultima versione: dopo un aggiornamento dei CSV le
+    precedenti non servono più e nel servizio della dashboard resterebbero in memoria.
+    """
+    valore = cache.get(versione)
+    if valore is None:
+        valore = calcola()
+        cache.clear()
+        cache[versione] = valore
+    return valore
+
+
+def costruisci_indice(df_strutture, df_catalogo):
+    """Indice delle chiavi valide per ogni chiave esterna"""
+    riferimenti = {'strutture': df_strutture, 'catalogo': df_catalogo}
+    return {
+        colonna: pd.Index(riferimenti[dataset][chiave].dropna().unique())
+        for colonna, (dataset, chiave) in CHIAVI_ESTERNE.items()
+    }
+
+
+def indice_per_versione(versione, df_strutture, df_catalogo):
+    """Restituisce l'indice della versione indicata, costruendolo solo la prima volta"""
+    return per_versione(_INDICI, versione, lambda: costruisci_indice(df_strutture, df_catalogo))
+
+
+def carica_indice(file_strutture=FILE_STRUTTURE, file_catalogo=FILE_CATALOGO):
+    """Legge strutture e catalogo (se la versione non è già indicizzata) e restituisce (versione, indice)"""
+    versione = versione_dati(file_strutture, file_catalogo)
+    indice = per_versione(
+        _INDICI, versione, lambda: costruisci_indice(pd.read_csv(file_strutture), pd.read_csv(file_catalogo))
+    )
+    return versione, indice
+
+
+def trova_orfani(df_dotazioni, indice):
+    """Tabella delle configurazioni con chiavi esterne non risolte (COLONNE_ORFANI)"""
+    orfani = []
+    for colonna, (dataset, _) in CHIAVI_ESTERNE.items():
+        if colonna not in df_dotazioni.columns:
+            continue
+        valori = df_dotazioni[colonna]
+        maschera = ~valori.isin(indice[colonna])
+        if maschera.any():
+            orfani.append(pd.DataFrame({
+                'Riga': valori.index[maschera],
+                'Colonna': colonna,
+                'Valore': valori[maschera].astype(str).to_numpy(),
+                'Riferimento': dataset
+            }))
+    if not orfani:
+        return pd.DataFrame(columns=COLONNE_ORFANI)
+    return pd.concat(orfani, ignore_index=True)
+
+
+def separa_orfani(df_dotazioni, orfani):
+    """
+    Divide le configurazioni in (valide, orfane) a partire dalla tabella di trova_orfani();
+    le orfane riportano in Chiave_Non_Trovata le colonne non risolte.
+    """
+    if orfani.empty:
+        return df_dotazioni, df_dotazioni.iloc[0:0]
+    motivi = orfani.groupby('Riga')['Colonna'].agg(', '.join)
+    df_orfane = df_dotazioni.loc[motivi.index].assign(Chiave_Non_Trovata=motivi.to_numpy())
+    return df_dotazioni.drop(index=motivi.index), df_orfane
+
+
+def stampa_orfani(orfani, contesto=''):
+    """Riepilogo degli orfani raggruppati per codice"""
+    if orfani.empty:
+        print(f"  ✅ Integrità referenziale OK{f' ({contesto})' if contesto else ''}")
+        return
+    print(f"  ❌ {len(orfani)} riferimenti orfani{' in ' + contesto if contesto else ''}:")
+    conteggi = orfani.groupby(['Colonna', 'Valore', 'Riferimento']).size()
+    for (colonna, valore, riferimento), n in conteggi.items():
+        print(f"    - {colonna} = {valore}: non presente in {riferimento} ({n} righe)")
+
+
+def main():
+    file_dotazioni = sys.argv[1] if len(sys.argv) > 1 else FILE_DOTAZIONI
+    versione, indice = carica_indice()
+    print(f"🔗 Verifica integrità referenziale (versione dati {versione})")
+
+    orfani = trova_orfani(pd.read_csv(file_dotazioni), indice)
+    stampa_orfani(orfani, contesto=file_dotazioni)
+    sys.exit(1 if not orfani.empty else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Costruzione dei lotti di gara dal fabbisogno.
+
+Le quantità DA_ACQUISTARE della tabella dei fatti (calcola_fabbisogno arricchito
+con le strutture) sono raggruppate con un solo groupby per
+(Codice_Dotazione, Zona, Finestra_Consegna):
+
+    Finestra_Consegna   'PNRR - entro 03/2026' per le strutture PNRR, 'Ordinaria' per le altre
+
+Un lotto di zona sotto soglia (quantità o valore minimi) non viene bandito da
+solo: è accorpato nel lotto regionale dello stesso dispositivo e finestra. Ogni
+dispositivo è una gara; per ciascuna si esporta un file Excel pronto da inviare
+con il riepilogo dei lotti e le consegne per struttura.
+
+Utilizzo:
+    from lotti_gara import costruisci_lotti
+
+    lotti, consegne = costruisci_lotti(df_fabbisogno, quantita_minima=3, valore_minimo_cent=2_000_000)
+
+Da riga di comando:
+    python lotti_gara.py
+    python lotti_gara.py --quantita-minima 3 --valore-minimo 20000 --lordo --cartella lotti_gara
+"""
+
+import argparse
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from openpyxl import Workbook
+
+from genera_report_direzione import scrivi_foglio
+from motore_fabbisogno import (
+    ETICHETTA_IMPORTI, carica_fabbisogno, colonne_euro, euro_a_centesimi, formatta_euro, seleziona_importi
+)
+
+FINESTRE_CONSEGNA = {'SI': 'PNRR - entro 03/2026', 'NO': 'Ordinaria'}
+
+ZONA_ACCORPATA = 'Regionale (accorpato)'
+
+CHIAVI_LOTTO = ['Codice_Dotazione', 'Zona_Lotto', 'Finestra_Consegna']
+
+COLONNE_LOTTI = [
+    'Lotto', 'Codice_Dotazione', 'Categoria', 'Descrizione', 'Finestra_Consegna', 'Zona_Lotto',
+    'Strutture', 'Quantita', 'Costo_Unitario_Cent', 'Valore_Cent', 'Accorpato'
+]
+
+COLONNE_CONSEGNE = [
+    'Lotto', 'Codice_Dotazione', 'Descrizione', 'Zona', 'Codice_Struttura', 'Nome_Struttura',
+    'Finestra_Consegna', 'Quantita_Da_Acquistare', 'Costo_Unitario_Cent', 'Costo_Da_Finanziare_Cent'
+]
+
+
+def costruisci_lotti(df_fabbisogno, quantita_minima=1, valore_minimo_cent=0):
+    """
+    Lotti di gara dal fabbisogno arricchito con le strutture (vista netto/lordo già selezionata).
+    Restituisce (lotti, consegne): un lotto per riga (COLONNE_LOTTI) e una consegna per
+    configurazione con il lotto di appartenenza (COLONNE_CONSEGNE).
+    """
+    fatti = df_fabbisogno[
+        (df_fabbisogno['Stato_Finanziamento'] == 'DA_ACQUISTARE') & (df_fabbisogno['Quantita_Da_Acquistare'] > 0)
+    ].assign(
+        Zona=lambda df: df['Zona'].fillna('N/D'),
+        Finestra_Consegna=lambda df: df['PNRR'].map(FINESTRE_CONSEGNA).fillna(FINESTRE_CONSEGNA['NO'])
+    )
+
+    # Unico passaggio sulla tabella dei fatti: lotti di zona per dispositivo e finestra
+    per_zona = fatti.groupby(['Codice_Dotazione', 'Zona', 'Finestra_Consegna'], as_index=False).agg(
+        Strutture=('Codice_Struttura', 'nunique'),
+        Quantita=('Quantita_Da_Acquistare', 'sum'),
+        Valore_Cent=('Costo_Da_Finanziare_Cent', 'sum')
+    )
+
+    # Soglie: i lotti di zona troppo piccoli confluiscono nel lotto regionale
+    sotto_soglia = (per_zona['Quantita'] < quantita_minima) | (per_zona['Valore_Cent'] < valore_minimo_cent)
+    per_zona['Zona_Lotto'] = per_zona['Zona'].where(~sotto_soglia, ZONA_ACCORPATA)
+    per_zona['Accorpato'] = sotto_soglia
+
+    lotti = per_zona.groupby(CHIAVI_LOTTO, as_index=False).agg(
+        Strutture=('Strutture', 'sum'),
+        Quantita=('Quantita', 'sum'),
+        Valore_Cent=('Valore_Cent', 'sum'),
+        Accorpato=('Accorpato', 'any')
+    )
+    catalogo = fatti.drop_duplicates('Codice_Dotazione').set_index('Codice_Dotazione')
+    for colonna in ['Categoria', 'Descrizione', 'Costo_Unitario_Cent']:
+        lotti[colonna] = lotti['Codice_Dotazione'].map(catalogo[colonna])
+
+    # Numerazione: per gara (dispositivo), PNRR prima, poi lotti di valore maggiore
+    lotti = lotti.sort_values(
+        ['Codice_Dotazione', 'Finestra_Consegna', 'Valore_Cent'], ascending=[True, False, False], ignore_index=True
+    )
+    progressivo = lotti.groupby('Codice_Dotazione').cumcount() + 1
+    lotti['Lotto'] = lotti['Codice_Dotazione'] + '-L' + progressivo.astype(str).str.zfill(2)
+
+    # Consegne per struttura con il lotto di appartenenza
+    zona_lotto = per_zona.set_index(['Codice_Dotazione', 'Zona', 'Finestra_Consegna'])['Zona_Lotto']
+    consegne = fatti.join(zona_lotto, on=['Codice_Dotazione', 'Zona', 'Finestra_Consegna'])
+    consegne = consegne.merge(lotti[CHIAVI_LOTTO + ['Lotto']], on=CHIAVI_LOTTO)
+    consegne = consegne[COLONNE_CONSEGNE].sort_values(['Lotto', 'Zona', 'Nome_Struttura'], ignore_index=True)
+
+    return lotti[COLONNE_LOTTI], consegne
+
+
+def esporta_gare(lotti, consegne, cartella):
+    """Un file Excel per gara (dispositivo) con le schede Lotti e Consegne; restituisce i percorsi"""
+    cartella = Path(cartella)
+    cartella.mkdir(parents=True, exist_ok=True)
+
+    lotti_euro = colonne_euro(lotti, ['Costo_Unitario_Cent', 'Valore_Cent']).drop(
+        columns=['Costo_Unitario_Cent', 'Valore_Cent']
+    ).rename(columns={'Costo_Unitario': 'Costo_Unitario_EUR', 'Valore': 'Valore_EUR'})
+    lotti_euro['Accorpato'] = np.where(lotti_euro['Accorpato'], 'SI', 'NO')
+    consegne_euro = colonne_euro(consegne, ['Costo_Unitario_Cent', 'Costo_Da_Finanziare_Cent']).drop(
+        columns=['Costo_Unitario_Cent', 'Costo_Da_Finanziare_Cent']
+    ).rename(columns={'Costo_Unitario': 'Costo_Unitario_EUR', 'Costo_Da_Finanziare': 'Valore_EUR'})
+
+    file_gare = []
+    consegne_per_gara = dict(tuple(consegne_euro.groupby('Codice_Dotazione')))
+    for codice, lotti_gara in lotti_euro.groupby('Codice_Dotazione'):
+        percorso = cartella / f"gara_{codice}.xlsx"
+        # Stesso writer del report direzione: sola scrittura, larghezze dai DataFrame
+        wb = Workbook(write_only=True)
+        scrivi_foglio(wb, 'Lotti', lotti_gara)
+        scrivi_foglio(wb, 'Consegne', consegne_per_gara[codice])
+        wb.save(percorso)
+        file_gare.append(percorso)
+    return file_gare
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lotti di gara per dispositivo, zona e finestra di consegna')
+    parser.add_argument('--quantita-minima', type=int, default=1, help='quantità minima per un lotto di zona')
+    parser.add_argument('--valore-minimo', type=float, default=0, help='valore minimo (€) per un lotto di zona')
+    parser.add_argument('--lordo', action='store_true', help='importi IVA inclusa')
+    parser.add_argument('--cartella', help='cartella di output (default: lotti_gara_YYYYMMDD_HHMM)')
+    args = parser.parse_args()
+
+    _, _, _, df_fabbisogno = carica_fabbisogno()
+    df_fabbisogno = seleziona_importi(df_fabbisogno, lordo=args.lordo)
+
+    inizio = time.perf_counter()
+    lotti, consegne = costruisci_lotti(
+        df_fabbisogno, args.quantita_minima, int(euro_a_centesimi([args.valore_minimo])[0])
+    )
+    durata = (time.perf_counter() - inizio) * 1000
+
+    print(f"📦 Lotti di gara (importi {ETICHETTA_IMPORTI[args.lordo]}, {durata:.1f} ms)")
+    print(f"  ✅ {lotti['Codice_Dotazione'].nunique()} gare, {len(lotti)} lotti "
+          f"({int(lotti['Accorpato'].sum())} accorpati a livello regionale), {len(consegne)} consegne")
+    print(f"  💶 Valore complessivo: {formatta_euro(lotti['Valore_Cent'].sum(), prefisso='€ ')}")
+
+    cartella = args.cartella or f"lotti_gara_{datetime.now().strftime('%Y%m%d_%H%M')}"
+    file_gare = esporta_gare(lotti, consegne, cartella)
+    print(f"\n💾 {len(file_gare)} file in {cartella}/")
+    for codice, lotti_gara in lotti.groupby('Codice_Dotazione'):
+        print(f"  - gara_{codice}.xlsx: {len(lotti_gara)} lotti, "
+              f"{formatta_euro(lotti_gara['Valore_Cent'].sum(), prefisso='€ ')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Motore di calcolo del fabbisogno condiviso da dashboard e report direzione
+USL Toscana Nord Ovest - Case di Comunità e Ospedali di Comunità
+
+Tutti gli importi sono tenuti in centesimi di euro interi (int64, colonne *_Cent):
+somme e aggregazioni sono esatte e riproducibili indipendentemente dall'ordine
+delle righe. La conversione in euro avviene solo per la visualizzazione
+(formatta_euro, colonne_euro).
+
+Per ogni voce di costo sono calcolate una sola volta le colonne netto, IVA e
+lordo (aliquota IVA_Percentuale del catalogo): Costo_<voce>_Cent,
+IVA_<voce>_Cent, Costo_<voce>_Lordo_Cent. seleziona_importi() sceglie la
+vista netto/lordo senza ricalcolare nulla.
+
+Utilizzo:
+    from motore_fabbisogno import calcola_fabbisogno, formatta_euro
+
+    df_fabbisogno = calcola_fabbisogno(df_dotazioni, df_catalogo)
+    print(formatta_euro(df_fabbisogno['Costo_Da_Finanziare_Cent'].sum()))
+
+    df_lordo = seleziona_importi(df_fabbisogno, lordo=True)
+
+carica_fabbisogno() è il punto d'ingresso comune di dashboard, report e script:
+il risultato (CSV letti, fabbisogno e fabbisogno arricchito con le strutture) è
+salvato in .cache_fabbisogno/ con chiave l'hash dei CSV di ingresso, quindi
+dopo un'integrazione il primo consumatore calcola e gli altri rileggono il
+risultato già pronto. Per precalcolare o forzare il ricalcolo:
+
+    python motore_fabbisogno.py [--ricalcola]
+"""
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from integrita_referenziale import versione_dati
+
+FILE_STRUTTURE = 'strutture_sanitarie.csv'
+FILE_CATALOGO = 'dotazioni_telemedicina_catalogo.csv'
+FILE_DOTAZIONI = 'dotazioni_strutture_telemedicina.csv'
+FILE_DOTAZIONI_MINIME = 'dotazioni_minime_standard.csv'
+
+# Voci di costo calcolate per ogni configurazione (colonna Costo_<voce>_Cent)
+VOCI_COSTO = ['Totale', 'Da_Finanziare', 'Gia_Finanziato', 'Presente']
+
+ETICHETTA_IMPORTI = {False: 'IVA esclusa', True: 'IVA inclusa'}
+
+COLONNE_STRUTTURA = ['Codice', 'Nome_Struttura', 'Tipologia', 'Zona', 'PNRR']
+
+# Risultati materializzati per versione dei CSV (un file per versione, tenuto solo l'ultimo)
+CARTELLA_CACHE = Path('.cache_fabbisogno')
+
+# Da incrementare quando cambia il calcolo: invalida i risultati salvati con il codice precedente
+VERSIONE_CALCOLO = 1
+
+
+def euro_a_centesimi(valori):
+    """Converte importi in euro (float, anche con NaN) in centesimi int64; NaN → 0"""
+    valori = pd.to_numeric(pd.Series(valori), errors='coerce')
+    return np.round(valori.fillna(0).to_numpy(dtype='float64') * 100).astype('int64')
+
+
+def centesimi_a_euro(centesimi):
+    """Converte centesimi interi in euro (float) per grafici e tabelle"""
+    if isinstance(centesimi, pd.Series):
+        return centesimi.astype('int64') / 100
+    return np.asarray(centesimi, dtype='int64') / 100
+
+
+def importo_per_quantita(costo_unitario, quantita):
+    """
+    Costo unitario in euro × quantità calcolato in centesimi interi e riportato in euro
+    (evita derive tipo 34462.600000000006); i costi mancanti restano NaN.
+    """
+    costo = pd.to_numeric(pd.Series(costo_unitario), errors='coerce').reset_index(drop=True)
+    quantita = pd.Series(quantita).fillna(0).to_numpy(dtype='int64')
+    totale = centesimi_a_euro(euro_a_centesimi(costo) * quantita)
+    return pd.Series(totale, index=pd.Series(costo_unitario).index).where(costo.notna().to_numpy())
+
+
+def percentuale_cent(importo_cent, percentuale):
+    """
+    importo × percentuale (%) in centesimi, arrotondato al centesimo (metà per eccesso).
+    Percentuale in centesimi di punto per restare in aritmetica intera (es. 22 → 2200).
+    """
+    percentuale_bp = euro_a_centesimi(percentuale)
+    return (np.asarray(importo_cent, dtype='int64') * percentuale_bp + 5000) // 10000
+
+
+def calcola_iva(netto_cent, aliquota):
+    """IVA in centesimi per riga: netto × aliquota (%) arrotondato al centesimo (metà per eccesso)"""
+    return percentuale_cent(netto_cent, aliquota)
+
+
+def seleziona_importi(df, lordo=False):
+    """
+    Vista netto/lordo del fabbisogno: con lordo=True le colonne Costo_*_Cent
+    vengono sostituite dalle corrispondenti colonne IVA inclusa già calcolate.
+    """
+    if not lordo:
+        return df
+    return df.assign(**{
+        f'Costo_{voce}_Cent': df[f'Costo_{voce}_Lordo_Cent']
+        for voce in ['Unitario'] + VOCI_COSTO
+    })
+
+
+def formatta_euro(centesimi, decimali=2, prefisso='€'):
+    """
+    Formatta un importo in centesimi come '€1,234.56' (stesso formato usato in dashboard e report).
+    L'aritmetica è intera: nessun errore di arrotondamento anche su somme molto grandi.
+    """
+    centesimi = int(centesimi)
+    segno = '-' if centesimi < 0 else ''
+    euro, cent = divmod(abs(centesimi), 100)
+    if decimali == 0:
+        euro += 1 if cent >= 50 else 0
+        return f"{segno}{prefisso}{euro:,}"
+    return f"{segno}{prefisso}{euro:,}.{cent:02d}"
+
+
+def colonne_euro(df, colonne_cent=None):
+    """
+    Aggiunge le colonne in euro per la visualizzazione (Costo_Totale_Cent → Costo_Totale).
+    Da usare dopo le aggregazioni, che vanno sempre fatte sulle colonne in centesimi.
+    """
+    df = df.copy()
+    if colonne_cent is None:
+        colonne_cent = [col for col in df.columns if col.endswith('_Cent')]
+    for col in colonne_cent:
+        df[col[:-len('_Cent')]] = centesimi_a_euro(df[col])
+    return df
+
+
+def calcola_fabbisogno(df_dotazioni, df_catalogo):
+    """
+    Calcola il fabbisogno complessivo per dotazione con distinzione stati finanziamento.
+
+    Colonne aggiunte (importi in centesimi int64):
+        Quantita_Da_Acquistare, Costo_Unitario_Cent, Catalogo_Mancante,
+        Costo_Totale_Cent, Costo_Da_Finanziare_Cent, Costo_Gia_Finanziato_Cent, Costo_Presente_Cent
+        e per ogni voce (anche Unitario) IVA_<voce>_Cent e Costo_<voce>_Lordo_Cent
+    """
+    # Merge con catalogo per ottenere descrizione e costo
+    df_merge = df_dotazioni.merge(
+        df_catalogo,
+        left_on='Codice_Dotazione',
+        right_on='Codice',
+        how='left'
+    )
+
+    # Codici senza riga in catalogo: costo 0 ma segnalati
+    df_merge['Catalogo_Mancante'] = df_merge['Costo_Unitario_EUR'].isna().to_numpy()
+    costo_unitario = euro_a_centesimi(df_merge['Costo_Unitario_EUR'])
+    df_merge['Costo_Unitario_Cent'] = costo_unitario
+
+    richiesta = df_merge['Quantita_Richiesta'].fillna(0).to_numpy(dtype='int64')
+    presente = df_merge['Quantita_Presente'].fillna(0).to_numpy(dtype='int64')
+    stato = df_merge.get('Stato_Finanziamento', pd.Series(None, index=df_merge.index, dtype=object)).to_numpy()
+
+    # Calcola quantità da acquistare
+    da_acquistare = np.clip(richiesta - presente, 0, None)
+    df_merge['Quantita_Da_Acquistare'] = da_acquistare
+
+    # Calcola costo per struttura (solo ciò che serve acquistare)
+    costo_totale = da_acquistare * costo_unitario
+    df_merge['Costo_Totale_Cent'] = costo_totale
+
+    # Calcola costi separati per stato finanziamento
+    df_merge['Costo_Da_Finanziare_Cent'] = np.where(stato == 'DA_ACQUISTARE', costo_totale, 0)
+    df_merge['Costo_Gia_Finanziato_Cent'] = np.where(stato == 'FINANZIATO', richiesta * costo_unitario, 0)
+    df_merge['Costo_Presente_Cent'] = np.where(stato == 'PRESENTE', presente * costo_unitario, 0)
+
+    # IVA e lordo calcolati riga per riga sul netto (aliquota mancante → 0%)
+    aliquota = df_merge.get('IVA_Percentuale', pd.Series(0, index=df_merge.index))
+    for voce in ['Unitario'] + VOCI_COSTO:
+        netto = df_merge[f'Costo_{voce}_Cent'].to_numpy(dtype='int64')
+        iva = calcola_iva(netto, aliquota)
+        df_merge[f'IVA_{voce}_Cent'] = iva
+        df_merge[f'Costo_{voce}_Lordo_Cent'] = netto + iva
+
+    return df_merge
+
+
+def arricchisci_strutture(df_fabbisogno, df_strutture, colonne=COLONNE_STRUTTURA):
+    """Aggiunge al fabbisogno le informazioni della struttura (nome, tipologia, zona, PNRR)"""
+    return df_fabbisogno.merge(
+        df_strutture[colonne],
+        left_on='Codice_Struttura',
+        right_on='Codice',
+        how='left',
+        suffixes=('', '_Strutt')
+    )
+
+
+def versione_fabbisogno():
+    """Chiave dei risultati: hash dei CSV di ingresso e versione del calcolo"""
+    return f"{versione_dati(FILE_STRUTTURE, FILE_CATALOGO, FILE_DOTAZIONI)}-v{VERSIONE_CALCOLO}"
+
+
+def _calcola_risultati():
+    df_strutture = pd.read_csv(FILE_STRUTTURE)
+    df_catalogo = pd.read_csv(FILE_CATALOGO)
+    df_dotazioni = pd.read_csv(FILE_DOTAZIONI)
+    df_fabbisogno = calcola_fabbisogno(df_dotazioni, df_catalogo)
+    return {
+        'strutture': df_strutture,
+        'catalogo': df_catalogo,
+        'dotazioni': df_dotazioni,
+        'fabbisogno': df_fabbisogno,
+        'arricchito': arricchisci_strutture(df_fabbisogno, df_strutture),
+    }
+
+
+def materializza_fabbisogno(ricalcola=False):
+    """
+    Risultati della versione corrente dei CSV: letti da .cache_fabbisogno/ se presenti,
+    altrimenti calcolati e salvati (scrittura atomica, le versioni precedenti sono rimosse).
+    Restituisce (risultati, da_cache).
+    """
+    percorso = CARTELLA_CACHE / f"fabbisogno_{versione_fabbisogno()}.pkl"
+    if not ricalcola and percorso.exists():
+        try:
+            with open(percorso, 'rb') as f:
+                return pickle.load(f), True
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass  # file illeggibile (scrittura interrotta, pandas diverso): si ricalcola
+
+    risultati = _calcola_risultati()
+    try:
+        CARTELLA_CACHE.mkdir(exist_ok=True)
+        # Temporaneo con nome univoco: dashboard e script possono scrivere la stessa versione insieme
+        fd, temporaneo = tempfile.mkstemp(dir=CARTELLA_CACHE, prefix=f'.{percorso.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(risultati, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporaneo, percorso)
+        except BaseException:
+            Path(temporaneo).unlink(missing_ok=True)
+            raise
+        for vecchio in CARTELLA_CACHE.glob('fabbisogno_*.pkl'):
+            if vecchio != percorso:
+                vecchio.unlink(missing_ok=True)
+    except OSError:
+        pass  # cartella in sola lettura: il risultato resta valido, solo non riusabile
+    return risultati, False
+
+
+def carica_fabbisogno(arricchito=True):
+    """
+    Restituisce (df_strutture, df_catalogo, df_dotazioni, df_fabbisogno), riusando i
+    risultati già calcolati per la stessa versione dei CSV (vedi materializza_fabbisogno)
+    """
+    risultati, _ = materializza_fabbisogno()
+    return (
+        risultati['strutture'], risultati['catalogo'], risultati['dotazioni'],
+        risultati['arricchito' if arricchito else 'fabbisogno']
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precalcola il fabbisogno per la versione corrente dei CSV')
+    parser.add_argument('--ricalcola', action='store_true', help='ignora i risultati già salvati')
+    args = parser.parse_args()
+
+    inizio = time.perf_counter()
+    risultati, da_cache = materializza_fabbisogno(ricalcola=args.ricalcola)
+    durata = (time.perf_counter() - inizio) * 1000
+    origine = 'letto da' if da_cache else 'calcolato e salvato in'
+    print(f"📦 Fabbisogno {versione_fabbisogno()} {origine} {CARTELLA_CACHE}/ ({durata:.1f} ms)")
+    print(f"  ✅ {len(risultati['strutture'])} strutture, {len(risultati['fabbisogno'])} configurazioni")
+    print(f"  💶 Da finanziare: {formatta_euro(risultati['fabbisogno']['Costo_Da_Finanziare_Cent'].sum(), prefisso='€ ')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Motore di upsert per chiave (Codice) tra un CSV esistente e un nuovo import.
+
+Invece di sovrascrivere il CSV con il file importato, calcola un changeset:
+    INSERT  righe con Codice presente solo nell'import
+    UPDATE  singole celle cambiate (una riga per colonna modificata)
+    DELETE  righe con Codice non più presente nell'import (solo se richiesto)
+
+Le modifiche manuali sono preservate: le colonne che l'import non contiene
+restano intatte e, di default, le celle vuote dell'import non cancellano i
+valori esistenti. Il changeset viene salvato su file e il CSV è riscritto in
+modo atomico (file temporaneo + os.replace): un'interruzione non lascia mai
+un file a metà.
+
+Utilizzo come modulo:
+    from motore_upsert import upsert_csv
+
+    changeset, file_changeset = upsert_csv('strutture_sanitarie.csv', df_importato, chiave='Codice')
+
+Benchmark:
+    python motore_upsert.py --righe 10000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+COLONNE_CHANGESET = ['Operazione', 'Chiave', 'Colonna', 'Valore_Precedente', 'Valore_Nuovo']
+
+
+def _indicizza(df, chiave, nome):
+    """Indicizza per chiave verificando che sia presente, valorizzata e univoca"""
+    if chiave not in df.columns:
+        raise ValueError(f"Colonna chiave '{chiave}' mancante in {nome}")
+
+    chiavi = df[chiave]
+    if chiavi.isna().any():
+        raise ValueError(f"{int(chiavi.isna().sum())} righe senza {chiave} in {nome}")
+
+    duplicate = chiavi[chiavi.duplicated()].unique()
+    if len(duplicate) > 0:
+        raise ValueError(f"{chiave} duplicati in {nome}: {', '.join(map(str, duplicate[:10]))}")
+
+    return df.set_index(chiave)
+
+
+def _come_testo(df):
+    """
+    Valori nella forma in cui finiscono nel CSV (20.0 → '20', NaN invariati):
+    il confronto non dipende dai dtype con cui Excel o read_csv hanno letto le colonne.
+    """
+    testo = {}
+    for colonna in df.columns:
+        serie = df[colonna]
+        vuote = serie.isna()
+        if pd.api.types.is_float_dtype(serie.dtype):
+            intere = ~vuote & (serie % 1 == 0)
+            valori = serie.astype(str).astype(object)
+            valori[intere] = serie[intere].astype('int64').astype(str)
+        elif pd.api.types.is_numeric_dtype(serie.dtype):
+            valori = serie.astype(str).astype(object)
+        else:
+            # Numeri interi già scritti come testo con decimali nulli ("20.0")
+            valori = serie.astype(str).str.replace(r'^(-?\d+)\.0+$', r'\1', regex=True).astype(object)
+        testo[colonna] = valori.mask(vuote)
+    return pd.DataFrame(testo, index=df.index)
+
+
+def _celle_diverse(prima, dopo):
+    """Confronto vettoriale cella per cella tra valori testuali: NaN == NaN"""
+    prima_na, dopo_na = prima.isna().to_numpy(), dopo.isna().to_numpy()
+    diverse = prima.to_numpy() != dopo.to_numpy()
+    return (prima_na != dopo_na) | (diverse & ~prima_na & ~dopo_na)
+
+
+def _righe_lunghe(df, operazione, colonna_valore):
+    """Converte righe intere (INSERT/DELETE) nel formato lungo del changeset, una riga per cella valorizzata"""
+    if df.empty:
+        return pd.DataFrame(columns=COLONNE_CHANGESET)
+    celle = df.stack().dropna()
+    return pd.DataFrame({
+        'Operazione': operazione,
+        'Chiave': celle.index.get_level_values(0),
+        'Colonna': celle.index.get_level_values(1),
+        'Valore_Precedente': celle.to_numpy() if colonna_valore == 'Valore_Precedente' else None,
+        'Valore_Nuovo': celle.to_numpy() if colonna_valore == 'Valore_Nuovo' else None
+    })
+
+
+def calcola_changeset(df_esistente, df_nuovo, chiave='Codice', elimina=False, ignora_vuoti=True):
+    """
+    Confronta i due DataFrame per chiave e restituisce il changeset (COLONNE_CHANGESET).
+
+    elimina:      se True, le chiavi assenti dall'import generano DELETE
+    ignora_vuoti: se True, le celle vuote dell'import non sovrascrivono valori esistenti
+    """
+    esistente = _come_testo(_indicizza(df_esistente, chiave, 'dati esistenti'))
+    nuovo = _come_testo(_indicizza(df_nuovo, chiave, 'file importato'))
+
+    inserite = nuovo.index.difference(esistente.index, sort=False)
+    rimosse = esistente.index.difference(nuovo.index, sort=False)
+    comuni = nuovo.index.intersection(esistente.index, sort=False)
+
+    parti = [_righe_lunghe(nuovo.loc[inserite], 'INSERT', 'Valore_Nuovo')]
+
+    # UPDATE: confronto colonna per colonna sulle sole chiavi comuni
+    for colonna in nuovo.columns:
+        dopo = nuovo.loc[comuni, colonna]
+        if colonna in esistente.columns:
+            prima = esistente.loc[comuni, colonna]
+        else:
+            prima = pd.Series(np.nan, index=comuni, dtype=object)
+
+        cambiate = _celle_diverse(prima, dopo)
+        if ignora_vuoti:
+            cambiate &= (dopo.fillna('').str.strip() != '').to_numpy()
+        if not cambiate.any():
+            continue
+
+        parti.append(pd.DataFrame({
+            'Operazione': 'UPDATE',
+            'Chiave': comuni[cambiate],
+            'Colonna': colonna,
+            'Valore_Precedente': prima.to_numpy()[cambiate],
+            'Valore_Nuovo': dopo.to_numpy()[cambiate]
+        }))
+
+    if elimina:
+        parti.append(_righe_lunghe(esistente.loc[rimosse], 'DELETE', 'Valore_Precedente'))
+
+    parti = [p for p in parti if not p.empty]
+    if not parti:
+        return pd.DataFrame(columns=COLONNE_CHANGESET)
+    return pd.concat(parti, ignore_index=True)[COLONNE_CHANGESET]
+
+
+def applica_changeset(df_esistente, changeset, chiave='Codice'):
+    """
+    Applica un changeset al DataFrame esistente.
+    Le righe esistenti mantengono il loro ordine; le nuove sono accodate nell'ordine dell'import.
+    Le colonne mantengono l'ordine originale; quelle nuove sono accodate.
+    """
+    if changeset.empty:
+        return df_esistente.copy()
+
+    risultato = df_esistente.set_index(chiave)
+
+    aggiornamenti = changeset[changeset['Operazione'] == 'UPDATE']
+    for colonna, gruppo in aggiornamenti.groupby('Colonna', sort=False):
+        if colonna not in risultato.columns:
+            risultato[colonna] = pd.Series(np.nan, index=risultato.index, dtype=object)
+        chiavi, valori = gruppo['Chiave'].to_numpy(), gruppo['Valore_Nuovo'].to_numpy()
+        try:
+            risultato.loc[chiavi, colonna] = valori
+        except (TypeError, ValueError):
+            # Valori non compatibili con il dtype letto (es. testo in colonna numerica)
+            risultato[colonna] = risultato[colonna].astype(object)
+            risultato.loc[chiavi, colonna] = valori
+
+    eliminate = changeset.loc[changeset['Operazione'] == 'DELETE', 'Chiave'].unique()
+    if len(eliminate) > 0:
+        risultato = risultato.drop(index=eliminate)
+
+    inserimenti = changeset[changeset['Operazione'] == 'INSERT']
+    if not inserimenti.empty:
+        ordine = pd.unique(inserimenti['Chiave'])
+        nuove = inserimenti.pivot(index='Chiave', columns='Colonna', values='Valore_Nuovo').reindex(ordine)
+        nuove = nuove.reindex(columns=risultato.columns.union(nuove.columns, sort=False))
+        risultato = pd.concat([risultato, nuove])
+
+    risultato.index.name = chiave
+    risultato = risultato.reset_index()
+    colonne = list(df_esistente.columns) + [c for c in risultato.columns if c not in df_esistente.columns]
+    return risultato[colonne]
+
+
+def scrivi_csv_atomico(df, percorso):
+    """Scrive il CSV su un file temporaneo nella stessa cartella e lo sostituisce atomicamente"""
+    percorso = Path(percorso)
+    fd, temporaneo = tempfile.mkstemp(dir=percorso.parent, prefix=f'.{percorso.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            df.to_csv(f, index=False)
+        os.replace(temporaneo, percorso)
+    except BaseException:
+        Path(temporaneo).unlink(missing_ok=True)
+        raise
+
+
+def riepilogo_changeset(changeset):
+    """Conteggi per operazione: righe inserite/eliminate, celle aggiornate"""
+    return {
+        'inserite': changeset.loc[changeset['Operazione'] == 'INSERT', 'Chiave'].nunique(),
+        'aggiornate': changeset.loc[changeset['Operazione'] == 'UPDATE', 'Chiave'].nunique(),
+        'celle_aggiornate': int((changeset['Operazione'] == 'UPDATE').sum()),
+        'eliminate': changeset.loc[changeset['Operazione'] == 'DELETE', 'Chiave'].nunique()
+    }
+
+
+def upsert_csv(percorso, df_nuovo, chiave='Codice', elimina=False, ignora_vuoti=True,
+               anteprima=False, cartella_changeset='.', controllo=None):
+    """
+    Aggiorna il CSV con i dati importati tramite upsert per chiave.
+    Salva il changeset in changeset_<nome>_<timestamp>.csv e riscrive il CSV in modo atomico.
+    Con anteprima=True calcola il changeset ed esegue il controllo senza scrivere nulla.
+    controllo: funzione chiamata sui dati aggiornati prima di scrivere; se solleva
+    un'eccezione nessun file viene modificato (es. schema_dati.verifica).
+    Restituisce (changeset, percorso file changeset o None).
+    """
+    percorso = Path(percorso)
+    # Lettura come testo: le celle non modificate vengono riscritte identiche
+    df_esistente = pd.read_csv(percorso, dtype=str, keep_default_na=False, na_values=[''])
+
+    changeset = calcola_changeset(df_esistente, df_nuovo, chiave=chiave,
+                                  elimina=elimina, ignora_vuoti=ignora_vuoti)
+    if changeset.empty:
+        return changeset, None
+
+    df_aggiornato = applica_changeset(df_esistente, changeset, chiave=chiave)
+    if controllo is not None:
+        controllo(df_aggiornato)
+    if anteprima:
+        return changeset, None
+
+    # Prima il changeset (traccia delle modifiche), poi la sostituzione atomica dei dati
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    file_changeset = Path(cartella_changeset) / f"changeset_{percorso.stem}_{timestamp}.csv"
+    scrivi_csv_atomico(changeset, file_changeset)
+    scrivi_csv_atomico(df_aggiornato, percorso)
+
+    return changeset, file_changeset
+
+
+def _genera_strutture(n, seed=42):
+    """Genera n strutture sintetiche con lo stesso schema di strutture_sanitarie.csv"""
+    rng = np.random.default_rng(seed)
+    zone = np.array(['Lunigiana', 'Apuane', 'Piana di Lucca', 'Valle del Serchio', 'Pisana', 'Livornese'])
+    return pd.DataFrame({
+        'Tipologia': rng.choice(['CdC', 'OdC'], n),
+        'Codice': [f'STR{i:06d}' for i in range(n)],
+        'Nome_Struttura': [f'Struttura {i}' for i in range(n)],
+        'Zona': rng.choice(zone, n),
+        'Comune': [f'Comune {i % 500}' for i in range(n)],
+        'PNRR': rng.choice(['SI', 'NO'], n),
+        'Posti_Letto': rng.integers(0, 40, n)
+    })
+
+
+def benchmark(n_righe):
+    """Misura calcolo e applicazione del changeset su un aggiornamento sintetico"""
+    print(f"📏 Benchmark upsert su {n_righe:,} righe")
+    rng = np.random.default_rng(7)
+    esistente = _genera_strutture(n_righe)
+
+    # Import: 5% righe modificate, 1% rimosse, 1% nuove
+    nuovo = esistente.copy()
+    modificate = rng.choice(n_righe, n_righe // 20, replace=False)
+    nuovo.loc[modificate, 'PNRR'] = np.where(nuovo.loc[modificate, 'PNRR'] == 'SI', 'NO', 'SI')
+    nuovo.loc[modificate[::2], 'Posti_Letto'] += 1
+    nuovo = nuovo.drop(index=rng.choice(n_righe, n_righe // 100, replace=False))
+    aggiunte = _genera_strutture(n_righe // 100, seed=1)
+    aggiunte['Codice'] = [f'NEW{i:06d}' for i in range(len(aggiunte))]
+    nuovo = pd.concat([nuovo, aggiunte], ignore_index=True)
+
+    inizio = time.perf_counter()
+    changeset = calcola_changeset(esistente, nuovo, elimina=True)
+    t_calcolo = time.perf_counter() - inizio
+
+    inizio = time.perf_counter()
+    risultato = applica_changeset(esistente, changeset)
+    t_applica = time.perf_counter() - inizio
+
+    conteggi = riepilogo_changeset(changeset)
+    print(f"  • Calcolo changeset:  {t_calcolo:7.3f} s")
+    print(f"  • Applicazione:       {t_applica:7.3f} s")
+    print(f"  • Inserite {conteggi['inserite']:,} | aggiornate {conteggi['aggiornate']:,} "
+          f"({conteggi['celle_aggiornate']:,} celle) | eliminate {conteggi['eliminate']:,}")
+    print(f"  • Righe risultanti:   {len(risultato):,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark motore di upsert')
+    parser.add_argument('--righe', type=int, default=10000, help='Numero di righe da generare')
+    args = parser.parse_args()
+    benchmark(args.righe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Nomi di file ricavati da testi liberi (zone, strutture, pagine della dashboard).
+
+Modulo senza dipendenze: lo usano report, benchmark e profilo della dashboard
+senza importare i moduli dei report.
+"""
+
+import re
+import unicodedata
+
+
+def nome_file(testo):
+    """Nome file senza accenti, spazi e simboli ('Alta val di Cecina - Valdera' → 'alta_val_di_cecina_valdera')"""
+    ascii_ = unicodedata.normalize('NFKD', str(testo)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '_', ascii_.lower()).strip('_')
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Normalizzazione numerica condivisa per importi e quantità in formato italiano
+(es. "€ 1.723,13", "3.000,00€", "36").
+
+Le conversioni lavorano su intere colonne con operazioni vettoriali pandas.
+Le celle non interpretabili NON vengono azzerate: restano NaN e sono restituite
+in una tabella di scarti con le coordinate (Riga, Colonna) della cella originale.
+
+Utilizzo come modulo:
+    from normalizza_numeri import converti_valuta, converti_quantita, normalizza_colonne
+
+    costi, scarti = converti_valuta(df[2], colonna=2)
+
+Benchmark:
+    python normalizza_numeri.py --celle 2000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+COLONNE_SCARTI = ['Riga', 'Colonna', 'Valore', 'Motivo']
+
+# Numero italiano: migliaia con "." (opzionali), decimali con ",", simbolo € prima o dopo
+# (gli export Excel usano spesso lo spazio non separabile U+00A0 accanto al simbolo €)
+_SPAZIO = '[\\s\u00a0]*'
+_PATTERN_ITALIANO = _SPAZIO + r'€?' + _SPAZIO + r'[-+]?(?:\d{1,3}(?:\.\d{3})+|\d+)(?:,\d+)?' + _SPAZIO + r'€?' + _SPAZIO
+_PATTERN_VUOTO = _SPAZIO + r'(?:€?' + _SPAZIO + r'-?' + _SPAZIO + r'€?|nan|None)' + _SPAZIO
+
+
+def _scarti(serie, maschera, colonna, motivo):
+    """Costruisce la tabella scarti per le celle selezionate dalla maschera"""
+    if not maschera.any():
+        return pd.DataFrame(columns=COLONNE_SCARTI)
+    righe = serie[maschera]
+    return pd.DataFrame({
+        'Riga': righe.index,
+        'Colonna': colonna if colonna is not None else serie.name,
+        'Valore': righe.astype(str).to_numpy(),
+        'Motivo': motivo
+    })
+
+
+def _dtype_testo():
+    """Stringhe Arrow se pyarrow è installato (operazioni .str compilate), altrimenti StringDtype standard"""
+    try:
+        return pd.StringDtype('pyarrow')
+    except ImportError:
+        return pd.StringDtype()
+
+
+_DTYPE_TESTO = _dtype_testo()
+
+
+def _converti(serie, colonna):
+    """Parsing vettoriale comune: restituisce (valori float con NaN, maschera celle vuote, scarti)"""
+    serie = pd.Series(serie)
+
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        valori = serie.astype('float64')
+        return valori, valori.isna(), pd.DataFrame(columns=COLONNE_SCARTI)
+
+    # In una colonna object (es. da openpyxl) possono convivere numeri e stringhe:
+    # i numeri passano così come sono, solo le stringhe vengono interpretate
+    if pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty'):
+        e_testo = serie.notna()
+        valori = pd.Series(np.nan, index=serie.index)
+    else:
+        e_testo = pd.Series([isinstance(v, str) for v in serie.to_numpy()], index=serie.index)
+        valori = pd.to_numeric(serie.where(~e_testo), errors='coerce').astype('float64')
+
+    testo = serie.where(e_testo).astype(_DTYPE_TESTO)
+
+    validi = testo.str.fullmatch(_PATTERN_ITALIANO).fillna(False).astype(bool)
+    vuoti = serie.isna() | (~validi & testo.str.fullmatch(_PATTERN_VUOTO).fillna(False).astype(bool))
+    candidati = e_testo & ~vuoti
+
+    convertiti = (
+        testo.where(validi)
+        .str.replace('€', '', regex=False)
+        .str.replace('.', '', regex=False)
+        .str.replace(',', '.', regex=False)
+        .str.strip()
+        .astype('float64')
+    )
+    valori = valori.where(~validi, convertiti)
+
+    scarti = _scarti(serie, candidati & ~validi, colonna, 'Formato numerico non valido')
+    return valori, vuoti, scarti
+
+
+def converti_valuta(serie, colonna=None):
+    """
+    Converte una colonna di importi in euro (float).
+    Celle vuote → NaN senza scarto; celle non interpretabili → NaN + riga in scarti.
+    """
+    valori, _, scarti = _converti(serie, colonna)
+    return valori, scarti
+
+
+def converti_quantita(serie, colonna=None):
+    """
+    Converte una colonna di quantità in interi (dtype Int64, NA per celle vuote).
+    Oltre ai formati non validi, scarta valori negativi o con parte decimale.
+    """
+    valori, _, scarti = _converti(serie, colonna)
+
+    non_intere = valori.notna() & ((valori % 1 != 0) | (valori < 0))
+    if non_intere.any():
+        scarti = pd.concat([
+            scarti,
+            _scarti(pd.Series(serie), non_intere, colonna, 'Quantità non intera o negativa')
+        ], ignore_index=True)
+        valori = valori.mask(non_intere)
+
+    return valori.round().astype('Int64'), scarti
+
+
+def normalizza_colonne(df, valuta=(), quantita=()):
+    """
+    Converte in un colpo solo le colonne indicate di un DataFrame.
+    Restituisce (DataFrame convertito, scarti di tutte le colonne).
+    """
+    df = df.copy()
+    tutti_scarti = []
+
+    for col in valuta:
+        df[col], scarti = converti_valuta(df[col], colonna=col)
+        tutti_scarti.append(scarti)
+
+    for col in quantita:
+        df[col], scarti = converti_quantita(df[col], colonna=col)
+        tutti_scarti.append(scarti)
+
+    tutti_scarti = [s for s in tutti_scarti if not s.empty]
+    if not tutti_scarti:
+        return df, pd.DataFrame(columns=COLONNE_SCARTI)
+    return df, pd.concat(tutti_scarti, ignore_index=True)
+
+
+def stampa_scarti(scarti, contesto='', massimo=10):
+    """Stampa un riepilogo delle celle scartate con le loro coordinate"""
+    if scarti.empty:
+        return
+    print(f"  ⚠️  {len(scarti)} celle non numeriche scartate{' in ' + contesto if contesto else ''}:")
+    for _, row in scarti.head(massimo).iterrows():
+        print(f"    - riga {row['Riga']}, colonna {row['Colonna']}: '{row['Valore']}' ({row['Motivo']})")
+    if len(scarti) > massimo:
+        print(f"    ... e altre {len(scarti) - massimo}")
+
+
+def _genera_celle(n, seed=42):
+    """Genera n celle realistiche (importi italiani, numeri, vuoti e qualche cella sporca)"""
+    rng = np.random.default_rng(seed)
+    importi = rng.uniform(0, 100000, n).round(2)
+    formati = rng.integers(0, 10, n)
+
+    def italiano(valori):
+        return pd.Series(valori).map('{:,.2f}'.format).str.replace(',', '#').str.replace('.', ',').str.replace('#', '.')
+
+    testo = italiano(importi)
+    celle = np.where(formati < 5, '€ ' + testo, testo + '€').astype(object)
+    celle[formati == 7] = ''
+    celle[formati == 8] = importi[formati == 8]
+    celle[formati == 9] = 'n.d.'
+    return pd.Series(celle)
+
+
+def _converti_per_cella(serie):
+    """Implementazione precedente (cella per cella), usata solo come riferimento nel benchmark"""
+    risultati = []
+    for valore in serie:
+        try:
+            risultati.append(float(str(valore).replace('€', '').replace('.', '').replace(',', '.').strip()))
+        except:
+            risultati.append(0.0)
+    return risultati
+
+
+def benchmark(n_celle):
+    """Confronta la conversione vettoriale con il parsing cella per cella"""
+    print(f"📏 Benchmark normalizzazione su {n_celle:,} celle")
+    celle_miste = _genera_celle(n_celle)
+    scenari = {
+        'solo testo (CSV)': celle_miste.astype(str),
+        'misto numeri/testo (xlsx)': celle_miste
+    }
+
+    for nome, celle in scenari.items():
+        inizio = time.perf_counter()
+        valori, scarti = converti_valuta(celle)
+        t_vettoriale = time.perf_counter() - inizio
+
+        campione = celle.iloc[:min(n_celle, 200000)]
+        inizio = time.perf_counter()
+        _converti_per_cella(campione)
+        t_cella = (time.perf_counter() - inizio) * n_celle / len(campione)
+
+        print(f"\n  Scenario: {nome}")
+        print(f"  • Vettoriale:       {t_vettoriale:8.3f} s  ({n_celle / t_vettoriale:,.0f} celle/s)")
+        print(f"  • Cella per cella:  {t_cella:8.3f} s  (stimato su {len(campione):,} celle, senza validazione)")
+        print(f"  • Rapporto:         {t_cella / t_vettoriale:8.1f}x")
+        print(f"  • Celle convertite: {valori.notna().sum():,} | scartate con coordinate: {len(scarti):,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark normalizzazione numerica formato italiano')
+    parser.add_argument('--celle', type=int, default=1000000, help='Numero di celle da generare')
+    args = parser.parse_args()
+    benchmark(args.celle)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Priorità di acquisto con budget limitato.
+
+Candidati: configurazioni DA_ACQUISTARE con costo da finanziare > 0 (tabella
+dei fatti di calcola_fabbisogno arricchita con i dati struttura). Ogni
+candidato ha una classe di priorità:
+
+    1  PNRR             scadenza marzo 2026
+    2  Gap DM 77        chiude un requisito Mancante (conformita_dm77)
+    3  Altro
+
+Obiettivo: finanziare il massimo numero di configurazioni, classe per classe
+(lessicografico: nessun candidato di classe inferiore scavalca uno di classe
+superiore che entra nel budget), rispettando budget complessivo ed eventuali
+tetti per zona. Con valore unitario per configurazione lo zaino si risolve in
+modo esatto con il greedy per costo crescente: dentro ogni classe i candidati
+ordinati per costo sono selezionati con due somme cumulative vettoriali (per
+zona e complessiva), senza cicli per riga. Il limite superiore (rilassamento
+continuo senza priorità né tetti) misura quanto costano priorità e tetti in
+numero di configurazioni finanziate.
+
+Per ogni candidato è riportato il budget cumulato nella graduatoria e, per i
+non finanziati, il budget aggiuntivo necessario (costo marginale).
+
+Utilizzo:
+    from priorita_acquisti import candidati_acquisto, ottimizza_budget
+
+    piano, riepilogo = ottimizza_budget(candidati_acquisto(df_fabbisogno, df_conformita), budget_cent)
+
+Da riga di comando:
+    python priorita_acquisti.py --budget 500000
+    python priorita_acquisti.py --budget 500000 --quota-zona 25 --csv piano_acquisti.csv
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from conformita_dm77 import FILE_DOTAZIONI_MINIME, calcola_conformita, mappatura_codici
+from motore_fabbisogno import (
+    ETICHETTA_IMPORTI, carica_fabbisogno, euro_a_centesimi, formatta_euro, seleziona_importi
+)
+
+CLASSI_PRIORITA = {1: 'PNRR', 2: 'Gap DM 77', 3: 'Altro'}
+
+COLONNE_PIANO = [
+    'Rango', 'Classe', 'Priorita', 'Codice_Struttura', 'Nome_Struttura', 'Zona', 'PNRR',
+    'Codice_Dotazione', 'Descrizione', 'Quantita_Da_Acquistare', 'Costo_Cent',
+    'Finanziato', 'Motivo_Esclusione', 'Budget_Cumulato_Cent', 'Budget_Aggiuntivo_Cent'
+]
+
+
+def gap_dm77(df_conformita):
+    """Coppie (Codice_Struttura, Codice_Dotazione) che chiudono un requisito DM 77 Mancante"""
+    mancanti = df_conformita.loc[
+        df_conformita['Stato_Conformita'] == 'Mancante', ['Codice_Struttura', 'Tipologia_Standard', 'Dispositivo']
+    ]
+    return mancanti.merge(mappatura_codici(), on=['Tipologia_Standard', 'Dispositivo'])[
+        ['Codice_Struttura', 'Codice_Dotazione']
+    ].drop_duplicates()
+
+
+def candidati_acquisto(df_fabbisogno, df_conformita=None):
+    """
+    Candidati al finanziamento con classe di priorità.
+    df_fabbisogno: calcola_fabbisogno arricchito con le strutture (colonne PNRR, Zona, Nome_Struttura),
+    nella vista netto/lordo desiderata (seleziona_importi).
+    """
+    candidati = df_fabbisogno[
+        (df_fabbisogno['Stato_Finanziamento'] == 'DA_ACQUISTARE') & (df_fabbisogno['Costo_Da_Finanziare_Cent'] > 0)
+    ]
+    candidati = pd.DataFrame({
+        'Codice_Struttura': candidati['Codice_Struttura'],
+        'Nome_Struttura': candidati['Nome_Struttura'],
+        'Zona': candidati['Zona'].fillna('N/D'),
+        'PNRR': candidati['PNRR'],
+        'Codice_Dotazione': candidati['Codice_Dotazione'],
+        'Descrizione': candidati['Descrizione'],
+        'Quantita_Da_Acquistare': candidati['Quantita_Da_Acquistare'],
+        'Costo_Cent': candidati['Costo_Da_Finanziare_Cent'].astype('int64')
+    }).reset_index(drop=True)
+
+    gap = np.zeros(len(candidati), dtype=bool)
+    if df_conformita is not None:
+        chiavi = pd.MultiIndex.from_frame(gap_dm77(df_conformita))
+        gap = pd.MultiIndex.from_frame(candidati[['Codice_Struttura', 'Codice_Dotazione']]).isin(chiavi)
+
+    candidati['Classe'] = np.select([candidati['PNRR'] == 'SI', gap], [1, 2], default=3)
+    candidati['Priorita'] = candidati['Classe'].map(CLASSI_PRIORITA)
+    return candidati
+
+
+def _tetti_zona(zone, budget, tetti_zona=None, quota_zona=None):
+    """Tetto di spesa per zona in centesimi (nessun tetto = budget complessivo)"""
+    tetti = pd.Series(budget, index=zone, dtype='int64')
+    if quota_zona is not None:
+        tetti[:] = budget * quota_zona // 100
+    for zona, tetto in (tetti_zona or {}).items():
+        if zona in tetti.index:
+            tetti[zona] = tetto
+    return tetti
+
+
+def ottimizza_budget(candidati, budget, tetti_zona=None, quota_zona=None):
+    """
+    Seleziona i candidati da finanziare.
+        budget:     budget complessivo in centesimi
+        tetti_zona: {zona: centesimi} tetto di spesa per zona
+        quota_zona: tetto per zona come % del budget (per le zone senza tetto esplicito)
+    Restituisce (piano, riepilogo): piano con COLONNE_PIANO in ordine di graduatoria,
+    riepilogo con spesa, residuo, finanziati per classe e limite superiore.
+    """
+    piano = candidati.sort_values(
+        ['Classe', 'Costo_Cent', 'Codice_Struttura', 'Codice_Dotazione'], kind='stable', ignore_index=True
+    )
+    costo = piano['Costo_Cent'].to_numpy(dtype='int64')
+    zona = piano['Zona']
+    residuo_zona = _tetti_zona(zona.unique(), budget, tetti_zona, quota_zona)
+    residuo = int(budget)
+
+    finanziato = np.zeros(len(piano), dtype=bool)
+    motivo = np.full(len(piano), '', dtype=object)
+    classi = piano['Classe'].to_numpy()
+
+    for classe in CLASSI_PRIORITA:
+        posizioni = np.flatnonzero(classi == classe)
+        if len(posizioni) == 0:
+            continue
+        # Tetto per zona: prefisso per costo crescente dentro ogni zona
+        cumulato_zona = pd.Series(costo[posizioni]).groupby(zona.iloc[posizioni].to_numpy()).cumsum().to_numpy()
+        entro_zona = cumulato_zona <= residuo_zona.reindex(zona.iloc[posizioni]).to_numpy()
+        # Budget complessivo: prefisso per costo crescente dei candidati ammessi dalla zona
+        cumulato = np.cumsum(np.where(entro_zona, costo[posizioni], 0))
+        entro_budget = entro_zona & (cumulato <= residuo)
+
+        scelti = posizioni[entro_budget]
+        finanziato[scelti] = True
+        motivo[posizioni[~entro_zona]] = 'Tetto zona'
+        motivo[posizioni[entro_zona & ~entro_budget]] = 'Budget'
+
+        spesa = pd.Series(costo[scelti]).groupby(zona.iloc[scelti].to_numpy()).sum()
+        residuo_zona = residuo_zona.sub(spesa, fill_value=0).astype('int64')
+        residuo -= int(costo[scelti].sum())
+
+    cumulato_graduatoria = np.cumsum(costo)
+    piano['Rango'] = np.arange(1, len(piano) + 1)
+    piano['Finanziato'] = finanziato
+    piano['Motivo_Esclusione'] = motivo
+    piano['Budget_Cumulato_Cent'] = cumulato_graduatoria
+    piano['Budget_Aggiuntivo_Cent'] = np.where(finanziato, 0, np.maximum(cumulato_graduatoria - budget, 0))
+
+    # Limite superiore: rilassamento continuo senza priorità né tetti per zona
+    # (numero massimo di configurazioni che il budget potrebbe coprire)
+    costi_crescenti = np.sort(costo)
+    interi = int(np.searchsorted(np.cumsum(costi_crescenti), budget, side='right'))
+    limite = float(interi)
+    if interi < len(costi_crescenti):
+        limite += (budget - costi_crescenti[:interi].sum()) / costi_crescenti[interi]
+
+    spesa = int(costo[finanziato].sum())
+    riepilogo = {
+        'Budget_Cent': int(budget),
+        'Spesa_Cent': spesa,
+        'Residuo_Cent': int(budget) - spesa,
+        'Candidati': len(piano),
+        'Finanziati': int(finanziato.sum()),
+        'Limite_Superiore': round(limite, 2),
+        'Prossimo_Costo_Cent': int(costo[~finanziato].min()) if (~finanziato).any() else 0,
+        'Per_Classe': piano.assign(Spesa_Cent=np.where(finanziato, costo, 0)).groupby('Priorita').agg(
+            Candidati=('Costo_Cent', 'size'),
+            Finanziati=('Finanziato', 'sum'),
+            Costo_Cent=('Costo_Cent', 'sum'),
+            Spesa_Cent=('Spesa_Cent', 'sum')
+        ).reindex(CLASSI_PRIORITA.values()).dropna().astype('int64').reset_index()
+    }
+    return piano[COLONNE_PIANO], riepilogo
+
+
+def carica_candidati(lordo=False):
+    """Legge i CSV e restituisce i candidati con la classe di priorità (gap DM 77 inclusi)"""
+    df_strutture, _, df_dotazioni, df_fabbisogno = carica_fabbisogno()
+    df_conformita = calcola_conformita(df_strutture, df_dotazioni, pd.read_csv(FILE_DOTAZIONI_MINIME))
+    return candidati_acquisto(seleziona_importi(df_fabbisogno, lordo=lordo), df_conformita)
+
+
+def _tetti(valori):
+    """['Versilia=100000', ...] → {'Versilia': centesimi}"""
+    tetti = {}
+    for valore in valori or []:
+        zona, _, euro = valore.rpartition('=')
+        if not zona:
+            raise SystemExit(f"❌ Formato non valido per --tetto-zona: {valore} (atteso ZONA=euro)")
+        tetti[zona] = int(euro_a_centesimi([float(euro)])[0])
+    return tetti
+
+
+def stampa_riepilogo(riepilogo):
+    print(f"  💶 Budget:     {formatta_euro(riepilogo['Budget_Cent'], prefisso='€ ')}")
+    print(f"  ✅ Spesa:      {formatta_euro(riepilogo['Spesa_Cent'], prefisso='€ ')} "
+          f"({riepilogo['Finanziati']}/{riepilogo['Candidati']} configurazioni, "
+          f"limite superiore {riepilogo['Limite_Superiore']})")
+    print(f"  💰 Residuo:    {formatta_euro(riepilogo['Residuo_Cent'], prefisso='€ ')}")
+    if riepilogo['Prossimo_Costo_Cent']:
+        print(f"  ➕ Prossimo intervento non finanziato: {formatta_euro(riepilogo['Prossimo_Costo_Cent'], prefisso='€ ')}")
+    for _, classe in riepilogo['Per_Classe'].iterrows():
+        print(f"     - {classe['Priorita']}: {classe['Finanziati']}/{classe['Candidati']} "
+              f"({formatta_euro(classe['Spesa_Cent'], prefisso='€ ')} su "
+              f"{formatta_euro(classe['Costo_Cent'], prefisso='€ ')})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Priorità di acquisto con budget limitato')
+    parser.add_argument('--budget', type=float, required=True, help='budget complessivo in euro')
+    parser.add_argument('--quota-zona', type=float, help='tetto per zona in %% del budget')
+    parser.add_argument('--tetto-zona', nargs='*', metavar='ZONA=EURO', help='tetto di spesa per singola zona')
+    parser.add_argument('--lordo', action='store_true', help='importi IVA inclusa')
+    parser.add_argument('--csv', help='salva il piano completo nel file CSV indicato')
+    args = parser.parse_args()
+
+    candidati = carica_candidati(lordo=args.lordo)
+    inizio = time.perf_counter()
+    piano, riepilogo = ottimizza_budget(
+        candidati, int(euro_a_centesimi([args.budget])[0]), _tetti(args.tetto_zona), args.quota_zona
+    )
+    durata = (time.perf_counter() - inizio) * 1000
+
+    print(f"🎯 Priorità acquisti (importi {ETICHETTA_IMPORTI[args.lordo]}, {durata:.1f} ms)")
+    stampa_riepilogo(riepilogo)
+
+    if args.csv:
+        piano.to_csv(args.csv, index=False)
+        print(f"\n💾 Piano acquisti: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Profilo dei tempi della dashboard, attivabile rerun per rerun.
+
+Si attiva con ?profilo=1 nell'indirizzo della dashboard oppure, per tutte le
+sessioni, con la variabile d'ambiente DASHBOARD_PROFILO=1 del server (il
+parametro nell'indirizzo ha la precedenza: ?profilo=0 lo spegne). Con il
+valore 'cprofile' ogni rerun è anche profilato con cProfile e le statistiche
+sono salvate in .profili_dashboard/ per l'analisi offline.
+
+Le fasi sono misurate con cronometra() (annidabili: il tempo 'proprio' di una
+fase esclude le fasi al suo interno) e ogni st.plotly_chart / st.dataframe è
+misurato dal wrapper StreamlitCronometrato. Lo stato è per thread: Streamlit
+esegue ogni rerun nel thread della sua sessione, quindi sessioni contemporanee
+non si mescolano. Senza profilo attivo cronometra() e il wrapper non misurano
+nulla.
+
+Utilizzo:
+    DASHBOARD_PROFILO=1 streamlit run dashboard_telemedicina.py
+    http://localhost:8501/?profilo=cprofile
+
+    python profilo_dashboard.py                     # riepilogo dei profili cProfile salvati
+    python profilo_dashboard.py --pagina dettaglio --righe 40 --ordina tottime
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from nomi_file import nome_file
+
+VARIABILE_AMBIENTE = 'DASHBOARD_PROFILO'
+PARAMETRO_QUERY = 'profilo'
+CARTELLA_PROFILI = Path('.profili_dashboard')
+
+# Valore del parametro o della variabile → modalità (None = profilo spento)
+MODALITA = {'1': 'tempi', 'tempi': 'tempi', 'cprofile': 'cprofile'}
+
+_stato = threading.local()
+
+
+def modalita_profilo(parametro=None):
+    """Modalità del rerun dal parametro ?profilo= (se presente) o da DASHBOARD_PROFILO"""
+    valore = parametro if parametro is not None else os.environ.get(VARIABILE_AMBIENTE, '')
+    return MODALITA.get(str(valore).strip().lower())
+
+
+def avvia_profilo(modalita):
+    """
+    Inizia il profilo del rerun nel thread corrente (None = spento, ma azzera
+    comunque lo stato lasciato da un rerun interrotto). Restituisce il profilo o None.
+    """
+    precedente = getattr(_stato, 'profilo', None)
+    if precedente and precedente['cprofile']:
+        precedente['cprofile'].disable()
+    _stato.profilo = None
+    if modalita is None:
+        return None
+
+    profilo = {'Modalita': modalita, 'Fasi': [], 'Livello': 0, 'Inizio': time.perf_counter(), 'cprofile': None}
+    if modalita == 'cprofile':
+        profilatore = cProfile.Profile()
+        try:
+            profilatore.enable()
+            profilo['cprofile'] = profilatore
+        except ValueError:  # un altro profilatore è già attivo in questo processo
+            pass
+    _stato.profilo = profilo
+    return profilo
+
+
+@contextmanager
+def cronometra(nome):
+    """
+    Misura il blocco come fase del profilo del rerun corrente. Restituisce la riga
+    della fase (dict), a cui si può cambiare il nome dopo averla misurata.
+    """
+    profilo = getattr(_stato, 'profilo', None)
+    fase = {'Fase': nome}
+    if profilo is None:
+        yield fase
+        return
+    fase['Livello'] = profilo['Livello']
+    profilo['Fasi'].append(fase)
+    profilo['Livello'] += 1
+    inizio = time.perf_counter()
+    try:
+        yield fase
+    finally:
+        fase['Secondi'] = time.perf_counter() - inizio
+        profilo['Livello'] -= 1
+
+
+def termina_profilo(profilo, etichetta=''):
+    """
+    Chiude il profilo del rerun: durata totale e, in modalità cprofile, statistiche
+    salvate in CARTELLA_PROFILI/<data>_<etichetta>.prof. Restituisce il profilo.
+    """
+    profilo['Secondi'] = time.perf_counter() - profilo['Inizio']
+    _stato.profilo = None
+    if profilo['cprofile']:
+        profilo['cprofile'].disable()
+        CARTELLA_PROFILI.mkdir(exist_ok=True)
+        percorso = CARTELLA_PROFILI / f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{nome_file(etichetta)}.prof"
+        profilo['cprofile'].dump_stats(percorso)
+        profilo['File_Cprofile'] = percorso
+        profilo['cprofile'] = None
+    return profilo
+
+
+def tabella_profilo(profilo):
+    """
+    Fasi del profilo con millisecondi totali e propri (esclusi i tempi delle fasi
+    annidate) e percentuale del rerun, nell'ordine di esecuzione.
+    """
+    fasi = profilo['Fasi']
+    propri = [f.get('Secondi', 0.0) for f in fasi]
+    for i, fase in enumerate(fasi):
+        for figlia in fasi[i + 1:]:
+            if figlia['Livello'] <= fase['Livello']:
+                break
+            if figlia['Livello'] == fase['Livello'] + 1:
+                propri[i] -= figlia.get('Secondi', 0.0)
+    totale = profilo.get('Secondi') or 1e-9
+    return pd.DataFrame({
+        'Fase': ['  ' * f['Livello'] + ('↳ ' if f['Livello'] else '') + f['Fase'] for f in fasi],
+        'ms': [round(f.get('Secondi', 0.0) * 1000, 1) for f in fasi],
+        'ms_propri': [round(p * 1000, 1) for p in propri],
+        '% rerun': [round(100 * f.get('Secondi', 0.0) / totale, 1) for f in fasi],
+    })
+
+
+def _descrivi_grafico(figura):
+    titolo = getattr(getattr(getattr(figura, 'layout', None), 'title', None), 'text', None)
+    return f"plotly_chart: {titolo}" if titolo else 'plotly_chart'
+
+
+def _descrivi_tabella(dati):
+    dati = getattr(dati, 'data', dati)  # Styler → DataFrame
+    forma = getattr(dati, 'shape', None)
+    return f"dataframe: {forma[0]:,}×{forma[1]}" if forma and len(forma) == 2 else 'dataframe'
+
+
+class StreamlitCronometrato:
+    """
+    Il modulo streamlit con st.plotly_chart e st.dataframe misurati come fasi del
+    profilo (serializzazione del grafico o della tabella inclusa); tutto il resto
+    è passato al modulo senza cambiamenti.
+    """
+
+    def __init__(self, modulo):
+        self._modulo = modulo
+
+    def __getattr__(self, nome):
+        return getattr(self._modulo, nome)
+
+    def plotly_chart(self, figura, *args, **kwargs):
+        with cronometra(_descrivi_grafico(figura)):
+            return self._modulo.plotly_chart(figura, *args, **kwargs)
+
+    def dataframe(self, *args, **kwargs):
+        with cronometra(_descrivi_tabella(args[0] if args else kwargs.get('data'))):
+            return self._modulo.dataframe(*args, **kwargs)
+
+
+def riepiloga_profili(cartella=CARTELLA_PROFILI, pagina=None, righe=25, ordina='cumulative'):
+    """Statistiche cProfile sommate di tutti i rerun salvati (o di quelli di una pagina)"""
+    file = sorted(Path(cartella).glob('*.prof'))
+    if pagina:
+        file = [f for f in file if nome_file(pagina) in f.stem]
+    if not file:
+        return None, 0
+    statistiche = pstats.Stats(str(file[0]))
+    for percorso in file[1:]:
+        statistiche.add(str(percorso))
+    statistiche.strip_dirs().sort_stats(ordina).print_stats(righe)
+    return statistiche, len(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Riepilogo dei profili cProfile salvati dalla dashboard')
+    parser.add_argument('--cartella', default=str(CARTELLA_PROFILI), help='cartella dei profili')
+    parser.add_argument('--pagina', help='solo i rerun di questa pagina (parte del nome)')
+    parser.add_argument('--righe', type=int, default=25, help='funzioni da mostrare')
+    parser.add_argument('--ordina', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'],
+                        help='ordinamento delle funzioni')
+    args = parser.parse_args()
+
+    print(f"🔬 Profili cProfile in {args.cartella}/" + (f" (pagina: {args.pagina})" if args.pagina else ''))
+    _, n_file = riepiloga_profili(args.cartella, args.pagina, args.righe, args.ordina)
+    if not n_file:
+        print(f"  ℹ️  Nessun profilo: aprire la dashboard con ?{PARAMETRO_QUERY}=cprofile "
+              f"o {VARIABILE_AMBIENTE}=cprofile")
+        return
+    print(f"📊 {n_file} rerun sommati")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Motore di regole di qualità dati per strutture e configurazioni dotazioni.
+
+Ogni regola è un predicato vettoriale sulla tabella dei fatti (configurazioni
+arricchite con i dati della struttura) oppure sull'anagrafica strutture: riceve
+il DataFrame intero e restituisce la maschera delle righe che violano la regola.
+Nessun ciclo per riga: l'intero set di regole gira in pochi millisecondi anche
+su centinaia di migliaia di configurazioni.
+
+I risultati sono tenuti in cache per versione dei dati (vedi
+integrita_referenziale.versione_dati): finché i CSV non cambiano le regole non
+vengono rieseguite.
+
+Utilizzo come modulo:
+    from regole_qualita import esegui_regole
+
+    riepilogo, dettaglio = esegui_regole(df_strutture, df_dotazioni, versione=versione)
+
+Da riga di comando (report su console, opzionale export CSV del dettaglio):
+    python regole_qualita.py
+    python regole_qualita.py --csv violazioni_qualita.csv
+"""
+
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from integrita_referenziale import FILE_DOTAZIONI, FILE_STRUTTURE, per_versione, versione_dati
+
+GRAVITA = ['errore', 'avviso']
+
+COLONNE_RIEPILOGO = ['Regola', 'Gravita', 'Tabella', 'Descrizione', 'Violazioni']
+COLONNE_DETTAGLIO = ['Regola', 'Gravita', 'Riga', 'Codice_Struttura', 'Codice_Dotazione', 'Valori']
+
+# Colonne della struttura riportate sulla tabella dei fatti
+COLONNE_FATTI_STRUTTURA = ['Tipologia', 'Zona', 'PNRR']
+
+
+def _stato(fatti, stato):
+    return fatti['Stato_Finanziamento'] == stato
+
+
+# Regole: tabella ('configurazioni' | 'strutture'), gravità, descrizione,
+# predicato(df) → maschera delle righe in violazione, colonne mostrate nel dettaglio
+REGOLE = {
+    'Q01': {
+        'tabella': 'configurazioni', 'gravita': 'errore',
+        'descrizione': 'Coppia Codice_Struttura + Codice_Dotazione duplicata',
+        'predicato': lambda f: f.duplicated(subset=['Codice_Struttura', 'Codice_Dotazione'], keep=False),
+        'colonne': ['Quantita_Presente', 'Quantita_Richiesta', 'Stato_Finanziamento']
+    },
+    'Q02': {
+        'tabella': 'configurazioni', 'gravita': 'avviso',
+        'descrizione': 'Quantita_Presente maggiore di Quantita_Richiesta',
+        'predicato': lambda f: f['Quantita_Presente'] > f['Quantita_Richiesta'],
+        'colonne': ['Quantita_Presente', 'Quantita_Richiesta']
+    },
+    'Q03': {
+        'tabella': 'configurazioni', 'gravita': 'avviso',
+        'descrizione': 'Stato FINANZIATO con dotazioni già presenti',
+        'predicato': lambda f: _stato(f, 'FINANZIATO') & (f['Quantita_Presente'] > 0),
+        'colonne': ['Stato_Finanziamento', 'Quantita_Presente']
+    },
+    'Q04': {
+        'tabella': 'configurazioni', 'gravita': 'avviso',
+        'descrizione': 'Stato PRESENTE senza dotazioni presenti',
+        'predicato': lambda f: _stato(f, 'PRESENTE') & (f['Quantita_Presente'] == 0),
+        'colonne': ['Stato_Finanziamento', 'Quantita_Presente']
+    },
+    'Q05': {
+        'tabella': 'configurazioni', 'gravita': 'avviso',
+        'descrizione': 'Stato DA_ACQUISTARE senza quantità da acquistare',
+        'predicato': lambda f: _stato(f, 'DA_ACQUISTARE') & (f['Quantita_Presente'] >= f['Quantita_Richiesta']),
+        'colonne': ['Stato_Finanziamento', 'Quantita_Presente', 'Quantita_Richiesta']
+    },
+    'Q06': {
+        'tabella': 'configurazioni', 'gravita': 'avviso',
+        'descrizione': 'Stato NON_RICHIESTO con quantità richiesta',
+        'predicato': lambda f: _stato(f, 'NON_RICHIESTO') & (f['Quantita_Richiesta'] > 0),
+        'colonne': ['Stato_Finanziamento', 'Quantita_Richiesta']
+    },
+    'S01': {
+        'tabella': 'strutture', 'gravita': 'errore',
+        'descrizione': 'OdC senza Posti_Letto',
+        'predicato': lambda s: (s['Tipologia'] == 'OdC') & ~(pd.to_numeric(s['Posti_Letto'], errors='coerce') > 0),
+        'colonne': ['Tipologia', 'Posti_Letto']
+    },
+    'S02': {
+        'tabella': 'strutture', 'gravita': 'errore',
+        'descrizione': 'CdC non classificata Hub o Spoke',
+        'predicato': lambda s: (s['Tipologia'] == 'CdC') & ~s['Classificazione'].isin(['Hub', 'Spoke']),
+        'colonne': ['Tipologia', 'Classificazione']
+    }
+}
+
+# Esito delle regole sull'ultima versione dei dati
+_RISULTATI = {}
+
+
+def costruisci_fatti(df_strutture, df_dotazioni):
+    """Tabella dei fatti: configurazioni con tipologia, zona e PNRR della struttura (indice originale)"""
+    colonne = ['Codice'] + [c for c in COLONNE_FATTI_STRUTTURA if c in df_strutture.columns]
+    strutture = df_strutture[colonne].drop_duplicates('Codice').set_index('Codice')
+    fatti = df_dotazioni.join(strutture, on='Codice_Struttura', rsuffix='_Strutt')
+    for colonna in ['Quantita_Presente', 'Quantita_Richiesta']:
+        fatti[colonna] = pd.to_numeric(fatti[colonna], errors='coerce').fillna(0)
+    return fatti
+
+
+def _valori(df, maschera, colonne):
+    """Testo 'Colonna=valore; ...' per le sole righe in violazione"""
+    testo = None
+    for colonna in colonne:
+        if colonna not in df.columns:
+            continue
+        parte = colonna + '=' + df.loc[maschera, colonna].astype(str)
+        testo = parte if testo is None else testo + '; ' + parte
+    return testo if testo is not None else pd.Series('', index=df.index[maschera])
+
+
+def _esegui(df_strutture, df_dotazioni):
+    tabelle = {
+        'configurazioni': costruisci_fatti(df_strutture, df_dotazioni),
+        'strutture': df_strutture
+    }
+    riepilogo = []
+    dettaglio = []
+    for codice, regola in REGOLE.items():
+        df = tabelle[regola['tabella']]
+        maschera = regola['predicato'](df).fillna(False).astype(bool)
+        riepilogo.append({
+            'Regola': codice, 'Gravita': regola['gravita'], 'Tabella': regola['tabella'],
+            'Descrizione': regola['descrizione'], 'Violazioni': int(maschera.sum())
+        })
+        if not maschera.any():
+            continue
+        righe = df.loc[maschera]
+        if regola['tabella'] == 'strutture':
+            struttura, dotazione = righe['Codice'].to_numpy(), ''
+        else:
+            struttura, dotazione = righe['Codice_Struttura'].to_numpy(), righe['Codice_Dotazione'].to_numpy()
+        dettaglio.append(pd.DataFrame({
+            'Regola': codice,
+            'Gravita': regola['gravita'],
+            'Riga': righe.index,
+            'Codice_Struttura': struttura,
+            'Codice_Dotazione': dotazione,
+            'Valori': _valori(df, maschera, regola['colonne']).to_numpy()
+        }))
+
+    df_riepilogo = pd.DataFrame(riepilogo, columns=COLONNE_RIEPILOGO)
+    if not dettaglio:
+        return df_riepilogo, pd.DataFrame(columns=COLONNE_DETTAGLIO)
+    return df_riepilogo, pd.concat(dettaglio, ignore_index=True)
+
+
+def esegui_regole(df_strutture, df_dotazioni, versione=None):
+    """
+    Esegue tutte le regole e restituisce (riepilogo, dettaglio):
+        riepilogo: una riga per regola con il numero di violazioni (COLONNE_RIEPILOGO)
+        dettaglio: una riga per violazione (COLONNE_DETTAGLIO)
+    Con versione indicata il risultato è riutilizzato finché la versione dei dati non cambia.
+    """
+    if versione is None:
+        return _esegui(df_strutture, df_dotazioni)
+    return per_versione(_RISULTATI, versione, lambda: _esegui(df_strutture, df_dotazioni))
+
+
+def stampa_report(riepilogo, dettaglio, massimo=10):
+    """Report su console: riepilogo per regola e prime violazioni di ciascuna"""
+    for _, regola in riepilogo.iterrows():
+        if regola['Violazioni'] == 0:
+            print(f"  ✅ {regola['Regola']} {regola['Descrizione']}")
+            continue
+        icona = '❌' if regola['Gravita'] == 'errore' else '⚠️ '
+        print(f"  {icona} {regola['Regola']} {regola['Descrizione']}: {regola['Violazioni']} righe")
+        violazioni = dettaglio[dettaglio['Regola'] == regola['Regola']]
+        for _, row in violazioni.head(massimo).iterrows():
+            codice = row['Codice_Struttura'] + (f" / {row['Codice_Dotazione']}" if row['Codice_Dotazione'] else '')
+            print(f"      - riga {row['Riga']}: {codice} ({row['Valori']})")
+        if len(violazioni) > massimo:
+            print(f"      ... e altre {len(violazioni) - massimo}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regole di qualità dati su strutture e configurazioni')
+    parser.add_argument('--csv', help='salva il dettaglio delle violazioni nel file CSV indicato')
+    args = parser.parse_args()
+
+    versione = versione_dati(FILE_STRUTTURE, FILE_DOTAZIONI)
+    print(f"🧪 Regole di qualità dati (versione dati {versione})")
+    df_strutture = pd.read_csv(FILE_STRUTTURE)
+    df_dotazioni = pd.read_csv(FILE_DOTAZIONI)
+
+    inizio = time.perf_counter()
+    riepilogo, dettaglio = esegui_regole(df_strutture, df_dotazioni)
+    durata = time.perf_counter() - inizio
+
+    print(f"  📊 {len(REGOLE)} regole su {len(df_strutture)} strutture e "
+          f"{len(df_dotazioni)} configurazioni ({durata * 1000:.1f} ms)")
+    stampa_report(riepilogo, dettaglio)
+
+    if args.csv:
+        dettaglio.to_csv(args.csv, index=False)
+        print(f"\n💾 Dettaglio violazioni: {args.csv}")
+
+    errori = riepilogo.loc[riepilogo['Gravita'] == 'errore', 'Violazioni'].sum()
+    sys.exit(1 if errori else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Report Excel e HTML per zona (o per struttura) generati in blocco.
+
+La tabella dei fatti (fabbisogno arricchito con le strutture) è calcolata una sola
+volta, divisa con un solo groupby per Zona o per Codice struttura e ogni parte è
+passata a un processo di lavoro che scrive i suoi report con le stesse funzioni
+del report della direzione (scrivi_report_excel, scrivi_report_html). Ogni
+processo legge plotly.js una volta e lo riusa per tutti i suoi report.
+
+Nella cartella di output c'è anche manifest.json con i file prodotti, i totali
+da finanziare, le sezioni HTML rigenerate (le altre vengono dalla cache) e i
+tempi di ogni report e dell'intera esecuzione.
+
+Utilizzo:
+    python report_territoriali.py                       # un report per zona
+    python report_territoriali.py --per struttura --lordo
+    python report_territoriali.py --processi 4 --formati html --cartella report_zone
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from genera_report_direzione import scrivi_report_excel
+from genera_report_html import AMBITO_ASL, bundle_plotly, scrivi_report_html
+from motore_fabbisogno import ETICHETTA_IMPORTI, carica_fabbisogno, formatta_euro, seleziona_importi
+from nomi_file import nome_file
+
+# Ripartizione: colonna della struttura e colonna corrispondente nella tabella dei fatti
+RIPARTIZIONI = {
+    'zona': ('Zona', 'Zona'),
+    'struttura': ('Codice', 'Codice_Struttura'),
+}
+
+FORMATI = ['excel', 'html']
+
+FILE_MANIFEST = 'manifest.json'
+
+
+def ripartisci(df_strutture, df_fabbisogno, per='zona'):
+    """
+    Parti della tabella dei fatti per zona o per struttura, ciascuna con le sue strutture.
+    Restituisce una lista di dict (Chiave, Ambito, Nome, strutture, fabbisogno); le
+    configurazioni senza struttura in anagrafica non finiscono in nessuna parte.
+    """
+    colonna_strutture, colonna_fatti = RIPARTIZIONI[per]
+    df_strutture = df_strutture.assign(Zona=df_strutture['Zona'].fillna('N/D'))
+    df_fabbisogno = df_fabbisogno[df_fabbisogno['Codice_Struttura'].isin(df_strutture['Codice'])]
+    df_fabbisogno = df_fabbisogno.assign(Zona=df_fabbisogno['Zona'].fillna('N/D'))
+
+    fatti_per_chiave = dict(tuple(df_fabbisogno.groupby(colonna_fatti, sort=False)))
+    parti = []
+    for chiave, strutture in df_strutture.groupby(colonna_strutture, sort=True):
+        fatti = fatti_per_chiave.get(chiave, df_fabbisogno.iloc[:0])
+        if per == 'zona':
+            ambito, nome = f"{AMBITO_ASL} - Zona {chiave}", f"zona_{nome_file(chiave)}"
+        else:
+            nome_struttura = strutture['Nome_Struttura'].iloc[0]
+            ambito, nome = f"{AMBITO_ASL} - {nome_struttura}", f"struttura_{nome_file(chiave)}"
+        parti.append({'Chiave': chiave, 'Ambito': ambito, 'Nome': nome, 'strutture': strutture, 'fabbisogno': fatti})
+    return parti
+
+
+def genera_parte(parte, cartella, lordo=False, formati=FORMATI):
+    """Scrive i report di una parte (eseguita nei processi di lavoro); restituisce la riga del manifest"""
+    cartella = Path(cartella)
+    riga = {
+        'Chiave': str(parte['Chiave']),
+        'Ambito': parte['Ambito'],
+        'Strutture': len(parte['strutture']),
+        'Configurazioni': len(parte['fabbisogno']),
+        'Processo': os.getpid(),
+    }
+    for formato in formati:
+        inizio = time.perf_counter()
+        if formato == 'excel':
+            percorso = cartella / f"{parte['Nome']}.xlsx"
+            totali = scrivi_report_excel(
+                percorso, parte['strutture'], parte['fabbisogno'], lordo=lordo, ambito=parte['Ambito'], verbose=False
+            )
+        else:
+            percorso = cartella / f"{parte['Nome']}.html"
+            totali = scrivi_report_html(percorso, parte['strutture'], parte['fabbisogno'], lordo=lordo,
+                                        ambito=parte['Ambito'])
+            riga['Sezioni_Rigenerate'] = len(totali['Sezioni_Rigenerate'])
+        riga[f'File_{formato.capitalize()}'] = percorso.name
+        riga[f'Secondi_{formato.capitalize()}'] = round(time.perf_counter() - inizio, 3)
+    riga['Da_Finanziare_PNRR_Cent'] = int(totali['Da_Finanziare_PNRR_Cent'])
+    riga['Da_Finanziare_No_Cent'] = int(totali['Da_Finanziare_No_Cent'])
+    return riga
+
+
+def _genera_parte(argomenti):
+    return genera_parte(*argomenti)
+
+
+def genera_report_territoriali(cartella, per='zona', lordo=False, formati=FORMATI, processi=None):
+    """
+    Genera i report di tutte le parti in parallelo (processi: numero di processi di lavoro,
+    default uno per CPU; 1 = tutto nel processo corrente) e scrive il manifest.
+    Restituisce il manifest come dict.
+    """
+    inizio = time.perf_counter()
+    cartella = Path(cartella)
+    cartella.mkdir(parents=True, exist_ok=True)
+
+    # Tabella dei fatti calcolata una volta sola, poi divisa
+    df_strutture, _, _, df_fabbisogno = carica_fabbisogno()
+    df_fabbisogno = seleziona_importi(df_fabbisogno, lordo=lordo)
+    parti = ripartisci(df_strutture, df_fabbisogno, per=per)
+    durata_preparazione = time.perf_counter() - inizio
+
+    if 'html' in formati:
+        bundle_plotly()  # copia locale di plotly.js creata prima di avviare i processi
+
+    processi = min(processi or os.cpu_count() or 1, len(parti)) or 1
+    argomenti = [(parte, cartella, lordo, formati) for parte in parti]
+    if processi == 1:
+        righe = [_genera_parte(a) for a in argomenti]
+    else:
+        with ProcessPoolExecutor(max_workers=processi) as pool:
+            righe = list(pool.map(_genera_parte, argomenti))
+
+    durata = time.perf_counter() - inizio
+    manifest = {
+        'Generato': datetime.now().isoformat(timespec='seconds'),
+        'Per': per,
+        'Importi': ETICHETTA_IMPORTI[lordo],
+        'Formati': list(formati),
+        'Processi': processi,
+        'Secondi_Preparazione': round(durata_preparazione, 3),
+        'Secondi_Totali': round(durata, 3),
+        'Secondi_Report_Sommati': round(sum(r.get(f'Secondi_{f.capitalize()}', 0) for r in righe for f in formati), 3),
+        'Report': righe,
+    }
+    with open(cartella / FILE_MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report Excel e HTML per zona o per struttura, generati in parallelo')
+    parser.add_argument('--per', choices=list(RIPARTIZIONI), default='zona', help='ripartizione (default: zona)')
+    parser.add_argument('--lordo', action='store_true', help='importi IVA inclusa')
+    parser.add_argument('--formati', nargs='+', choices=FORMATI, default=FORMATI, help='formati da generare')
+    parser.add_argument('--processi', type=int, help='processi di lavoro (default: uno per CPU)')
+    parser.add_argument('--cartella', help='cartella di output (default: report_<per>_YYYYMMDD_HHMM)')
+    args = parser.parse_args()
+
+    cartella = args.cartella or f"report_{args.per}_{datetime.now().strftime('%Y%m%d_%H%M')}"
+    print(f"📊 Report per {args.per} (importi {ETICHETTA_IMPORTI[args.lordo]})...")
+    manifest = genera_report_territoriali(cartella, args.per, args.lordo, args.formati, args.processi)
+
+    righe = manifest['Report']
+    print(f"  ✅ {len(righe)} ambiti, {len(righe) * len(args.formati)} file in {cartella}/ "
+          f"con {manifest['Processi']} processi")
+    print(f"  ⏱️  {manifest['Secondi_Totali']:.1f} s totali "
+          f"(preparazione {manifest['Secondi_Preparazione']:.1f} s, "
+          f"somma dei singoli report {manifest['Secondi_Report_Sommati']:.1f} s)")
+    for riga in sorted(righe, key=lambda r: -r['Da_Finanziare_PNRR_Cent'] - r['Da_Finanziare_No_Cent']):
+        totale = riga['Da_Finanziare_PNRR_Cent'] + riga['Da_Finanziare_No_Cent']
+        print(f"  - {riga['Ambito']}: {riga['Strutture']} strutture, "
+              f"da finanziare {formatta_euro(totale, prefisso='€ ')}")
+    print(f"\n💾 Manifest: {Path(cartella) / FILE_MANIFEST}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Schema dichiarativo dei file dati e validatore vettoriale.
+
+Ogni dataset ha uno schema in SCHEMI (tipo, obbligatorietà, valori ammessi,
+intervalli, univocità, riferimenti ad altri dataset). Lo schema viene
+compilato una sola volta in una lista di controlli vettoriali che lavorano su
+colonne intere; valida() li esegue tutti in un passaggio e restituisce una
+tabella errori riga/colonna, vuota se i dati sono conformi.
+
+Utilizzo come modulo:
+    from schema_dati import valida
+
+    errori = valida(df_dotazioni, 'dotazioni', riferimenti={'catalogo': df_catalogo})
+
+    verifica(df_aggiornato, 'strutture')   # solleva ErroreValidazione: blocca la scrittura
+
+Da riga di comando (valida tutti i CSV della dashboard):
+    python schema_dati.py
+"""
+
+import re
+import sys
+import time
+from functools import lru_cache
+
+import pandas as pd
+
+COLONNE_ERRORI = ['Dataset', 'Riga', 'Colonna', 'Valore', 'Errore']
+
+STATI_FINANZIAMENTO = ['DA_ACQUISTARE', 'FINANZIATO', 'PRESENTE', 'NON_RICHIESTO']
+
+# Specifiche colonna:
+#   tipo:         'testo' | 'intero' | 'numero'
+#   obbligatorio: valore richiesto in ogni riga
+#   opzionale:    la colonna può mancare del tutto (default: deve esistere)
+#   valori:       valori ammessi
+#   min / max:    intervallo per colonne numeriche
+#   pattern:      espressione regolare (fullmatch) per colonne testo
+#   univoco:      nessun duplicato nella colonna
+#   riferimento:  'dataset.Colonna' che deve contenere il valore
+SCHEMI = {
+    'strutture': {
+        'file': 'strutture_sanitarie.csv',
+        'colonne': {
+            'Codice': {'tipo': 'testo', 'obbligatorio': True, 'univoco': True, 'pattern': r'[A-Z]+\d+'},
+            'Tipologia': {'tipo': 'testo', 'obbligatorio': True, 'valori': ['CdC', 'OdC', 'Cure Intermedie']},
+            'Nome_Struttura': {'tipo': 'testo', 'obbligatorio': True},
+            'Zona': {'tipo': 'testo', 'opzionale': True},
+            'Classificazione': {'tipo': 'testo', 'opzionale': True, 'valori': ['Hub', 'Spoke']},
+            'PNRR': {'tipo': 'testo', 'obbligatorio': True, 'valori': ['SI', 'NO']},
+            'Posti_Letto': {'tipo': 'intero', 'opzionale': True, 'min': 0}
+        }
+    },
+    'catalogo': {
+        'file': 'dotazioni_telemedicina_catalogo.csv',
+        'colonne': {
+            'Categoria': {'tipo': 'testo', 'obbligatorio': True},
+            'Codice': {'tipo': 'testo', 'obbligatorio': True, 'univoco': True},
+            'Descrizione': {'tipo': 'testo', 'obbligatorio': True},
+            'Costo_Unitario_EUR': {'tipo': 'numero', 'obbligatorio': True, 'min': 0},
+            'IVA_Percentuale': {'tipo': 'numero', 'obbligatorio': True, 'min': 0, 'max': 22},
+            'Applicabile_A': {'tipo': 'testo', 'opzionale': True, 'valori': ['CDC', 'ODC', 'COMUNE']}
+        }
+    },
+    'dotazioni': {
+        'file': 'dotazioni_strutture_telemedicina.csv',
+        'univoci': [['Codice_Struttura', 'Codice_Dotazione']],
+        'colonne': {
+            'Codice_Struttura': {'tipo': 'testo', 'obbligatorio': True, 'riferimento': 'strutture.Codice'},
+            'Codice_Dotazione': {'tipo': 'testo', 'obbligatorio': True, 'riferimento': 'catalogo.Codice'},
+            'Quantita_Presente': {'tipo': 'intero', 'obbligatorio': True, 'min': 0},
+            'Quantita_Richiesta': {'tipo': 'intero', 'obbligatorio': True, 'min': 0},
+            'Stato_Finanziamento': {'tipo': 'testo', 'obbligatorio': True, 'valori': STATI_FINANZIAMENTO}
+        }
+    },
+    'dotazioni_minime': {
+        'file': 'dotazioni_minime_standard.csv',
+        'colonne': {
+            'Tipologia': {'tipo': 'testo', 'obbligatorio': True, 'valori': ['CDC', 'ODC', 'COMUNE']},
+            'Dispositivo': {'tipo': 'testo', 'obbligatorio': True},
+            'Quantita_Minima': {'tipo': 'intero', 'obbligatorio': True, 'min': 0}
+        }
+    }
+}
+
+
+def _vuoti(serie):
+    """Celle mancanti o con solo spazi"""
+    return serie.isna() | (serie.astype(str).str.strip() == '')
+
+
+def _compila_colonna(colonna, spec):
+    """Traduce la specifica di una colonna in controlli (messaggio, funzione(serie, riferimenti) → maschera)"""
+    controlli = []
+    tipo = spec.get('tipo', 'testo')
+
+    if spec.get('obbligatorio'):
+        controlli.append(('Valore mancante', lambda s, rif: _vuoti(s)))
+
+    if tipo in ('intero', 'numero'):
+        def non_numerico(s, rif):
+            return ~_vuoti(s) & pd.to_numeric(s, errors='coerce').isna()
+        controlli.append(('Valore non numerico', non_numerico))
+
+    if tipo == 'intero':
+        def non_intero(s, rif):
+            numeri = pd.to_numeric(s, errors='coerce')
+            return numeri.notna() & (numeri % 1 != 0)
+        controlli.append(('Valore non intero', non_intero))
+
+    if 'min' in spec:
+        minimo = spec['min']
+        controlli.append((f'Valore minore di {minimo}',
+                          lambda s, rif: pd.to_numeric(s, errors='coerce') < minimo))
+
+    if 'max' in spec:
+        massimo = spec['max']
+        controlli.append((f'Valore maggiore di {massimo}',
+                          lambda s, rif: pd.to_numeric(s, errors='coerce') > massimo))
+
+    if 'valori' in spec:
+        ammessi = pd.Index([str(v) for v in spec['valori']])
+        controlli.append((f"Valore non ammesso (ammessi: {', '.join(ammessi)})",
+                          lambda s, rif: ~_vuoti(s) & ~s.astype(str).str.strip().isin(ammessi)))
+
+    if 'pattern' in spec:
+        regex = re.compile(spec['pattern'])
+        controlli.append((f"Formato non valido ({spec['pattern']})",
+                          lambda s, rif: ~_vuoti(s) & ~s.astype(str).str.strip().str.fullmatch(regex).fillna(False)))
+
+    if spec.get('univoco'):
+        controlli.append(('Valore duplicato', lambda s, rif: ~_vuoti(s) & s.duplicated(keep=False)))
+
+    if 'riferimento' in spec:
+        dataset, colonna_rif = spec['riferimento'].split('.')
+
+        def orfano(s, rif):
+            if rif is None or dataset not in rif:
+                return pd.Series(False, index=s.index)
+            return ~_vuoti(s) & ~s.isin(rif[dataset][colonna_rif])
+        controlli.append((f'Codice non presente in {dataset}', orfano))
+
+    return controlli
+
+
+@lru_cache(maxsize=None)
+def compila_schema(nome):
+    """
+    Compila (una volta sola) lo schema di un dataset in una lista di controlli vettoriali
+    (colonne necessarie, etichetta colonna, messaggio, funzione(df, riferimenti) → maschera righe errate).
+    """
+    schema = SCHEMI[nome]
+    controlli = []
+    for colonna, spec in schema['colonne'].items():
+        for messaggio, funzione in _compila_colonna(colonna, spec):
+            controlli.append((
+                [colonna], colonna, messaggio,
+                lambda df, rif, colonna=colonna, funzione=funzione: funzione(df[colonna], rif)
+            ))
+    for chiave in schema.get('univoci', []):
+        controlli.append((
+            chiave, ' + '.join(chiave), f"Combinazione {' + '.join(chiave)} duplicata",
+            lambda df, rif, chiave=chiave: df.duplicated(subset=chiave, keep=False)
+        ))
+    return controlli
+
+
+def _errori(nome, valori, colonna, messaggio):
+    """Righe della tabella errori per i valori (già filtrati) di una colonna"""
+    return pd.DataFrame({
+        'Dataset': nome,
+        'Riga': valori.index,
+        'Colonna': colonna,
+        'Valore': valori.to_numpy(),
+        'Errore': messaggio
+    })
+
+
+def valida(df, nome, riferimenti=None):
+    """
+    Valida un DataFrame contro lo schema del dataset indicato.
+    riferimenti: {'catalogo': df_catalogo, 'strutture': df_strutture, ...} per i controlli di riferimento
+    Restituisce la tabella errori (COLONNE_ERRORI); Riga è l'indice del DataFrame.
+    """
+    schema = SCHEMI[nome]
+    errori = []
+
+    mancanti = [c for c, spec in schema['colonne'].items() if c not in df.columns and not spec.get('opzionale')]
+    for colonna in mancanti:
+        errori.append(pd.DataFrame([{
+            'Dataset': nome, 'Riga': None, 'Colonna': colonna, 'Valore': '', 'Errore': 'Colonna mancante'
+        }]))
+
+    for colonne, etichetta, messaggio, controllo in compila_schema(nome):
+        if not all(c in df.columns for c in colonne):
+            continue
+        maschera = controllo(df, riferimenti).fillna(False).astype(bool)
+        if maschera.any():
+            valori = df.loc[maschera, colonne[0]].astype(str)
+            for colonna in colonne[1:]:
+                valori = valori + ' + ' + df.loc[maschera, colonna].astype(str)
+            errori.append(_errori(nome, valori, etichetta, messaggio))
+
+    if not errori:
+        return pd.DataFrame(columns=COLONNE_ERRORI)
+    return pd.concat(errori, ignore_index=True)
+
+
+class ErroreValidazione(ValueError):
+    """Dati non conformi allo schema: la tabella errori è in .errori"""
+
+    def __init__(self, errori):
+        super().__init__(f"{len(errori)} errori di schema")
+        self.errori = errori
+
+
+def verifica(df, nome, riferimenti=None):
+    """Come valida(), ma solleva ErroreValidazione se ci sono errori: da usare come controllo prima di scrivere"""
+    errori = valida(df, nome, riferimenti)
+    if not errori.empty:
+        raise ErroreValidazione(errori)
+    return df
+
+
+def valida_tutti(dati):
+    """
+    Valida più dataset insieme risolvendo i riferimenti tra loro.
+    dati: {'strutture': df, 'catalogo': df, ...}
+    """
+    risultati = [valida(df, nome, riferimenti=dati) for nome, df in dati.items()]
+    risultati = [r for r in risultati if not r.empty]
+    if not risultati:
+        return pd.DataFrame(columns=COLONNE_ERRORI)
+    return pd.concat(risultati, ignore_index=True)
+
+
+def stampa_errori(errori, massimo=20):
+    """Stampa un riepilogo della tabella errori"""
+    if errori.empty:
+        print("  ✅ Nessun errore di schema")
+        return
+    print(f"  ❌ {len(errori)} errori di schema:")
+    for _, row in errori.head(massimo).iterrows():
+        riga = '' if pd.isna(row['Riga']) else f"riga {row['Riga']}, "
+        print(f"    - [{row['Dataset']}] {riga}{row['Colonna']}: {row['Errore']} ('{row['Valore']}')")
+    if len(errori) > massimo:
+        print(f"    ... e altri {len(errori) - massimo}")
+
+
+def main():
+    print("🔍 Validazione schema file dati")
+    dati = {nome: pd.read_csv(schema['file']) for nome, schema in SCHEMI.items()}
+
+    inizio = time.perf_counter()
+    errori = valida_tutti(dati)
+    durata = time.perf_counter() - inizio
+
+    print(f"  📊 {sum(len(df) for df in dati.values())} righe in {len(dati)} file ({durata * 1000:.1f} ms)")
+    stampa_errori(errori)
+    sys.exit(1 if not errori.empty else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Simulatore what-if dei prezzi di catalogo.
+
+Invece di modificare dotazioni_telemedicina_catalogo.csv e ricalcolare il
+fabbisogno, il simulatore parte da una base precalcolata una volta sola: per
+ogni (Codice_Dotazione, PNRR, Zona, Tipologia) le quantità che moltiplicano il
+costo unitario in ciascuna voce (Totale, Da_Finanziare, Gia_Finanziato,
+Presente) e i totali già calcolati da motore_fabbisogno. Uno scenario di
+prezzo aggiorna i KPI per differenza:
+
+    totale_scenario = totale_base + quantità × (prezzo_scenario − prezzo_base)
+
+su poche centinaia di righe, quindi ogni modifica risponde in pochi ms.
+Importi in centesimi interi; nella vista IVA inclusa l'IVA sulla differenza è
+arrotondata per gruppo (codice, PNRR, zona, tipologia).
+
+Uno scenario è un dizionario salvabile in JSON (cartella scenari_prezzi/):
+    {"nome": "Gara regionale", "descrizione": "...",
+     "prezzi": {"DIAG001": 3500.0},       # nuovo prezzo unitario IVA esclusa (€)
+     "sconti": {"ATTR003": 15}}           # sconto % sul prezzo (di catalogo o fissato in "prezzi")
+
+Utilizzo:
+    from simulatore_prezzi import base_simulazione, applica_scenario
+
+    base = base_simulazione(df_fabbisogno, df_strutture)
+    kpi = applica_scenario(base, {'prezzi': {'DIAG001': 3500}})
+
+Da riga di comando:
+    python simulatore_prezzi.py --prezzo DIAG001=3500 --sconto ATTR003=15 --salva "Gara regionale"
+    python simulatore_prezzi.py --confronta "Gara regionale" "Prezzi 2025"
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from integrita_referenziale import per_versione
+from motore_fabbisogno import (
+    VOCI_COSTO, calcola_iva, carica_fabbisogno, euro_a_centesimi, formatta_euro, percentuale_cent
+)
+from nomi_file import nome_file
+
+CARTELLA_SCENARI = 'scenari_prezzi'
+
+DIMENSIONI = ['Codice_Dotazione', 'PNRR', 'Zona', 'Tipologia']
+
+# Base del simulatore per l'ultima versione dei dati
+_BASI = {}
+
+
+def _quantita_voci(df_fabbisogno):
+    """Quantità che moltiplicano il costo unitario in ciascuna voce (stessa logica di calcola_fabbisogno)"""
+    stato = df_fabbisogno['Stato_Finanziamento']
+    da_acquistare = df_fabbisogno['Quantita_Da_Acquistare']
+    return {
+        'Totale': da_acquistare,
+        'Da_Finanziare': da_acquistare.where(stato == 'DA_ACQUISTARE', 0),
+        'Gia_Finanziato': df_fabbisogno['Quantita_Richiesta'].fillna(0).where(stato == 'FINANZIATO', 0),
+        'Presente': df_fabbisogno['Quantita_Presente'].fillna(0).where(stato == 'PRESENTE', 0)
+    }
+
+
+def _costruisci_base(df_fabbisogno, df_strutture):
+    fatti = df_fabbisogno[['Codice_Dotazione', 'Codice_Struttura']].join(
+        df_strutture.drop_duplicates('Codice').set_index('Codice')[['PNRR', 'Zona', 'Tipologia']],
+        on='Codice_Struttura'
+    )
+    colonne = {f'Q_{voce}': q.astype('int64') for voce, q in _quantita_voci(df_fabbisogno).items()}
+    for voce in VOCI_COSTO:
+        colonne[f'Costo_{voce}_Cent'] = df_fabbisogno[f'Costo_{voce}_Cent']
+        colonne[f'Costo_{voce}_Lordo_Cent'] = df_fabbisogno[f'Costo_{voce}_Lordo_Cent']
+    fatti = fatti.assign(**colonne)
+
+    base = fatti.groupby(DIMENSIONI, dropna=False, as_index=False)[list(colonne)].sum()
+
+    # Prezzo e aliquota di catalogo per codice
+    catalogo = df_fabbisogno.drop_duplicates('Codice_Dotazione').set_index('Codice_Dotazione')
+    base['Costo_Unitario_Cent'] = base['Codice_Dotazione'].map(catalogo['Costo_Unitario_Cent']).astype('int64')
+    base['IVA_Percentuale'] = base['Codice_Dotazione'].map(catalogo['IVA_Percentuale']).fillna(0)
+    return base
+
+
+def base_simulazione(df_fabbisogno, df_strutture, versione=None):
+    """
+    Base del simulatore: una riga per (Codice_Dotazione, PNRR, Zona, Tipologia) con
+    quantità per voce (Q_<voce>), totali netti e lordi (Costo_<voce>[_Lordo]_Cent),
+    prezzo (Costo_Unitario_Cent) e aliquota di catalogo.
+    df_fabbisogno: risultato di calcola_fabbisogno (IVA esclusa).
+    Con versione indicata la base è riutilizzata finché la versione dei dati non cambia.
+    """
+    if versione is None:
+        return _costruisci_base(df_fabbisogno, df_strutture)
+    return per_versione(_BASI, versione, lambda: _costruisci_base(df_fabbisogno, df_strutture))
+
+
+def prezzi_scenario(base, scenario):
+    """
+    Prezzo unitario in centesimi per ogni riga della base secondo lo scenario: prima il
+    prezzo fisso, poi lo sconto %, che si applica al prezzo fissato se c'è (altrimenti
+    a quello di catalogo) e arrotonda al centesimo con metà per eccesso come l'IVA.
+    """
+    prezzo = base['Costo_Unitario_Cent'].to_numpy(dtype='int64').copy()
+    codici = base['Codice_Dotazione']
+    for codice, euro in (scenario.get('prezzi') or {}).items():
+        prezzo[(codici == codice).to_numpy()] = euro_a_centesimi([euro])[0]
+    for codice, sconto in (scenario.get('sconti') or {}).items():
+        maschera = (codici == codice).to_numpy()
+        prezzo[maschera] = percentuale_cent(prezzo[maschera], 100 - float(sconto))
+    return prezzo
+
+
+def applica_scenario(base, scenario, lordo=False):
+    """
+    Totali dello scenario per riga della base: Costo_<voce>_Cent (netto o lordo) e Delta_<voce>_Cent.
+    Solo le righe dei codici modificati cambiano; nessun ricalcolo del fabbisogno.
+    """
+    differenza = prezzi_scenario(base, scenario) - base['Costo_Unitario_Cent'].to_numpy(dtype='int64')
+    risultato = base[DIMENSIONI].copy()
+    for voce in VOCI_COSTO:
+        delta = base[f'Q_{voce}'].to_numpy(dtype='int64') * differenza
+        suffisso = '_Lordo' if lordo else ''
+        if lordo:
+            delta = delta + calcola_iva(delta, base['IVA_Percentuale'])
+        risultato[f'Costo_{voce}_Cent'] = base[f'Costo_{voce}{suffisso}_Cent'].to_numpy(dtype='int64') + delta
+        risultato[f'Delta_{voce}_Cent'] = delta
+    return risultato
+
+
+def kpi_scenario(risultato, per=None):
+    """Somma dei totali e delle differenze per voce, complessiva o per una dimensione (PNRR, Zona, ...)"""
+    colonne = [c for c in risultato.columns if c.endswith('_Cent')]
+    if per is None:
+        return risultato[colonne].sum()
+    return risultato.groupby(per, dropna=False)[colonne].sum().reset_index()
+
+
+def confronta_scenari(base, scenari, lordo=False):
+    """Tabella affiancata: una riga per voce, una colonna per scenario (più 'Base'), importi in centesimi"""
+    colonne = {'Base': applica_scenario(base, {}, lordo)}
+    colonne.update({scenario.get('nome', f'Scenario {i + 1}'): applica_scenario(base, scenario, lordo)
+                    for i, scenario in enumerate(scenari)})
+    return pd.DataFrame({
+        nome: [int(risultato[f'Costo_{voce}_Cent'].sum()) for voce in VOCI_COSTO]
+        for nome, risultato in colonne.items()
+    }, index=VOCI_COSTO)
+
+
+def salva_scenario(scenario, cartella=CARTELLA_SCENARI):
+    """Salva lo scenario in <cartella>/<nome>.json e restituisce il percorso"""
+    cartella = Path(cartella)
+    cartella.mkdir(parents=True, exist_ok=True)
+    scenario = {**scenario, 'salvato': datetime.now().isoformat(timespec='seconds')}
+    percorso = cartella / f"{nome_file(scenario.get('nome', '')) or 'scenario'}.json"
+    percorso.write_text(json.dumps(scenario, indent=2, ensure_ascii=False), encoding='utf-8')
+    return percorso
+
+
+def carica_scenari(cartella=CARTELLA_SCENARI):
+    """Scenari salvati, per nome"""
+    cartella = Path(cartella)
+    if not cartella.exists():
+        return {}
+    scenari = {}
+    for percorso in sorted(cartella.glob('*.json')):
+        scenario = json.loads(percorso.read_text(encoding='utf-8'))
+        scenari[scenario.get('nome', percorso.stem)] = scenario
+    return scenari
+
+
+def _coppie(valori, tipo):
+    """['DIAG001=3500', ...] → {'DIAG001': 3500.0}"""
+    coppie = {}
+    for valore in valori or []:
+        codice, _, numero = valore.partition('=')
+        if not numero:
+            raise SystemExit(f"❌ Formato non valido per --{tipo}: {valore} (atteso CODICE=valore)")
+        coppie[codice.strip()] = float(numero)
+    return coppie
+
+
+def stampa_confronto(confronto):
+    larghezza = max(len(nome) for nome in confronto.columns) + 2
+    print("  " + "Voce".ljust(16) + ''.join(nome.rjust(max(larghezza, 18)) for nome in confronto.columns))
+    for voce, riga in confronto.iterrows():
+        print("  " + voce.ljust(16) + ''.join(
+            formatta_euro(valore, prefisso='€ ').rjust(max(larghezza, 18)) for valore in riga
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulazione what-if dei prezzi di catalogo')
+    parser.add_argument('--prezzo', nargs='*', metavar='CODICE=EURO', help='nuovo prezzo unitario IVA esclusa')
+    parser.add_argument('--sconto', nargs='*', metavar='CODICE=PERC', help='sconto percentuale sul prezzo (fissato con --prezzo o di catalogo)')
+    parser.add_argument('--lordo', action='store_true', help='importi IVA inclusa')
+    parser.add_argument('--salva', metavar='NOME', help='salva lo scenario con il nome indicato')
+    parser.add_argument('--confronta', nargs='*', metavar='NOME', help='confronta scenari salvati')
+    args = parser.parse_args()
+
+    df_strutture, _, _, df_fabbisogno = carica_fabbisogno(arricchito=False)
+    inizio = time.perf_counter()
+    base = base_simulazione(df_fabbisogno, df_strutture)
+    print(f"🧮 Base simulazione: {len(base)} gruppi da {len(df_fabbisogno)} configurazioni "
+          f"({(time.perf_counter() - inizio) * 1000:.1f} ms)")
+
+    scenari = []
+    if args.prezzo or args.sconto:
+        scenari.append({
+            'nome': args.salva or 'Scenario',
+            'prezzi': _coppie(args.prezzo, 'prezzo'),
+            'sconti': _coppie(args.sconto, 'sconto')
+        })
+        if args.salva:
+            print(f"💾 Scenario salvato: {salva_scenario(scenari[-1])}")
+
+    if args.confronta is not None:
+        salvati = carica_scenari()
+        for nome in args.confronta or salvati:
+            if nome not in salvati:
+                raise SystemExit(f"❌ Scenario non trovato: {nome} (disponibili: {', '.join(salvati) or 'nessuno'})")
+            scenari.append(salvati[nome])
+
+    inizio = time.perf_counter()
+    confronto = confronta_scenari(base, scenari, lordo=args.lordo)
+    durata = (time.perf_counter() - inizio) * 1000
+
+    print(f"\n📊 Confronto scenari ({'IVA inclusa' if args.lordo else 'IVA esclusa'}, {durata:.1f} ms)")
+    stampa_confronto(confronto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Storico dei censimenti tecnologie sanitarie (prospetti CDC/ODC datati).
+
+I prospetti ricevuti periodicamente (es. "CDC_censimento ..._prospetto al
+19-01-26.CSV", "... al 20-01-26.CSV") sono letti in forma lunga, una riga per
+(struttura, dispositivo), con lo stato normalizzato:
+
+    PRESENTE | FINANZIATO | DA_ACQUISTARE | NON_RICHIESTO | NON_COMPILATO | ALTRO
+
+e acquisiti una sola volta (data + hash del contenuto) in un archivio append-only
+(cartella storico_censimenti/):
+
+    acquisizioni.csv   un prospetto per riga: Data, Tipo, File, Hash, Righe, Variazioni
+    variazioni.csv     solo le righe (struttura, dispositivo) cambiate rispetto allo
+                       stato alla data precedente; Stato RIMOSSO se la riga non c'è più
+
+Lo stato a una data è l'ultima variazione di ogni chiave fino a quella data
+(stato_al); l'andamento per zona del valore DA_ACQUISTARE si ottiene con una
+somma cumulata vettoriale dei contributi di ciascuna variazione, valorizzata ai
+prezzi di catalogo correnti (andamento). La dashboard legge solo l'archivio,
+senza rileggere i vecchi prospetti.
+
+I prospetti di uno stesso tipo vanno acquisiti in ordine di data.
+
+Utilizzo:
+    python storico_censimenti.py acquisisci                      # tutti i prospetti nella cartella
+    python storico_censimenti.py acquisisci "ODC_..._prospetto al 21-01-26.CSV"
+    python storico_censimenti.py andamento --stato DA_ACQUISTARE --per Zona --lordo
+    python storico_censimenti.py stato --al 19-01-26
+
+Utilizzo come modulo:
+    from storico_censimenti import carica_storico, andamento, prezzi_catalogo
+
+    variazioni, acquisizioni = carica_storico()
+    df = andamento(variazioni, prezzi_catalogo(df_catalogo), date=acquisizioni['Data'])
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from motore_fabbisogno import (
+    ETICHETTA_IMPORTI, FILE_CATALOGO, calcola_iva, euro_a_centesimi, formatta_euro
+)
+
+CARTELLA_STORICO = Path('storico_censimenti')
+FILE_VARIAZIONI = 'variazioni.csv'
+FILE_ACQUISIZIONI = 'acquisizioni.csv'
+
+MODELLO_PROSPETTI = '*_prospetto al *.CSV'
+
+# Colonna del prospetto (inizio intestazione, senza maiuscole) → codice catalogo,
+# con i nomi dei dispositivi di dotazioni_minime_standard.csv
+DISPOSITIVI_CENSIMENTO = {
+    'CDC': {
+        'ECG': 'DIAG001',
+        'Holter cardiaco': 'DIAG002',
+        'Spirometro': 'DIAG003',
+        'Ecografo portatile': 'DIAG004',
+        'Monitor multiparametrico': 'DIAG005'
+    },
+    'ODC': {
+        'Apparecchio radiologico': 'DIAG007',
+        'Ecografo': 'DIAG013',
+        'Carrello emergenza': 'DIAG010',
+        'Defibrillatore': 'DIAG006',
+        'Spirometro': 'DIAG012',
+        'Emogasanalizzatore': 'DIAG008',
+        'POC': 'DIAG009',
+        'ECG portatile': 'DIAG011',
+        'Telemedicina (STANZA)': 'DIAG014'
+    }
+}
+
+STATI_CENSIMENTO = ['PRESENTE', 'FINANZIATO', 'DA_ACQUISTARE', 'NON_RICHIESTO', 'NON_COMPILATO', 'ALTRO']
+STATO_RIMOSSO = 'RIMOSSO'
+
+CHIAVI = ['Chiave_Struttura', 'Dispositivo']
+
+COLONNE_SNAPSHOT = [
+    'Tipo', 'Chiave_Struttura', 'Zona', 'Nome_Struttura', 'Indirizzo', 'PNRR',
+    'Dispositivo', 'Codice_Dotazione', 'Stato', 'Valore_Originale'
+]
+COLONNE_VARIAZIONI = [
+    'Data', 'Tipo', 'Chiave_Struttura', 'Zona', 'Nome_Struttura', 'PNRR', 'Dispositivo', 'Codice_Dotazione', 'Stato'
+]
+COLONNE_ACQUISIZIONI = ['Data', 'Tipo', 'File', 'Hash', 'Righe', 'Variazioni', 'Acquisito_Il']
+
+
+def data_prospetto(percorso):
+    """Data del prospetto dal nome file ('... al 19-01-26.CSV' → 2026-01-19)"""
+    trovato = re.search(r'al (\d{1,2})-(\d{1,2})-(\d{2,4})', Path(percorso).name)
+    if not trovato:
+        raise ValueError(f"Data non riconosciuta nel nome del file: {Path(percorso).name}")
+    giorno, mese, anno = trovato.groups()
+    return pd.Timestamp(int(anno) + (2000 if len(anno) == 2 else 0), int(mese), int(giorno))
+
+
+def hash_contenuto(percorso):
+    """SHA-256 del solo contenuto (indipendente dal nome del file)"""
+    return hashlib.sha256(Path(percorso).read_bytes()).hexdigest()
+
+
+def _normalizza_testo(serie):
+    return (serie.fillna('').astype(str).str.replace('\x92', "'", regex=False)
+            .str.replace(r'\s+', ' ', regex=True).str.strip())
+
+
+def normalizza_stato(valori):
+    """Testo libero della cella → stato (STATI_CENSIMENTO), in modo vettoriale"""
+    testo = _normalizza_testo(pd.Series(valori)).str.upper()
+    return pd.Series(np.select(
+        [
+            testo == '',
+            testo.str.contains('NON RICHIESTO', regex=False),
+            testo.str.contains('PRESENT', regex=False),
+            testo.str.contains('FINANZIATO', regex=False),
+            testo.str.contains('DA ACQUISTARE', regex=False)
+        ],
+        ['NON_COMPILATO', 'NON_RICHIESTO', 'PRESENTE', 'FINANZIATO', 'DA_ACQUISTARE'],
+        default='ALTRO'
+    ), index=testo.index)
+
+
+def _colonne_dispositivi(intestazione, tipo):
+    """Indice di colonna → dispositivo, escluse le colonne del numero di inventario"""
+    dispositivi = sorted(DISPOSITIVI_CENSIMENTO[tipo], key=len, reverse=True)
+    colonne = {}
+    for indice, nome in enumerate(intestazione):
+        nome = nome.strip().lower()
+        if not nome or 'inserire' in nome:
+            continue
+        for dispositivo in dispositivi:
+            if nome.startswith(dispositivo.lower()) and dispositivo not in colonne.values():
+                colonne[indice] = dispositivo
+                break
+    return colonne
+
+
+def leggi_prospetto(percorso):
+    """
+    Prospetto di censimento CDC o ODC in forma lunga (COLONNE_SNAPSHOT), una riga per
+    (struttura, dispositivo). Chiave_Struttura = Tipo|Zona|Nome normalizzati.
+    """
+    testo = Path(percorso).read_bytes().decode('latin-1')
+    righe = list(csv.reader(io.StringIO(testo), delimiter=';'))
+
+    intestazione = next((i for i, r in enumerate(righe) if r and r[0].strip() == 'Zona'), None)
+    if intestazione is None:
+        raise ValueError(f"Intestazione 'Zona;...' non trovata in {Path(percorso).name}")
+    nomi = righe[intestazione]
+    tipo = 'ODC' if nomi[1].strip().upper() == 'STRUTTURA' else 'CDC'
+    dispositivi = _colonne_dispositivi(nomi, tipo)
+
+    larghezza = len(nomi)
+    dati = pd.DataFrame([(r + [''] * larghezza)[:larghezza] for r in righe[intestazione + 1:]])
+    dati = dati[(_normalizza_testo(dati[0]) != '') & (_normalizza_testo(dati[1]) != '')]
+
+    if tipo == 'CDC':
+        # Zona;Denominazione;Tipologia;PNRR;indirizzo;...
+        nome, indirizzo, pnrr = dati[1], dati[4], _normalizza_testo(dati[3]).str.upper() != ''
+    else:
+        # Zona;STRUTTURA (nome + a capo + indirizzo);POSTI LETTO;SETTING;PNRR;...
+        parti = dati[1].str.split('\n', n=1, expand=True).reindex(columns=[0, 1])
+        nome, indirizzo = parti[0], parti[1]
+        pnrr = _normalizza_testo(dati[4]).str.upper().isin(['X', 'SI', 'PNRR'])
+
+    strutture = pd.DataFrame({
+        'Tipo': tipo,
+        'Zona': _normalizza_testo(dati[0]),
+        'Nome_Struttura': _normalizza_testo(nome),
+        'Indirizzo': _normalizza_testo(indirizzo),
+        'PNRR': np.where(pnrr, 'SI', 'NO')
+    }, index=dati.index)
+    strutture['Chiave_Struttura'] = (
+        tipo + '|' + strutture['Zona'].str.upper() + '|' + strutture['Nome_Struttura'].str.upper()
+    )
+    strutture = strutture.drop_duplicates('Chiave_Struttura')
+
+    # Da larga a lunga: una riga per (struttura, dispositivo)
+    stati = dati.loc[strutture.index, list(dispositivi)].rename(columns=dispositivi)
+    lunga = strutture.join(stati).melt(
+        id_vars=list(strutture.columns), value_vars=list(dispositivi.values()),
+        var_name='Dispositivo', value_name='Valore_Originale'
+    )
+    lunga['Valore_Originale'] = _normalizza_testo(lunga['Valore_Originale'])
+    lunga['Stato'] = normalizza_stato(lunga['Valore_Originale'])
+    lunga['Codice_Dotazione'] = lunga['Dispositivo'].map(DISPOSITIVI_CENSIMENTO[tipo])
+    return lunga[COLONNE_SNAPSHOT].sort_values(CHIAVI, ignore_index=True)
+
+
+def carica_storico(cartella=CARTELLA_STORICO):
+    """(variazioni, acquisizioni) dall'archivio; tabelle vuote se non ancora creato"""
+    cartella = Path(cartella)
+    percorsi = cartella / FILE_VARIAZIONI, cartella / FILE_ACQUISIZIONI
+    tabelle = []
+    for percorso, colonne in zip(percorsi, [COLONNE_VARIAZIONI, COLONNE_ACQUISIZIONI]):
+        if percorso.exists():
+            df = pd.read_csv(percorso, dtype=str, keep_default_na=False)
+            df['Data'] = pd.to_datetime(df['Data'])
+        else:
+            df = pd.DataFrame(columns=colonne).astype({'Data': 'datetime64[ns]'})
+        tabelle.append(df)
+    variazioni, acquisizioni = tabelle
+    for colonna in ['Righe', 'Variazioni']:
+        acquisizioni[colonna] = pd.to_numeric(acquisizioni[colonna]).astype('int64')
+    return variazioni, acquisizioni
+
+
+def stato_al(variazioni, data, tipo=None):
+    """Stato di ogni (struttura, dispositivo) alla data: ultima variazione fino alla data, senza i RIMOSSO"""
+    storico = variazioni[variazioni['Data'] <= pd.Timestamp(data)]
+    if tipo is not None:
+        storico = storico[storico['Tipo'] == tipo]
+    ultime = storico.sort_values('Data', kind='stable').drop_duplicates(CHIAVI, keep='last')
+    return ultime[ultime['Stato'] != STATO_RIMOSSO].reset_index(drop=True)
+
+
+def calcola_variazioni(precedente, attuale):
+    """
+    Righe da registrare: chiavi nuove o con Stato/PNRR cambiati, più le chiavi
+    non più presenti (Stato RIMOSSO). Un solo merge sulle chiavi.
+    """
+    confronto = attuale.merge(
+        precedente[CHIAVI + ['Stato', 'PNRR']], on=CHIAVI, how='outer', suffixes=('', '_Prec'), indicator=True
+    )
+    cambiate = (confronto['_merge'] == 'left_only') | (
+        (confronto['_merge'] == 'both')
+        & ((confronto['Stato'] != confronto['Stato_Prec']) | (confronto['PNRR'] != confronto['PNRR_Prec']))
+    )
+    rimosse = precedente.merge(
+        confronto.loc[confronto['_merge'] == 'right_only', CHIAVI], on=CHIAVI
+    ).assign(Stato=STATO_RIMOSSO)
+    return pd.concat([confronto.loc[cambiate, attuale.columns], rimosse[attuale.columns]], ignore_index=True)
+
+
+def acquisisci_prospetto(percorso, cartella=CARTELLA_STORICO):
+    """
+    Acquisisce un prospetto nell'archivio registrando solo le variazioni rispetto
+    allo stato alla data precedente. Restituisce la riga di acquisizioni.csv
+    (dict) oppure None se lo stesso contenuto è già stato acquisito per quella data.
+    """
+    cartella = Path(cartella)
+    sha = hash_contenuto(percorso)
+    data = data_prospetto(percorso)
+    variazioni, acquisizioni = carica_storico(cartella)
+    if ((acquisizioni['Hash'] == sha) & (acquisizioni['Data'] == data)).any():
+        return None
+
+    prospetto = leggi_prospetto(percorso)
+    tipo = prospetto['Tipo'].iloc[0]
+
+    stesso_tipo = acquisizioni[acquisizioni['Tipo'] == tipo]
+    if (stesso_tipo['Data'] == data).any():
+        raise ValueError(f"Prospetto {tipo} del {data:%d/%m/%Y} già acquisito con contenuto diverso")
+    if (stesso_tipo['Data'] > data).any():
+        raise ValueError(
+            f"Prospetto {tipo} del {data:%d/%m/%Y} più vecchio dell'ultimo acquisito "
+            f"({stesso_tipo['Data'].max():%d/%m/%Y}): l'archivio è solo in aggiunta"
+        )
+
+    colonne = [c for c in COLONNE_VARIAZIONI if c != 'Data']
+    nuove = calcola_variazioni(stato_al(variazioni, data, tipo)[colonne], prospetto[colonne])
+    nuove.insert(0, 'Data', data.strftime('%Y-%m-%d'))
+
+    voce = {
+        'Data': data.strftime('%Y-%m-%d'), 'Tipo': tipo, 'File': Path(percorso).name, 'Hash': sha,
+        'Righe': len(prospetto), 'Variazioni': len(nuove),
+        'Acquisito_Il': datetime.now().isoformat(timespec='seconds')
+    }
+    cartella.mkdir(parents=True, exist_ok=True)
+    for nome, df in [(FILE_VARIAZIONI, nuove), (FILE_ACQUISIZIONI, pd.DataFrame([voce]))]:
+        percorso_archivio = cartella / nome
+        df.to_csv(percorso_archivio, mode='a', header=not percorso_archivio.exists(), index=False)
+    return voce
+
+
+def prezzi_catalogo(df_catalogo, lordo=False):
+    """Prezzo unitario in centesimi per codice catalogo (IVA inclusa se lordo)"""
+    prezzo = euro_a_centesimi(df_catalogo['Costo_Unitario_EUR'])
+    if lordo:
+        prezzo = prezzo + calcola_iva(prezzo, df_catalogo['IVA_Percentuale'].fillna(0))
+    return pd.Series(prezzo, index=df_catalogo['Codice'].to_numpy())
+
+
+def andamento(variazioni, prezzi_cent, stato='DA_ACQUISTARE', per='Zona', date=None):
+    """
+    Quantità e valore (centesimi, prezzi correnti) delle righe nello stato indicato,
+    per gruppo (Zona, Tipo, PNRR, ...) a ogni data di variazione o alle date richieste.
+
+    Ogni variazione contribuisce +valore al proprio gruppo e −valore precedente al
+    gruppo precedente della stessa chiave: la somma cumulata per data dà lo stato
+    as-of senza ricostruire gli snapshot.
+    """
+    storico = variazioni.sort_values(CHIAVI + ['Data'], kind='stable')
+    nello_stato = (storico['Stato'] == stato).to_numpy()
+    quantita = nello_stato.astype('int64')
+    valore = np.where(nello_stato, storico['Codice_Dotazione'].map(prezzi_cent).fillna(0).to_numpy('int64'), 0)
+
+    contributi = pd.DataFrame({'Data': storico['Data'], per: storico[per], 'Quantita': quantita, 'Valore_Cent': valore})
+    nuova_chiave = ~storico.duplicated(CHIAVI).to_numpy()
+    precedenti = contributi.shift(1)[~nuova_chiave].assign(Data=contributi['Data'][~nuova_chiave])
+    precedenti[['Quantita', 'Valore_Cent']] = -precedenti[['Quantita', 'Valore_Cent']].astype('int64')
+    contributi = pd.concat([contributi, precedenti], ignore_index=True)
+
+    tabella = contributi.pivot_table(
+        index='Data', columns=per, values=['Quantita', 'Valore_Cent'], aggfunc='sum', fill_value=0
+    ).sort_index().cumsum()
+    if date is not None:
+        date = pd.DatetimeIndex(pd.to_datetime(pd.Series(date)).drop_duplicates().sort_values())
+        tabella = tabella.reindex(tabella.index.union(date)).ffill().fillna(0).loc[date].rename_axis('Data')
+
+    risultato = tabella.stack(per, future_stack=True).reset_index()
+    risultato[['Quantita', 'Valore_Cent']] = risultato[['Quantita', 'Valore_Cent']].astype('int64')
+    return risultato[['Data', per, 'Quantita', 'Valore_Cent']].sort_values(['Data', per], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Storico dei prospetti di censimento CDC/ODC')
+    parser.add_argument('--cartella', default=str(CARTELLA_STORICO), help='cartella dell\'archivio')
+    sotto = parser.add_subparsers(dest='comando', required=True)
+
+    p_acq = sotto.add_parser('acquisisci', help='Acquisisce i prospetti non ancora presenti')
+    p_acq.add_argument('file', nargs='*', help=f'prospetti (default: {MODELLO_PROSPETTI} nella cartella corrente)')
+
+    p_and = sotto.add_parser('andamento', help='Andamento per data di quantità e valore in uno stato')
+    p_and.add_argument('--stato', default='DA_ACQUISTARE', choices=STATI_CENSIMENTO)
+    p_and.add_argument('--per', default='Zona', choices=['Zona', 'Tipo', 'PNRR', 'Dispositivo'])
+    p_and.add_argument('--lordo', action='store_true', help='importi IVA inclusa')
+
+    p_stato = sotto.add_parser('stato', help='Conteggio per stato a una data')
+    p_stato.add_argument('--al', required=True, metavar='GG-MM-AA', help='data (es. 19-01-26)')
+    p_stato.add_argument('--csv', help='salva lo stato completo nel file CSV indicato')
+
+    args = parser.parse_args()
+
+    try:
+        if args.comando == 'acquisisci':
+            file = args.file or sorted(Path('.').glob(MODELLO_PROSPETTI), key=lambda p: (data_prospetto(p), p.name))
+            print(f"🗂️  Acquisizione prospetti in {args.cartella}/")
+            for percorso in file:
+                inizio = time.perf_counter()
+                voce = acquisisci_prospetto(percorso, args.cartella)
+                if voce is None:
+                    print(f"  ⏭️  {Path(percorso).name}: già acquisito")
+                    continue
+                print(f"  ✅ {voce['Tipo']} {pd.Timestamp(voce['Data']):%d/%m/%Y}: {voce['Righe']} righe, "
+                      f"{voce['Variazioni']} variazioni ({(time.perf_counter() - inizio) * 1000:.1f} ms)")
+
+        elif args.comando == 'andamento':
+            variazioni, acquisizioni = carica_storico(args.cartella)
+            if acquisizioni.empty:
+                raise ValueError("Archivio vuoto: eseguire prima 'python storico_censimenti.py acquisisci'")
+            prezzi = prezzi_catalogo(pd.read_csv(FILE_CATALOGO), lordo=args.lordo)
+            inizio = time.perf_counter()
+            df = andamento(variazioni, prezzi, stato=args.stato, per=args.per, date=acquisizioni['Data'])
+            durata = (time.perf_counter() - inizio) * 1000
+            print(f"📈 Andamento {args.stato} per {args.per} "
+                  f"(prezzi catalogo correnti, {ETICHETTA_IMPORTI[args.lordo]}, {durata:.1f} ms)")
+            for data, righe in df.groupby('Data'):
+                print(f"\n  📅 {data:%d/%m/%Y}: {righe['Quantita'].sum()} dispositivi, "
+                      f"{formatta_euro(righe['Valore_Cent'].sum(), prefisso='€ ')}")
+                for _, row in righe[righe['Quantita'] != 0].iterrows():
+                    print(f"    - {row[args.per]}: {row['Quantita']} "
+                          f"({formatta_euro(row['Valore_Cent'], prefisso='€ ')})")
+
+        elif args.comando == 'stato':
+            variazioni, _ = carica_storico(args.cartella)
+            data = pd.to_datetime(args.al, format='%d-%m-%y')
+            df = stato_al(variazioni, data)
+            print(f"📅 Stato al {data:%d/%m/%Y}: {df['Chiave_Struttura'].nunique()} strutture, {len(df)} righe")
+            conteggi = pd.crosstab(df['Tipo'], df['Stato']).reindex(columns=STATI_CENSIMENTO, fill_value=0)
+            for tipo, riga in conteggi.iterrows():
+                print(f"  - {tipo}: " + ', '.join(f"{stato} {n}" for stato, n in riga.items() if n))
+            if args.csv:
+                df.to_csv(args.csv, index=False)
+                print(f"\n💾 Stato completo: {args.csv}")
+
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()